@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-24
+# modified: 2021-05-15
+#
+# Tests the AsyncClock, comparing its tick interval jitter against that of
+# the threaded Clock. Each clock publishes into a minimal sink that records
+# the arrival time of each tick message. The AsyncClock's schedule is then
+# checked exactly on an event loop with virtual time, with each tick taking
+# a share of its period to handle, which would otherwise cause drift.
+#
+
+import pytest
+import sys, time, asyncio, selectors
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.message_factory import MessageFactory
+from lib.pll import IntervalEstimator
+from lib.timing import now_ns, NS_PER_SEC, NS_PER_US
+from lib.clock import Clock
+from lib.async_clock import AsyncClock
+
+LOOP_FREQ_HZ = 50
+DURATION_SEC = 2.0
+WORK_SEC     = 0.005 # virtual time taken to handle each tick
+
+_CONFIG = { 'ros': { 'clock': { 'loop_freq_hz': LOOP_FREQ_HZ, 'tock_modulo': 10, 'enable_trim': False } } }
+
+# ..............................................................................
+class VirtualSelector(selectors.SelectSelector):
+    '''
+    A selector that, rather than waiting, advances the time of its loop.
+    '''
+    def __init__(self, loop):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout:
+            self._loop.advance(timeout)
+        return super().select(0)
+
+# ..............................................................................
+class VirtualTimeLoop(asyncio.SelectorEventLoop):
+    '''
+    An event loop whose time only advances when it would otherwise wait, or
+    by advance(), so that it runs as fast as the host allows and the timing
+    of its callbacks is exact.
+    '''
+    def __init__(self):
+        self._time_sec = 0.0
+        super().__init__(VirtualSelector(self))
+
+    def time(self):
+        return self._time_sec
+
+    def advance(self, seconds):
+        self._time_sec += seconds
+
+# ..............................................................................
+class TickSink(object):
+    '''
+    Records the interval between arrivals of clock messages, either handled
+    synchronously (threaded Clock) or placed on the queue (AsyncClock). If
+    the loop has virtual time it is used, and advanced by work_sec per tick.
+    '''
+    def __init__(self, loop=None, work_sec=0.0):
+        self._loop = loop
+        self._virtual = isinstance(loop, VirtualTimeLoop)
+        self._work_sec = work_sec
+        self._intervals = IntervalEstimator(1000)
+        self._max_error_ns = 0
+        self._last_ns = None
+        self.count = 0
+
+    @property
+    def loop(self):
+        return self._loop
+
+    def handle(self, message):
+        _now = round(self._loop.time() * NS_PER_SEC) if self._virtual else now_ns()
+        if self._last_ns is not None:
+            _interval = _now - self._last_ns
+            self._intervals.add(_interval)
+            self._max_error_ns = max(self._max_error_ns, abs(_interval - ( NS_PER_SEC // LOOP_FREQ_HZ )))
+        self._last_ns = _now
+        self.count += 1
+        if self._virtual:
+            self._loop.advance(self._work_sec)
+
+    def publish_message_nowait(self, message):
+        self.handle(message)
+
+    def stats(self):
+        return self._intervals.mean / NS_PER_US, ( self._intervals.variance ** 0.5 ) / NS_PER_US, self._max_error_ns / NS_PER_US
+
+# ..............................................................................
+@pytest.mark.unit
+def test_async_clock():
+    _log = Logger('async-clock-test', Level.INFO)
+    _message_factory = MessageFactory(None, Level.WARN)
+
+    # threaded Clock ...........................
+    _sink = TickSink()
+    _clock = Clock(_CONFIG, _sink, _message_factory, Level.WARN)
+    _clock.enable()
+    time.sleep(DURATION_SEC)
+    _clock.disable()
+    _mean, _stdev, _max = _sink.stats()
+    _log.info(Fore.YELLOW + 'threaded clock: {:d} ticks; interval mean: {:9.2f}µs; stdev: {:7.2f}µs; max error: {:7.2f}µs'.format(_sink.count, _mean, _stdev, _max))
+    time.sleep(0.1)
+
+    # AsyncClock ...............................
+    _loop = asyncio.new_event_loop()
+    _sink = TickSink(_loop)
+    _async_clock = AsyncClock(_CONFIG, _sink, _message_factory, Level.WARN)
+    _async_clock.enable()
+    _loop.run_until_complete(asyncio.sleep(DURATION_SEC))
+    _async_clock.close()
+    _loop.close()
+    _mean, _stdev, _max = _sink.stats()
+    _log.info(Fore.GREEN + 'async clock:    {:d} ticks; interval mean: {:9.2f}µs; stdev: {:7.2f}µs; max error: {:7.2f}µs'.format(_sink.count, _mean, _stdev, _max))
+    _late_mean, _late_stdev, _late_max, _overruns = _async_clock.jitter_stats
+    _log.info(Fore.GREEN + 'async clock lateness: mean {:7.2f}µs; stdev: {:7.2f}µs; max: {:7.2f}µs; overruns: {:d}'.format(_late_mean, _late_stdev, _late_max, _overruns))
+
+    # AsyncClock in virtual time ...............
+    # scheduled on absolute deadlines, so the time taken handling each tick
+    # does not accumulate as drift: the count is exact
+    _loop = VirtualTimeLoop()
+    _sink = TickSink(_loop, WORK_SEC)
+    _async_clock = AsyncClock(_CONFIG, _sink, _message_factory, Level.WARN)
+    _async_clock.enable()
+    _loop.run_until_complete(asyncio.sleep(DURATION_SEC))
+    _async_clock.close()
+    _loop.close()
+    _mean, _stdev, _max = _sink.stats()
+    _late_mean, _late_stdev, _late_max, _overruns = _async_clock.jitter_stats
+    assert abs(_sink.count - LOOP_FREQ_HZ * DURATION_SEC) <= 1
+    assert _mean == pytest.approx(NS_PER_SEC / LOOP_FREQ_HZ / NS_PER_US, rel=1e-6)
+    assert _max < 1.0 # µs
+    assert _overruns == 0
+
+# main .........................................................................
+def main():
+    try:
+        test_async_clock()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-11
+# modified: 2021-05-15
+#
+# Tests interrupt-driven bumper detection upon a mock GPIO edge source, both
+# with the bumpers on GPIOs and via the IO Expander's interrupt output,
+# measuring the latency from a hit to its event.
+#
+
+import pytest, time
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.event import Event
+from lib.message_factory import MessageFactory
+from lib.filters import RunningMean
+from lib.timing import now_ns
+from lib.ioe import IoExpander
+from lib.ioe_scan import IOE_PINS
+from lib.bumpers import Bumpers
+from mock.gpio_edge_source import MockGpioEdgeSource
+from mock.ms51 import MockMS51, MockIOE, ADC, IN_PU
+
+# ..............................................................................
+class EventRecorder(object):
+    '''
+    Records the events received, with the time of their arrival.
+    '''
+    def __init__(self):
+        self.events = []
+
+    def handle(self, message):
+        self.events.append(( message.event, now_ns() ))
+
+# ..............................................................................
+@pytest.mark.unit
+def test_gpio_bumpers():
+    _log = Logger('bumpers-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _bmp_config = _config['ros'].get('bumpers')
+    _bmp_config['source'] = 'gpio'
+    _pins = ( _bmp_config.get('port_pin'), _bmp_config.get('cntr_pin'), _bmp_config.get('stbd_pin') )
+    _debounce_ns = int(_bmp_config.get('debounce_ms') * 1000000)
+    _gpio = MockGpioEdgeSource(bounces=3, bounce_us=300)
+    _recorder = EventRecorder()
+    _bumpers = Bumpers(_config, None, _recorder, MessageFactory(None, Level.WARN), Level.WARN, pi=_gpio)
+    _bumpers.enable()
+    _latency_us = RunningMean(30)
+    try:
+        for i in range(30):
+            _index = i % 3
+            _hit_ns = _gpio.press(_pins[_index])
+            _gpio.wait()
+            assert len(_recorder.events) == i + 1
+            _event, _event_ns = _recorder.events[-1]
+            assert _event is Bumpers.EVENTS[_index]
+            _latency_us.add(( _event_ns - _hit_ns ) // 1000)
+            # bouncing upon release is not a hit
+            _gpio.release(_pins[_index])
+            _gpio.edge(_pins[_index], 1, _debounce_ns // 1000)
+            _gpio.wait()
+            assert len(_recorder.events) == i + 1
+        assert _bumpers.hits == 30
+        assert _bumpers.bounces == 30 * 6
+        _log.info('hit to event latency: mean {:5.1f}µs (polled every 4th tick at 20Hz: up to 200000µs).'.format(_latency_us.mean))
+        assert _latency_us.mean < 20000
+        # hits of a bumper quicker than the debounce interval are one hit
+        _gpio.press(_pins[0])
+        _gpio.edge(_pins[0], 1, 1000)
+        _gpio.edge(_pins[0], 0, 1000)
+        _gpio.wait()
+        assert _bumpers.hits == 31
+        # a hit whose edge is missed is caught by the fallback poll, once
+        _gpio.release(_pins[0])
+        _gpio.wait()
+        _bumpers.poll()
+        assert _bumpers.hits == 31
+        time.sleep(_debounce_ns / 1e9)
+        _gpio._levels[_pins[2]] = 0 # no edge
+        _bumpers.poll()
+        _bumpers.poll()
+        assert _bumpers.hits == 32
+        assert _recorder.events[-1][0] is Event.BUMPER_STBD
+        _gpio._levels[_pins[2]] = 1
+        _bumpers.poll()
+        _bumpers.disable()
+        _gpio.press(_pins[1])
+        _gpio.wait()
+        _bumpers.poll()
+        assert _bumpers.hits == 32
+    finally:
+        _bumpers.close()
+        _gpio.stop()
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ioe_bumpers():
+    _log = Logger('bumpers-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros']['io_expander']['bulk_read'] = True
+    _bmp_config = _config['ros'].get('bumpers')
+    _bmp_config['source'] = 'ioe'
+    _bmp_config['debounce_ms'] = 2.0
+    _interrupt_pin = _bmp_config.get('interrupt_pin')
+    _ioe_config = _config['ros'].get('io_expander')
+    _bmp_pins = [ _ioe_config.get(_key) for _key in ( 'port_bmp_pin', 'center_bmp_pin', 'stbd_bmp_pin' ) ]
+    _gpio = MockGpioEdgeSource()
+    _ms51 = MockMS51()
+    _ioe = MockIOE(_ms51, _gpio, _interrupt_pin)
+    for _key in ( 'port_side_ir_pin', 'port_ir_pin', 'center_ir_pin', 'stbd_ir_pin', 'stbd_side_ir_pin', 'port_moth_pin', 'stbd_moth_pin' ):
+        _ioe.set_mode(_ioe_config.get(_key), ADC)
+    for _pin in _bmp_pins:
+        _ioe.set_mode(_pin, IN_PU)
+    _expander = IoExpander(_config, Level.WARN, ioe=_ioe, bus=_ms51)
+    _recorder = EventRecorder()
+    _bumpers = Bumpers(_config, _expander, _recorder, MessageFactory(None, Level.WARN), Level.WARN, pi=_gpio)
+    _bumpers.enable()
+    _latency_us = RunningMean(30)
+    try:
+        for i in range(30):
+            _index = i % 3
+            _hit_ns = now_ns()
+            _ioe.set_input(_bmp_pins[_index], 0)
+            _gpio.wait()
+            assert len(_recorder.events) == i + 1
+            _event, _event_ns = _recorder.events[-1]
+            assert _event is Bumpers.EVENTS[_index]
+            _latency_us.add(( _event_ns - _hit_ns ) // 1000)
+            assert not _ioe.get_interrupt()
+            _ioe.set_input(_bmp_pins[_index], 1)
+            _gpio.wait()
+            assert len(_recorder.events) == i + 1
+            time.sleep(0.003) # open for longer than the debounce interval
+        _log.info('hit to event latency via IO Expander: mean {:5.1f}µs.'.format(_latency_us.mean))
+        assert _latency_us.mean < 20000
+        # two bumpers upon one interrupt
+        _port, _bit, _channel = IOE_PINS[_bmp_pins[2] - 1]
+        _ms51.set_level(_port, _bit, 0)
+        _ioe.set_input(_bmp_pins[0], 0)
+        _gpio.wait()
+        assert _bumpers.hits == 32
+        assert set(_event for _event, _ns in _recorder.events[30:]) == { Event.BUMPER_PORT, Event.BUMPER_STBD }
+        # a hit already seen upon an edge is not published again by a poll
+        _bumpers.poll()
+        assert _bumpers.hits == 32
+        # a hit whose interrupt is missed is caught by the fallback poll
+        _ioe.set_input(_bmp_pins[0], 1)
+        _ms51.set_level(_port, _bit, 1)
+        _gpio.wait()
+        time.sleep(0.003)
+        _port, _bit, _channel = IOE_PINS[_bmp_pins[1] - 1]
+        _ms51.set_level(_port, _bit, 0) # no interrupt
+        _bumpers.poll()
+        assert _bumpers.hits == 33
+        assert _recorder.events[-1][0] is Event.BUMPER_CNTR
+        _bumpers.poll()
+        assert _bumpers.hits == 33
+    finally:
+        _bumpers.close()
+        _gpio.stop()
+
+# main .........................................................................
+def main():
+    try:
+        test_gpio_bumpers()
+        test_ioe_bumpers()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
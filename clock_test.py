@@ -12,7 +12,6 @@
 
 import pytest
 import time, itertools, traceback
-from datetime import datetime as dt
 from colorama import init, Fore, Style
 init()
 
@@ -21,6 +20,7 @@ from lib.config_loader import ConfigLoader
 from lib.event import Event
 from lib.message_factory import MessageFactory
 from lib.clock import Clock
+from lib.timing import now_ns, ns_to_ms
 
 INFINITE = True
 SHOW_STATS = False
@@ -34,7 +34,7 @@ class MockMessageBus():
         super().__init__()
         self._counter = itertools.count()
         self._log = Logger("queue", Level.INFO)
-        self._start_time = dt.now()
+        self._start_time = now_ns()
         self._last_time  = self._start_time
         self._log.info('ready.')
 
@@ -50,12 +50,10 @@ class MockMessageBus():
         _event = message.event
         _value = message.value
 
-        _now = dt.now()
-        _delta = _now - self._start_time
-        _elapsed_ms = (_now - self._last_time).total_seconds() * 1000.0
-        _process_delta = _now - message.timestamp
-        _elapsed_loop_ms = _delta.total_seconds() * 1000.0
-        _process_ms = _process_delta.total_seconds() * 1000.0
+        _now = now_ns()
+        _elapsed_ms = ns_to_ms(_now - self._last_time)
+        _elapsed_loop_ms = ns_to_ms(_now - self._start_time)
+        _process_ms = ns_to_ms(_now - message.timestamp)
         _total_ms = _elapsed_loop_ms + _process_ms
 
         if SHOW_STATS:
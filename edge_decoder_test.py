@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-01
+# modified: 2021-05-01
+#
+# Tests that the bulk EdgeDecoder counts the same steps as the callback
+# Decoder for the same edges, including across the 32 bit tick wrap, and
+# compares the cost of per-edge callbacks with that of a per-tick fold.
+#
+
+import pytest
+import sys, timeit
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.ticker import Ticker
+from lib.decoder import Decoder
+from lib.edge_decoder import EdgeDecoder, EdgeRing
+from lib.motor import Motor
+from mock.pigpio import MockPi
+from mock.thunderborg import ThunderBorg
+from mock.edge_source import MockEdgeSource
+
+GPIO_A = 12
+GPIO_B = 16
+
+# ..............................................................................
+class Counter(object):
+    def __init__(self):
+        self.steps = 0
+    def add(self, step):
+        self.steps += step
+
+# ..............................................................................
+def _replay(decoder, edges):
+    for _gpio, _level, _tick in edges:
+        if _gpio == GPIO_A:
+            decoder._pulse_a(_gpio, _level, _tick)
+        else:
+            decoder._pulse_b(_gpio, _level, _tick)
+
+# ..............................................................................
+@pytest.mark.unit
+def test_edge_decoder():
+    _log = Logger('edge-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros'].get('motors')['edge_ring_capacity'] = 64
+
+    # equivalence with the callback decoder ...
+    _source = MockEdgeSource(GPIO_A, GPIO_B)
+    _decoder = EdgeDecoder(_config, _source, GPIO_A, GPIO_B, Orientation.PORT, Level.WARN)
+    _counter = Counter()
+    _callback_decoder = Decoder(MockPi(), Orientation.PORT, GPIO_A, GPIO_B, _counter.add, Level.WARN)
+    _folded = 0
+    for _steps in [ 10, 25, -7, 0, -30, 100, 3 ]:
+        _source.add_steps(_steps, 800)
+        _source.add_report(0x40) # keep-alive, ignored
+        _folded += _decoder.fold()
+    _replay(_callback_decoder, _source.edges)
+    assert _counter.steps == 101
+    assert _folded == _counter.steps
+    assert _decoder.reports == len(_source.edges)
+    assert _decoder.fold() == 0
+
+    # the ring holds the newest steps, across the tick wrap
+    _ring = _decoder.ring
+    assert len(_ring) == 64
+    assert _ring.total == 175
+    _ticks, _directions = _ring.latest(5)
+    assert list(_directions) == [ 1, 1, 1, 1, 1 ]
+    assert _ring.last_tick() == int(_ticks[-1])
+    assert _ticks[0] < 0x20000 # wrapped past zero
+    assert list(( _ticks[1:] - _ticks[:-1] ).astype('uint32')) == [ 800 ] * 4
+
+    # partial reports are held until complete
+    _source.add_steps(1, 800)
+    _data = _source.read()
+    class _Split(object):
+        def __init__(self, chunks):
+            self._chunks = chunks
+        def read(self):
+            return self._chunks.pop(0) if self._chunks else b''
+        def get_current_tick(self):
+            return 0
+        def close(self):
+            pass
+    _decoder._source = _Split([ _data[:17], _data[17:] ])
+    assert _decoder.fold() == 0
+    assert _decoder.fold() == 1
+
+    # ring wraparound on extend ...............
+    _ring = EdgeRing(8)
+    _ring.extend([ 1, 2, 3, 4, 5, 6 ], [ 1 ] * 6)
+    _ring.extend([ 7, 8, 9, 10 ], [ -1 ] * 4)
+    _ticks, _directions = _ring.latest()
+    assert list(_ticks) == [ 3, 4, 5, 6, 7, 8, 9, 10 ]
+    assert list(_directions) == [ 1, 1, 1, 1, -1, -1, -1, -1 ]
+
+    # a motor using the edge decoder ..........
+    _motor = Motor(_config, Ticker(20, lambda: None, Level.WARN), ThunderBorg(Level.WARN), MockPi(), Orientation.PORT, Level.WARN)
+    _source = MockEdgeSource(GPIO_A, GPIO_B)
+    _motor.set_edge_decoder(EdgeDecoder(_config, _source, GPIO_A, GPIO_B, Orientation.PORT, Level.WARN))
+    _source.add_steps(42, 500)
+    assert _motor.steps == 42
+    assert _motor.steps == 42
+    assert len(_motor.edge_ring) == 42
+    _motor.close()
+
+    # per-edge callbacks vs per-tick fold .....
+    _source = MockEdgeSource(GPIO_A, GPIO_B)
+    _source.add_steps(50, 500) # about one 20Hz tick at 5 rps
+    _edges = list(_source.edges)
+    _data = _source.read()
+    _decoder._source = _Split([])
+    _decoder._source.read = lambda: _data
+    _n = 1000
+    _callback_sec = timeit.timeit(lambda: _replay(_callback_decoder, _edges), number=_n) / _n
+    _fold_sec = timeit.timeit(_decoder.fold, number=_n) / _n
+    _log.info('per tick of {:d} edges: callbacks: {:6.2f}µs; fold: {:6.2f}µs.'.format(
+            len(_edges), _callback_sec * 1e6, _fold_sec * 1e6))
+
+# main .........................................................................
+def main():
+    try:
+        test_edge_decoder()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-02
+# modified: 2021-05-15
+#
+# Tests the EdgeVelocity estimator on synthetic steps, then evaluates it
+# against the step-counting velocity on the simulated plant, at low and high
+# speed, by the RMS error from the plant's actual wheel velocity.
+#
+
+import pytest
+import sys, math
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.edge_decoder import EdgeRing
+from lib.edge_velocity import EdgeVelocity
+from mock.plant import simulate
+
+# ..............................................................................
+def _rms_errors(clock, plant, motor, estimator, seconds):
+    '''
+    Returns the RMS errors of the motor's (step counting) velocity and of
+    the estimator's from the plant's velocity, once settled.
+    '''
+    _settle_ticks = int(2.0 * clock.freq_hz)
+    _count_errors = []
+    _edge_errors = []
+    for i in range(int(seconds * clock.freq_hz)):
+        clock.tick()
+        _steps_per_sec, _confidence = estimator.estimate(motor.edge_ring, motor.get_current_tick())
+        _edge_velocity = motor._velocity.steps_to_cm(motor.pulse_sign * _steps_per_sec)
+        _velocity = plant.get_velocity(motor.orientation)
+        if i >= _settle_ticks:
+            _count_errors.append(( motor.velocity - _velocity ) ** 2)
+            _edge_errors.append(( _edge_velocity - _velocity ) ** 2)
+    return math.sqrt(sum(_count_errors) / len(_count_errors)), math.sqrt(sum(_edge_errors) / len(_edge_errors)), _confidence
+
+# ..............................................................................
+@pytest.mark.unit
+def test_edge_velocity():
+    _log = Logger('edge-velocity-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _estimator = EdgeVelocity(_config, Level.WARN)
+
+    # synthetic steps across the tick wrap ....
+    _ring = EdgeRing(64)
+    _tick = 0xFFFFF000
+    for i in range(20): # 100 steps/sec, forward
+        _tick = ( _tick + 10000 ) & 0xFFFFFFFF
+        _ring.append(_tick, 1)
+    _steps_per_sec, _confidence = _estimator.estimate(_ring, _tick + 2000)
+    assert _steps_per_sec == pytest.approx(100.0)
+    assert _confidence == 1.0
+    # a single period at low speed, backward
+    _ring.clear()
+    _ring.append(1000, -1)
+    _ring.append(201000, -1)
+    _steps_per_sec, _confidence = _estimator.estimate(_ring, 202000)
+    assert _steps_per_sec == pytest.approx(-5.0)
+    assert _confidence == pytest.approx(1.0 / _estimator.confidence_steps)
+    # no step since: slowing, then stopped
+    _steps_per_sec, _confidence = _estimator.estimate(_ring, 201000 + 240000)
+    assert _steps_per_sec == pytest.approx(-1e6 / 240000)
+    assert _estimator.estimate(_ring, 201000 + 300000) == ( 0.0, 0.0 )
+
+    # evaluation against the plant ............
+    _tb, _clock, _motors, _plant = simulate(_config, seed=42, edge_sources=True)
+    _port_motor = _motors.get_motor(Orientation.PORT)
+    _stbd_motor = _motors.get_motor(Orientation.STBD)
+    assert _port_motor.edge_ring is not None
+    _motors.enable()
+    for _power in [ 0.25, 0.8 ]:
+        _port_motor.set_motor_power(_power)
+        _stbd_motor.set_motor_power(_power)
+        for _motor in ( _port_motor, _stbd_motor ):
+            _count_rms, _edge_rms, _confidence = _rms_errors(_clock, _plant, _motor, _estimator, 4.0)
+            _log.info('{} at {:4.2f} power ({:5.2f}cm/sec): RMS error: count: {:5.3f}; edge: {:5.3f}cm/sec; confidence: {:4.2f}'.format(
+                    _motor.orientation.label, _power, _plant.get_velocity(_motor.orientation), _count_rms, _edge_rms, _confidence))
+            assert _edge_rms < _count_rms
+            assert _confidence > 0.9
+        if _power < 0.5: # a third or less of step counting's error at low speed
+            assert _edge_rms < _count_rms / 3.0
+    # the motors use the estimator if so configured
+    _port_motor._velocity._edge_velocity = _estimator
+    _clock.run(1.0)
+    assert _port_motor.velocity == pytest.approx(_plant.get_velocity(Orientation.PORT), rel=0.05)
+    assert _port_motor.velocity_confidence > 0.9
+    _port_motor.set_motor_power(0.0)
+    _stbd_motor.set_motor_power(0.0)
+    _clock.run(3.0)
+    assert _port_motor.velocity == 0.0
+    assert _port_motor.velocity_confidence == 0.0
+    _motors.disable()
+
+# main .........................................................................
+def main():
+    try:
+        test_edge_velocity()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
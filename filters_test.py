@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-07
+# modified: 2021-05-07
+#
+# Tests the streaming filters against their batch equivalents, and compares
+# the cost of the running mean with recalculating the mean of a deque.
+#
+
+import pytest
+import random, statistics, timeit
+from collections import deque as Deque
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.filters import RunningMean, IntervalEstimator, ExponentialMovingAverage, MedianFilter, FilterBank
+
+# ..............................................................................
+def _deque_mean(deque, value):
+    '''
+    The mean as previously calculated by the IFS and PID controllers.
+    '''
+    deque.append(value)
+    _n = 0
+    _mean = 0.0
+    for x in deque:
+        _n += 1
+        _mean += ( x - _mean ) / _n
+    return _mean
+
+# ..............................................................................
+@pytest.mark.unit
+def test_filters():
+    _log = Logger('filters-test', Level.INFO)
+    random.seed(42)
+    _values = [ random.uniform(10.0, 100.0) for i in range(1000) ]
+
+    # running mean ............................
+    _mean = RunningMean(20)
+    assert _mean.value != _mean.value # NaN
+    for i, _value in enumerate(_values):
+        _result = _mean.add(_value)
+        _window = _values[max(0, i - 19):i + 1]
+        assert _result == pytest.approx(statistics.mean(_window))
+    assert _mean.full
+    assert _mean.variance == pytest.approx(statistics.variance(_values[-20:]))
+    _mean.reset()
+    assert _mean.count == 0
+    with pytest.raises(ValueError):
+        IntervalEstimator(1)
+
+    # exponential moving average ..............
+    _ema = ExponentialMovingAverage(0.25)
+    assert _ema.add(8.0) == 8.0
+    assert _ema.add(4.0) == 7.0
+    for i in range(100):
+        _ema.add(1.0)
+    assert _ema.value == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        ExponentialMovingAverage(0.0)
+
+    # median ..................................
+    for _size in ( 1, 4, 5 ):
+        _median = MedianFilter(_size)
+        for i, _value in enumerate(_values[:200]):
+            assert _median.add(_value) == statistics.median(_values[max(0, i - _size + 1):i + 1])
+    _median = MedianFilter(5)
+    for _value in [ 30.0, 31.0, 250.0, 30.5, 29.0 ]: # rejects an outlier
+        _result = _median.add(_value)
+    assert _result == 30.5
+
+    # filter bank .............................
+    _bank = FilterBank(lambda: RunningMean(2), 5)
+    assert len(_bank) == 5
+    _bank.add(2, 10.0)
+    assert _bank.add(2, 20.0) == 15.0
+    assert _bank.add(3, 5.0) == 5.0
+    assert _bank[2].count == 2
+    _bank.reset()
+    assert _bank[2].count == 0
+
+    # cost per value ..........................
+    for _size in ( 2, 20, 50 ):
+        _deque = Deque([], maxlen=_size)
+        _mean = RunningMean(_size)
+        _deque_sec = timeit.timeit(lambda: [ _deque_mean(_deque, _value) for _value in _values ], number=10) / ( 10 * len(_values) )
+        _mean_sec = timeit.timeit(lambda: [ _mean.add(_value) for _value in _values ], number=10) / ( 10 * len(_values) )
+        _log.info('window of {:d}: deque mean: {:5.3f}µs; running mean: {:5.3f}µs.'.format(_size, _deque_sec * 1e6, _mean_sec * 1e6))
+        if _size >= 20: # the same cost regardless of size
+            assert _mean_sec < _deque_sec
+
+# main .........................................................................
+def main():
+    try:
+        test_filters()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-15
+# modified: 2021-05-15
+#
+# Tests the IMU acquisition service upon mock devices: that each is read at
+# its own rate regardless of how often its readings are consumed, and that
+# consumers obtain the latest reading without reading the device.
+#
+
+import pytest, time, timeit
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.imu_service import ImuReading, ImuReader, ImuService
+from lib.timing import now_ns, NS_PER_SEC
+
+# ..............................................................................
+class MockImu(object):
+    '''
+    A device turning at a constant rate, each read taking read_sec (as an
+    I²C read) and sampling at its midpoint, failing upon every fail_every-th
+    read if provided.
+    '''
+    def __init__(self, degrees_per_sec, read_sec=0.002, fail_every=None):
+        self._degrees_per_sec = degrees_per_sec
+        self._read_sec   = read_sec
+        self._fail_every = fail_every
+        self.reads = 0
+        self.interval = None # the start and end (ns) of the last successful read
+
+    def read_orientation(self):
+        self.reads += 1
+        _start_ns = now_ns()
+        time.sleep(self._read_sec / 2.0)
+        _heading = ( now_ns() / NS_PER_SEC * self._degrees_per_sec ) % 360.0
+        time.sleep(self._read_sec / 2.0)
+        if self._fail_every and self.reads % self._fail_every == 0:
+            raise OSError('I²C read failed.')
+        self.interval = ( _start_ns, now_ns() )
+        return ( _heading, 1.0, -2.0, ( 1.0, 0.0, 0.0, 0.0 ), True )
+
+# ..............................................................................
+@pytest.mark.unit
+def test_imu_service():
+    _log = Logger('imu-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _rates_hz = _config['ros'].get('imu_service').get('rates_hz')
+    _service = ImuService(_config, Level.WARN)
+    _bno055 = MockImu(90.0)
+    _nxp = MockImu(0.0, read_sec=0.004, fail_every=5)
+    _service.add_reader('bno055', _bno055.read_orientation)
+    _service.add_reader('nxp9dof', _nxp.read_orientation)
+    with pytest.raises(ValueError):
+        _service.add_reader('bno055', _bno055.read_orientation)
+    assert _service.latest() is None
+    assert _service.is_stale()
+    _service.enable()
+    try:
+        # consumers on several threads poll at 1kHz .....................
+        _queries = [ 0 ]
+        _stop = [ False ]
+        def _consume():
+            while not _stop[0]:
+                _reading = _service.latest()
+                if _reading:
+                    assert isinstance(_reading, ImuReading)
+                    assert len(_reading.quaternion) == 4
+                _queries[0] += 1
+                time.sleep(0.001)
+        _consumers = [ Thread(target=_consume, daemon=True) for i in range(3) ]
+        for _consumer in _consumers:
+            _consumer.start()
+        _duration_sec = 1.0
+        time.sleep(_duration_sec)
+        _stop[0] = True
+        for _consumer in _consumers:
+            _consumer.join()
+        # ... yet each device is read only at its own rate
+        _bno055_rate = _service.get_reader('bno055').slot.count / _duration_sec
+        _nxp_rate = _nxp.reads / _duration_sec
+        _log.info('{:d} queries; bno055 read at {:5.1f}Hz ({:d}Hz); nxp9dof at {:5.1f}Hz ({:d}Hz).'.format(
+                _queries[0], _bno055_rate, _rates_hz.get('bno055'), _nxp_rate, _rates_hz.get('nxp9dof')))
+        assert _queries[0] > 5 * _bno055.reads
+        assert _bno055_rate == pytest.approx(_rates_hz.get('bno055'), rel=0.2)
+        assert _nxp_rate == pytest.approx(_rates_hz.get('nxp9dof'), rel=0.2)
+        # the latest reading is fresh
+        _reading = _service.latest('bno055')
+        assert _reading.pitch == 1.0 and _reading.roll == -2.0 and _reading.calibration
+        assert _service.get_age_sec() < 2.0 / _rates_hz.get('bno055')
+        assert not _service.is_stale('bno055')
+        # a query costs no I²C ..........
+        _query_us = timeit.timeit(lambda: _service.latest(), number=10000) / 10000 * 1e6
+        _log.info('query of latest reading: {:5.2f}µs.'.format(_query_us))
+        assert _query_us < 100.0
+    finally:
+        _service.close()
+    # failed reads are counted, the reader continuing
+    _reader = _service.get_reader('nxp9dof')
+    assert _reader.errors == _nxp.reads // 5
+    assert _reader.slot.count == _nxp.reads - _reader.errors
+    # the last reading is timestamped within its read
+    _start_ns, _end_ns = _bno055.interval
+    assert _start_ns <= _service.latest().timestamp <= _end_ns
+    _reads = _bno055.reads
+    time.sleep(0.05)
+    assert _bno055.reads == _reads
+    assert _service.latest() is not None
+    time.sleep(_config['ros'].get('imu_service').get('stale_sec'))
+    assert _service.is_stale()
+
+# ..............................................................................
+@pytest.mark.unit
+def test_imu_reader_warnings():
+    # a failing device is warned of at once, then at most once each warn_sec
+    _imu = MockImu(0.0, read_sec=0.0, fail_every=1)
+    _reader = ImuReader('failing', _imu.read_orientation, 100.0, Level.WARN, warn_sec=0.2)
+    _warnings = []
+    _reader._log.warning = _warnings.append
+    _reader.enable()
+    try:
+        time.sleep(0.05)
+        assert len(_warnings) == 1
+        assert _warnings[0].startswith('1 error reading failing:')
+        time.sleep(0.4)
+    finally:
+        _reader.disable()
+    assert 2 <= len(_warnings) <= 4
+    # ... each reporting the failures since the last
+    _failures = [ int(_warning.split(' ')[0]) for _warning in _warnings ]
+    assert all(_count > 1 for _count in _failures[1:])
+    assert sum(_failures) <= _reader.errors == _imu.reads
+
+# ..............................................................................
+class FakeBno055(object):
+    '''
+    A BNO055 whose orientation is set by the test, and which fails once
+    failing is set.
+    '''
+    def __init__(self, calibration):
+        self.heading     = 0.0
+        self.calibration = calibration
+        self.failing     = False
+
+    def read_orientation(self):
+        if self.failing:
+            raise OSError('I²C read failed.')
+        return ( self.heading, 0.0, 0.0, ( 1.0, 0.0, 0.0, 0.0 ), self.calibration )
+
+# ..............................................................................
+@pytest.mark.unit
+def test_compass_service():
+    # the Compass requires the BNO055's modules, even with a fake device
+    pytest.importorskip('adafruit_bno055')
+    pytest.importorskip('pyquaternion')
+    from lib.bno055 import Calibration
+    from lib.compass import Compass
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _service = ImuService(_config, Level.WARN)
+    _bno055 = FakeBno055(Calibration.CALIBRATED)
+    _compass = Compass(_config, None, Level.WARN, imu_service=_service, bno055=_bno055)
+    assert _compass.get_heading() == ( Calibration.NEVER, None, 0.0 )
+    _bno055.heading = 123.0
+    _service.enable()
+    try:
+        time.sleep(0.1)
+        assert _compass.get_heading() == ( Calibration.CALIBRATED, 123.0, 123.0 )
+        # a failing reader leaves the heading stale: calibration is lost
+        _bno055.failing = True
+        time.sleep(_config['ros'].get('imu_service').get('stale_sec') + 0.1)
+        assert _compass.get_heading() == ( Calibration.LOST, 123.0, 123.0 )
+        assert _service.get_reader('bno055').errors > 0
+        _bno055.failing = False
+        time.sleep(0.1)
+        assert _compass.get_heading()[0] is Calibration.CALIBRATED
+    finally:
+        _service.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_imu_service()
+        test_imu_reader_warnings()
+        test_compass_service()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-08
+# modified: 2021-05-08
+#
+# Tests bulk acquisition of the IO Expander's pins against per-pin reads on a
+# register-level mock of its MS51, comparing the number of I²C transactions.
+#
+
+import pytest
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.ioe import IoExpander
+from lib.ioe_scan import IOE_PINS
+from mock.ms51 import MockMS51, MockIOE, ADC, IN_PU
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ioe_scan():
+    _log = Logger('ioe-scan-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _ioe_config = _config['ros'].get('io_expander')
+    _ms51 = MockMS51()
+    _ioe = MockIOE(_ms51)
+    _adc_pins = [ _ioe_config.get(_key) for _key in ( 'port_side_ir_pin', 'port_ir_pin', 'center_ir_pin',
+            'stbd_ir_pin', 'stbd_side_ir_pin', 'port_moth_pin', 'stbd_moth_pin' ) ]
+    _bmp_pins = [ _ioe_config.get(_key) for _key in ( 'port_bmp_pin', 'center_bmp_pin', 'stbd_bmp_pin' ) ]
+    for _pin in _adc_pins:
+        _ioe.set_mode(_pin, ADC)
+    for _pin in _bmp_pins:
+        _ioe.set_mode(_pin, IN_PU)
+    # distinct voltages on each ADC pin; center bumper pressed
+    for i, _pin in enumerate(_adc_pins):
+        _ms51.set_voltage(IOE_PINS[_pin - 1][2], 0.3 + i * 0.4)
+    _port, _bit, _channel = IOE_PINS[_bmp_pins[1] - 1]
+    _ms51.set_level(_port, _bit, 0)
+
+    # per-pin reads ...........................
+    _config['ros']['io_expander']['bulk_read'] = False
+    _expander = IoExpander(_config, Level.WARN, ioe=_ioe)
+    assert not _expander.bulk
+    _ms51.transactions = 0
+    _expected = _expander.scan()
+    _per_pin_transactions = _ms51.transactions
+    assert list(_expected[:IoExpander.BUMPERS]) == [ int(round(( 0.3 + i * 0.4 ) * 100.0)) for i in range(7) ]
+    assert _expected[IoExpander.BUMPERS] == IoExpander.BUMPER_CNTR
+
+    # bulk scan ...............................
+    _config['ros']['io_expander']['bulk_read'] = True
+    for _sequential in ( True, False ):
+        _config['ros']['io_expander']['sequential_read'] = _sequential
+        _expander = IoExpander(_config, Level.WARN, ioe=_ioe, bus=_ms51)
+        assert _expander.bulk
+        _ms51.transactions = 0
+        _snapshot = _expander.scan()
+        _bulk_transactions = _ms51.transactions
+        assert _snapshot == _expected
+        _log.info('transactions per scan: per pin: {:d}; bulk ({}): {:d}.'.format(_per_pin_transactions,
+                'sequential' if _sequential else 'single', _bulk_transactions))
+        # three or four per ADC channel, one per port of the bumpers
+        assert _bulk_transactions == ( 3 if _sequential else 4 ) * 7 + 2
+    assert _bulk_transactions * 3 < _per_pin_transactions
+
+    # snapshot reuse and the bumpers ..........
+    _ms51.set_level(_port, _bit, 1)
+    _port, _bit, _channel = IOE_PINS[_bmp_pins[0] - 1]
+    _ms51.set_level(_port, _bit, 0)
+    _port, _bit, _channel = IOE_PINS[_bmp_pins[2] - 1]
+    _ms51.set_level(_port, _bit, 0)
+    assert _expander.scan(_snapshot) is _snapshot
+    assert _snapshot[IoExpander.BUMPERS] == IoExpander.BUMPER_PORT | IoExpander.BUMPER_STBD
+    # the per-pin getters still work alongside bulk reads
+    assert _expander.get_stbd_side_ir_value() == _snapshot[IoExpander.STBD_SIDE_IR]
+
+# main .........................................................................
+def main():
+    try:
+        test_ioe_scan()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
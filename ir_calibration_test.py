@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-06
+# modified: 2021-05-06
+#
+# Tests the infrared sensor lookup tables against the pow() conversion they
+# replace, the regeneration of tables upon a change of exponent, and fitting
+# a per-sensor calibration curve from recorded samples.
+#
+
+import pytest
+import sys, timeit
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.ir_calibration import IrCalibration, DistanceTable, fit_curve
+
+# the (raw, cm) measurements of a Sharp GP2Y0A60SZLF, as listed in lib/ifs.py
+SAMPLES = [ ( 226.5, 5.0 ), ( 197.0, 7.5 ), ( 151.0, 10.0 ), ( 92.0, 20.0 ), ( 69.9, 30.0 ),
+            ( 59.2, 40.0 ), ( 52.0, 50.0 ), ( 46.0, 60.0 ), ( 41.8, 70.0 ), ( 38.2, 80.0 ),
+            ( 35.8, 90.0 ), ( 34.0, 100.0 ), ( 32.9, 110.0 ), ( 31.7, 120.0 ) ]
+
+# ..............................................................................
+def _pow_distance(value):
+    '''
+    The conversion previously computed by the IFS upon each reading.
+    '''
+    if value == None or value == 0:
+        return None
+    return pow(1000.0 / value, 1.27)
+
+def _lookup_distance(distances, value):
+    '''
+    The conversion now performed by the IFS upon each reading.
+    '''
+    if value == None or value == 0:
+        return None
+    return distances[value if value <= 330 else 330]
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ir_calibration():
+    _log = Logger('ir-cal-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _calibration = IrCalibration(_config, Level.WARN)
+
+    # the tables match the pow() conversion ...
+    for _raw in range(1, 331):
+        for _orientation in ( Orientation.CNTR, Orientation.PORT_SIDE ):
+            assert _calibration.convert(_orientation, _raw) == pow(1000.0 / _raw, 1.27)
+    assert _calibration.convert(Orientation.CNTR, 0) is None
+    assert _calibration.convert(Orientation.CNTR, None) is None
+    assert _calibration.convert(Orientation.CNTR, 400) == _calibration.convert(Orientation.CNTR, 330)
+
+    # regenerated only upon a change ..........
+    _table = _calibration.get_table(Orientation.CNTR)
+    _distances = _calibration.get_distances(Orientation.CNTR)
+    assert not _calibration.set_exponent(1.271) # within resolution
+    assert _calibration.get_table(Orientation.CNTR) is _table
+    assert _calibration.get_distances(Orientation.CNTR) is _distances
+    assert _calibration.set_exponent(1.33)
+    assert _calibration.exponent == 1.33
+    assert _calibration.convert(Orientation.PORT, 100) == pytest.approx(pow(10.0, 1.33))
+
+    # per-sensor curve fitted from samples ....
+    _numerator, _exponent = fit_curve([ ( _raw, pow(900.0 / _raw, 1.2) ) for _raw in range(30, 200, 10) ])
+    assert _numerator == pytest.approx(900.0)
+    assert _exponent == pytest.approx(1.2)
+    _numerator, _exponent = _calibration.fit(Orientation.CNTR, SAMPLES)
+    _log.info('fitted curve: ({:>7.2f}/raw)^{:>5.3f}'.format(_numerator, _exponent))
+    for _raw, _cm in SAMPLES[2:]:
+        assert _calibration.convert(Orientation.CNTR, int(round(_raw))) == pytest.approx(_cm, rel=0.25)
+    # the common curve no longer applies to the fitted sensor
+    _calibration.set_exponent(1.0)
+    assert _calibration.convert(Orientation.CNTR, 100) == pytest.approx(pow(_numerator / 100.0, _exponent))
+    assert _calibration.convert(Orientation.STBD, 100) == pytest.approx(10.0)
+    with pytest.raises(ValueError):
+        fit_curve([ ( 50.0, 20.0 ) ])
+
+    # lookup vs pow(), as called by the IFS ...
+    _distances = _calibration.get_distances(Orientation.STBD)
+    _raws = [ ( _raw % 300 ) + 1 for _raw in range(100000) ]
+    _pow_sec = timeit.timeit(lambda: [ _pow_distance(_raw) for _raw in _raws ], number=1) / len(_raws)
+    _lookup_sec = timeit.timeit(lambda: [ _lookup_distance(_distances, _raw) for _raw in _raws ], number=1) / len(_raws)
+    _log.info('per conversion: pow(): {:5.3f}µs; lookup: {:5.3f}µs.'.format(_pow_sec * 1e6, _lookup_sec * 1e6))
+
+# main .........................................................................
+def main():
+    try:
+        test_ir_calibration()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
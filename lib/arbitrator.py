@@ -16,10 +16,10 @@
 
 import time, itertools
 from threading import Thread
-import datetime as dt
 
 from lib.logger import Logger 
 from lib.event import Event
+from lib.timing import now_ns, elapsed_ms
 
 # ..............................................................................
 class Arbitrator(Thread):
@@ -52,9 +52,19 @@ class Arbitrator(Thread):
         self._closing = False
         self._closed = False
         self._suppressed = False
+        self._heartbeat = None
         self._counter = itertools.count()
         self._log.debug('ready.')
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the arbitrator loop as a control loop with the Watchdog.
+        As the loop also beats while waiting on a ballistic action, its
+        expected period is the longer of the two loop delays.
+        '''
+        self._heartbeat = watchdog.register('arbitrator', max(self._loop_delay_sec, self._ballistic_loop_delay_sec), control=True)
+
     # ..........................................................................
     def set_suppressed(self, suppressed):
         self._suppressed = suppressed
@@ -74,7 +84,9 @@ class Arbitrator(Thread):
     def run(self):
         self._log.info('arbitrating tasks...')
         while self._is_enabled:
-            _start_time = dt.datetime.now()
+            _start_ns = now_ns()
+            if self._heartbeat:
+                self._heartbeat.beat()
             self._loop_count = next(self._counter)
             if self._suppressed:
                 # if suppressed just clear the queue so events don't build up
@@ -118,10 +130,11 @@ class Arbitrator(Thread):
                         if (self._loop_count % 500) == 0:
                             self._log.info('{:06d} : idle...'.format(self._loop_count))
             time.sleep(self._loop_delay_sec)
-            _delta = dt.datetime.now() - _start_time
-            _elapsed_ms = int(_delta.total_seconds() * 1000)
+            _elapsed_ms = int(elapsed_ms(_start_ns))
             self._log.info('elapsed: {}ms'.format(_elapsed_ms))
 
+        if self._heartbeat:
+            self._heartbeat.release()
         self._log.info('loop end.')
 
     # ..........................................................................
@@ -182,6 +195,8 @@ class Arbitrator(Thread):
             while not _current_message.is_complete():
                 self._log.info('loop: waiting on ballistic action {}...'.format(_current_message.get_action().description))
                 time.sleep(self._ballistic_loop_delay_sec)
+                if self._heartbeat:
+                    self._heartbeat.beat()
         else:
             self._log.info('acting upon accepted highest priority message #{}: {}'.format(message.get_number(), message.get_description()))
             self._controller.act(_current_message, self._action_complete_callback)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-24
+# modified: 2021-05-07
+#
+# An asyncio-native system clock that ticks and tocks.
+#
+
+import itertools
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.filters import IntervalEstimator
+from lib.timing import now_ns, NS_PER_US, NS_PER_SEC
+
+# ...............................................................
+class AsyncClock(object):
+    '''
+    An asyncio-native equivalent of the Clock, for use with the asyncio
+    MessageBus. This creates a "TICK" message every loop, replaced by a
+    "TOCK" message every modulo-nth loop.
+
+    Rather than a thread and a Rate, each tick is scheduled with the event
+    loop's call_at() on an absolute deadline, so that neither callback time
+    nor sleep overshoot accumulate as drift. Each message is placed directly
+    on the message bus queue, so no task is created per tick and everything
+    runs on the single event loop thread with no cross-thread handoff.
+
+    As with the Clock, the period may be disciplined by a PhaseLockedLoop.
+
+    :param config:           the application configuration
+    :param message_bus:      the asyncio message bus
+    :param message_factory:  the factory for messages
+    :param level:            the log level
+    '''
+    def __init__(self, config, message_bus, message_factory, level=Level.INFO):
+        self._log = Logger("async-clock", level)
+        if message_bus is None:
+            raise ValueError('null message bus argument.')
+        self._message_bus = message_bus
+        if message_factory is None:
+            raise ValueError('null message factory argument.')
+        self._message_factory = message_factory
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config            = config['ros'].get('clock')
+        self._loop_freq_hz = _config.get('loop_freq_hz')
+        self._tock_modulo  = _config.get('tock_modulo')
+        self._period_ns    = round(NS_PER_SEC / self._loop_freq_hz)
+        self._log.info('tick frequency: {:d}Hz'.format(self._loop_freq_hz))
+        self._log.info('tock frequency: {:d}Hz'.format(round(self._loop_freq_hz / self._tock_modulo)))
+        self._loop         = message_bus.loop
+        self._counter      = itertools.count()
+        self._lateness     = IntervalEstimator(100)
+        self._max_late_ns  = 0
+        self._overruns     = 0
+        self._pll          = None
+        self._handle       = None
+        self._deadline     = 0.0
+        self._enabled      = False
+        self._closed       = False
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def name(self):
+        return 'async-clock'
+
+    # ..........................................................................
+    @property
+    def message_bus(self):
+        return self._message_bus
+
+    # ..........................................................................
+    @property
+    def message_factory(self):
+        return self._message_factory
+
+    # ..........................................................................
+    @property
+    def freq_hz(self):
+        return self._loop_freq_hz
+
+    # ..........................................................................
+    def set_pll(self, pll):
+        '''
+        Sets a PhaseLockedLoop used to discipline the clock period to an
+        external reference. Set to None to free-run.
+        '''
+        self._pll = pll
+        if pll is None:
+            self._period_ns = round(NS_PER_SEC / self._loop_freq_hz)
+
+    # ..........................................................................
+    @property
+    def jitter_stats(self):
+        '''
+        Returns a tuple of tick lateness statistics, in microseconds:
+        (mean, standard deviation, maximum), followed by the overrun count.
+        '''
+        if self._lateness.count == 0:
+            return 0.0, 0.0, 0.0, self._overruns
+        return self._lateness.mean / NS_PER_US, ( self._lateness.variance ** 0.5 ) / NS_PER_US, \
+                self._max_late_ns / NS_PER_US, self._overruns
+
+    # ..........................................................................
+    def _tick(self):
+        '''
+        The scheduled callback: publishes a TICK or TOCK message and
+        schedules the next tick on the following absolute deadline.
+        '''
+        if not self._enabled:
+            return
+        _now = self._loop.time()
+        _late_ns = round(( _now - self._deadline ) * NS_PER_SEC)
+        self._lateness.add(_late_ns)
+        if _late_ns > self._max_late_ns:
+            self._max_late_ns = _late_ns
+        _count = next(self._counter)
+        if (( _count % self._tock_modulo ) == 0 ):
+            _message = self._message_factory.get_message(Event.CLOCK_TOCK, _count)
+        else:
+            _message = self._message_factory.get_message(Event.CLOCK_TICK, _count)
+        self._message_bus.publish_message_nowait(_message)
+        if self._pll:
+            self._period_ns = self._pll.tick(now_ns())
+        self._deadline += self._period_ns / NS_PER_SEC
+        if self._deadline < _now:
+            # overran a whole period: skip missed deadlines rather than bursting to catch up
+            self._overruns += 1
+            self._deadline = _now + ( self._period_ns / NS_PER_SEC )
+        self._handle = self._loop.call_at(self._deadline, self._tick)
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        '''
+        Enables the clock, scheduling the first tick one period from now.
+        This may be called before or after the event loop is running.
+        '''
+        if not self._closed:
+            if self._enabled:
+                self._log.warning('clock already enabled.')
+            else:
+                self._enabled = True
+                self._deadline = self._loop.time() + ( self._period_ns / NS_PER_SEC )
+                self._handle = self._loop.call_at(self._deadline, self._tick)
+                self._log.info('clock enabled.')
+        else:
+            self._log.warning('cannot enable clock: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._handle:
+                self._handle.cancel()
+                self._handle = None
+            self._log.info('clock disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if not self._closed:
+            if self._enabled:
+                self.disable()
+            self._closed = True
+            self._log.info('closed.')
+        else:
+            self._log.warning('already closed.')
+
+#EOF
@@ -64,6 +64,14 @@ class MessageBus(object):
         self._loop.create_task(self.start_consuming())
         self._log.info('ready.')
 
+    # ..........................................................................
+    @property
+    def loop(self):
+        '''
+        Returns the asyncio event loop used by the message bus.
+        '''
+        return self._loop
+
     # ..........................................................................
     @property
     def queue(self):
@@ -202,6 +210,17 @@ class MessageBus(object):
         _result = asyncio.create_task(self._queue.put(message))
         self._log.debug('result from published message: {}'.format(type(_result)))
 
+    # ..........................................................................
+    def publish_message_nowait(self, message):
+        '''
+        Synchronously publishes the Message to the MessageBus by placing it
+        directly on the (unbounded) queue, without creating a task. This
+        must be called from the event loop's own thread, e.g., from a
+        callback scheduled via loop.call_at(), and is used by high-rate
+        publishers such as the AsyncClock.
+        '''
+        self._queue.put_nowait(message)
+
     # ..........................................................................
     async def republish_message(self, message):
         '''
@@ -7,10 +7,10 @@
 #
 # author:   Murray Altheim
 # created:  2020-03-27
-# modified: 2020-03-27
+# modified: 2021-05-15
 #
 
-import sys
+import sys, math
 from enum import Enum
 from colorama import init, Fore, Style
 init()
@@ -244,6 +244,32 @@ class BNO055:
         return ( self._is_calibrated, _euler_converted_heading, self._heading )
 
 
+    # ..........................................................................
+    def read_orientation(self):
+        '''
+        Reads the calibration status and quaternion (two I²C reads) without
+        logging, returning a tuple of the heading (0-360°, trimmed), pitch
+        and roll (degrees, trimmed), the quaternion (w, x, y, z) and the
+        Calibration, as read by an ImuReader, or None upon a null read.
+
+        The heading is derived from the quaternion as by read(), so that
+        the quat_heading_trim applies to both.
+        '''
+        _status = self._bno055.calibration_status
+        self._is_calibrated = Calibration.CALIBRATED if _status[1] >= 3 else Calibration.LOST
+        _quat = self._bno055.quaternion
+        if _quat is None or None in _quat:
+            return None
+        _q = Quaternion(*_quat)
+        _orig_quat_heading = _q.degrees
+        if _orig_quat_heading < 0.0:
+            _orig_quat_heading += 360.0
+        _yaw, _pitch, _roll = _q.yaw_pitch_roll
+        if self._is_calibrated is Calibration.CALIBRATED:
+            self._heading = Convert.offset_in_degrees(_orig_quat_heading, self._quat_heading_trim)
+        return ( self._heading, math.degrees(_pitch) + self._pitch_trim, math.degrees(_roll) + self._roll_trim,
+                tuple(_quat), self._is_calibrated )
+
 # ..............................................................................
 class BNO055Mode(Enum):
     '''
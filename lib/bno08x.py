@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-03-27
-# modified: 2020-03-27
+# modified: 2021-05-15
 #
 # Support for the Adafruit 9-DOF Orientation IMU Fusion Breakout - BNO085 (BNO080).
 #
@@ -282,6 +282,20 @@ class BNO08x:
         except Exception as e:
             return None
 
+    # ..........................................................................
+    def read_orientation(self):
+        '''
+        Reads the rotation vector quaternion without logging, returning a
+        tuple of the heading (0-360°), pitch and roll (degrees), all trimmed,
+        the quaternion (w, x, y, z) and whether calibrated, as read by an
+        ImuReader.
+        '''
+        ( _quat_i, _quat_j, _quat_k, _quat_real ) = self._bno.quaternion  # pylint:disable=no-member
+        _heading, _pitch, _roll = Convert.quaternion_to_euler(_quat_real, _quat_i, _quat_j, _quat_k)
+        return ( Convert.offset_in_degrees(math.degrees(_heading), self._heading_trim),
+                math.degrees(_pitch) + self._pitch_trim, math.degrees(_roll) + self._roll_trim,
+                ( _quat_real, _quat_i, _quat_j, _quat_k ), self._calibrated )
+
     # ..........................................................................
     def read(self):
         '''
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-11
+# modified: 2021-05-15
+#
+# Interrupt-driven detection of the bumpers of the Integrated Front Sensor,
+# publishing their events from a pigpio callback rather than upon polling.
+#
+
+from threading import Lock
+from colorama import init, Fore, Style
+init()
+try:
+    import pigpio
+except ImportError:
+    pigpio = None
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.ioe import IoExpander
+
+# as pigpio
+INPUT        = 0
+PUD_UP       = 2
+EITHER_EDGE  = 2
+FALLING_EDGE = 1
+
+# ..............................................................................
+class Bumpers(object):
+    '''
+    Publishes a BUMPER_PORT, BUMPER_CNTR or BUMPER_STBD event as soon as a
+    bumper is hit, from a pigpio callback, rather than waiting for the IFS
+    to poll the bumpers.
+
+    With the 'ioe' source the bumpers remain connected to the IO Expander,
+    whose interrupt output (asserted low upon any change of a bumper pin)
+    is connected to the Pi's interrupt_pin: upon its falling edge the
+    interrupt is cleared and the bumpers read. With the 'gpio' source the
+    bumpers are connected directly to the Pi's GPIOs (with pull-ups).
+
+    Switch bounce is debounced in software on the leading edge: a bumper
+    is hit upon the first closing edge after it has been open for at least
+    debounce_ms, and its event published immediately. Closing edges while
+    the contacts are still bouncing (upon being hit or released) are
+    counted as bounces and ignored.
+
+    Events are published on pigpio's callback thread. If pigpio is not
+    available this raises an exception upon creation, and the IFS polls
+    the bumpers instead.
+
+    As a fallback for an edge that is missed (or an interrupt line that
+    isn't connected), poll() reads the bumpers and treats each change since
+    the last reading as an edge; the IFS calls this at poll_rate_hz. A hit
+    already seen upon an edge is not published again.
+
+    This uses the ros:bumpers: section of the configuration.
+
+    :param config:           the application configuration
+    :param ioe:              the IoExpander (for the 'ioe' source)
+    :param message_bus:      the message bus receiving the events
+    :param message_factory:  the factory for the event messages
+    :param level:            the log level
+    :param pi:               the optional pigpio pi (or a mock)
+    '''
+    EVENTS = ( Event.BUMPER_PORT, Event.BUMPER_CNTR, Event.BUMPER_STBD )
+    BITS   = ( IoExpander.BUMPER_PORT, IoExpander.BUMPER_CNTR, IoExpander.BUMPER_STBD )
+
+    def __init__(self, config, ioe, message_bus, message_factory, level=Level.INFO, pi=None):
+        self._log = Logger('bumpers', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if message_bus is None:
+            raise ValueError('null message bus argument.')
+        _config = config['ros'].get('bumpers')
+        self._source = _config.get('source')
+        if self._source == 'ioe':
+            if ioe is None:
+                raise ValueError('null IO Expander argument.')
+            self._pins = ( _config.get('interrupt_pin'), )
+        elif self._source == 'gpio':
+            self._pins = ( _config.get('port_pin'), _config.get('cntr_pin'), _config.get('stbd_pin') )
+        else:
+            raise ValueError('unrecognised bumper source: {}'.format(self._source))
+        self._ioe             = ioe
+        self._message_bus     = message_bus
+        self._message_factory = message_factory
+        self._debounce_us     = int(_config.get('debounce_ms') * 1000)
+        if pi is None:
+            if pigpio is None:
+                raise ImportError('interrupt-driven bumpers require the pigpio module.')
+            pi = pigpio.pi()
+            if not pi.connected:
+                raise RuntimeError('can\'t connect to pigpio daemon; did you start it?')
+        self._pi = pi
+        for _pin in self._pins:
+            self._pi.set_mode(_pin, INPUT)
+            self._pi.set_pull_up_down(_pin, PUD_UP)
+        # the index of the bumper of each GPIO ('gpio' source)
+        self._gpio_index = { _pin: i for i, _pin in enumerate(self._pins) }
+        self._closed_mask = 0                  # the bumpers last seen as closed
+        self._lock        = Lock()             # edges and polls arrive on different threads
+        self._last_edge   = [ None ] * 3       # tick of the last edge of each bumper
+        self._hits        = 0
+        self._bounces     = 0
+        self._callbacks   = []
+        self._enabled     = False
+        self._closed      = False
+        self._log.info('ready: {} source on GPIO {}; debounce {:d}µs.'.format(self._source, self._pins, self._debounce_us))
+
+    # ..........................................................................
+    def _gpio_edge(self, gpio, level, tick):
+        '''
+        The pigpio callback of the 'gpio' source.
+        '''
+        with self._lock:
+            self._edge(self._gpio_index[gpio], level, tick)
+
+    # ..........................................................................
+    def _ioe_edge(self, gpio, level, tick):
+        '''
+        The pigpio callback of the 'ioe' source, upon the falling edge of
+        the IO Expander's interrupt output: clears the interrupt and reads
+        the bumpers, treating each bumper that has changed as an edge. The
+        interrupt is cleared first so that a change during the read asserts
+        it again rather than being lost.
+        '''
+        try:
+            self._ioe.clear_interrupt()
+            _mask = self._ioe.get_bumpers()
+        except Exception as e:
+            self._log.error('error reading bumpers: {}'.format(e))
+            return
+        self._update(_mask, tick)
+
+    # ..........................................................................
+    def poll(self):
+        '''
+        Reads the bumpers, treating each bumper that has changed since it
+        was last seen as an edge. This is a fallback for missed edges, and
+        does nothing unless enabled.
+        '''
+        if not self._enabled:
+            return
+        try:
+            if self._source == 'ioe':
+                _mask = self._ioe.get_bumpers()
+            else:
+                _mask = 0
+                for _pin, _bit in zip(self._pins, Bumpers.BITS):
+                    if self._pi.read(_pin) == 0:
+                        _mask |= _bit
+        except Exception as e:
+            self._log.error('error polling bumpers: {}'.format(e))
+            return
+        self._update(_mask, self._pi.get_current_tick())
+
+    # ..........................................................................
+    def _update(self, mask, tick):
+        '''
+        Treats each bumper whose closed state in the mask differs from that
+        last seen as an edge.
+        '''
+        with self._lock:
+            _changed = mask ^ self._closed_mask
+            for i, _bit in enumerate(Bumpers.BITS):
+                if _changed & _bit:
+                    self._edge(i, 0 if mask & _bit else 1, tick)
+
+    # ..........................................................................
+    def _edge(self, index, level, tick):
+        '''
+        Debounces an edge of the bumper of the index, whose contacts are
+        closed when level is 0, publishing its event upon a hit.
+        '''
+        if level:
+            self._closed_mask &= ~Bumpers.BITS[index]
+        else:
+            self._closed_mask |= Bumpers.BITS[index]
+        _last = self._last_edge[index]
+        self._last_edge[index] = tick
+        if level:
+            return
+        if _last is None or (( tick - _last ) & 0xFFFFFFFF) >= self._debounce_us:
+            self._hits += 1
+            self._message_bus.handle(self._message_factory.get_message(Bumpers.EVENTS[index], True))
+        else:
+            self._bounces += 1
+
+    # ..........................................................................
+    @property
+    def hits(self):
+        return self._hits
+
+    # ..........................................................................
+    @property
+    def bounces(self):
+        '''
+        Returns the number of closing edges ignored as switch bounce.
+        '''
+        return self._bounces
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if self._closed:
+            self._log.warning('cannot enable: already closed.')
+        elif not self._enabled:
+            if self._source == 'ioe':
+                with self._lock:
+                    self._closed_mask = self._ioe.get_bumpers()
+                self._ioe.enable_bumper_interrupts()
+                self._callbacks.append(self._pi.callback(self._pins[0], FALLING_EDGE, self._ioe_edge))
+            else:
+                with self._lock:
+                    self._closed_mask = 0
+                    for _pin, _bit in zip(self._pins, Bumpers.BITS):
+                        if self._pi.read(_pin) == 0:
+                            self._closed_mask |= _bit
+                for _pin in self._pins:
+                    self._callbacks.append(self._pi.callback(_pin, EITHER_EDGE, self._gpio_edge))
+            self._enabled = True
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            for _callback in self._callbacks:
+                _callback.cancel()
+            self._callbacks.clear()
+            if self._source == 'ioe':
+                self._ioe.enable_bumper_interrupts(False)
+            self._log.info('disabled.')
+        else:
+            self._log.debug('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
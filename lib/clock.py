@@ -13,7 +13,6 @@
 #
 
 import sys, time, itertools
-from datetime import datetime as dt
 from threading import Thread
 from colorama import init, Fore, Style
 init()
@@ -23,6 +22,7 @@ from lib.logger import Logger, Level
 from lib.pid import PID
 from lib.event import Event
 from lib.rate import Rate
+from lib.timing import now_ns, NS_PER_MS
 try:
     from lib.ioe_pot import Potentiometer
 except Exception:
@@ -114,12 +114,35 @@ class Clock(object):
             self._pid = None
             self._log.info(Style.DIM + 'trim disabled.')
         # .........................
+        self._pll          = None
+        self._heartbeat    = None
         self._thread       = None
         self._enabled      = False
         self._closed       = False
-        self._last_time    = dt.now()
+        self._last_ns      = now_ns()
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_pll(self, pll):
+        '''
+        Sets a PhaseLockedLoop used to discipline the clock period to an
+        external reference (see ExternalClock and HardwareClock). When set,
+        this supersedes the PID-based trim. Set to None to free-run.
+        '''
+        self._pll = pll
+        if pll is None:
+            self._rate.set_period_ns(round(1000000000 / self._loop_freq_hz))
+            self._log.info('clock period no longer disciplined.')
+        else:
+            self._log.info('clock period disciplined by phase-locked loop.')
+
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers this clock as a control loop with the Watchdog.
+        '''
+        self._heartbeat = watchdog.register('clock', 1.0 / self._loop_freq_hz, control=True)
+
     # ..........................................................................
     def name(self):
         return 'clock'
@@ -170,7 +193,9 @@ class Clock(object):
         _pid_output = 0.0
 
         while f_is_enabled():
-            _now = dt.now()
+            _now_ns = now_ns()
+            if self._heartbeat:
+                self._heartbeat.beat()
             _count = next(self._counter)
             if (( _count % self._tock_modulo ) == 0 ):
                 _message = self._message_factory.get_message(Event.CLOCK_TOCK, _count)
@@ -192,10 +217,12 @@ class Clock(object):
                     self._pid.kd = _scaled_value
 #                   self._log.info(Fore.GREEN  + 'scaled value kd: {:8.5f}'.format(_scaled_value))
 
-            _delta_ms = 1000.0 * (_now - self._last_time).total_seconds()
+            _delta_ms = ( _now_ns - self._last_ns ) / NS_PER_MS
             _error_ms = _delta_ms - self.dt_ms
 
-            if self._pid:
+            if self._pll:
+                self._rate.set_period_ns(self._pll.tick(_now_ns))
+            elif self._pid:
                 _pid_output = self._pid(_delta_ms)
                 self._rate.trim = self._rate.trim + ( _pid_output / 1000.0 )
                 _kp = self._pid.kp
@@ -219,9 +246,11 @@ class Clock(object):
                     + Fore.RED + ' out: {:9.6f}'.format(_pid_output) \
                     + Fore.YELLOW + ' trim: {:9.6f}'.format(self._rate.trim))
 
-            self._last_time = _now
+            self._last_ns = _now_ns
             self._rate.wait()
 
+        if self._heartbeat:
+            self._heartbeat.release()
         self._log.info('exited clock loop.')
 
     # ..........................................................................
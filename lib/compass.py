@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-08-15
-# modified: 2020-08-15
+# modified: 2021-05-15
 #
 #  A simplifying wrapper around a BNO055 used solely as a compass.
 #
@@ -29,8 +29,15 @@ class Compass():
         flat ground. The Indicator is optional.
 
         To function in a loop it must be enabled; otherwise just call get_heading().
+
+        If an ImuService is provided the BNO055 is read by its reader thread
+        and get_heading() returns its latest reading without any I²C. If
+        that reading is stale (e.g., the reader is failing) the Calibration
+        returned is LOST.
+
+        The BNO055 is optional (e.g., a mock); by default one is created.
     '''
-    def __init__(self, config, indicator, level):
+    def __init__(self, config, indicator, level, imu_service=None, bno055=None):
         super().__init__()
         if config is None:
             raise ValueError('no configuration provided.')
@@ -38,9 +45,13 @@ class Compass():
         self._indicator = indicator
         self._enabled   = False
         self._thread    = None
+        self._heartbeat = None
         self._has_been_calibrated = False
 
-        self._bno055 = BNO055(config, level)
+        self._bno055 = bno055 if bno055 else BNO055(config, level)
+        self._imu_service = imu_service
+        if self._imu_service:
+            self._imu_service.add_reader('bno055', self._bno055.read_orientation)
 
 #       self._bno055.set_mode(BNO055Mode.IMUPLUS_MODE)
 #       self._bno055.set_mode(BNO055Mode.NDOF_FMC_OFF_MODE)
@@ -68,6 +79,13 @@ class Compass():
             self.start_indicator()
         self._log.info('enabled.')
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the indicator loop with the Watchdog.
+        '''
+        self._heartbeat = watchdog.register('compass', 0.05)
+
     # ..........................................................................
     def get_heading(self):
         '''
@@ -75,7 +93,15 @@ class Compass():
         of the sensor calibration followed by the heading value. If the
         result ever indicates the sensor is calibrated, this sets a flag.
         '''
-        _tuple = self._bno055.read()
+        if self._imu_service:
+            _reading = self._imu_service.latest('bno055')
+            if _reading is None:
+                return ( Calibration.NEVER, None, 0.0 )
+            elif self._imu_service.is_stale('bno055'):
+                return ( Calibration.LOST, _reading.heading, _reading.heading )
+            _tuple = ( _reading.calibration, _reading.heading, _reading.heading )
+        else:
+            _tuple = self._bno055.read()
         _calibration = _tuple[0]
         if _calibration.calibrated:
             self._has_been_calibrated = True
@@ -89,6 +115,8 @@ class Compass():
         '''
         self._log.info('starting indicator thread...')
         while self._enabled:
+            if self._heartbeat:
+                self._heartbeat.beat()
             _result = self.get_heading()
             _calibration = _result[0]
             _heading = _result[1]
@@ -115,6 +143,9 @@ class Compass():
 
             time.sleep(0.05)
 
+        if self._heartbeat:
+            self._heartbeat.release()
+
     # ..........................................................................
     def start_indicator(self):
         '''
@@ -11,7 +11,6 @@
 #
 
 import time
-import datetime as dt
 from colorama import init, Fore, Style
 init()
 
@@ -21,6 +20,7 @@ from lib.event import Event
 #rom lib.status import Status
 from lib.enums import Orientation
 from lib.logger import Logger, Level
+from lib.timing import now_ns, elapsed_ms
 #from lib.gamepad import Gamepad
 
 # behaviours ....................
@@ -131,7 +131,7 @@ class Controller():
             self._log.warning('action ignored: controller disabled.')
             return
 
-        _start_time = dt.datetime.now()
+        _start_ns = now_ns()
         self._current_message = message
 #       _port_speed = self._motors.get_current_power_level(Orientation.PORT)
 #       _stbd_speed = self._motors.get_current_power_level(Orientation.STBD)
@@ -371,8 +371,7 @@ class Controller():
             callback(self._current_message, _current_power_levels)
         self._clear_current_message()
 
-        _delta = dt.datetime.now() - _start_time
-        _elapsed_ms = int(_delta.total_seconds() * 1000)
+        _elapsed_ms = int(elapsed_ms(_start_ns))
         self._log.debug(Fore.MAGENTA + Style.DIM + 'elapsed: {}ms'.format(_elapsed_ms) + Style.DIM)
 
 # EOF
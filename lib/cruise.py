@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-03-16
-# modified: 2020-05-22
+# modified: 2021-05-05
 #
 
 from datetime import datetime as dt
@@ -36,11 +36,20 @@ class CruiseBehaviour():
         _pid_controllers        = pid_motor_controller.get_pid_controllers()
         self._port_pid          = _pid_controllers[0]
         self._stbd_pid          = _pid_controllers[1]
+        self._trajectory        = None
         self._timeout_count     = 0
         self._timeout_limit     = 4
         self._enabled           = False
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_trajectory_generator(self, trajectory):
+        '''
+        Sets a TrajectoryGenerator, through which the cruising velocity is
+        then set as a jerk-limited motion profile.
+        '''
+        self._trajectory = trajectory
+
     # ..........................................................................
     def get_cruising_velocity(self):
         return self._cruising_velocity
@@ -56,8 +65,12 @@ class CruiseBehaviour():
     # ..........................................................................
     def set_cruising_velocity(self, velocity):
         self._log.info(Fore.MAGENTA + Style.BRIGHT + 'setting cruise velocity: {:5.2f}'.format(velocity))
-        self._port_pid.velocity = velocity
-        self._stbd_pid.velocity = velocity
+        if self._trajectory:
+            if self._trajectory.profile.final != ( velocity, velocity ):
+                self._trajectory.set_velocity(velocity, velocity)
+        else:
+            self._port_pid.velocity = velocity
+            self._stbd_pid.velocity = velocity
 
   # ......................................................
     def add(self, message):
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-01
+# modified: 2021-05-15
+#
+# An encoder backend that reads timestamped quadrature edges in bulk from a
+# pigpio notification pipe, rather than via a Python callback per edge.
+#
+
+import os, errno
+import numpy
+from threading import Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+
+# the pigpio notification report: seqno, flags, tick (µs) and GPIO levels
+REPORT_DTYPE = numpy.dtype([ ('seqno', '<u2'), ('flags', '<u2'), ('tick', '<u4'), ('level', '<u4') ])
+REPORT_SIZE  = REPORT_DTYPE.itemsize # 12 bytes
+
+# as pigpio
+INPUT  = 0
+PUD_UP = 2
+
+# ..............................................................................
+class EdgeRing(object):
+    '''
+    A preallocated ring buffer of encoder steps, each as its pigpio tick
+    (a 32 bit microsecond timestamp, which wraps about every 72 minutes)
+    and direction (+1 or -1). Appending never allocates; once full the
+    oldest steps are overwritten.
+
+    :param capacity:  the number of steps held
+    '''
+    def __init__(self, capacity):
+        self._capacity   = capacity
+        self._ticks      = numpy.zeros(capacity, dtype=numpy.uint32)
+        self._directions = numpy.zeros(capacity, dtype=numpy.int8)
+        self._head       = 0 # index of the next write
+        self._count      = 0 # number of valid steps
+        self._total      = 0 # number of steps ever appended
+
+    # ..........................................................................
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def total(self):
+        return self._total
+
+    # ..........................................................................
+    def append(self, tick, direction):
+        self._ticks[self._head] = tick
+        self._directions[self._head] = direction
+        self._head = ( self._head + 1 ) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+        self._total += 1
+
+    # ..........................................................................
+    def extend(self, ticks, directions):
+        '''
+        Appends arrays of ticks and directions, in bulk.
+        '''
+        _n = len(ticks)
+        if _n == 0:
+            return
+        if _n >= self._capacity: # only the newest fit
+            ticks = ticks[-self._capacity:]
+            directions = directions[-self._capacity:]
+            self._total += _n - self._capacity
+            _n = self._capacity
+        _end = self._head + _n
+        if _end <= self._capacity:
+            self._ticks[self._head:_end] = ticks
+            self._directions[self._head:_end] = directions
+        else:
+            _split = self._capacity - self._head
+            self._ticks[self._head:] = ticks[:_split]
+            self._directions[self._head:] = directions[:_split]
+            self._ticks[:_n - _split] = ticks[_split:]
+            self._directions[:_n - _split] = directions[_split:]
+        self._head = _end % self._capacity
+        self._count = min(self._count + _n, self._capacity)
+        self._total += _n
+
+    # ..........................................................................
+    def latest(self, n=None):
+        '''
+        Returns the newest n (default: all) steps as a tuple of tick and
+        direction arrays, oldest first. The arrays are copies.
+        '''
+        _n = self._count if n is None else min(n, self._count)
+        _start = self._head - _n
+        if _start >= 0:
+            return self._ticks[_start:self._head].copy(), self._directions[_start:self._head].copy()
+        _indices = numpy.arange(_start, self._head) % self._capacity
+        return self._ticks[_indices], self._directions[_indices]
+
+    # ..........................................................................
+    def last_tick(self):
+        '''
+        Returns the tick of the newest step, or None if empty.
+        '''
+        if self._count == 0:
+            return None
+        return int(self._ticks[self._head - 1])
+
+    # ..........................................................................
+    def clear(self):
+        self._head  = 0
+        self._count = 0
+
+# ..............................................................................
+class NotificationPipe(object):
+    '''
+    A source of pigpio notification reports for the two encoder GPIOs,
+    read without blocking from the daemon's /dev/pigpioN pipe. As with
+    the Decoder, both GPIOs are configured as inputs with pull-ups. Note
+    that this requires the pigpio daemon be running on the local host.
+
+    :param pi:      the pigpio pi
+    :param gpio_a:  pin number for A
+    :param gpio_b:  pin number for B
+    '''
+    def __init__(self, pi, gpio_a, gpio_b):
+        self._pi = pi
+        self._pi.set_mode(gpio_a, INPUT)
+        self._pi.set_mode(gpio_b, INPUT)
+        self._pi.set_pull_up_down(gpio_a, PUD_UP)
+        self._pi.set_pull_up_down(gpio_b, PUD_UP)
+        self._handle = pi.notify_open()
+        if self._handle < 0:
+            raise Exception('unable to open pigpio notification handle: {}'.format(self._handle))
+        self._fd = os.open('/dev/pigpio{:d}'.format(self._handle), os.O_RDONLY | os.O_NONBLOCK)
+        pi.notify_begin(self._handle, ( 1 << gpio_a ) | ( 1 << gpio_b ))
+
+    # ..........................................................................
+    def get_current_tick(self):
+        return self._pi.get_current_tick()
+
+    # ..........................................................................
+    def read(self):
+        '''
+        Returns all available report bytes.
+        '''
+        _chunks = []
+        while True:
+            try:
+                _chunk = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in ( errno.EAGAIN, errno.EWOULDBLOCK ):
+                    break
+                raise
+            if not _chunk:
+                break
+            _chunks.append(_chunk)
+        return b''.join(_chunks)
+
+    # ..........................................................................
+    def close(self):
+        self._pi.notify_close(self._handle)
+        os.close(self._fd)
+
+# ..............................................................................
+class EdgeDecoder(object):
+    '''
+    Decodes the quadrature edges of a motor encoder in bulk. Once per
+    control tick fold() reads all reports available from the source,
+    decodes them with NumPy, appends the resulting steps with their edge
+    timestamps to a ring buffer, and returns the net step count since the
+    previous fold, so that no Python code executes per edge.
+
+    The decoding is identical to that of the (callback) Decoder: a rising
+    edge of A while B is high is a step of +1, a rising edge of B while A
+    is high a step of -1.
+
+    The source provides read(), returning the raw bytes of pigpio
+    notification reports, and get_current_tick(), e.g., a NotificationPipe
+    or a MockEdgeSource. fold() may be called from any thread.
+
+    :param config:       the application configuration
+    :param source:       the source of notification reports
+    :param gpio_a:       pin number for A
+    :param gpio_b:       pin number for B
+    :param orientation:  the motor orientation
+    :param level:        the log level
+    '''
+    def __init__(self, config, source, gpio_a, gpio_b, orientation, level=Level.INFO):
+        self._log = Logger('edge:{}'.format(orientation.label), level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if source is None:
+            raise ValueError('null source argument.')
+        self._source = source
+        self._gpio_a = gpio_a
+        self._gpio_b = gpio_b
+        _capacity = config['ros'].get('motors').get('edge_ring_capacity')
+        self._ring    = EdgeRing(_capacity)
+        self._level_a = None # level of A prior to the next report
+        self._level_b = None
+        self._partial = b''  # any incomplete report from the last read
+        self._reports = 0
+        self._lock    = Lock()
+        self._log.info('pin A: {:d}; pin B: {:d}; ring capacity: {:d} steps.'.format(gpio_a, gpio_b, _capacity))
+
+    # ..........................................................................
+    @property
+    def ring(self):
+        return self._ring
+
+    # ..........................................................................
+    @property
+    def reports(self):
+        '''
+        The number of notification reports (i.e., edges) decoded.
+        '''
+        return self._reports
+
+    # ..........................................................................
+    def get_current_tick(self):
+        return self._source.get_current_tick()
+
+    # ..........................................................................
+    def fold(self):
+        '''
+        Decodes all available edges, returning the net number of steps.
+        '''
+        with self._lock:
+            return self._fold()
+
+    def _fold(self):
+        _data = self._partial + self._source.read()
+        _whole = len(_data) - len(_data) % REPORT_SIZE
+        self._partial = _data[_whole:]
+        if _whole == 0:
+            return 0
+        _reports = numpy.frombuffer(_data, dtype=REPORT_DTYPE, count=_whole // REPORT_SIZE)
+        # ignore keep-alive, watchdog and event reports
+        _reports = _reports[_reports['flags'] == 0]
+        if len(_reports) == 0:
+            return 0
+        self._reports += len(_reports)
+        _levels = _reports['level']
+        _a = ( _levels >> self._gpio_a ) & 1
+        _b = ( _levels >> self._gpio_b ) & 1
+        # the levels prior to each report; the first report has no rising edge
+        _prev_a = numpy.empty_like(_a)
+        _prev_b = numpy.empty_like(_b)
+        _prev_a[1:] = _a[:-1]
+        _prev_b[1:] = _b[:-1]
+        _prev_a[0] = _a[0] if self._level_a is None else self._level_a
+        _prev_b[0] = _b[0] if self._level_b is None else self._level_b
+        self._level_a = _a[-1]
+        self._level_b = _b[-1]
+        _forward = ( _a == 1 ) & ( _prev_a == 0 ) & ( _b == 1 )
+        _reverse = ( _b == 1 ) & ( _prev_b == 0 ) & ( _a == 1 )
+        _directions = _forward.astype(numpy.int8) - _reverse.astype(numpy.int8)
+        _is_step = _directions != 0
+        _directions = _directions[_is_step]
+        self._ring.extend(_reports['tick'][_is_step], _directions)
+        return int(_directions.sum())
+
+    # ..........................................................................
+    def cancel(self):
+        self._source.close()
+
+#EOF
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-02
+# modified: 2021-05-02
+#
+# Estimates encoder step velocity from the timestamps of the steps held in an
+# EdgeRing, rather than from the step count per tick.
+#
+
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+
+US_PER_SEC = 1000000.0
+
+# ..............................................................................
+class EdgeVelocity(object):
+    '''
+    Estimates velocity (in steps per second) and a confidence in that
+    estimate from the timestamps of the newest steps in an EdgeRing.
+
+    Counting steps per 50ms tick yields only 0-2 steps per tick at low
+    speed, which quantises the velocity far too coarsely for the PID
+    controllers. Instead the estimate uses a window of recent steps whose
+    length adapts to the speed:
+
+      * at speed, when at least fit_steps steps are within the window, the
+        velocity is the least-squares slope of position against time over
+        up to window_steps steps, i.e., step counting over the window but
+        without quantisation at its boundaries;
+
+      * at low speed, when fewer steps are within the window, the velocity
+        is from the inter-edge period(s) of the newest steps, extending
+        back as far as the two newest steps.
+
+    In either case, if the time since the newest step exceeds the measured
+    period the wheel must have slowed, and the velocity is reduced to that
+    of one step over that time. When no step has occurred within the
+    window the velocity is zero.
+
+    The confidence (0.0-1.0) is the product of the fraction of the
+    confidence_steps steps used in the estimate and the freshness of the
+    newest step relative to the measured period.
+
+    This uses the ros:motors:edge_velocity: section of the configuration.
+
+    :param config:  the application configuration
+    :param level:   the log level
+    '''
+    def __init__(self, config, level=Level.INFO):
+        self._log = Logger('edge-velocity', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('motors').get('edge_velocity')
+        self._window_steps     = _config.get('window_steps')
+        self._fit_steps        = _config.get('fit_steps')
+        self._max_window_us    = _config.get('max_window_ms') * 1000
+        self._confidence_steps = _config.get('confidence_steps')
+        self._log.info('window: {:d} steps or {:d}ms; fit from {:d} steps; full confidence at {:d} steps.'.format(
+                self._window_steps, self._max_window_us // 1000, self._fit_steps, self._confidence_steps))
+
+    # ..........................................................................
+    @property
+    def confidence_steps(self):
+        return self._confidence_steps
+
+    # ..........................................................................
+    def estimate(self, ring, now_tick):
+        '''
+        Returns a tuple of the velocity in steps per second and the
+        confidence in that velocity, from the steps in the EdgeRing as of
+        the tick now_tick (µs, as provided by the encoder source).
+        '''
+        _ticks, _directions = ring.latest(self._window_steps)
+        if len(_ticks) < 2:
+            return 0.0, 0.0
+        # ages in µs; uint32 arithmetic is correct across the 32 bit tick wrap
+        _ages = ( numpy.uint32(now_tick & 0xFFFFFFFF) - _ticks ).astype(numpy.int64)
+        _ages[_ages > 0x7FFFFFFF] = 0 # any stamped after now_tick
+        _stale_us = int(_ages[-1])
+        if _stale_us > self._max_window_us:
+            return 0.0, 0.0
+        _recent = int(numpy.count_nonzero(_ages <= self._max_window_us))
+        if _recent >= self._fit_steps:
+            # least-squares slope of position against time
+            _times = -_ages[-_recent:].astype(numpy.float64)
+            _positions = numpy.cumsum(_directions[-_recent:], dtype=numpy.float64)
+            _times -= _times.mean()
+            _positions -= _positions.mean()
+            _variance = numpy.dot(_times, _times)
+            if _variance == 0.0:
+                return 0.0, 0.0
+            _steps_per_us = numpy.dot(_times, _positions) / _variance
+            _count = _recent - 1
+            _period_us = ( _ages[-_recent] - _stale_us ) / _count
+        else:
+            # from the period(s) of the newest steps, at least the newest two
+            _count = max(_recent, 2) - 1
+            _span_us = max(1, int(_ages[-_count - 1]) - _stale_us)
+            _steps_per_us = int(_directions[-_count:].sum()) / _span_us
+            _period_us = _span_us / _count
+        _freshness = 1.0
+        if _stale_us > _period_us:
+            _freshness = _period_us / _stale_us
+            _steps_per_us *= _freshness
+        _confidence = min(1.0, _count / self._confidence_steps) * _freshness
+        return float(_steps_per_us * US_PER_SEC), _confidence
+
+#EOF
@@ -7,24 +7,36 @@
 #
 # author:   Murray Altheim
 # created:  2021-02-19
-# modified: 2021-02-19
+# modified: 2021-05-07
 #
 # Uses an interrupt (event detect) set on a GPIO pin as an external Clock trigger.
 #
 
-import sys, itertools
-from datetime import datetime as dt
+import sys, time, itertools
+from threading import Timer
 import RPi.GPIO as GPIO
-from collections import deque as Deque
-import statistics
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Logger, Level
+from lib.filters import IntervalEstimator
+from lib.pll import PhaseLockedLoop
+from lib.timing import now_ns
 
 # ..............................................................................
 class ExternalClock(object):
+    '''
+    Receives edges from an external clock source (see microsecond_clock.ino)
+    on a GPIO pin.
 
+    Used standalone this logs the interval statistics of each edge. When
+    used to discipline a software Clock via discipline(), each edge is
+    instead fed into a PhaseLockedLoop which drives the Clock's period.
+    Once the loop is locked the edge detection is removed for a resample
+    interval so that the external clock doesn't wake Python on every edge;
+    the Clock continues in holdover at the estimated period, and this is
+    also what happens should the external source drop out.
+    '''
     def __init__(self, config, message_bus, level):
         if config is None:
             raise ValueError('no configuration provided.')
@@ -35,19 +47,29 @@ class ExternalClock(object):
         self._log.info('tick frequency: {:d}Hz'.format(self._loop_freq_hz))
         self._dt_s = 1 / self._loop_freq_hz
         self._log.info('frequency: {}s'.format( self._dt_s ))
-        self._dt_ms = 50.0 # loop delay in milliseconds 
+        self._dt_ms = 1000.0 * self._dt_s # loop delay in milliseconds
         self._log.info('frequency: {}ms'.format( self._dt_ms ))
         _config = config['ros'].get('external_clock')
         self._pin = _config.get('pin')
         self._log.info('external clock input pin: {}'.format( self._pin ))
+        self._sample_edges = _config.get('sample_edges')
+        self._resample_sec = _config.get('resample_sec')
+        self._log.info('once locked, sample {:d} edges every {:5.2f}s.'.format(self._sample_edges, self._resample_sec))
+        # the loop must tolerate the deliberate gaps between samples before entering holdover
+        self._pll = PhaseLockedLoop(round(1000000000 * self._dt_s), kp=_config.get('pll_kp'), ki=_config.get('pll_ki'),
+                holdover_ns=round(2000000000 * self._resample_sec), level=level)
         GPIO.setmode(GPIO.BCM)
         GPIO.setup(self._pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        self._enabled = False
+        self._enabled    = False
+        self._detecting  = False
+        self._discipline = False
+        self._timer      = None
+        self._sampled    = 0
         # testing ....................
         self._queue_len = 50 # larger number means it takes longer to change
-        self._queue  = Deque([], maxlen=self._queue_len)
+        self._estimator = IntervalEstimator(self._queue_len)
         self._counter = itertools.count()
-        self._last_time = dt.now()
+        self._last_ns = now_ns()
         self._max_error = 0.0
         self._max_vari  = 0.0
         self._log.info('ready.')
@@ -57,51 +79,93 @@ class ExternalClock(object):
     def enabled(self):
         return self._enabled
 
+    # ..........................................................................
+    @property
+    def pll(self):
+        '''
+        Returns the PhaseLockedLoop driven by this external clock.
+        '''
+        return self._pll
+
+    # ..........................................................................
+    def discipline(self, clock):
+        '''
+        Discipline the period of the provided software Clock to this
+        external clock. This should be called prior to enabling.
+        '''
+        self._discipline = True
+        clock.set_pll(self._pll)
+        self._log.info('disciplining clock \'{}\' to external clock.'.format(clock.name()))
+
     # ..........................................................................
     def enable(self):
         if self._enabled:
             self._log.info('already enabled.')
         else:
             self._enabled = True
-            GPIO.add_event_detect(self._pin, GPIO.BOTH, 
-                    callback=self._tick_callback,
+            self._start_detect()
+
+    # ..........................................................................
+    def _start_detect(self):
+        if self._enabled and not self._detecting:
+            self._sampled = 0
+            self._detecting = True
+            GPIO.add_event_detect(self._pin, GPIO.BOTH,
+                    callback=self._pll_callback if self._discipline else self._tick_callback,
                     bouncetime=10) # ms, shouldn't be much need
 
     # ..........................................................................
-    def _get_mean(self, value):
-        '''
-        Returns the mean of measured values.
-        '''
-        self._queue.append(value)
-        _n = 0
-        _mean = 0.0
-        for x in self._queue:
-            _n += 1
-            _mean += ( x - _mean ) / _n
-        if _n < 1:
-            return float('nan');
-        else:
-            return _mean
+    def _stop_detect(self):
+        if self._detecting:
+            self._detecting = False
+            GPIO.remove_event_detect(self._pin)
 
     # ..........................................................................
     def disable(self):
         if self._enabled:
-            GPIO.remove_event_detect(self._pin)
+            self._enabled = False
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._stop_detect()
         else:
             self._log.info('already disabled.')
 
+    # ..........................................................................
+    def _pll_callback(self, value):
+        '''
+        The callback used when disciplining a Clock: this does no more than
+        pass the edge timestamp to the phase-locked loop. Once locked and
+        having sampled enough edges, edge detection is suspended until the
+        resample interval has elapsed.
+        '''
+        self._pll.reference_edge(now_ns())
+        self._sampled += 1
+        if self._pll.locked and self._sampled >= self._sample_edges:
+            # cannot remove event detection from within its own callback
+            self._sampled = 0
+            self._timer = Timer(0.0, self._suspend_detect)
+            self._timer.start()
+
+    # ..........................................................................
+    def _suspend_detect(self):
+        self._stop_detect()
+        if self._enabled:
+            self._timer = Timer(self._resample_sec, self._start_detect)
+            self._timer.start()
+
     # ..........................................................................
     def _tick_callback(self, value):
         if self._enabled:
-            _now = dt.now()
+            _now_ns = now_ns()
             self._count = next(self._counter)
-            _delta_ms = 1000.0 * (_now - self._last_time).total_seconds()
-            _mean = self._get_mean(_delta_ms)
-            if len(self._queue) > 5:
+            _delta_ns = _now_ns - self._last_ns
+            _delta_ms = _delta_ns / 1000000
+            _mean = self._estimator.add(_delta_ns) / 1000000
+            if self._estimator.count > 5:
                 _error_ms = _delta_ms - self._dt_ms
                 self._max_error = max(self._max_error, _error_ms)
-                _vari1 = statistics.variance(self._queue) # if len(self._queue) > 5 else 0.0
-                _vari  = sum((item - _mean)**2 for item in self._queue) / (len(self._queue) - 1)
+                _vari = self._estimator.variance / 1000000000000 # ns² to ms²
                 if self._count <= self._queue_len:
                     _vari = 0.0
                     self._max_vari = 0.0
@@ -119,7 +183,7 @@ class ExternalClock(object):
             else:
                 self._log.info(Fore.CYAN + '[{:05d}]\tΔ {:8.5f}; '.format(self._count, _delta_ms) + Fore.CYAN + 'mean: {:8.5f}'.format(_mean))
 
-            self._last_time = _now
+            self._last_ns = _now_ns
             if self._count > 1000: 
                 self._log.info('reached count limit, exiting...')
                 self._enabled = False
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-07
+# modified: 2021-05-07
+#
+# Streaming filters whose cost per value is independent of their window size,
+# used for smoothing sensor readings, setpoints and clock intervals.
+#
+# Each filter has the same interface: add(value) adds a value and returns the
+# current filtered value, which is also available as the value property, and
+# reset() empties the filter.
+#
+
+from bisect import bisect_left, insort
+
+# ..............................................................................
+class RunningMean(object):
+    '''
+    The mean of the most recent size values, held in a fixed-size ring
+    buffer with a running sum (and sum of squares, so that the variance is
+    also available), so that adding a value costs the same no matter the
+    size of the window.
+
+    For floating point values the running sums are recalculated from the
+    buffer every RESYNC values (or once per cycle of a larger ring), so
+    that rounding error cannot accumulate; this is still a constant cost
+    when amortised over the values added.
+
+    :param size:  the size of the window
+    '''
+    RESYNC = 256
+
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('window size must be at least 1.')
+        self._size   = size
+        self._resync_interval = max(size, RunningMean.RESYNC)
+        self.reset()
+
+    # ..........................................................................
+    def reset(self):
+        self._buffer = [0] * self._size
+        self._index  = 0
+        self._count  = 0
+        self._sum    = 0
+        self._sum_sq = 0
+        self._resync = self._resync_interval
+
+    # ..........................................................................
+    def add(self, value):
+        '''
+        Adds a value to the window, evicting the oldest value if the window
+        is full. Returns the current mean.
+        '''
+        _old = self._buffer[self._index]
+        if self._count == self._size:
+            self._sum    -= _old
+            self._sum_sq -= _old * _old
+        else:
+            self._count += 1
+        self._buffer[self._index] = value
+        self._sum    += value
+        self._sum_sq += value * value
+        self._index += 1
+        if self._index == self._size:
+            self._index = 0
+        self._resync -= 1
+        if self._resync == 0:
+            self._resync = self._resync_interval
+            if type(self._sum) is float:
+                self._sum    = sum(self._buffer)
+                self._sum_sq = sum(x * x for x in self._buffer)
+        return self._sum / self._count
+
+    # ..........................................................................
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def full(self):
+        return self._count == self._size
+
+    # ..........................................................................
+    @property
+    def value(self):
+        return self.mean
+
+    # ..........................................................................
+    @property
+    def mean(self):
+        '''
+        Returns the mean of the values in the window, NaN if empty.
+        '''
+        if self._count == 0:
+            return float('nan')
+        return self._sum / self._count
+
+    # ..........................................................................
+    @property
+    def variance(self):
+        '''
+        Returns the sample variance of the values in the window, 0.0 if
+        there are fewer than two values.
+        '''
+        if self._count < 2:
+            return 0.0
+        return max(0.0, ( self._sum_sq - ( self._sum * self._sum ) / self._count ) / ( self._count - 1 ))
+
+# ..............................................................................
+class IntervalEstimator(RunningMean):
+    '''
+    A RunningMean of intervals, used by the clocks to track their period
+    and its variance.
+
+    Values are expected to be integers (e.g., nanoseconds), which avoids
+    any accumulation of floating point error in the running sums.
+
+    :param size:  the size of the window
+    '''
+    def __init__(self, size=50):
+        if size < 2:
+            raise ValueError('window size must be at least 2.')
+        super().__init__(size)
+
+# ..............................................................................
+class ExponentialMovingAverage(object):
+    '''
+    An exponential moving average, where each new value is weighted by
+    alpha (0.0-1.0) and the previous average by (1 - alpha). The first value
+    added initialises the average.
+
+    :param alpha:  the weight of each new value
+    '''
+    def __init__(self, alpha):
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError('alpha must be greater than 0.0 and at most 1.0.')
+        self._alpha = alpha
+        self.reset()
+
+    # ..........................................................................
+    def reset(self):
+        self._value = None
+
+    # ..........................................................................
+    def add(self, value):
+        '''
+        Adds a value, returning the updated average.
+        '''
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * ( value - self._value )
+        return self._value
+
+    # ..........................................................................
+    @property
+    def value(self):
+        '''
+        Returns the average, NaN if no value has been added.
+        '''
+        return float('nan') if self._value is None else self._value
+
+# ..............................................................................
+class MedianFilter(object):
+    '''
+    The median of the most recent size values, which rejects the occasional
+    outlier (e.g., a spurious reading from an infrared sensor) that would
+    skew a mean.
+
+    The values are held both in arrival order in a ring buffer and in a
+    small sorted window, so that each new value replaces the oldest by
+    binary search rather than by sorting the window.
+
+    :param size:  the size of the window
+    '''
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError('window size must be at least 1.')
+        self._size   = size
+        self._buffer = [0] * size
+        self.reset()
+
+    # ..........................................................................
+    def reset(self):
+        self._index  = 0
+        self._count  = 0
+        self._sorted = []
+
+    # ..........................................................................
+    def add(self, value):
+        '''
+        Adds a value to the window, evicting the oldest value if the window
+        is full. Returns the current median.
+        '''
+        if self._count == self._size:
+            del self._sorted[bisect_left(self._sorted, self._buffer[self._index])]
+        else:
+            self._count += 1
+        self._buffer[self._index] = value
+        insort(self._sorted, value)
+        self._index += 1
+        if self._index == self._size:
+            self._index = 0
+        return self.value
+
+    # ..........................................................................
+    @property
+    def count(self):
+        return self._count
+
+    # ..........................................................................
+    @property
+    def value(self):
+        '''
+        Returns the median of the values in the window, NaN if empty.
+        '''
+        _n = self._count
+        if _n == 0:
+            return float('nan')
+        _mid = _n // 2
+        if _n % 2:
+            return self._sorted[_mid]
+        return ( self._sorted[_mid - 1] + self._sorted[_mid] ) / 2.0
+
+# ..............................................................................
+class FilterBank(object):
+    '''
+    A preallocated array of filters, one per sensor (or other source),
+    keyed by its index, e.g.:
+
+        _bank = FilterBank(lambda: RunningMean(4), 5)
+        _mean = _bank.add(2, _value)
+
+    :param factory:  a function returning a new filter
+    :param count:    the number of filters
+    '''
+    def __init__(self, factory, count):
+        self._filters = [ factory() for i in range(count) ]
+
+    # ..........................................................................
+    def add(self, index, value):
+        '''
+        Adds the value to the filter of the index, returning its filtered value.
+        '''
+        return self._filters[index].add(value)
+
+    # ..........................................................................
+    def __getitem__(self, index):
+        return self._filters[index]
+
+    # ..........................................................................
+    def __len__(self):
+        return len(self._filters)
+
+    # ..........................................................................
+    def reset(self):
+        for _filter in self._filters:
+            _filter.reset()
+
+#EOF
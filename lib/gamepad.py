@@ -81,6 +81,7 @@ class Gamepad():
         self._enabled = False
         self._thread  = None
         self._gamepad = None
+        self._heartbeat = None
 
     # ..........................................................................
     def connect(self):
@@ -139,6 +140,16 @@ class Gamepad():
     def convert_range(value):
         return ( (value - 127.0) / 255.0 ) * -2.0
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the gamepad event loop with the Watchdog. As the loop
+        blocks waiting on gamepad events it is registered as aperiodic,
+        so that only the loop thread dying while enabled (e.g., upon a
+        lost connection) is reported, as a control loop stall.
+        '''
+        self._heartbeat = watchdog.register('gamepad', None, control=True)
+
     # ..........................................................................
     def _gamepad_loop(self, f_is_enabled):
         self._log.info('starting event loop...')
@@ -149,6 +160,8 @@ class Gamepad():
                     raise Exception(Gamepad._NOT_AVAILABLE_ERROR + ' [gamepad no longer available]')
                 # loop and filter by event code and print the mapped label
                 for event in self._gamepad.read_loop():
+                    if self._heartbeat:
+                        self._heartbeat.beat()
                     self._handleEvent(event)
                     if not f_is_enabled():
                         self._log.info(Fore.BLACK + 'breaking from event loop.')
@@ -174,6 +187,8 @@ class Gamepad():
                     self._gamepad_closed = True
 
             self._rate.wait()
+        if self._heartbeat and not f_is_enabled():
+            self._heartbeat.release()
         self._log.info('exited event loop.')
 
     # ..........................................................................
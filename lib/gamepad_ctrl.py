@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-08-05
-# modified: 2020-10-26
+# modified: 2021-05-15
 #
 
 import sys, itertools, time, threading
@@ -73,7 +73,9 @@ class GamepadController():
         # get ready...
         self._counter        = itertools.count()
         self._cruise_behaviour = None
+        self._trajectory     = None
         self._monitor_thread = None
+        self._heartbeat      = None
         self._pid_enabled    = False
         self._enabled        = False
         self._lights_on      = False
@@ -81,6 +83,22 @@ class GamepadController():
         self._start_time     = dt.datetime.now()
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the 20Hz PID monitor loop with the Watchdog.
+        '''
+        self._heartbeat = watchdog.register('gp-monitor', 1.0 / 20.0)
+
+    # ..........................................................................
+    def set_trajectory_generator(self, trajectory):
+        '''
+        Sets a TrajectoryGenerator, through which the velocity of each motor
+        is then set as a jerk-limited motion profile, full deflection of a
+        stick corresponding to the generator's max_velocity.
+        '''
+        self._trajectory = trajectory
+
     # ..........................................................................
     def enable(self):
         self._enabled = True
@@ -260,7 +278,10 @@ class GamepadController():
             _velocity = Gamepad.convert_range(_value)
             self._log.debug(Fore.RED + 'PORT: {};\tvalue: {:>5.2f}; velocity: {:>5.2f};'.format(event.description, _value, _velocity))
 #           self._motors.set_motor(Orientation.PORT, _velocity)
-            self._port_pid.velocity = _velocity * 100.0
+            if self._trajectory:
+                self._trajectory.set_velocity(_velocity * self._trajectory.max_velocity, None)
+            else:
+                self._port_pid.velocity = _velocity * 100.0
 
         elif event is Event.PORT_THETA:
 #           if message.value == 0: # on push of button
@@ -276,7 +297,10 @@ class GamepadController():
             _velocity = Gamepad.convert_range(_value)
             self._log.info(Fore.GREEN + 'STBD: {};\tvalue: {:>5.2f}; velocity: {:>5.2f};'.format(event.description, _value, _velocity))
 #           self._motors.set_motor(Orientation.STBD, _velocity)
-            self._stbd_pid.velocity = _velocity * 100.0
+            if self._trajectory:
+                self._trajectory.set_velocity(None, _velocity * self._trajectory.max_velocity)
+            else:
+                self._stbd_pid.velocity = _velocity * 100.0
 
         elif event is Event.STBD_THETA:
 #           if message.value == 0: # on push of button
@@ -392,6 +416,8 @@ class GamepadController():
             self._log.info(Fore.GREEN + 'starting PID monitor...')
         _rate = Rate(20)
         while f_is_enabled():
+            if self._heartbeat:
+                self._heartbeat.beat()
             kp, ki, kd, p_cp, p_ci, p_cd, p_last_power, p_current_motor_power, p_power, p_current_velocity, p_setpoint, p_steps = self._port_pid.stats
             _x, _y, _z, s_cp, s_ci, s_cd, s_last_power, s_current_motor_power, s_power, s_current_velocity, s_setpoint, s_steps = self._stbd_pid.stats
             _msg = ('{:7.4f}|{:7.4f}|{:7.4f}|{:7.4f}|{:7.4f}|{:7.4f}|{:5.2f}|{:5.2f}|{:5.2f}|{:<5.2f}|{:>5.2f}|{:d}|{:7.4f}|{:7.4f}|{:7.4f}|{:5.2f}|{:5.2f}|{:5.2f}|{:<5.2f}|{:>5.2f}|{:d}|').format(\
@@ -407,6 +433,8 @@ class GamepadController():
                 self._file_log.file(_msg)
             if self._log_to_console:
                 self._log.info(_msg2)
+        if self._heartbeat:
+            self._heartbeat.release()
         self._log.info('PID monitor stopped.')
 
 
@@ -60,7 +60,6 @@ class GamepadDemo():
         self._message_factory  = MessageFactory(level)
         self._motors = Motors(_config, None, Level.INFO)
 #       self._motor_controller = SimpleMotorController(self._motors, Level.INFO)
-        self._pid_motor_ctrl = PIDMotorController(_config, self._motors, Level.INFO)
         # i2c scanner, let's us know if certain devices are available
         _i2c_scanner = I2CScanner(Level.WARN)
         _addresses = _i2c_scanner.get_int_addresses()
@@ -89,6 +88,7 @@ class GamepadDemo():
 #       self._queue = MessageQueue(self._message_factory, Level.INFO)
 
         self._clock = Clock(_config, self._message_bus, self._message_factory, Level.INFO)
+        self._pid_motor_ctrl = PIDMotorController(_config, self._clock, self._motors, Level.INFO)
 
         # attempt to find the gamepad
         self._gamepad = Gamepad(_config, self._message_bus, self._message_factory, Level.INFO)
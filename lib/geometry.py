@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-09-13
-# modified: 2020-09-13
+# modified: 2021-05-03
 #
 # Unlike other enums this one requires configuration as it involves the
 # specifics of the motor encoders and physical geometry of the robot.
@@ -74,6 +74,14 @@ class Geometry(object):
         # TODO set values for each enumeration
         self._log.info('ready.')
 
+    # ..........................................................................
+    @property
+    def wheelbase(self):
+        '''
+        Returns the wheelbase (the distance between the wheels) in mm.
+        '''
+        return self._wheelbase
+
     # ..........................................................................
     @property
     def steps_per_rotation(self):
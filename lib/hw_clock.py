@@ -7,14 +7,12 @@
 #
 # author:   Murray Altheim
 # created:  2021-03-02
-# modified: 2021-03-03
+# modified: 2021-05-07
 #
 
-import sys, itertools, traceback, os.path
-from collections import deque as Deque
+import sys, time, itertools, traceback, os.path
 from os import path
-from datetime import datetime as dt
-import statistics
+from threading import Timer
 from colorama import init, Fore, Style
 init()
 try:
@@ -23,6 +21,9 @@ except Exception:
     print('unable to import gpiozero.')
 
 from lib.logger import Level, Logger
+from lib.filters import IntervalEstimator
+from lib.pll import PhaseLockedLoop
+from lib.timing import now_ns
 
 # ..............................................................................
 
@@ -70,8 +71,17 @@ class HardwareClock(object):
     And that's it. You can connect an LED between BCM pin 19 and ground
     through an appropriate resistor and you'll see it vibrating away at
     20Hz.
+
+    The hardware clock may be used to discipline the period of the software
+    Clock via discipline(). Once the PhaseLockedLoop is locked, only
+    sample_edges edges are sampled every resample_sec seconds, the Clock
+    otherwise continuing in holdover at the estimated period.
+
+    :param level:         the log level
+    :param sample_edges:  once locked, the number of edges sampled per resample interval
+    :param resample_sec:  once locked, the interval between samples (sec)
     '''
-    def __init__(self, level):
+    def __init__(self, level, sample_edges=100, resample_sec=10.0):
         self._log = Logger("hwclock", level)
         self.check_boot_config()
         self.configure()
@@ -81,35 +91,63 @@ class HardwareClock(object):
         self._sensor.when_activated   = self._activated
 #       self._sensor.when_deactivated = self._deactivated
         self._enabled = False
+        self._sample_edges = sample_edges
+        self._resample_sec = resample_sec
+        self._sampled = 0
+        self._timer   = None
+        self._pll     = PhaseLockedLoop(50000000, holdover_ns=round(2000000000 * resample_sec), level=level)
         # testing ....................
         self._dt_ms = 50.0 # loop delay in milliseconds 
         self._queue_len = 50 # larger number means it takes longer to change
-        self._queue  = Deque([], maxlen=self._queue_len)
+        self._estimator = IntervalEstimator(self._queue_len)
         self._counter = itertools.count()
-        self._last_time = dt.now()
+        self._last_ns = now_ns()
         self._max_error = 0.0
         self._max_vari  = 0.0
         self._log.info('ready.')
 
     # ..........................................................................
-    def _get_mean(self, value):
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    # ..........................................................................
+    @property
+    def pll(self):
         '''
-        Returns the mean of measured values.
+        Returns the PhaseLockedLoop driven by this hardware clock.
         '''
-        self._queue.append(value)
-        _n = 0
-        _mean = 0.0
-        for x in self._queue:
-            _n += 1
-            _mean += ( x - _mean ) / _n
-        if _n < 1:
-            return float('nan');
-        else:
-            return _mean
+        return self._pll
 
     # ..........................................................................
-    def add_callback(self, callback):
-        self._callbacks.append(callback)
+    def discipline(self, clock):
+        '''
+        Discipline the period of the provided software Clock to this
+        hardware clock.
+        '''
+        self.add_callback(self._pll_callback)
+        clock.set_pll(self._pll)
+        self._log.info('disciplining clock \'{}\' to hardware clock.'.format(clock.name()))
+
+    # ..........................................................................
+    def _pll_callback(self):
+        '''
+        Passes the edge timestamp to the phase-locked loop. Once locked and
+        having sampled enough edges, the edge callback is detached until the
+        resample interval has elapsed.
+        '''
+        self._pll.reference_edge(now_ns())
+        self._sampled += 1
+        if self._pll.locked and self._sampled >= self._sample_edges:
+            self._sampled = 0
+            self._sensor.when_activated = None
+            self._timer = Timer(self._resample_sec, self._resume_sampling)
+            self._timer.start()
+
+    # ..........................................................................
+    def _resume_sampling(self):
+        self._timer = None
+        if self._enabled:
+            self._sensor.when_activated = self._activated
 
     # ..........................................................................
     def _activated(self):
@@ -206,16 +244,15 @@ For a hardware clock, PWM support needs to be added to the boot configuration:
     # ..........................................................................
     def test_callback_method(self):
         if self._enabled:
-            _now = dt.now()
+            _now_ns = now_ns()
             self._count = next(self._counter)
-            _delta_ms = 1000.0 * (_now - self._last_time).total_seconds()
-            _mean = self._get_mean(_delta_ms)
-            if len(self._queue) > 5:
+            _delta_ns = _now_ns - self._last_ns
+            _delta_ms = _delta_ns / 1000000
+            _mean = self._estimator.add(_delta_ns) / 1000000
+            if self._estimator.count > 5:
                 _error_ms = _delta_ms - self._dt_ms
                 self._max_error = max(self._max_error, _error_ms)
-                _vari1 = statistics.variance(self._queue) # if len(self._queue) > 5 else 0.0
-                _vari  = sum((item - _mean)**2 for item in self._queue) / (len(self._queue) - 1)
-                self._max_vari = max(self._max_vari, _vari)
+                _vari = self._estimator.variance / 1000000000000 # ns² to ms²
                 if self._count <= self._queue_len:
                     _vari = 0.0
                     self._max_vari = 0.0
@@ -232,7 +269,7 @@ For a hardware clock, PWM support needs to be added to the boot configuration:
                             + Fore.CYAN                + 'max err: {:8.5f}; mean: {:8.5f}; max vari: {:8.5f}'.format(self._max_error, _mean, self._max_vari))
             else:
                 self._log.info(Fore.CYAN + '[{:05d}]\tΔ {:8.5f}; '.format(self._count, _delta_ms) + Fore.CYAN + 'mean: {:8.5f}'.format(_mean))
-            self._last_time = _now
+            self._last_ns = _now_ns
             if self._count > 1000: 
                 self._log.info('reached count limit, exiting...')
                 self.disable()
@@ -259,6 +296,9 @@ For a hardware clock, PWM support needs to be added to the boot configuration:
     # ..........................................................................
     def disable(self):
         self._callbacks = []
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
         if not path.exists(HWCLOCK_ENABLE_PATH):
             raise Exception('hardware clock enable file \'{}\' not found.'.format(HWCLOCK_ENABLE_PATH))
         HardwareClock._write_to_file(HWCLOCK_ENABLE_PATH, '0')
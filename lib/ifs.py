@@ -7,7 +7,7 @@
 #
 # author:   altheim
 # created:  2020-01-18
-# modified: 2020-10-28
+# modified: 2021-05-15
 #
 # Implements an Integrated Front Sensor using an IO Expander Breakout Garden
 # board. This polls the values of the board's pins, which outputs 0-255 values
@@ -15,8 +15,6 @@
 #
 
 import itertools, time, threading
-import datetime as dt
-from collections import deque as Deque
 from colorama import init, Fore, Style
 init()
 
@@ -28,7 +26,13 @@ from lib.message_factory import MessageFactory
 from lib.message_bus import MessageBus
 from lib.message import Message
 from lib.rate import Rate
+from lib.filters import FilterBank, RunningMean
+from lib.sampler import Sampler
+from lib.timing import now_ns, elapsed_ms
 from lib.ioe import IoExpander
+from lib.ir_calibration import IrCalibration
+from lib.poll_scheduler import PollScheduler
+from lib.bumpers import Bumpers
 from lib.pot import Potentiometer # for calibration only
 
 # ..............................................................................
@@ -38,14 +42,43 @@ class IntegratedFrontSensor():
     infrared sensors, receiving messages from the IO Expander board or I²C
     Arduino slave, sending the messages with its events onto the message bus.
 
+    The sensors are read by a Sampler on its own thread (at sample_freq_hz)
+    into a double-buffered snapshot (see IoExpander.scan()), so that the
+    blocking I²C reads no longer occur within the message bus.
+
+    If the poll scheduler is adaptive, each sampling cycle reads only the
+    groups of sensors chosen by the PollScheduler, according to the motion
+    of the robot (if the motors have been set) and the proximity of any
+    obstacles, otherwise every sensor is read upon each cycle (other than
+    the moth sensors, which are unused). The effective rate of each sensor
+    is available as sample_rates.
+
+    If configured, the bumpers are interrupt-driven (see Bumpers), their
+    events published as soon as they are hit rather than upon a poll; the
+    bumpers are then no longer read into the snapshot, but the sampler still
+    polls them at the bumpers' poll_rate_hz so that a missed edge is caught.
+    If the interrupt path is unavailable (e.g., without pigpio) they are
+    polled as before.
+
     When enabled this adds the IFS as a handler to the Clock's BessageBus, to
-    receive TICK messages triggering polling of the sensors.
+    receive TICK messages triggering thresholding of the latest snapshot.
 
     :param config:           the YAML based application configuration
     :param clock:            the system Clock
     :param level:            the logging Level
+    :param pi:               the optional pigpio pi (or a mock) for the bumpers
+    :param ioe:              the optional IoExpander (e.g., upon a mock)
     '''
-    def __init__(self, config, clock, level):
+    # the index of each IR sensor's running average
+    IR_PORT_SIDE, IR_PORT, IR_CNTR, IR_STBD, IR_STBD_SIDE = range(5)
+    IR_SENSOR_COUNT = 5
+    # the groups thresholded by handle(); the snapshot holds a count of the
+    # reads of each following those of the IO Expander
+    HANDLED_GROUPS = ( IoExpander.GROUP_BUMPERS, IoExpander.GROUP_CNTR, IoExpander.GROUP_OBLQ, IoExpander.GROUP_SIDE )
+    GROUP_COUNTS   = IoExpander.SNAPSHOT_SIZE
+    SNAPSHOT_SIZE  = IoExpander.SNAPSHOT_SIZE + len(HANDLED_GROUPS)
+
+    def __init__(self, config, clock, level, pi=None, ioe=None):
         if config is None:
             raise ValueError('no configuration provided.')
         if clock is None:
@@ -59,6 +92,9 @@ class IntegratedFrontSensor():
         self._ignore_duplicates        = self._config.get('ignore_duplicates')
         _use_pot                       = self._config.get('use_potentiometer')
         self._pot = Potentiometer(config, Level.INFO) if _use_pot else None
+        self._calibration = IrCalibration(config, level)
+        self._raw_max = self._calibration.raw_max
+        self._update_distance_tables()
         self._loop_freq_hz             = self._config.get('loop_freq_hz')
         self._rate = Rate(self._loop_freq_hz)
         # event thresholds:
@@ -74,17 +110,32 @@ class IntegratedFrontSensor():
                 + Fore.GREEN + ' stbd={:>5.2f}; stbd side={:>5.2f}'.format(self._oblq_trigger_distance_cm, self._side_trigger_distance_cm))
         # hardware pin assignments are defined in IO Expander
         # create/configure IO Expander
-        self._ioe = IoExpander(config, Level.INFO)
-        # these are used to support running averages
+        self._ioe = ioe if ioe else IoExpander(config, Level.INFO)
+        self._sampler = Sampler('ifs-sampler', self._acquire, IntegratedFrontSensor.SNAPSHOT_SIZE, self._config.get('sample_freq_hz'), level)
+        self._snapshot = self._sampler.snapshot()
+        self._last_sequence = 0
+        self._group_counts = [ 0 ] * len(IntegratedFrontSensor.HANDLED_GROUPS) # as of the last handle()
+        self._motors = None
+        # interrupt-driven bumpers, otherwise polled
+        self._bumpers = None
+        _bmp_config = config['ros'].get('bumpers')
+        if _bmp_config.get('interrupt'):
+            try:
+                self._bumpers = Bumpers(config, self._ioe, self._message_bus, self._message_factory, level, pi=pi)
+            except Exception as e:
+                self._log.warning('bumpers will be polled: {}'.format(e))
+        # the fallback poll of interrupt-driven bumpers, every so many samples
+        self._bumper_poll_cycles = max(1, int(self._config.get('sample_freq_hz') / _bmp_config.get('poll_rate_hz')))
+        self._bumper_cycle = 0
+        _exclude = IoExpander.GROUP_BUMPERS if self._bumpers else 0
+        # the groups read by the sampler: not the moth sensors, which are unused
+        self._groups = IoExpander.GROUP_ALL & ~IoExpander.GROUP_MOTH & ~_exclude
+        self._scheduler = PollScheduler(config, level, exclude=_exclude) if self._config.get('poll_scheduler').get('adaptive') else None
+        self._handler_us = RunningMean(50) # duration of handle()
+        # running averages of each IR sensor, indexed by IR_CNTR, etc.
         _queue_limit = 2 # larger number means it takes longer to change
-        self._deque_cntr      = Deque([], maxlen=_queue_limit)
-        self._deque_port      = Deque([], maxlen=_queue_limit)
-        self._deque_stbd      = Deque([], maxlen=_queue_limit)
-        self._deque_port_side = Deque([], maxlen=_queue_limit)
-        self._deque_stbd_side = Deque([], maxlen=_queue_limit)
+        self._ir_means = FilterBank(lambda: RunningMean(_queue_limit), IntegratedFrontSensor.IR_SENSOR_COUNT)
         self._counter    = itertools.count()
-        self._thread     = None
-        self._group      = 0
         self._enabled    = False
         self._suppressed = False
         self._closed     = False
@@ -96,169 +147,188 @@ class IntegratedFrontSensor():
         return 'IntegratedFrontSensor'
 
     # ..........................................................................
-    def handle(self, message):
+    def set_motors(self, motors):
         '''
-        Poll the various infrared and bumper sensors, executing callbacks for each.
-        In tests this typically takes 173ms using an ItsyBitsy, 85ms from a 
-        Pimoroni IO Expander (which uses a Nuvoton MS51 microcontroller).
-
-        This uses 'poll groups' so that all sensors are read upon each poll.
+        Sets the Motors, whose velocities are used by the poll scheduler.
+        '''
+        self._motors = motors
 
-          Group 0: the bumpers
-          Group 1: the center infrared sensor
-          Group 2: the oblique infrared sensors
-          Group 3: the side infrared sensors
+    # ..........................................................................
+    def _acquire(self, snapshot):
+        '''
+        Reads the scheduled groups of sensors (or all sensors) into the
+        snapshot, and periodically polls any interrupt-driven bumpers. This
+        is called on the sampler's thread, so the calibration tables are
+        also updated here if the potentiometer is in use.
+        '''
+        if self._pot and self._calibration.set_exponent(self._pot.get_scaled_value()):
+            self._update_distance_tables()
+        _scheduler = self._scheduler
+        if _scheduler:
+            if self._motors:
+                _port_velocity = self._motors.get_motor(Orientation.PORT).velocity
+                _stbd_velocity = self._motors.get_motor(Orientation.STBD).velocity
+                _scheduler.set_motion(( _port_velocity + _stbd_velocity ) / 2.0, ( _stbd_velocity - _port_velocity ) / 2.0)
+            self._ioe.scan(snapshot, _scheduler.next_groups())
+            _scheduler.record(snapshot)
+        else:
+            self._ioe.scan(snapshot, self._groups)
+        _groups = snapshot[IoExpander.GROUPS]
+        for i, _group in enumerate(IntegratedFrontSensor.HANDLED_GROUPS):
+            if _groups & _group:
+                _index = IntegratedFrontSensor.GROUP_COUNTS + i
+                snapshot[_index] = ( snapshot[_index] + 1 ) & 0xFFFF
+        if self._bumpers:
+            self._bumper_cycle += 1
+            if self._bumper_cycle >= self._bumper_poll_cycles:
+                self._bumper_cycle = 0
+                self._bumpers.poll()
 
-        Note that the bumpers are handled entirely differently, using a "charge pump" debouncer,
-        running off a modulo of the clock TICKs.
+    # ..........................................................................
+    def handle(self, message):
         '''
+        Thresholds the latest snapshot of the infrared and bumper sensors,
+        sending a message for each sensor that has been triggered.
+
+        Previously this read the sensors itself, in one of four 'poll groups'
+        per tick, which typically took 173ms using an ItsyBitsy, 85ms from a
+        Pimoroni IO Expander (which uses a Nuvoton MS51 microcontroller),
+        blocking every other handler of the tick. The sensors are now read by
+        the sampler, so this only copies the snapshot and compares values
+        (the mean duration is available as handler_us). A snapshot is only
+        processed once; if the sampler has not completed a new one since the
+        previous tick this returns immediately. Only the groups of sensors
+        read since the previous tick are processed (by the count of reads of
+        each group in the snapshot), so that if snapshots have been missed
+        the values of groups not read again are not processed twice.
+        '''
+        _start_ns = now_ns()
+        _sequence, _timestamp_ns = self._sampler.read(self._snapshot)
+        if _sequence == self._last_sequence:
+            return message
+        _snapshot = self._snapshot
+        _groups = 0
+        _counts = self._group_counts
+        for i, _group in enumerate(IntegratedFrontSensor.HANDLED_GROUPS):
+            _reads = _snapshot[IntegratedFrontSensor.GROUP_COUNTS + i]
+            if _reads != _counts[i]:
+                _counts[i] = _reads
+                _groups |= _group
+        _groups &= self._groups
+        self._last_sequence = _sequence
         _count = next(self._counter)
-        _group = self._get_sensor_group()
-        self._log.debug(Fore.YELLOW + '[{:04d}] sensor group: {}'.format(_count, _group))
-#       _current_thread = threading.current_thread()
-#       _current_thread.name = 'poll-{:d}'.format(_group)
-        _start_time = dt.datetime.now()
-
-        # force group?
-#       _group = 1
-        if _group == 0: # bumper group .........................................
-            self._log.debug(Fore.WHITE + '[{:04d}] BUMP ifs poll start; group: {}'.format(_count, _group))
-
-            # port bumper sensor ...........................
-            if self._ioe.get_raw_port_bmp_value() == 0:
+
+        # bumpers ......................................
+        _bumpers = _snapshot[IoExpander.BUMPERS] if _groups & IoExpander.GROUP_BUMPERS else 0
+        if _bumpers:
+            if _bumpers & IoExpander.BUMPER_PORT:
                 self._log.debug(Fore.RED + 'adding new message for BUMPER_PORT event.')
                 self._message_bus.handle(self._message_factory.get_message(Event.BUMPER_PORT, True))
-
-            # center bumper sensor .........................
-            if self._ioe.get_raw_center_bmp_value() == 0:
+            if _bumpers & IoExpander.BUMPER_CNTR:
                 self._log.debug(Fore.BLUE + 'adding new message for BUMPER_CNTR event.')
                 self._message_bus.handle(self._message_factory.get_message(Event.BUMPER_CNTR, True))
-
-            # stbd bumper sensor ...........................
-            if self._ioe.get_raw_stbd_bmp_value() == 0:
+            if _bumpers & IoExpander.BUMPER_STBD:
                 self._log.debug(Fore.GREEN + 'adding new message for BUMPER_STBD event.')
                 self._message_bus.handle(self._message_factory.get_message(Event.BUMPER_STBD, True))
 
-        elif _group == 1: # center infrared group ..............................
-            self._log.debug(Fore.BLUE + '[{:04d}] CNTR ifs poll start; group: {}'.format(_count, _group))
-            _cntr_ir_data      = self._ioe.get_center_ir_value()
-            if _cntr_ir_data > self._cntr_raw_min_trigger:
-                self._log.debug(Fore.BLUE + '[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 3) + (Fore.RED if (_cntr_ir_data > 100.0) else Fore.YELLOW) \
-                        + Style.BRIGHT + '{:d}'.format(_cntr_ir_data) + Style.DIM + '\t(analog value 0-255)')
-                _value = self._get_mean_distance(Orientation.CNTR, self._convert_to_distance(_cntr_ir_data))
-                if _value != None and _value < self._cntr_trigger_distance_cm:
-                    self._log.debug(Fore.BLUE + Style.DIM + 'CNTR     \tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
-                            _value, self._cntr_trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(_cntr_ir_data))
-                    _cntr_ir_message = self._message_factory.get_message(Event.INFRARED_CNTR, _value)
-                    self._message_bus.handle(_cntr_ir_message)
-
-        elif _group == 2: # oblique infrared group .............................
-            self._log.debug(Fore.YELLOW + '[{:04d}] OBLQ ifs poll start; group: {}'.format(_count, _group))
-
-            # port analog infrared sensor ..................
-            _port_ir_data      = self._ioe.get_port_ir_value()
-            if _port_ir_data > self._oblq_raw_min_trigger:
-                self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 2) + (Fore.RED if (_port_ir_data > 100.0) else Fore.YELLOW) \
-                        + Style.BRIGHT + '{:d}'.format(_port_ir_data) + Style.DIM + '\t(analog value 0-255)')
-                _value = self._get_mean_distance(Orientation.PORT, self._convert_to_distance(_port_ir_data))
-                if _value != None and _value < self._oblq_trigger_distance_cm:
-                    self._log.debug(Fore.RED + Style.DIM + 'PORT     \tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
-                            _value, self._oblq_trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(_port_ir_data))
-                    _port_ir_message = self._message_factory.get_message(Event.INFRARED_PORT, _value)
-                    self._message_bus.handle(_port_ir_message)
-
-            # starboard analog infrared sensor .............
-            _stbd_ir_data      = self._ioe.get_stbd_ir_value()
-            if _stbd_ir_data > self._oblq_raw_min_trigger:
-                self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 4) + (Fore.RED if (_stbd_ir_data > 100.0) else Fore.YELLOW) \
-                        + Style.BRIGHT + '{:d}'.format(_stbd_ir_data) + Style.DIM + '\t(analog value 0-255)')
-                _value = self._get_mean_distance(Orientation.STBD, self._convert_to_distance(_stbd_ir_data))
-                if _value != None and _value < self._oblq_trigger_distance_cm:
-                    self._log.debug(Fore.GREEN + Style.DIM + 'STBD     \tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
-                            _value, self._oblq_trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(_stbd_ir_data))
-                    _stbd_ir_message = self._message_factory.get_message(Event.INFRARED_STBD, _value)
-                    self._message_bus.handle(_stbd_ir_message)
-
-        elif _group == 3: # side infrared group ................................
-            self._log.debug(Fore.RED + '[{:04d}] SIDE ifs poll start; group: {}'.format(_count, _group))
-
-            # port side analog infrared sensor .............
-            _port_side_ir_data = self._ioe.get_port_side_ir_value()
-            if _port_side_ir_data > self._side_raw_min_trigger:
-                self._log.debug(Fore.RED + '[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 1) + (Fore.RED if (_port_side_ir_data > 100.0) else Fore.YELLOW) \
-                        + Style.BRIGHT + '{:d}'.format(_port_side_ir_data) + Style.DIM + '\t(analog value 0-255)')
-                _value = self._get_mean_distance(Orientation.PORT_SIDE, self._convert_to_distance(_port_side_ir_data))
-                if _value != None and _value < self._side_trigger_distance_cm:
-                    self._log.debug(Fore.RED + Style.DIM + 'PORT_SIDE\tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
-                            _value, self._side_trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(_port_side_ir_data))
-                    _port_side_ir_message = self._message_factory.get_message(Event.INFRARED_PORT_SIDE, _value)
-                    self._message_bus.handle(_port_side_ir_message)
-
-            # starboard side analog infrared sensor ........
-            _stbd_side_ir_data = self._ioe.get_stbd_side_ir_value()
-            if _stbd_side_ir_data > self._side_raw_min_trigger:
-                self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(_count, 5) + (Fore.RED if (_stbd_side_ir_data > 100.0) else Fore.YELLOW) \
-                        + Style.BRIGHT + '{:d}'.format(_stbd_side_ir_data) + Style.DIM + '\t(analog value 0-255)')
-                _value = self._get_mean_distance(Orientation.STBD_SIDE, self._convert_to_distance(_stbd_side_ir_data))
-                if _value != None and _value < self._side_trigger_distance_cm:
-                    self._log.debug(Fore.GREEN + Style.DIM + 'STBD_SIDE\tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
-                            _value, self._side_trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(_stbd_side_ir_data))
-                    _stbd_side_ir_message = self._message_factory.get_message(Event.INFRARED_STBD_SIDE, _value)
-                    self._message_bus.handle(_stbd_side_ir_message)
-        else:
-            raise Exception('invalid group number: {:d}'.format(_group))
-
-        _delta = dt.datetime.now() - _start_time
-        _elapsed_ms = int(_delta.total_seconds() * 1000)
-        self._log.debug(Fore.BLACK + '[{:04d}] poll end; elapsed processing time: {:d}ms'.format(_count, _elapsed_ms))
+        # infrared sensors .............................
+        if _groups & IoExpander.GROUP_CNTR:
+            self._handle_infrared(_count, IntegratedFrontSensor.IR_CNTR, _snapshot[IoExpander.CNTR_IR],
+                    self._cntr_raw_min_trigger, self._cntr_distances, self._cntr_trigger_distance_cm, Event.INFRARED_CNTR)
+        if _groups & IoExpander.GROUP_OBLQ:
+            self._handle_infrared(_count, IntegratedFrontSensor.IR_PORT, _snapshot[IoExpander.PORT_IR],
+                    self._oblq_raw_min_trigger, self._port_distances, self._oblq_trigger_distance_cm, Event.INFRARED_PORT)
+            self._handle_infrared(_count, IntegratedFrontSensor.IR_STBD, _snapshot[IoExpander.STBD_IR],
+                    self._oblq_raw_min_trigger, self._stbd_distances, self._oblq_trigger_distance_cm, Event.INFRARED_STBD)
+        if _groups & IoExpander.GROUP_SIDE:
+            self._handle_infrared(_count, IntegratedFrontSensor.IR_PORT_SIDE, _snapshot[IoExpander.PORT_SIDE_IR],
+                    self._side_raw_min_trigger, self._port_side_distances, self._side_trigger_distance_cm, Event.INFRARED_PORT_SIDE)
+            self._handle_infrared(_count, IntegratedFrontSensor.IR_STBD_SIDE, _snapshot[IoExpander.STBD_SIDE_IR],
+                    self._side_raw_min_trigger, self._stbd_side_distances, self._side_trigger_distance_cm, Event.INFRARED_STBD_SIDE)
+
+        _elapsed_us = ( now_ns() - _start_ns ) // 1000
+        self._handler_us.add(_elapsed_us)
+        self._log.debug(Fore.BLACK + '[{:04d}] snapshot {:d} processed in {:d}µs; {:d}µs old.'.format(
+                _count, _sequence, _elapsed_us, ( _start_ns - _timestamp_ns ) // 1000))
         return message
 
-    # ......................................................
-    def _get_sensor_group(self):
+    # ..........................................................................
+    def _handle_infrared(self, count, index, raw, raw_min_trigger, distances, trigger_distance_cm, event):
         '''
-        Loops 0-3 to select the sensor group.
+        Sends a message with the event if the mean distance of the IR sensor
+        of the index is within its trigger distance.
         '''
-        if self._group == 3:
-            self._group = 0
-        else:
-            self._group += 1
-#       self._log.debug(Fore.BLACK + 'sensor group: {:d}'.format(self._group))
-        return self._group
+        if raw > raw_min_trigger:
+            self._log.debug('[{:04d}] ANALOG IR ({:d}):       \t'.format(count, index) + (Fore.RED if (raw > 100.0) else Fore.YELLOW) \
+                    + Style.BRIGHT + '{:d}'.format(raw) + Style.DIM + '\t(analog value 0-330)')
+            _value = self._get_mean_distance(index, self._convert_to_distance(distances, raw))
+            if _value != None and _value < trigger_distance_cm:
+                self._log.debug(Style.DIM + '{}\tmean distance:\t{:5.2f}/{:5.2f}cm'.format(\
+                        event.description, _value, trigger_distance_cm) + Style.DIM + '; raw: {:d}'.format(raw))
+                self._message_bus.handle(self._message_factory.get_message(event, _value))
 
     # ..........................................................................
-    def _get_mean_distance(self, orientation, value):
+    @property
+    def handler_us(self):
         '''
-        Returns the mean of values collected in the queue for the specified IR sensor.
+        Returns the mean duration of recent calls to handle() in microseconds.
+        '''
+        return self._handler_us.mean
+
+    # ..........................................................................
+    @property
+    def sampler(self):
+        return self._sampler
+
+    # ..........................................................................
+    @property
+    def sample_rates(self):
+        '''
+        Returns a dict of the effective sample rate (Hz) of each sensor, by
+        label (e.g., 'ir-cntr'), if the poll scheduler is adaptive, otherwise
+        None (every sensor is read at sample_freq_hz).
+        '''
+        return self._scheduler.sensor_rates if self._scheduler else None
+
+    # ..........................................................................
+    def _get_mean_distance(self, index, value):
+        '''
+        Returns the running average of the values of the IR sensor of the
+        index (IR_CNTR, etc.), including the new value.
         '''
         if value == None or value == 0:
             return None
-        if orientation is Orientation.CNTR:
-            _deque = self._deque_cntr
-        elif orientation is Orientation.PORT:
-            _deque = self._deque_port
-        elif orientation is Orientation.STBD:
-            _deque = self._deque_stbd
-        elif orientation is Orientation.PORT_SIDE:
-            _deque = self._deque_port_side
-        elif orientation is Orientation.STBD_SIDE:
-            _deque = self._deque_stbd_side
-        else:
-            raise ValueError('unsupported orientation.')
-        _deque.append(value)
-        _n = 0
-        _mean = 0.0
-        for x in _deque:
-            _n += 1
-            _mean += ( x - _mean ) / _n
-        if _n < 1:
-            return float('nan');
-        else:
-            return _mean
+        return self._ir_means.add(index, value)
+
+    # ..........................................................................
+    def _update_distance_tables(self):
+        '''
+        Obtains the lookup table of distances for each IR sensor from the
+        calibration, upon creation or whenever the tables are regenerated.
+        '''
+        self._cntr_distances      = self._calibration.get_distances(Orientation.CNTR)
+        self._port_distances      = self._calibration.get_distances(Orientation.PORT)
+        self._stbd_distances      = self._calibration.get_distances(Orientation.STBD)
+        self._port_side_distances = self._calibration.get_distances(Orientation.PORT_SIDE)
+        self._stbd_side_distances = self._calibration.get_distances(Orientation.STBD_SIDE)
 
     # ..........................................................................
-    def _convert_to_distance(self, value):
+    def fit_calibration(self, orientation, samples):
+        '''
+        Fits a calibration curve for the IR sensor of the orientation from a
+        sequence of recorded (raw value, distance cm) samples, thereafter
+        using it in place of the common curve.
         '''
-        Converts the value returned by the IR sensor to a distance in centimeters.
+        _curve = self._calibration.fit(orientation, samples)
+        self._update_distance_tables()
+        return _curve
+
+    # ..........................................................................
+    def _convert_to_distance(self, distances, value):
+        '''
+        Converts the value returned by the IR sensor to a distance in centimeters,
+        by indexing the sensor's table of distances precomputed by IrCalibration
+        (rather than calculating the curve upon each reading).
 
         Distance Calculation ---------------
 
@@ -299,14 +369,9 @@ class IntegratedFrontSensor():
         '''
         if value == None or value == 0:
             return None
+        _distance = distances[value if value <= self._raw_max else self._raw_max]
         if self._pot:
-            _EXPONENT = self._pot.get_scaled_value(True)
-        else:
-            _EXPONENT = 1.27 #1.33
-        _NUMERATOR = 1000.0
-        _distance = pow( _NUMERATOR / value, _EXPONENT ) # 900
-        if self._pot:
-            self._log.info(Fore.YELLOW + 'value: {:>5.2f}; pot value: {:>5.2f}; distance: {:>5.2f}cm'.format(value, _EXPONENT, _distance))
+            self._log.info(Fore.YELLOW + 'value: {:>5.2f}; pot value: {:>5.2f}; distance: {:>5.2f}cm'.format(value, self._calibration.exponent, _distance))
         return _distance
 
     # ..........................................................................
@@ -323,6 +388,9 @@ class IntegratedFrontSensor():
     def enable(self):
         if not self._closed:
             self._enabled = True
+            self._sampler.enable()
+            if self._bumpers:
+                self._bumpers.enable()
             self._clock.message_bus.add_handler(Message, self.handle)
             self._log.info('enabled.')
         else:
@@ -332,6 +400,9 @@ class IntegratedFrontSensor():
     def disable(self):
         if self._enabled:
             self._enabled = False
+            self._sampler.disable()
+            if self._bumpers:
+                self._bumpers.disable()
             self._log.info('disabled.')
         else:
             self._log.warning('already disabled.')
@@ -343,6 +414,9 @@ class IntegratedFrontSensor():
         '''
         if not self._closed:
             self.disable()
+            self._sampler.close()
+            if self._bumpers:
+                self._bumpers.close()
             self._closed = True
             self._log.info('closed.')
         else:
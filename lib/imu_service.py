@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-15
+# modified: 2021-05-15
+#
+# An IMU acquisition service: one reader thread per device at its native rate,
+# each publishing its latest orientation for consumers to read without I²C.
+#
+
+import time
+from collections import namedtuple
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.timing import now_ns, NS_PER_SEC
+
+# ..............................................................................
+class ImuReading(namedtuple('ImuReading', 'heading pitch roll quaternion calibration timestamp')):
+    '''
+    The orientation of the robot as of a reading of an IMU: its heading
+    (0-360°), pitch and roll (degrees), the quaternion (w, x, y, z) if the
+    device provides one (else None), the device's calibration status, and
+    the timestamp (ns) of the reading.
+
+    An ImuReading is immutable, so may be shared freely between threads.
+    '''
+    __slots__ = ()
+
+# ..............................................................................
+class ImuSlot(object):
+    '''
+    The latest ImuReading of a device, written by a single thread and read
+    by any other without locking: a reading is published by replacing the
+    reading property in a single assignment, so a reader always obtains a
+    complete reading, either the latest or the one before it.
+    '''
+    def __init__(self):
+        self._reading = None
+        self._count   = 0
+
+    # ..........................................................................
+    def publish(self, reading):
+        self._reading = reading
+        self._count += 1
+
+    # ..........................................................................
+    @property
+    def reading(self):
+        '''
+        Returns the latest ImuReading, or None if there has been none.
+        '''
+        return self._reading
+
+    # ..........................................................................
+    @property
+    def count(self):
+        '''
+        Returns the number of readings published.
+        '''
+        return self._count
+
+# ..............................................................................
+class ImuReader(object):
+    '''
+    Reads a device on its own thread at a fixed rate, publishing each
+    reading into its ImuSlot. The read function returns a tuple of heading,
+    pitch, roll, quaternion and calibration (or None if nothing could be
+    read); the reading is timestamped at the midpoint of the read. An
+    exception raised by a read is counted and the loop continues: the first
+    is logged as a warning, then at most one each warn_sec with the number
+    of failures since the last.
+
+    :param name:     the name of the device
+    :param read:     the function reading the device
+    :param rate_hz:  the rate at which the device is read
+    :param level:    the log level
+    :param warn_sec: the minimum interval between warnings of failed reads
+    '''
+    def __init__(self, name, read, rate_hz, level=Level.INFO, warn_sec=1.0):
+        self._log = Logger('imu-{}'.format(name), level)
+        if read is None:
+            raise ValueError('null read function argument.')
+        if rate_hz <= 0:
+            raise ValueError('rate must be greater than zero.')
+        self._name      = name
+        self._read      = read
+        self._rate_hz   = rate_hz
+        self._period_ns = int(NS_PER_SEC / rate_hz)
+        self._slot      = ImuSlot()
+        self._errors    = 0
+        self._failures  = 0    # failed reads since the last warning
+        self._warn_ns   = int(warn_sec * NS_PER_SEC)
+        self._warned_ns = None # when the last warning was logged
+        self._overruns  = 0
+        self._thread    = None
+        self._enabled   = False
+        self._log.info('ready at {:d}Hz.'.format(int(rate_hz)))
+
+    # ..........................................................................
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def rate_hz(self):
+        return self._rate_hz
+
+    @property
+    def slot(self):
+        return self._slot
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @property
+    def overruns(self):
+        '''
+        Returns the number of reads that took longer than the period.
+        '''
+        return self._overruns
+
+    # ..........................................................................
+    def _loop(self):
+        _next_ns = now_ns()
+        while self._enabled:
+            _start_ns = now_ns()
+            try:
+                _values = self._read()
+                if _values is not None:
+                    self._slot.publish(ImuReading(*_values, ( _start_ns + now_ns() ) // 2))
+            except Exception as e:
+                self._error(e)
+            _next_ns += self._period_ns
+            _delay_ns = _next_ns - now_ns()
+            if _delay_ns > 0:
+                time.sleep(_delay_ns / NS_PER_SEC)
+            else:
+                # too slow: begin the next period now rather than catching up
+                self._overruns += 1
+                _next_ns = now_ns()
+
+    # ..........................................................................
+    def _error(self, e):
+        '''
+        Counts a failed read, warning of the first and then of at most one
+        each warn_sec, so that a failing device neither goes unnoticed nor
+        floods the log at the rate of the reader.
+        '''
+        self._errors   += 1
+        self._failures += 1
+        _now_ns = now_ns()
+        if self._warned_ns is None or _now_ns - self._warned_ns >= self._warn_ns:
+            self._log.warning('{:d} error{} reading {}: {}'.format(
+                    self._failures, '' if self._failures == 1 else 's', self._name, e))
+            self._warned_ns = _now_ns
+            self._failures  = 0
+        else:
+            self._log.debug('error reading {}: {}'.format(self._name, e))
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._enabled:
+            self._enabled = True
+            self._thread = Thread(name='imu-{}'.format(self._name), target=self._loop, daemon=True)
+            self._thread.start()
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread:
+                self._thread.join(timeout=1.0)
+                self._thread = None
+            self._log.info('disabled.')
+
+# ..............................................................................
+class ImuService(object):
+    '''
+    Acquires the orientation of the robot from one or more IMUs, each read
+    by its own ImuReader at its native rate, so that consumers (e.g., the
+    Compass, and in time the Indicator, video annotation and behaviours)
+    obtain the latest reading of a device with latest() at no cost, rather than each
+    performing its own I²C reads.
+
+    Devices are added with add_reader() with a function reading the device,
+    e.g., the read_orientation() method of a BNO055, BNO08x or NXP9DoF.
+    Unless otherwise specified, latest() returns the reading of the first
+    device added.
+
+    This uses the ros:imu_service: section of the configuration.
+
+    :param config:  the application configuration
+    :param level:   the log level
+    '''
+    def __init__(self, config, level=Level.INFO):
+        self._log = Logger('imu-service', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('imu_service')
+        self._rates_hz        = _config.get('rates_hz')
+        self._default_rate_hz = _config.get('default_rate_hz')
+        self._stale_ns        = int(_config.get('stale_sec') * NS_PER_SEC)
+        self._level           = level
+        self._readers         = {}
+        self._primary         = None
+        self._enabled         = False
+        self._closed          = False
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def add_reader(self, name, read, rate_hz=None):
+        '''
+        Adds a reader of the named device, by default at its configured
+        rate, returning the ImuReader. If the service is enabled the reader
+        is started immediately.
+        '''
+        if name in self._readers:
+            raise ValueError('a reader for {} already exists.'.format(name))
+        if rate_hz is None:
+            rate_hz = self._rates_hz.get(name, self._default_rate_hz)
+        _reader = ImuReader(name, read, rate_hz, self._level)
+        self._readers[name] = _reader
+        if self._primary is None:
+            self._primary = name
+        if self._enabled:
+            _reader.enable()
+        self._log.info('added reader for {} at {:d}Hz.'.format(name, int(rate_hz)))
+        return _reader
+
+    # ..........................................................................
+    def get_reader(self, name):
+        return self._readers.get(name)
+
+    # ..........................................................................
+    def latest(self, name=None):
+        '''
+        Returns the latest ImuReading of the named device (by default the
+        first added), or None if there has been none.
+        '''
+        _reader = self._readers.get(self._primary if name is None else name)
+        return _reader.slot.reading if _reader else None
+
+    # ..........................................................................
+    def get_age_sec(self, name=None):
+        '''
+        Returns the age (sec) of the latest reading of the named device, or
+        None if there has been none.
+        '''
+        _reading = self.latest(name)
+        return None if _reading is None else ( now_ns() - _reading.timestamp ) / NS_PER_SEC
+
+    # ..........................................................................
+    def is_stale(self, name=None):
+        '''
+        Returns True if there has been no reading of the named device within
+        the configured stale_sec.
+        '''
+        _reading = self.latest(name)
+        return _reading is None or now_ns() - _reading.timestamp > self._stale_ns
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if self._closed:
+            self._log.warning('cannot enable: already closed.')
+        elif not self._enabled:
+            self._enabled = True
+            for _reader in self._readers.values():
+                _reader.enable()
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            for _reader in self._readers.values():
+                _reader.disable()
+            self._log.info('disabled.')
+        else:
+            self._log.debug('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
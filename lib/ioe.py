@@ -7,7 +7,7 @@
 #
 # author:   altheim
 # created:  2020-01-18
-# modified: 2020-10-28
+# modified: 2021-05-15
 #
 # Wraps the functionality of a Pimoroni IO Expander Breakout board, providing
 # access to the values of the board's pins, which outputs 0-255 values for
@@ -16,11 +16,14 @@
 # source: /usr/local/lib/python3.7/dist-packages/ioexpander/__init__.py
 #
 
+from array import array
+from threading import RLock
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Logger, Level
 from lib.event import Event
+from lib.ioe_scan import AdcScanner, Ms51Bus
 
 # ..............................................................................
 class IoExpander():
@@ -29,13 +32,49 @@ class IoExpander():
     array of infrareds and bumper switches.
 
     Optional are a pair of analog imputs wired up as a Moth sensor.
+
+    If bulk_read is configured, scan() reads all of the pins in a single
+    scan of the board's registers (see AdcScanner), otherwise it reads each
+    pin in turn. The snapshot it returns is indexed by PORT_SIDE_IR, etc.,
+    and its BUMPERS entry is a mask of BUMPER_PORT, etc. for each bumper
+    that is pressed. A scan may be limited to groups of sensors (a mask of
+    GROUP_BUMPERS, etc.), which is recorded in the GROUPS entry; the
+    entries of other groups are left unchanged.
+
+    The board may be read from more than one thread (e.g., the IFS sampler
+    and the interrupt callback of the bumpers), so scans, bumper reads and
+    changes to its interrupt are serialised by a lock.
+
+    :param config:  the application configuration
+    :param level:   the log level
+    :param ioe:     an optional, already configured IOE (e.g., a mock)
+    :param bus:     an optional register bus for bulk reads (e.g., a mock)
     '''
-    def __init__(self, config, level):
+    # snapshot indices
+    PORT_SIDE_IR, PORT_IR, CNTR_IR, STBD_IR, STBD_SIDE_IR, PORT_MOTH, STBD_MOTH, BUMPERS, GROUPS = range(9)
+    SNAPSHOT_SIZE = 9
+    # sensor groups, as a mask
+    GROUP_BUMPERS = 0x01
+    GROUP_CNTR    = 0x02 # center infrared
+    GROUP_OBLQ    = 0x04 # port and starboard infrareds
+    GROUP_SIDE    = 0x08 # port and starboard side infrareds
+    GROUP_MOTH    = 0x10
+    GROUP_ALL     = 0x1F
+    # the snapshot indices of the analog sensors of each group
+    GROUP_INDICES = { GROUP_CNTR: ( CNTR_IR, ), GROUP_OBLQ: ( PORT_IR, STBD_IR ),
+            GROUP_SIDE: ( PORT_SIDE_IR, STBD_SIDE_IR ), GROUP_MOTH: ( PORT_MOTH, STBD_MOTH ) }
+    # bumper bits of the BUMPERS entry
+    BUMPER_PORT = 0x01
+    BUMPER_CNTR = 0x02
+    BUMPER_STBD = 0x04
+
+    def __init__(self, config, level, ioe=None, bus=None):
         super().__init__()
         if config is None:
             raise ValueError('no configuration provided.')
         _config = config['ros'].get('io_expander')
         self._log = Logger('ioe', level)
+        _i2c_address = _config.get('i2c_address')
         # infrared
         self._port_side_ir_pin = _config.get('port_side_ir_pin')  # pin connected to port side infrared
         self._port_ir_pin      = _config.get('port_ir_pin')       # pin connected to port infrared
@@ -60,63 +99,97 @@ class IoExpander():
                 + Fore.RED + ' port={:d};'.format(self._port_bmp_pin) \
                 + Fore.BLUE + ' center={:d};'.format(self._cntr_bmp_pin) \
                 + Fore.GREEN + ' stbd={:d}'.format(self._stbd_bmp_pin))
-
-        # debouncing "charge pumps"
-        self._port_bmp_pump = 0
-        self._cntr_bmp_pump = 0
-        self._stbd_bmp_pump = 0
-        self._pump_limit    = 10
+        self._bmp_snapshot = array('H', bytes(2 * IoExpander.SNAPSHOT_SIZE)) # used by get_bumpers()
+        self._lock = RLock()
         # configure board
+        if ioe:
+            self._ioe = ioe
+        else:
+            self._ioe = self._configure_ioe(_i2c_address)
+        self._scanner = None
+        if _config.get('bulk_read'):
+            try:
+                if bus is None:
+                    bus = Ms51Bus(_config.get('i2c_bus'), _i2c_address)
+                self._scanner = AdcScanner(bus,
+                        [ self._port_side_ir_pin, self._port_ir_pin, self._center_ir_pin, self._stbd_ir_pin,
+                          self._stbd_side_ir_pin, self._port_moth_pin, self._stbd_moth_pin ],
+                        [ self._port_bmp_pin, self._cntr_bmp_pin, self._stbd_bmp_pin ],
+                        sequential=_config.get('sequential_read'), level=level)
+                self._scanner.setup()
+            except ImportError:
+                self._log.error("bulk read requires the smbus2 module\nInstall with: pip3 install --user smbus2")
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def _configure_ioe(self, i2c_address):
         try:
             import ioexpander as io
-            self._ioe = io.IOE(i2c_addr=0x18)
-#           self._ioe.set_i2c_addr(0x18)
-            self._ioe.set_adc_vref(3.3)  # input voltage of IO Expander, this is 3.3 on Breakout Garden
+            _ioe = io.IOE(i2c_addr=i2c_address)
+#           _ioe.set_i2c_addr(0x18)
+            _ioe.set_adc_vref(3.3)  # input voltage of IO Expander, this is 3.3 on Breakout Garden
             # analog infrared sensors
-            self._ioe.set_mode(self._port_side_ir_pin, io.ADC)
-            self._ioe.set_mode(self._port_ir_pin,      io.ADC)
-            self._ioe.set_mode(self._center_ir_pin,    io.ADC)
-            self._ioe.set_mode(self._stbd_ir_pin,      io.ADC)
-            self._ioe.set_mode(self._stbd_side_ir_pin, io.ADC)
+            _ioe.set_mode(self._port_side_ir_pin, io.ADC)
+            _ioe.set_mode(self._port_ir_pin,      io.ADC)
+            _ioe.set_mode(self._center_ir_pin,    io.ADC)
+            _ioe.set_mode(self._stbd_ir_pin,      io.ADC)
+            _ioe.set_mode(self._stbd_side_ir_pin, io.ADC)
             # moth sensors
-            self._ioe.set_mode(self._port_moth_pin,    io.ADC)
-            self._ioe.set_mode(self._stbd_moth_pin,    io.ADC)
+            _ioe.set_mode(self._port_moth_pin,    io.ADC)
+            _ioe.set_mode(self._stbd_moth_pin,    io.ADC)
             # digital bumper
-            self._ioe.set_mode(self._port_bmp_pin,     io.IN_PU)
-            self._ioe.set_mode(self._cntr_bmp_pin,     io.IN_PU)
-            self._ioe.set_mode(self._stbd_bmp_pin,     io.IN_PU)
+            _ioe.set_mode(self._port_bmp_pin,     io.IN_PU)
+            _ioe.set_mode(self._cntr_bmp_pin,     io.IN_PU)
+            _ioe.set_mode(self._stbd_bmp_pin,     io.IN_PU)
+            return _ioe
         except ImportError:
-            self._ioe = None
             self._log.error("This script requires the pimoroni-ioexpander module\nInstall with: pip3 install --user pimoroni-ioexpander")
-        self._log.info('ready.')
-
-    # ..........................................................................
-#    def add(self, message):
-#        '''
-#        React to every 5th TICK message.
-#        '''
-##       self._log.info(Fore.YELLOW + Style.DIM + 'MESSAGE received at message {:d}.'.format(message.eid))
-#        if message.event is Event.CLOCK_TICK:
-#            if message.eid % 5 == 0:
-##               self._log.info(Fore.GREEN + Style.BRIGHT + 'STBD bumper: {}'.format(self._ioe.input(self._stbd_bmp_pin)))
-#                if self._ioe.input(self._port_bmp_pin) == 0:
-#                    self._port_bmp_pump = self._pump_limit
-#                if self._ioe.input(self._cntr_bmp_pin) == 0:
-#                    self._cntr_bmp_pump = self._pump_limit
-#                if self._ioe.input(self._stbd_bmp_pin) == 0:
-#                    self._stbd_bmp_pump = self._pump_limit
-#            else:
-#                if self._port_bmp_pump > 0:
-#                    self._port_bmp_pump -= 1
-#                if self._cntr_bmp_pump > 0:
-#                    self._cntr_bmp_pump -= 1
-#                if self._stbd_bmp_pump > 0:
-#                    self._stbd_bmp_pump -= 1
-#            self._log.debug('message[{:d}] received values: '.format(message.eid) \
-#                    + Fore.RED   + 'PORT={:d}\t'.format(self._port_bmp_pump) \
-#                    + Fore.BLUE  + 'CNTR={:d}\t'.format(self._cntr_bmp_pump) \
-#                    + Fore.GREEN + 'STBD={:d}'.format(self._stbd_bmp_pump) )
-#        pass
+            return None
+
+    # bulk acquisition .........................................................
+
+    @property
+    def bulk(self):
+        '''
+        Returns True if scan() reads the pins in a single bulk scan.
+        '''
+        return self._scanner is not None
+
+    def scan(self, snapshot=None, groups=GROUP_ALL):
+        '''
+        Returns a snapshot of the pins of the groups (by default all) as an
+        array indexed by PORT_SIDE_IR, etc. If a snapshot array is provided
+        it is filled and returned.
+        '''
+        if snapshot is None:
+            snapshot = array('H', bytes(2 * IoExpander.SNAPSHOT_SIZE))
+        with self._lock:
+            self._scan(snapshot, groups)
+        return snapshot
+
+    def _scan(self, snapshot, groups):
+        if self._scanner:
+            if groups == IoExpander.GROUP_ALL:
+                self._scanner.scan(snapshot)
+            else:
+                _indices = [ _index for _group, _indices in IoExpander.GROUP_INDICES.items() if groups & _group for _index in _indices ]
+                self._scanner.scan(snapshot, _indices, groups & IoExpander.GROUP_BUMPERS)
+        else:
+            if groups & IoExpander.GROUP_SIDE:
+                snapshot[IoExpander.PORT_SIDE_IR] = self.get_port_side_ir_value()
+                snapshot[IoExpander.STBD_SIDE_IR] = self.get_stbd_side_ir_value()
+            if groups & IoExpander.GROUP_OBLQ:
+                snapshot[IoExpander.PORT_IR]      = self.get_port_ir_value()
+                snapshot[IoExpander.STBD_IR]      = self.get_stbd_ir_value()
+            if groups & IoExpander.GROUP_CNTR:
+                snapshot[IoExpander.CNTR_IR]      = self.get_center_ir_value()
+            if groups & IoExpander.GROUP_MOTH:
+                snapshot[IoExpander.PORT_MOTH], snapshot[IoExpander.STBD_MOTH] = self.get_moth_values()
+            if groups & IoExpander.GROUP_BUMPERS:
+                snapshot[IoExpander.BUMPERS] = ( IoExpander.BUMPER_PORT if self.get_raw_port_bmp_value() == 0 else 0 ) \
+                        | ( IoExpander.BUMPER_CNTR if self.get_raw_center_bmp_value() == 0 else 0 ) \
+                        | ( IoExpander.BUMPER_STBD if self.get_raw_stbd_bmp_value() == 0 else 0 )
+        snapshot[IoExpander.GROUPS] = groups
 
     # infrared sensors .........................................................
 
@@ -143,6 +216,33 @@ class IoExpander():
 
     # bumpers ..................................................................
 
+    def get_bumpers(self):
+        '''
+        Reads only the bumpers, returning a mask of BUMPER_PORT, etc. for
+        each bumper that is pressed.
+        '''
+        with self._lock:
+            return self.scan(self._bmp_snapshot, IoExpander.GROUP_BUMPERS)[IoExpander.BUMPERS]
+
+    def enable_bumper_interrupts(self, enabled=True):
+        '''
+        Enables (or disables) the interrupt upon a change of any bumper pin,
+        and the board's interrupt output, which is asserted (low) until the
+        interrupt is cleared with clear_interrupt().
+        '''
+        with self._lock:
+            for _pin in ( self._port_bmp_pin, self._cntr_bmp_pin, self._stbd_bmp_pin ):
+                self._ioe.set_pin_interrupt(_pin, enabled)
+            if enabled:
+                self._ioe.enable_interrupt_out()
+                self._ioe.clear_interrupt()
+            else:
+                self._ioe.disable_interrupt_out()
+
+    def clear_interrupt(self):
+        with self._lock:
+            self._ioe.clear_interrupt()
+
     def get_port_bmp_value(self):
         return ( self._ioe.input(self._port_bmp_pin) == 0 )
 #       return ( self._ioe.input(self._port_bmp_pin) == 0 )
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-08
+# modified: 2021-05-10
+#
+# Bulk acquisition of the analog and digital inputs of a Pimoroni IO Expander
+# (a Nuvoton MS51 microcontroller), by driving its registers directly.
+#
+# The register addresses and pin table are those of the pimoroni-ioexpander
+# library (ioexpander/__init__.py).
+#
+
+from array import array
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+
+# MS51 registers
+REG_P0      = 0x40
+REG_P1      = 0x50
+REG_P2      = 0x60
+REG_P3      = 0x70
+REG_ADCRL   = 0x82 # low 4 bits of the conversion
+REG_ADCRH   = 0x83 # high 8 bits of the conversion
+REG_ADCCON1 = 0xa1
+REG_ADCCON0 = 0xa8
+REG_AINDIDS = 0xb6 # disables the digital input of ADC channels
+
+ADCCON0_ADCF = 0x80 # conversion complete flag
+ADCCON0_ADCS = 0x40 # conversion start flag
+ADCCON1_ADCEN = 0x01
+
+PORT_REGISTERS = ( REG_P0, REG_P1, REG_P2, REG_P3 )
+
+# (port, bit, ADC channel or None) of IO Expander pins 1-14
+IOE_PINS = (
+    ( 1, 5, None ), ( 1, 0, None ), ( 1, 2, None ), ( 1, 4, None ), ( 0, 0, None ),
+    ( 0, 1, None ), ( 1, 1, 7 ), ( 0, 3, 6 ), ( 0, 4, 5 ), ( 3, 0, 1 ),
+    ( 0, 6, 3 ), ( 0, 5, 4 ), ( 0, 7, 2 ), ( 1, 7, 0 ) )
+
+# ..............................................................................
+class Ms51Bus(object):
+    '''
+    Register access to an MS51 over I²C via smbus2, where each read or write
+    is a single bus transaction. A read of more than one byte is a single
+    sequential read of consecutive registers.
+
+    :param i2c_bus:   the I²C bus number
+    :param i2c_addr:  the I²C address of the device
+    '''
+    def __init__(self, i2c_bus, i2c_addr):
+        from smbus2 import SMBus, i2c_msg
+        self._i2c_msg  = i2c_msg
+        self._i2c_dev  = SMBus(i2c_bus)
+        self._i2c_addr = i2c_addr
+
+    # ..........................................................................
+    def read(self, reg, length=1):
+        '''
+        Returns a list of the values of length registers from reg.
+        '''
+        _msg_w = self._i2c_msg.write(self._i2c_addr, [ reg ])
+        _msg_r = self._i2c_msg.read(self._i2c_addr, length)
+        self._i2c_dev.i2c_rdwr(_msg_w, _msg_r)
+        return list(_msg_r)
+
+    # ..........................................................................
+    def write(self, reg, value):
+        self._i2c_dev.i2c_rdwr(self._i2c_msg.write(self._i2c_addr, [ reg, value ]))
+
+# ..............................................................................
+class AdcScanner(object):
+    '''
+    Reads all of a set of ADC pins and digital input pins of an IO Expander
+    in a single scan, returning a compact array snapshot.
+
+    The ioexpander library's input() configures the ADC from scratch for
+    every reading, with six read-modify-write cycles (each followed by a 1ms
+    sleep), so that each analog reading costs 16 bus transactions, and each
+    digital pin requires a read of its port. Instead, the digital input of
+    every ADC channel is disabled and the ADC enabled once in setup(); each
+    conversion is then selected and started in a single write of ADCCON0,
+    its completion polled, and its result read in a single sequential read
+    of ADCRL-ADCRH, i.e., three transactions per channel. Each port holding
+    a digital pin is read once, regardless of the number of pins.
+
+    The snapshot contains the value of each ADC pin (in the order given) as
+    hundredths of a volt (as returned by the IoExpander getters), followed
+    by a bit mask of the digital pins (in the order given) reading low. A
+    scan may be limited to some of the ADC pins and/or omit the digital
+    pins, in which case the other entries of the snapshot are unchanged.
+
+    :param bus:           the register bus (an Ms51Bus or mock)
+    :param adc_pins:      the IO Expander pins (1-14) in ADC mode
+    :param digital_pins:  the IO Expander pins (1-14) in input mode
+    :param vref:          the ADC reference voltage
+    :param sequential:    if False, read ADCRH and ADCRL separately
+    :param level:         the log level
+    '''
+    POLL_LIMIT = 100 # polls of ADCF before timing out
+
+    def __init__(self, bus, adc_pins, digital_pins, vref=3.3, sequential=True, level=Level.INFO):
+        self._log = Logger('adc-scan', level)
+        if bus is None:
+            raise ValueError('null bus argument.')
+        self._bus = bus
+        self._channels = []
+        for _pin in adc_pins:
+            _channel = IOE_PINS[_pin - 1][2]
+            if _channel is None:
+                raise ValueError('pin {:d} does not support ADC.'.format(_pin))
+            self._channels.append(_channel)
+        # the port register and bit mask of each digital pin
+        self._digital = [ ( PORT_REGISTERS[IOE_PINS[_pin - 1][0]], 1 << IOE_PINS[_pin - 1][1] ) for _pin in digital_pins ]
+        self._port_registers = sorted(set(_reg for _reg, _mask in self._digital))
+        self._scale      = vref * 100.0 / 4095.0
+        self._sequential = sequential
+        self._size       = len(self._channels) + 1
+        self._log.info('ADC channels: {}; digital ports: {}.'.format(self._channels, [ hex(_reg) for _reg in self._port_registers ]))
+
+    # ..........................................................................
+    @property
+    def size(self):
+        '''
+        Returns the length of the snapshot array.
+        '''
+        return self._size
+
+    # ..........................................................................
+    def setup(self):
+        '''
+        Disables the digital input of the ADC channels and enables the ADC.
+        This must be called after the pin modes have been set.
+        '''
+        _mask = 0
+        for _channel in self._channels:
+            _mask |= 1 << _channel
+        self._bus.write(REG_AINDIDS, _mask)
+        self._bus.write(REG_ADCCON1, self._bus.read(REG_ADCCON1)[0] | ADCCON1_ADCEN)
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def scan(self, snapshot=None, adc_indices=None, digital=True):
+        '''
+        Reads the pins, returning the snapshot as an array of unsigned
+        shorts. If a snapshot array is provided it is filled and returned.
+
+        :param snapshot:     the optional array to fill
+        :param adc_indices:  the indices of the ADC pins to read, all if None
+        :param digital:      if True, read the digital pins
+        '''
+        if snapshot is None:
+            snapshot = array('H', bytes(2 * self._size))
+        _bus = self._bus
+        for i in ( range(len(self._channels)) if adc_indices is None else adc_indices ):
+            _channel = self._channels[i]
+            # select the channel, clear ADCF and start the conversion in one write
+            _bus.write(REG_ADCCON0, _channel | ADCCON0_ADCS)
+            for _poll in range(AdcScanner.POLL_LIMIT):
+                if _bus.read(REG_ADCCON0)[0] & ADCCON0_ADCF:
+                    break
+            else:
+                raise RuntimeError('timeout waiting for ADC conversion on channel {:d}.'.format(_channel))
+            if self._sequential:
+                _lo, _hi = _bus.read(REG_ADCRL, 2)
+            else:
+                _hi = _bus.read(REG_ADCRH)[0]
+                _lo = _bus.read(REG_ADCRL)[0]
+            snapshot[i] = int(round((( _hi << 4 ) | ( _lo & 0x0f )) * self._scale))
+        if not digital:
+            return snapshot
+        _ports = { _reg: _bus.read(_reg)[0] for _reg in self._port_registers }
+        _low = 0
+        for i, ( _reg, _mask ) in enumerate(self._digital):
+            if not _ports[_reg] & _mask:
+                _low |= 1 << i
+        snapshot[self._size - 1] = _low
+        return snapshot
+
+#EOF
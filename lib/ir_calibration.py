@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-06
+# modified: 2021-05-06
+#
+# Precomputed raw-to-distance lookup tables for the analog infrared sensors of
+# the Integrated Front Sensor, with per-sensor calibration curves.
+#
+
+import math
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+
+# the infrared sensors, whose labels are used as keys in the configuration
+IR_ORIENTATIONS = ( Orientation.PORT_SIDE, Orientation.PORT, Orientation.CNTR, Orientation.STBD, Orientation.STBD_SIDE )
+
+# ..............................................................................
+def fit_curve(samples):
+    '''
+    Fits the curve distance = ( numerator / raw ) ^ exponent to a sequence
+    of recorded (raw value, distance cm) samples, returning the numerator
+    and exponent as a tuple.
+
+    In log-log space the curve is the line log(d) = e·log(n) - e·log(raw),
+    so it is fitted by linear least squares.
+    '''
+    _samples = numpy.asarray(samples, dtype=numpy.float64).reshape(-1, 2)
+    _samples = _samples[( _samples[:,0] > 0.0 ) & ( _samples[:,1] > 0.0 )]
+    if len(_samples) < 2:
+        raise ValueError('at least two non-zero samples are required to fit a curve.')
+    _slope, _intercept = numpy.polyfit(numpy.log(_samples[:,0]), numpy.log(_samples[:,1]), 1)
+    _exponent = -_slope
+    if _exponent <= 0.0:
+        raise ValueError('samples do not describe a falling curve.')
+    return math.exp(_intercept / _exponent), _exponent
+
+# ..............................................................................
+def load_samples(filename):
+    '''
+    Returns the (raw value, distance cm) samples recorded in a text file,
+    one whitespace-separated pair per line, as an array.
+    '''
+    return numpy.loadtxt(filename, dtype=numpy.float64, ndmin=2)
+
+# ..............................................................................
+class DistanceTable(object):
+    '''
+    A table of the distance (cm) for each raw value of an infrared sensor
+    from 0 to raw_max, computed once from the curve
+
+        distance = ( numerator / raw ) ^ exponent
+
+    so that a reading is converted by indexing rather than by a floating
+    point pow() upon each poll. A raw value of zero has no distance (None);
+    values beyond raw_max are treated as raw_max.
+
+    :param numerator:  the numerator of the curve
+    :param exponent:   the exponent of the curve
+    :param raw_max:    the maximum raw value
+    '''
+    def __init__(self, numerator, exponent, raw_max):
+        self._numerator = numerator
+        self._exponent  = exponent
+        self._table     = [ None ] + [ pow(numerator / _raw, exponent) for _raw in range(1, raw_max + 1) ]
+        self._raw_max   = raw_max
+
+    # ..........................................................................
+    @property
+    def numerator(self):
+        return self._numerator
+
+    # ..........................................................................
+    @property
+    def exponent(self):
+        return self._exponent
+
+    # ..........................................................................
+    @property
+    def values(self):
+        '''
+        Returns the list of distances indexed by raw value.
+        '''
+        return self._table
+
+    # ..........................................................................
+    def lookup(self, raw):
+        '''
+        Returns the distance in centimeters of the raw value, or None if
+        the value is zero (or negative).
+        '''
+        if raw <= 0:
+            return None
+        return self._table[raw if raw <= self._raw_max else self._raw_max]
+
+# ..............................................................................
+class IrCalibration(object):
+    '''
+    Holds a DistanceTable for each infrared sensor of the Integrated Front
+    Sensor, converting raw readings to distances.
+
+    By default each sensor uses the common curve of the configuration.
+    A sensor may instead be given its own curve, either in the curves:
+    section of the configuration (keyed by the sensor's orientation label)
+    or fitted at runtime from recorded samples with fit().
+
+    The exponent of the common curve may be adjusted (e.g., by the
+    potentiometer during calibration) with set_exponent(). Changes are
+    quantised to the configured exponent_resolution, and the tables are
+    regenerated only when the quantised exponent actually changes.
+
+    This uses the ros:integrated_front_sensor:calibration: section of the
+    configuration.
+
+    :param config:  the application configuration
+    :param level:   the log level
+    '''
+    def __init__(self, config, level=Level.INFO):
+        self._log = Logger('ir-cal', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('integrated_front_sensor').get('calibration')
+        self._numerator  = _config.get('numerator')
+        self._exponent   = _config.get('exponent')
+        self._raw_max    = _config.get('raw_max')
+        self._resolution = _config.get('exponent_resolution')
+        self._fitted     = {} # orientation: DistanceTable of sensors with their own curve
+        _curves = _config.get('curves') or {}
+        for _orientation in IR_ORIENTATIONS:
+            _curve = _curves.get(_orientation.label)
+            if _curve:
+                self._fitted[_orientation] = DistanceTable(_curve[0], _curve[1], self._raw_max)
+                self._log.info('{} curve: ({:>7.2f}/raw)^{:>5.3f}'.format(_orientation.label, _curve[0], _curve[1]))
+        self._tables = {}
+        self._build_tables()
+        self._log.info('ready: common curve ({:>7.2f}/raw)^{:>5.3f}; raw values 0-{:d}.'.format(self._numerator, self._exponent, self._raw_max))
+
+    # ..........................................................................
+    def _build_tables(self):
+        _common = DistanceTable(self._numerator, self._exponent, self._raw_max)
+        _tables = { _orientation: self._fitted.get(_orientation, _common) for _orientation in IR_ORIENTATIONS }
+        # replaced as a whole so that a concurrent convert() sees either set of tables
+        self._tables = _tables
+        self._values = { _orientation: _table.values for _orientation, _table in _tables.items() }
+
+    # ..........................................................................
+    @property
+    def exponent(self):
+        '''
+        Returns the exponent of the common curve.
+        '''
+        return self._exponent
+
+    # ..........................................................................
+    def set_exponent(self, exponent):
+        '''
+        Sets the exponent of the common curve, regenerating the tables of
+        the sensors using it only if the (quantised) exponent has changed.
+        Returns True if the tables were regenerated.
+        '''
+        _exponent = round(round(exponent / self._resolution) * self._resolution, 6)
+        if _exponent == self._exponent:
+            return False
+        self._exponent = _exponent
+        self._build_tables()
+        self._log.info('common curve exponent set to {:>5.3f}.'.format(_exponent))
+        return True
+
+    # ..........................................................................
+    @property
+    def raw_max(self):
+        return self._raw_max
+
+    # ..........................................................................
+    def get_table(self, orientation):
+        '''
+        Returns the DistanceTable of the infrared sensor.
+        '''
+        return self._tables[orientation]
+
+    # ..........................................................................
+    def get_distances(self, orientation):
+        '''
+        Returns the list of distances of the infrared sensor indexed by raw
+        value, for callers that index it directly. A new list is created
+        whenever the sensor's table is regenerated.
+        '''
+        return self._values[orientation]
+
+    # ..........................................................................
+    def fit(self, orientation, samples):
+        '''
+        Fits a calibration curve for the infrared sensor from a sequence of
+        recorded (raw value, distance cm) samples, thereafter using it in
+        place of the common curve. Returns the numerator and exponent.
+        '''
+        if orientation not in IR_ORIENTATIONS:
+            raise ValueError('unsupported orientation: {}.'.format(orientation))
+        _numerator, _exponent = fit_curve(samples)
+        self._fitted[orientation] = DistanceTable(_numerator, _exponent, self._raw_max)
+        self._build_tables()
+        self._log.info('{} curve fitted from {:d} samples: ({:>7.2f}/raw)^{:>5.3f}'.format(
+                orientation.label, len(samples), _numerator, _exponent))
+        return _numerator, _exponent
+
+    # ..........................................................................
+    def convert(self, orientation, raw):
+        '''
+        Returns the distance in centimeters of the raw value of the infrared
+        sensor, or None if the value is zero or None.
+        '''
+        if not raw or raw < 0:
+            return None
+        return self._values[orientation][raw if raw <= self._raw_max else self._raw_max]
+
+#EOF
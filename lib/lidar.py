@@ -7,7 +7,7 @@
 #
 # author:   altheim
 # created:  2020-03-31
-# modified: 2021-03-29
+# modified: 2021-05-15
 #
 
 import time
@@ -22,8 +22,24 @@ except ImportError:
 
 from lib.tof import TimeOfFlight, Range
 from lib.servo import Servo
+from lib.sweep import SweepEngine
 from lib.logger import Logger, Level
 
+# ..............................................................................
+class _LidarServo(object):
+    '''
+    Presents the Lidar's servo to its SweepEngine, reversing its movement
+    if required.
+    '''
+    def __init__(self, lidar):
+        self._lidar = lidar
+
+    def set_position(self, angle):
+        self._lidar._set_servo_position(angle)
+
+    def get_position(self, default_angle):
+        return self._lidar._get_servo_position(default_angle)
+
 # ..............................................................................
 class Lidar():
     '''
@@ -33,6 +49,10 @@ class Lidar():
     sweeping to port, positive (maximum servo position) to starboard.
 
     The 'reverse_movement' parameter is used in case the servo movement is backwards.
+
+    Sweeps are performed by a SweepEngine, which if pipelined moves the servo
+    between the ToF sensor's measurements, the sensor's inter-measurement
+    period being set to allow for the servo to settle.
     '''
     def __init__(self, config, level):
         self._log = Logger('lidar', Level.INFO)
@@ -77,6 +97,13 @@ class Lidar():
 
         self._tof = TimeOfFlight(_range, Level.WARN)
         self._error_range = 0.067
+        if self._servo:
+            self._engine = SweepEngine(self._config, _LidarServo(self), self._tof, level)
+            _sweep_config = self._config['ros'].get('lidar').get('sweep')
+            if _sweep_config.get('pipelined'):
+                self._tof.set_timing(int(_sweep_config.get('budget_ms') * 1000), self._engine.inter_measurement_ms)
+        else:
+            self._engine = None
         self._enabled = False
         self._closed = False
         self._log.info('ready.')
@@ -101,6 +128,53 @@ class Lidar():
             else:
                 return self._servo.get_position(default_angle)
 
+    # ..........................................................................
+    def sweep(self):
+        '''
+        Sweeps from the minimum to the maximum angle (and back again if
+        double_sweep is set), returning an array of (angle, range mm) rows,
+        or None if disabled or there is no servo.
+        '''
+        if not self._enabled:
+            self._log.warning('cannot sweep: disabled.')
+            return None
+        if not self._engine:
+            self._log.warning('cannot sweep: no servo.')
+            return None
+        self._log.info('sweep fore...')
+        _scan = self._engine.sweep()
+        if self._double_sweep:
+            self._log.info('sweep back...')
+            _scan = numpy.concatenate(( _scan, self._engine.sweep(reverse=True) ))
+        for _degrees, _mm in _scan:
+            self._log.debug('distance at {:>5.2f}°: \t{}mm'.format(_degrees, _mm))
+        return _scan
+
+    # ..........................................................................
+    def start_sweeping(self):
+        '''
+        Starts sweeping back and forth continuously on a separate thread.
+        '''
+        if not self._enabled:
+            self._log.warning('cannot sweep: disabled.')
+        elif not self._engine:
+            self._log.warning('cannot sweep: no servo.')
+        else:
+            self._engine.enable()
+
+    # ..........................................................................
+    def stop_sweeping(self):
+        if self._engine:
+            self._engine.disable()
+
+    # ..........................................................................
+    def get_latest_sweep(self):
+        '''
+        Returns the latest complete sweep of continuous sweeping as an array
+        of (angle, range mm) rows, or None if there has been none.
+        '''
+        return self._engine.get_latest() if self._engine else None
+
     # ..........................................................................
     def scan(self):
         if not self._enabled:
@@ -109,76 +183,14 @@ class Lidar():
         try:
             if self._servo:
                 start = time.time()
-                _min_mm = 9999.0
-                _angle_at_min = 0.0
-                _max_mm = 0
-                _angle_at_max = 0.0
-    
-                self._set_servo_position(self._min_angle)
-                time.sleep(0.3)
-#               wait_count = 0
-#               while ( not self._in_range(self._get_servo_position(self._min_angle), self._min_angle) ) and ( wait_count < 20 ):
-#                   wait_count += 1
-#                   self._set_servo_position(self._min_angle)
-#                   self._log.info(Fore.MAGENTA + Style.BRIGHT + 'waiting for match at degrees: {:>5.2f}°: waited: {:d}'.format(self._get_servo_position(-1), wait_count))
-#                   time.sleep(1.0)
-#               time.sleep(0.05)
-#               self._log.info(Fore.YELLOW + Style.BRIGHT + 'starting scan from degrees: {:>5.2f}°: waited: {:d}'.format(self._get_servo_position(-1), wait_count))
-    
-                # sweep from minimum to maximum ........................................................
-                self._log.info('sweep fore...')
-#               self._log.info('sweep min to max...')
-                for degrees in numpy.arange(self._min_angle, self._max_angle + 0.01, self._degree_step):
-                    self._set_servo_position(degrees)
-                    wait_count = 0
-                    while not self._in_range(self._get_servo_position(degrees), degrees) and wait_count < 10:
-                        time.sleep(0.0025)
-                        wait_count += 1
-                    self._log.debug(Fore.GREEN + Style.BRIGHT + 'measured degrees: {:>5.2f}°: \ttarget: {:>5.2f}°; waited: {:d}'.format(\
-                            self._get_servo_position(degrees), degrees, wait_count))
-                    mm = self._tof.read_distance()
-                    self._log.info('distance at {:>5.2f}°: \t{}mm'.format(degrees, mm))
-                    # capture min and max at angles
-                    _min_mm = min(_min_mm, mm)
-                    if mm == _min_mm:
-                        _angle_at_min = degrees
-                    _max_mm = max(_max_mm, mm)
-                    if mm == _max_mm:
-                        _angle_at_max = degrees
-                    time.sleep(self._step_delay_sec)
-    
-                if self._double_sweep:
-                    self._log.info('sweep back...')
-#                   self._log.info('sweep max to min...')
-                    # sweep from maximum to minimum ........................................................
-                    for degrees in numpy.arange(self._max_angle, self._min_angle + 0.01, -1.0 * self._degree_step):
-                        self._set_servo_position(degrees)
-                        wait_count = 0
-                        while not self._in_range(self._get_servo_position(degrees), degrees) and wait_count < 10:
-                            time.sleep(0.0025)
-                            wait_count += 1
-                        self._log.debug(Fore.GREEN + Style.BRIGHT + 'measured degrees: {:>5.2f}°: \ttarget: {:>5.2f}°; waited: {:d}'.format(\
-                                self._get_servo_position(degrees), degrees, wait_count))
-                        mm = self._tof.read_distance()
-                        self._log.info('distance at {:>5.2f}°: \t{}mm'.format(degrees, mm))
-                        # capture min and max at angles
-                        _min_mm = min(_min_mm, mm)
-                        if mm == _min_mm:
-                            _angle_at_min = degrees
-                        _max_mm = max(_max_mm, mm)
-                        if mm == _max_mm:
-                            _angle_at_max = degrees
-                        time.sleep(self._step_delay_sec)
-    
-                time.sleep(0.1)
-    #           self._log.info('complete.')
+                _scan = self.sweep()
+                _angle_at_min, _min_mm = _scan[numpy.argmin(_scan[:,1])]
+                _angle_at_max, _max_mm = _scan[numpy.argmax(_scan[:,1])]
                 elapsed = time.time() - start
                 self._log.info('min. distance at {:>5.2f}°:\t{}mm'.format(_angle_at_min, _min_mm))
                 self._log.info('max. distance at {:>5.2f}°:\t{}mm'.format(_angle_at_max, _max_mm))
                 self._log.info('scan complete: {:>5.2f}sec elapsed.'.format(elapsed))
-                self._set_servo_position(0.0)
-    #           self._servo.set_position(_angle_at_max)
-    #           self.close()
+                self._engine.set_position(0.0)
                 return [ _angle_at_min, _min_mm, _angle_at_max, _max_mm ]
             else:
                 _degrees = 0
@@ -204,6 +216,7 @@ class Lidar():
     # ..........................................................................
     def disable(self):
         self._enabled = False
+        self.stop_sweeping()
         if self._servo:
             self._servo.disable()
         self._tof.disable()
@@ -211,6 +224,8 @@ class Lidar():
     # ..........................................................................
     def close(self):
         self.disable()
+        if self._engine:
+            self._engine.close()
         if self._servo:
             self._servo.close()
         self._closed = True
@@ -15,12 +15,12 @@
 #
 
 import string, uuid, random
-from datetime import datetime as dt
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Logger, Level
 from lib.event import Event
+from lib.timing import now_ns, elapsed_ms
 #from lib.subscriber import Subscriber
 
 ID_CHARACTERS = string.ascii_uppercase + string.digits
@@ -31,7 +31,7 @@ class Message(object):
     Don't create one of these directly: use the MessageFactory class.
     '''
     def __init__(self, event, value):
-        self._timestamp     = dt.now()
+        self._timestamp     = now_ns()
         self._message_id    = uuid.uuid4()
         # generate instance name
         _host_id = "".join(random.choices(ID_CHARACTERS, k=4))
@@ -59,13 +59,17 @@ class Message(object):
 
     @property
     def timestamp(self):
+        '''
+        Returns the creation time of the message as a monotonic timestamp
+        in integer nanoseconds (see lib.timing).
+        '''
         return self._timestamp
 
     # age      .................................................................
 
     @property
     def age(self):
-        _age_ms = (dt.now() - self._timestamp).total_seconds() * 1000.0
+        _age_ms = elapsed_ms(self._timestamp)
 #       print(Fore.GREEN + Style.BRIGHT + 'message age: {:5.2f}ms ({})'.format(_age_ms, self._event.description) + Style.RESET_ALL)
         return int(_age_ms)
 
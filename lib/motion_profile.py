@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-05
+# modified: 2021-05-15
+#
+# Jerk-limited (S-curve) motion profiles, providing the velocity setpoints of
+# both motors' PID controllers on each control tick.
+#
+
+import math
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+
+# ..............................................................................
+def scurve_timing(delta_v, max_accel, max_jerk):
+    '''
+    Returns the jerk phase duration, constant acceleration phase duration
+    and peak acceleration of a symmetric S-curve changing velocity by the
+    magnitude of delta_v. If the change is too small to reach max_accel the
+    acceleration phase is zero and the peak acceleration is reduced.
+    '''
+    _delta_v = abs(delta_v)
+    if _delta_v * max_jerk >= max_accel * max_accel:
+        _jerk_sec = max_accel / max_jerk
+        return _jerk_sec, _delta_v / max_accel - _jerk_sec, max_accel
+    _jerk_sec = math.sqrt(_delta_v / max_jerk)
+    return _jerk_sec, 0.0, _jerk_sec * max_jerk
+
+# ..............................................................................
+def scurve(times, v0, v1, max_accel, max_jerk):
+    '''
+    Returns the velocities at the array of times (sec) of an S-curve from
+    v0 to v1, with v1 after its end.
+    '''
+    _jerk_sec, _accel_sec, _peak = scurve_timing(v1 - v0, max_accel, max_jerk)
+    _total_sec = 2.0 * _jerk_sec + _accel_sec
+    _sign = 1.0 if v1 >= v0 else -1.0
+    _t = numpy.minimum(times, _total_sec)
+    _rising    = v0 + _sign * max_jerk * _t * _t / 2.0
+    _constant  = v0 + _sign * ( _peak * _jerk_sec / 2.0 + _peak * ( _t - _jerk_sec ) )
+    _remaining = _total_sec - _t
+    _falling   = v1 - _sign * max_jerk * _remaining * _remaining / 2.0
+    return numpy.where(_t < _jerk_sec, _rising, numpy.where(_t < _jerk_sec + _accel_sec, _constant, _falling))
+
+# ..............................................................................
+class MotionProfile(object):
+    '''
+    A precomputed buffer of the (port, starboard) velocity setpoints of a
+    motion, one per control tick, created by either to_velocity() or
+    over_distance(). Each tick next() returns the next pair of setpoints
+    by simple indexing; once exhausted the final pair is returned.
+
+    The motor with the larger change follows an S-curve limited by the
+    maximum acceleration and jerk; the other's setpoints are scaled from
+    it, so that both complete the motion on the same tick and in the same
+    proportion throughout (e.g., maintaining the radius of a turn).
+    '''
+    def __init__(self, setpoints):
+        self._setpoints = setpoints
+        self._final     = setpoints[-1]
+        self._index     = 0
+
+    # ..........................................................................
+    @staticmethod
+    def _pair(lead, lead_start, lead_end, other_start, other_end):
+        '''
+        Returns the setpoint buffer of the lead motor's velocities with the
+        other motor's scaled to match.
+        '''
+        if lead_end == lead_start:
+            _other = numpy.full_like(lead, other_end)
+        else:
+            _other = other_start + ( other_end - other_start ) * ( lead - lead_start ) / ( lead_end - lead_start )
+        return list(zip(lead.tolist(), _other.tolist()))
+
+    # ..........................................................................
+    @staticmethod
+    def to_velocity(port_start, stbd_start, port_target, stbd_target, max_accel, max_jerk, dt):
+        '''
+        Returns the profile changing the velocities from their start to their
+        target values (cm/sec), sampled every dt seconds.
+        '''
+        _port_lead = abs(port_target - port_start) >= abs(stbd_target - stbd_start)
+        if _port_lead:
+            _start, _target, _other_start, _other_target = port_start, port_target, stbd_start, stbd_target
+        else:
+            _start, _target, _other_start, _other_target = stbd_start, stbd_target, port_start, port_target
+        _jerk_sec, _accel_sec, _peak = scurve_timing(_target - _start, max_accel, max_jerk)
+        _count = max(1, int(math.ceil(( 2.0 * _jerk_sec + _accel_sec ) / dt - 1e-9)))
+        _lead = scurve(numpy.arange(1, _count + 1) * dt, _start, _target, max_accel, max_jerk)
+        _setpoints = MotionProfile._pair(_lead, _start, _target, _other_start, _other_target)
+        if not _port_lead:
+            _setpoints = [ ( _port, _stbd ) for _stbd, _port in _setpoints ]
+        return MotionProfile(_setpoints)
+
+    # ..........................................................................
+    @staticmethod
+    def over_distance(port_cm, stbd_cm, max_velocity, max_accel, max_jerk, dt):
+        '''
+        Returns the profile moving each wheel the given distance (cm) from
+        rest to rest, the lead wheel cruising at up to max_velocity, sampled
+        every dt seconds.
+        '''
+        _port_lead = abs(port_cm) >= abs(stbd_cm)
+        _distance = abs(port_cm) if _port_lead else abs(stbd_cm)
+        if _distance == 0.0:
+            return MotionProfile([ ( 0.0, 0.0 ) ])
+        # accelerating to and decelerating from v covers v·T(v): find the peak velocity
+        def _move_distance(velocity):
+            _jerk_sec, _accel_sec, _peak = scurve_timing(velocity, max_accel, max_jerk)
+            return velocity * ( 2.0 * _jerk_sec + _accel_sec )
+        _velocity = max_velocity
+        if _move_distance(_velocity) > _distance:
+            _low, _high = 0.0, max_velocity
+            for i in range(60):
+                _velocity = ( _low + _high ) / 2.0
+                if _move_distance(_velocity) > _distance:
+                    _high = _velocity
+                else:
+                    _low = _velocity
+            _velocity = _low
+        _jerk_sec, _accel_sec, _peak = scurve_timing(_velocity, max_accel, max_jerk)
+        _ramp_sec = 2.0 * _jerk_sec + _accel_sec
+        _cruise_sec = ( _distance - _move_distance(_velocity) ) / _velocity
+        _total_sec = 2.0 * _ramp_sec + _cruise_sec
+        _count = max(1, int(math.ceil(_total_sec / dt - 1e-9)))
+        _times = numpy.arange(1, _count + 1) * dt
+        _lead = numpy.where(_times < _ramp_sec + _cruise_sec,
+                scurve(_times, 0.0, _velocity, max_accel, max_jerk),
+                scurve(_times - _ramp_sec - _cruise_sec, _velocity, 0.0, max_accel, max_jerk))
+        _lead *= math.copysign(1.0, port_cm if _port_lead else stbd_cm)
+        _ratio = ( stbd_cm / port_cm ) if _port_lead else ( port_cm / stbd_cm )
+        _setpoints = list(zip(_lead.tolist(), ( _lead * _ratio ).tolist()))
+        if not _port_lead:
+            _setpoints = [ ( _port, _stbd ) for _stbd, _port in _setpoints ]
+        return MotionProfile(_setpoints)
+
+    # ..........................................................................
+    def __len__(self):
+        return len(self._setpoints)
+
+    # ..........................................................................
+    def __getitem__(self, index):
+        return self._setpoints[index]
+
+    # ..........................................................................
+    @property
+    def final(self):
+        return self._final
+
+    # ..........................................................................
+    @property
+    def done(self):
+        return self._index >= len(self._setpoints)
+
+    # ..........................................................................
+    def next(self):
+        '''
+        Returns the next (port, starboard) setpoints.
+        '''
+        _index = self._index
+        if _index < len(self._setpoints):
+            self._index = _index + 1
+            return self._setpoints[_index]
+        return self._final
+
+# ..............................................................................
+class TrajectoryGenerator(object):
+    '''
+    Provides the velocity setpoints of both PID controllers on each control
+    tick from a MotionProfile, precomputed once per command, in place of
+    slew limiting each setpoint as it is set.
+
+    Commands are set_velocity() (e.g., from the cruise behaviour or gamepad),
+    move() (a distance), and stop(). Each begins from the current setpoints
+    and replaces any motion in progress. As the generator replaces slew
+    limiting, enable() disables the PID controllers' slew limiters, and
+    disable() restores them as they were.
+
+    The generator is added as a callback of the executor (or clock), so its
+    setpoints apply from the PID controllers' following step if the PID
+    controllers were enabled before it.
+
+    This uses the ros:motion_profile: section of the configuration.
+
+    :param config:          the application configuration
+    :param executor:        the RealTimeExecutor, Ticker or VirtualClock
+    :param pid_motor_ctrl:  the PIDMotorController
+    :param level:           the log level
+    '''
+    def __init__(self, config, executor, pid_motor_ctrl, level=Level.INFO):
+        self._log = Logger('trajectory', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if executor is None:
+            raise ValueError('null executor argument.')
+        if pid_motor_ctrl is None:
+            raise ValueError('null PID motor controller argument.')
+        self._port_pid, self._stbd_pid = pid_motor_ctrl.get_pid_controllers()
+        _config = config['ros'].get('motion_profile')
+        self._max_velocity = _config.get('max_velocity')
+        self._max_accel    = _config.get('max_accel')
+        self._max_jerk     = _config.get('max_jerk')
+        self._dt           = 1.0 / executor.freq_hz
+        self._profile      = MotionProfile([ ( 0.0, 0.0 ) ])
+        self._setpoints    = ( 0.0, 0.0 )
+        self._saved_slew   = None # the PID controllers' slew limiting before enable()
+        self._enabled      = False
+        self._closed       = False
+        executor.add_callback(self.tick)
+        self._log.info('max velocity: {:5.2f}cm/sec; max acceleration: {:5.2f}cm/sec²; max jerk: {:5.2f}cm/sec³'.format(
+                self._max_velocity, self._max_accel, self._max_jerk))
+
+    # ..........................................................................
+    def _clamp(self, velocity):
+        return max(-self._max_velocity, min(self._max_velocity, velocity))
+
+    # ..........................................................................
+    @property
+    def max_velocity(self):
+        '''
+        Returns the maximum velocity (cm/sec) of either motor.
+        '''
+        return self._max_velocity
+
+    # ..........................................................................
+    @property
+    def setpoints(self):
+        '''
+        Returns the most recent (port, starboard) setpoints.
+        '''
+        return self._setpoints
+
+    # ..........................................................................
+    @property
+    def profile(self):
+        return self._profile
+
+    # ..........................................................................
+    @property
+    def active(self):
+        '''
+        Returns True if a motion is in progress.
+        '''
+        return not self._profile.done
+
+    # ..........................................................................
+    def set_velocity(self, port_velocity, stbd_velocity=None):
+        '''
+        Changes the velocity of the port and starboard motors (cm/sec). If a
+        velocity is None that motor's target velocity is unchanged.
+        '''
+        _port_start, _stbd_start = self._setpoints
+        _port_final, _stbd_final = self._profile.final
+        _port = _port_final if port_velocity is None else self._clamp(port_velocity)
+        _stbd = _stbd_final if stbd_velocity is None else self._clamp(stbd_velocity)
+        self._profile = MotionProfile.to_velocity(_port_start, _stbd_start, _port, _stbd, self._max_accel, self._max_jerk, self._dt)
+        self._log.debug('velocity: {:5.2f}, {:5.2f}cm/sec over {:d} ticks.'.format(_port, _stbd, len(self._profile)))
+        return self._profile
+
+    # ..........................................................................
+    def move(self, port_cm, stbd_cm=None):
+        '''
+        Moves the port and starboard wheels the given distances (cm), from
+        rest to rest. If stbd_cm is None it is the same as port_cm.
+        '''
+        _stbd_cm = port_cm if stbd_cm is None else stbd_cm
+        self._profile = MotionProfile.over_distance(port_cm, _stbd_cm, self._max_velocity, self._max_accel, self._max_jerk, self._dt)
+        self._log.debug('move: {:5.2f}, {:5.2f}cm over {:d} ticks.'.format(port_cm, _stbd_cm, len(self._profile)))
+        return self._profile
+
+    # ..........................................................................
+    def stop(self):
+        '''
+        Decelerates both motors to a stop.
+        '''
+        return self.set_velocity(0.0, 0.0)
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Sets the next setpoints of the PID controllers.
+        '''
+        if self._enabled:
+            self._setpoints = _port, _stbd = self._profile.next()
+            self._port_pid.setpoint = _port
+            self._stbd_pid.setpoint = _stbd
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if self._closed:
+            self._log.warning('cannot enable: already closed.')
+        elif not self._enabled:
+            self._saved_slew = ( self._port_pid.enable_slew(False), self._stbd_pid.enable_slew(False) )
+            self._enabled = True
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            _port_slew, _stbd_slew = self._saved_slew
+            self._port_pid.enable_slew(_port_slew)
+            self._stbd_pid.enable_slew(_stbd_slew)
+            self._log.info('disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if self._enabled:
+            self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
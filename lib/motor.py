@@ -7,10 +7,11 @@
 #
 # author:   Murray Altheim
 # created:  2020-01-18
-# modified: 2020-08-30
+# modified: 2021-05-15
 #
 
 import sys, itertools, time
+from threading import Thread, Lock, Event
 from colorama import init, Fore, Style
 init()
 
@@ -21,17 +22,29 @@ except ImportError:
     sys.exit(1)
 
 from lib.logger import Level, Logger
+from lib.timing import now_ns
 from lib.enums import Orientation
 from lib.slew import SlewRate
 from lib.decoder import Decoder
+from lib.edge_decoder import EdgeDecoder, NotificationPipe
 from lib.velocity import Velocity
 
+# serialises access to the ThunderBorg, shared by both motors
+TB_LOCK = Lock()
+
 # ..............................................................................
 class Motor():
     '''
     Establishes power control over a motor using a Hall Effect encoder
     to determine the robot's velocity and distance traveled.
 
+    A shadow copy of the last commanded (driving) power is kept, so that
+    setting the motor power requires no I2C read-back from the ThunderBorg.
+    While enabled, a background thread periodically reconciles the shadow
+    copy with the value read from the ThunderBorg, counting (and adopting)
+    any disagreement, e.g., following a call to cancel() or a ThunderBorg
+    comms failsafe.
+
     This uses the ros:motors: section of the configuration.
 
     :param config:      application configuration
@@ -67,6 +80,10 @@ class Motor():
             self._orientation = Orientation.STBD if orientation is Orientation.PORT else Orientation.PORT
         else:
             self._orientation = orientation
+        # encoder backend: 'callback' (per edge) or 'notify' (bulk, per tick)
+        self._config = config
+        self._encoder_backend = cfg.get('encoder_backend')
+        self._edge_decoder = None
         # velocity calculation .............................
 #       if clock:
         self._velocity = Velocity(config, clock, self, Level.WARN)
@@ -78,11 +95,20 @@ class Motor():
         # acceleration loop delay
         self._accel_loop_delay_sec = cfg.get('accel_loop_delay_sec') # default: 0.10
         self._log.debug('acceleration loop delay: {:>5.2f} sec'.format(self._accel_loop_delay_sec))
+        # shadow power reconciliation
+        self._reconcile_interval_sec = cfg.get('reconcile_interval_sec') # default: 1.0
+        self._reconcile_epsilon = cfg.get('reconcile_epsilon') # default: 0.01
+        self._log.debug('reconcile interval: {:>5.2f} sec; epsilon: {:>5.3f}'.format(self._reconcile_interval_sec, self._reconcile_epsilon))
 
         # TODO move this configuration to its own Decoder section
         self._log.debug('reverse motor orientation: {}'.format(self._reverse_motor_orientation))
         self._reverse_encoder_orientation = cfg.get('reverse_encoder_orientation')
         self._log.debug('reverse encoder orientation: {}'.format(self._reverse_encoder_orientation))
+        # the sign applied to encoder pulses to obtain forward steps
+        if self._reverse_encoder_orientation:
+            self._pulse_sign = -1 if self._orientation is Orientation.PORT else 1
+        else:
+            self._pulse_sign = 1 if self._orientation is Orientation.PORT else -1
         # GPIO pins configured for A1, B1, A2 and B2
         self._motor_encoder_a1_port = cfg.get('motor_encoder_a1_port') # default: 22
         self._log.debug('motor encoder a1 port: {:d}'.format(self._motor_encoder_a1_port))
@@ -104,10 +130,17 @@ class Motor():
         self._max_power = 0.0                # capture maximum power applied
         self._max_driving_power = 0.0        # capture maximum adjusted power applied
         self._interrupt = False              # used to interrupt loops
-        self._stepcount_timestamp = time.time()  # timestamp at beginning of velocity measurement
+        self._stepcount_timestamp = now_ns()     # timestamp at beginning of velocity measurement
         self._enabled = False                # was by default enabled
         self._killed  = False                # if killed we never re-enable
-        self._start_timestamp = time.time()  # timestamp at beginning of velocity measurement
+        self._start_timestamp = now_ns()     # timestamp at beginning of velocity measurement
+        self._shadow_power = 0.0             # last commanded driving power
+        self._write_count = 0                # count of power writes
+        self._mismatch_count = 0             # count of shadow/hardware disagreements
+        self._reconcile_thread = None
+        self._reconcile_stop = None          # set to stop the reconcile thread
+        self._stage = None                   # optional MotorCommandStage
+        self._ramp_engine = None             # optional RampEngine used by accelerate()
 
         # configure encoder ................................
         self._log.info('configuring rotary encoders...')
@@ -131,8 +164,50 @@ class Motor():
             _encoder_b = self._motor_encoder_b2_stbd
         else:
             raise ValueError("unrecognised value for orientation.")
-        self._decoder = Decoder(self._pi, self._orientation, _encoder_a, _encoder_b, self._callback_step_count, self._log.level)
-        self._log.info('configured {} motor encoder on pin {} and {}.'.format(orientation.name, _encoder_a, _encoder_b))
+        if self._encoder_backend == 'notify':
+            self._edge_decoder = EdgeDecoder(self._config, NotificationPipe(self._pi, _encoder_a, _encoder_b),
+                    _encoder_a, _encoder_b, self._orientation, self._log.level)
+            self._decoder = self._edge_decoder
+        else:
+            self._decoder = Decoder(self._pi, self._orientation, _encoder_a, _encoder_b, self._callback_step_count, self._log.level)
+        self._log.info('configured {} motor encoder on pin {} and {} ({} backend).'.format(
+                orientation.name, _encoder_a, _encoder_b, self._encoder_backend))
+
+    # ..............................................................................
+    def set_edge_decoder(self, decoder):
+        '''
+        Replaces the encoder backend with the provided EdgeDecoder, e.g.,
+        one using a MockEdgeSource.
+        '''
+        self._decoder.cancel()
+        self._edge_decoder = decoder
+        self._decoder = decoder
+
+    # ..............................................................................
+    @property
+    def edge_ring(self):
+        '''
+        Returns the EdgeRing of timestamped steps if using an EdgeDecoder,
+        otherwise None.
+        '''
+        return self._edge_decoder.ring if self._edge_decoder else None
+
+    # ..............................................................................
+    def get_current_tick(self):
+        '''
+        Returns the current tick (µs) of the EdgeDecoder's source, on the
+        same timeline as the timestamps of the edge ring.
+        '''
+        return self._edge_decoder.get_current_tick()
+
+    # ..............................................................................
+    @property
+    def pulse_sign(self):
+        '''
+        Returns the sign (+1 or -1) applied to encoder pulses (and the
+        directions of the edge ring) to obtain forward steps.
+        '''
+        return self._pulse_sign
 
     # ..........................................................................
     @property
@@ -142,6 +217,14 @@ class Motor():
         '''
         return self._orientation
 
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the time source used by the velocity calculation.
+        '''
+        if self._velocity:
+            self._velocity.set_time_source(now_ns)
+
     # ..........................................................................
     @property
     def velocity(self):
@@ -150,6 +233,17 @@ class Motor():
         else:
             return 0.0
 
+    # ..........................................................................
+    @property
+    def velocity_confidence(self):
+        '''
+        Returns the confidence (0.0-1.0) in the current velocity.
+        '''
+        if self._velocity:
+            return self._velocity.confidence
+        else:
+            return 0.0
+
     # ..........................................................................
     @property
     def enabled(self):
@@ -158,6 +252,15 @@ class Motor():
     # ..............................................................................
     @property
     def steps(self):
+        '''
+        Returns the step count. If using an EdgeDecoder the edges received
+        since the last call are first folded into the count, i.e., once per
+        control tick when called by the velocity calculation.
+        '''
+        if self._edge_decoder:
+            _steps = self._edge_decoder.fold()
+            if _steps:
+                self._callback_step_count(_steps)
         return self._steps
 
     # ..............................................................................
@@ -179,16 +282,7 @@ class Motor():
         This callback is used to capture encoder steps.
         '''
 #       self._log.info(Fore.BLACK + Style.BRIGHT + '_callback_step_count({})'.format(pulse))
-        if not self._reverse_encoder_orientation:
-            if self._orientation is Orientation.PORT:
-                self._steps = self._steps + pulse
-            else:
-                self._steps = self._steps - pulse
-        else:
-            if self._orientation is Orientation.PORT:
-                self._steps = self._steps - pulse
-            else:
-                self._steps = self._steps + pulse
+        self._steps = self._steps + self._pulse_sign * pulse
 #       self._log.info(Fore.BLACK + '{}: {:+d} steps'.format(self._orientation.label, self._steps))
 
     # ..........................................................................
@@ -200,6 +294,11 @@ class Motor():
                 self._enabled = True
                 if self._velocity:
                     self._velocity.enable()
+                if self._reconcile_thread is None:
+                    self._reconcile_stop = Event()
+                    self._reconcile_thread = Thread(name='reconcile:{}'.format(self._orientation.label), \
+                            target=Motor._reconcile_loop, args=[self, self._reconcile_stop], daemon=True)
+                    self._reconcile_thread.start()
                 self._log.info('enabled.')
         else:
             self._log.warning('cannot enable: motor has been killed.')
@@ -212,11 +311,13 @@ class Motor():
             self._enabled = False
             if self._velocity:
                 self._velocity.disable()
+            if self._reconcile_thread:
+                # wake and wait for the thread, so that re-enabling never starts a second
+                self._reconcile_stop.set()
+                self._reconcile_thread.join(timeout=self._reconcile_interval_sec + 1.0)
+                self._reconcile_thread = None
 #           self.set_motor_power(0.0)
-            if self._orientation is Orientation.PORT:
-                self._tb.SetMotor1(0.0)
-            else:
-                self._tb.SetMotor2(0.0)
+            self._drive(0.0, immediate=True)
             self._log.info('disabled.')
 
     # ..........................................................................
@@ -225,6 +326,8 @@ class Motor():
             self.disable()
         if self._max_power > 0 or self._max_driving_power > 0:
             self._log.info('on closing: max power: {:>5.2f}; max adjusted power: {:>5.2f}.'.format(self._max_power, self._max_driving_power))
+        if self._edge_decoder:
+            self._edge_decoder.cancel()
         self._log.info('closed.')
 
     # ..........................................................................
@@ -255,12 +358,14 @@ class Motor():
         '''
         Stop both motors immediately. This can be called from either motor.
         '''
+        global TB
         try: TB
         except NameError: TB = None
 
         if TB:
-            TB.SetMotor1(0.0)
-            TB.SetMotor2(0.0)
+            with TB_LOCK:
+                TB.SetMotor1(0.0)
+                TB.SetMotor2(0.0)
         else:
             print('motor             :' + Fore.YELLOW + ' WARN  : cannot cancel motors: no thunderborg available.' + Style.RESET_ALL)
 
@@ -304,7 +409,7 @@ class Motor():
             self._log.error('motor power too low: {:>5.2f}; limit: {:>5.2f}'.format( power_level,( -1.0 * self._motor_power_limit )))
             power_level = -1.0 * self._motor_power_limit
 #           return
-        _current_power = self.get_current_power_level()
+        _current_power = self._shadow_power
 #       _current_actual_power = _current_power * ( 1.0 / self._max_power_ratio )
         if abs(_current_power - power_level) > 0.3 and _current_power > 0.0 and power_level < 0:
             self._log.error('cannot perform positive-negative power jump: {:>5.2f} to {:>5.2f}.'.format(_current_power, power_level))
@@ -319,10 +424,108 @@ class Motor():
         self._max_driving_power = max(abs(_driving_power), self._max_driving_power)
         self._log.debug(Fore.MAGENTA + Style.BRIGHT + 'power argument: {:>5.2f}'.format(power_level) + Style.NORMAL \
                 + '\tcurrent power: {:>5.2f}; driving power: {:>5.2f}.'.format(_current_power, _driving_power))
-        if self._orientation is Orientation.PORT:
-            self._tb.SetMotor1(_driving_power)
-        else:
-            self._tb.SetMotor2(_driving_power)
+        self._drive(_driving_power)
+
+    # ..........................................................................
+    def set_command_stage(self, stage):
+        '''
+        Sets a MotorCommandStage, through which the driving power is then
+        written when the stage is flushed rather than immediately. Stopping
+        the motor still flushes immediately. Set to None to write directly.
+        '''
+        self._stage = stage
+
+    # ..........................................................................
+    def set_ramp_engine(self, ramp_engine):
+        '''
+        Sets a RampEngine, which accelerate() then uses to ramp the motor
+        power on the control tick rather than blocking. Set to None to
+        use the blocking loop.
+        '''
+        self._ramp_engine = ramp_engine
+
+    # ..........................................................................
+    def _drive(self, driving_power, immediate=False):
+        '''
+        Writes the driving power to the ThunderBorg (or to the command stage
+        if one is set), updating the shadow copy. If immediate is True the
+        command stage is flushed.
+        '''
+        if self._stage:
+            self._stage.set(self._orientation, driving_power)
+            self._shadow_power = driving_power
+            self._write_count += 1
+            if immediate:
+                self._stage.flush()
+            return
+        with TB_LOCK:
+            if self._orientation is Orientation.PORT:
+                self._tb.SetMotor1(driving_power)
+            else:
+                self._tb.SetMotor2(driving_power)
+            self._shadow_power = driving_power
+            self._write_count += 1
+
+    # ..........................................................................
+    @property
+    def current_power(self):
+        '''
+        Returns the last commanded driving power (the shadow copy), which
+        unlike get_current_power_level() requires no read from the ThunderBorg.
+        '''
+        return self._shadow_power
+
+    # ..........................................................................
+    @property
+    def shadow_mismatch_count(self):
+        '''
+        Returns the number of times reconciliation found the shadow copy of
+        the motor power disagreed with the value read from the ThunderBorg.
+        '''
+        return self._mismatch_count
+
+    # ..........................................................................
+    def _read_power(self):
+        with TB_LOCK:
+            if self._orientation is Orientation.PORT:
+                return self._tb.GetMotor1()
+            else:
+                return self._tb.GetMotor2()
+
+    # ..........................................................................
+    def reconcile(self):
+        '''
+        Reads the motor power from the ThunderBorg and compares it with the
+        shadow copy, adopting the hardware value if they differ by more than
+        the configured epsilon. A read that fails, that is overtaken by a
+        write, or that precedes a pending write in the command stage is
+        disregarded. Returns True if the two agreed.
+        '''
+        _write_count = self._write_count
+        _shadow_power = self._shadow_power
+        _power = self._read_power()
+        if _power is None or _write_count != self._write_count \
+                or ( self._stage and self._stage.is_pending(self._orientation) ):
+            return True
+        if abs(_power - _shadow_power) > self._reconcile_epsilon:
+            self._mismatch_count += 1
+            if self._stage:
+                self._stage.invalidate(self._orientation)
+            self._log.warning('shadow power {:>5.2f} disagrees with motor power {:>5.2f} ({:d} times).'.format( \
+                    _shadow_power, _power, self._mismatch_count))
+            self._shadow_power = _power
+            return False
+        return True
+
+    # ..........................................................................
+    def _reconcile_loop(self, stop):
+        '''
+        Reconciles the shadow copy of the motor power every interval until
+        the stop Event is set.
+        '''
+        while not stop.wait(self._reconcile_interval_sec):
+            self.reconcile()
+        self._log.debug('exited reconcile loop.')
 
     # ..........................................................................
     def is_stopped(self):
@@ -338,16 +541,10 @@ class Motor():
         '''
         value = None
         count = 0
-        if self._orientation is Orientation.PORT:
-            while value == None and count < 20:
-                count += 1
-                value = self._tb.GetMotor1()
-                time.sleep(0.005)
-        else:
-            while value == None and count < 20:
-                count += 1
-                value = self._tb.GetMotor2()
-                time.sleep(0.005)
+        while value == None and count < 20:
+            count += 1
+            value = self._read_power()
+            time.sleep(0.005)
         if value == None:
             return 0.0
         else:
@@ -388,31 +585,26 @@ class Motor():
         Stops the motor immediately.
         '''
         self._log.info('stop.')
-        if self._orientation is Orientation.PORT:
-            self._tb.SetMotor1(0.0)
-        else:
-            self._tb.SetMotor2(0.0)
-        pass
+        self._drive(0.0, immediate=True)
+
+    # ..........................................................................
+    def halt(self):
+        '''
+        Quickly (but not immediately) stops. If using a RampEngine this
+        returns the Ramp.
+        '''
+        self._log.info('halting...')
+        # set slew fast, then decelerate to zero
+        return self.accelerate(0.0, SlewRate.FAST, -1)
 
-#    # ..........................................................................
-#    def halt(self):
-#        '''
-#        Quickly (but not immediately) stops.
-#        '''
-#        self._log.info('halting...')
-#        # set slew slow, then decelerate to zero
-#        self.accelerate(0.0, SlewRate.FAST, -1)
-#        self._log.debug('halted.')
-#
     # ..........................................................................
     def brake(self):
         '''
-        Slowly coasts to a stop.
+        Slowly coasts to a stop. If using a RampEngine this returns the Ramp.
         '''
         self._log.info('braking...')
         # set slew slow, then decelerate to zero
-        self.accelerate(0.0, SlewRate.SLOWER, -1)
-        self._log.debug('braked.')
+        return self.accelerate(0.0, SlewRate.SLOWER, -1)
 
 #    # ..........................................................................
 #    def ahead(self, speed):
@@ -462,9 +654,19 @@ class Motor():
         This takes into account the maximum power to be supplied to the
         motor based on the battery and motor voltages.
 
-        If steps > 0 then run until the number of steps has been reached.
+        If steps > 0 then run until the number of steps has been reached,
+        leaving the motor at the speed.
+
+        If a RampEngine has been set this returns immediately with the Ramp,
+        which is advanced on each control tick and may be waited upon (or
+        awaited), completing once the speed (and any steps) are reached;
+        otherwise this blocks until then. In either case the ramp is
+        cancelled by interrupt().
         '''
+        if self._ramp_engine:
+            return self._ramp_engine.start(self, speed, slew_rate, steps)
         self._interrupt = False
+        _from_steps = self.steps
         _current_power_level = self.get_current_power_level()
         if _current_power_level is None:
             raise RuntimeError('cannot continue: unable to read current power from motor.')
@@ -477,6 +679,7 @@ class Motor():
 
         if _current_power_level == _desired_div_100: # no change
             self._log.warning('already at acceleration power of {:>5.2f}, exiting.'.format(_current_power_level) )
+            self._run_steps(_from_steps, steps)
             return
         elif _current_power_level < _desired_div_100: # moving ahead
             _slew_rate_ratio = slew_rate.ratio
@@ -492,15 +695,22 @@ class Motor():
             if self._interrupt:
                 break
             time.sleep(self._accel_loop_delay_sec)
+        self._run_steps(_from_steps, steps)
 
         # be sure we're powered off
         if speed == 0.0 and abs(driving_power_level) > 0.00001:
             self._log.warning('non-zero power level: {:7.5f}v; stopping completely...'.format(driving_power_level))
-            if self._orientation is Orientation.PORT:
-                self._tb.SetMotor1(0.0)
-            else:
-                self._tb.SetMotor2(0.0)
+            self._drive(0.0, immediate=True)
 
         self._log.debug('accelerate complete.')
 
+    # ..........................................................................
+    def _run_steps(self, from_steps, steps):
+        '''
+        If steps > 0, blocks until the motor has run that number of steps
+        since the step count was from_steps, or until interrupted.
+        '''
+        while steps > 0 and not self._interrupt and abs(self.steps - from_steps) < steps:
+            time.sleep(self._accel_loop_delay_sec)
+
 #EOF
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-27
+# modified: 2021-04-27
+#
+# Collects the port and starboard motor commands for a control tick and
+# writes them to the ThunderBorg together.
+#
+
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+from lib.timing import now_ns, elapsed_sec
+
+# ..............................................................................
+class MotorCommandStage(object):
+    '''
+    A command stage between the two Motors and the ThunderBorg. Rather than
+    each motor writing its power as soon as it is set, each writes into this
+    stage, which is flushed once per control tick (e.g., by the
+    PIDMotorController after both PID controllers have stepped).
+
+    When flushed, if the port and starboard values are equal (within the
+    configured epsilon) a single SetMotors transaction is issued; otherwise
+    the two values are sent back-to-back. In either case a side whose value
+    is within epsilon of its last written value is not rewritten.
+
+    The number of set requests (i.e., what would have been written without
+    the stage) and the number of actual I2C transactions are counted.
+
+    :param config:   the application configuration
+    :param tb:       the ThunderBorg motor controller
+    :param lock:     the lock serialising access to the ThunderBorg
+    :param level:    the log level
+    '''
+    def __init__(self, config, tb, lock, level=Level.INFO):
+        self._log = Logger('cmd-stage', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if tb is None:
+            raise ValueError('null thunderborg argument.')
+        self._tb = tb
+        if lock is None:
+            raise ValueError('null lock argument.')
+        self._lock = lock
+        _config = config['ros'].get('motors')
+        self._epsilon = _config.get('command_epsilon')
+        self._log.info('command epsilon: {:>6.4f}'.format(self._epsilon))
+        self._pending_port = None
+        self._pending_stbd = None
+        self._last_port    = None
+        self._last_stbd    = None
+        self._requests     = 0
+        self._transactions = 0
+        self._start_ns     = now_ns()
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def set(self, orientation, power):
+        '''
+        Sets the pending driving power for the motor of the given orientation,
+        to be written upon the next flush().
+        '''
+        if orientation is Orientation.PORT:
+            self._pending_port = power
+        else:
+            self._pending_stbd = power
+        self._requests += 1
+
+    # ..........................................................................
+    def is_pending(self, orientation):
+        '''
+        Returns True if a value set for the given orientation has yet to be flushed.
+        '''
+        if orientation is Orientation.PORT:
+            return self._pending_port is not None
+        else:
+            return self._pending_stbd is not None
+
+    # ..........................................................................
+    def invalidate(self, orientation):
+        '''
+        Forgets the last written value for the given orientation, so that
+        its next value is written regardless, e.g., when the motor power
+        has been found to differ from what was last written.
+        '''
+        if orientation is Orientation.PORT:
+            self._last_port = None
+        else:
+            self._last_stbd = None
+
+    # ..........................................................................
+    def _changed(self, pending, last):
+        return pending is not None and ( last is None or abs(pending - last) > self._epsilon )
+
+    # ..........................................................................
+    def flush(self):
+        '''
+        Writes any pending changes to the ThunderBorg.
+        '''
+        with self._lock:
+            _port = self._pending_port
+            _stbd = self._pending_stbd
+            self._pending_port = None
+            self._pending_stbd = None
+            _port_changed = self._changed(_port, self._last_port)
+            _stbd_changed = self._changed(_stbd, self._last_stbd)
+            if not _port_changed and not _stbd_changed:
+                return
+            # the target of an unchanged side is its last value
+            _port_target = _port if _port_changed else self._last_port
+            _stbd_target = _stbd if _stbd_changed else self._last_stbd
+            if _port_target is not None and _stbd_target is not None \
+                    and abs(_port_target - _stbd_target) <= self._epsilon:
+                self._tb.SetMotors(_port_target)
+                self._last_port = _port_target
+                self._last_stbd = _port_target
+                self._transactions += 1
+            else:
+                if _port_changed:
+                    self._tb.SetMotor1(_port)
+                    self._last_port = _port
+                    self._transactions += 1
+                if _stbd_changed:
+                    self._tb.SetMotor2(_stbd)
+                    self._last_stbd = _stbd
+                    self._transactions += 1
+
+    # ..........................................................................
+    @property
+    def stats(self):
+        '''
+        Returns a tuple of: set requests per second and I2C transactions
+        per second, since creation or the last reset.
+        '''
+        _elapsed_sec = elapsed_sec(self._start_ns)
+        if _elapsed_sec <= 0.0:
+            return 0.0, 0.0
+        return self._requests / _elapsed_sec, self._transactions / _elapsed_sec
+
+    # ..........................................................................
+    def reset_stats(self):
+        self._requests     = 0
+        self._transactions = 0
+        self._start_ns     = now_ns()
+
+    # ..........................................................................
+    def print_stats(self):
+        _requests_per_sec, _transactions_per_sec = self.stats
+        self._log.info('motor writes: {:7.1f}/sec requested; '.format(_requests_per_sec) \
+                + Fore.GREEN + '{:7.1f}/sec I2C transactions.'.format(_transactions_per_sec))
+
+#EOF
@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-01-18
-# modified: 2021-02-08
+# modified: 2021-05-15
 #
 # To start pigpiod:
 #
@@ -23,7 +23,6 @@
 #
 
 import sys, time, traceback
-from threading import Thread
 from fractions import Fraction
 from colorama import init, Fore, Style
 init()
@@ -38,13 +37,18 @@ from lib.logger import Logger, Level
 from lib.event import Event
 from lib.enums import Direction, Orientation
 from lib.slew import SlewRate
+from lib.motor_command import MotorCommandStage
+from lib.ramp import RampEngine
 
 # ..............................................................................
 class Motors():
     '''
     A dual motor controller with encoders.
+
+    The optional pi argument provides the pigpio pi (e.g., a MockPi when
+    running against a simulated plant), otherwise one is created.
     '''
-    def __init__(self, config, ticker, tb, level):
+    def __init__(self, config, ticker, tb, level, pi=None):
         super().__init__()
         self._log = Logger('motors', level)
         self._log.info('initialising motors...')
@@ -61,14 +65,14 @@ class Motors():
         self._set_max_power_ratio()
         # config pigpio's pi and name its callback thread (ex-API)
         try:
-            self._pi = pigpio.pi()
+            self._pi = pi if pi else pigpio.pi()
             if self._pi is None:
                 raise Exception('unable to instantiate pigpio.pi().')
             elif self._pi._notify is None:
                 raise Exception('can\'t connect to pigpio daemon; did you start it?')
             self._pi._notify.name = 'pi.callback'
             self._log.info('pigpio version {}'.format(self._pi.get_pigpio_version()))
-            from lib.motor import Motor
+            from lib.motor import Motor, TB_LOCK
             self._log.info('imported Motor.')
         except Exception as e:
             self._log.error('error importing and/or configuring Motor: {}'.format(e))
@@ -78,6 +82,12 @@ class Motors():
         self._port_motor.set_max_power_ratio(self._max_power_ratio)
         self._stbd_motor = Motor(config, self._ticker, self._tb, self._pi, Orientation.STBD, level)
         self._stbd_motor.set_max_power_ratio(self._max_power_ratio)
+        self._stage = MotorCommandStage(config, self._tb, TB_LOCK, level)
+        # ramps of both motors are advanced together on the ticker
+        self._ramp_engine = RampEngine(config, self._ticker, self.flush, level)
+        self._port_motor.set_ramp_engine(self._ramp_engine)
+        self._stbd_motor.set_ramp_engine(self._ramp_engine)
+        self._halt_timeout_sec = config['ros'].get('motors').get('halt_timeout_sec')
         self._closed  = False
         self._enabled = False # used to be enabled by default
         # a dictionary of motor # to last set value
@@ -163,6 +173,59 @@ class Motors():
         else:
             return self._stbd_motor
 
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the time source of both motors' velocity calculation.
+        '''
+        self._port_motor.set_time_source(now_ns)
+        self._stbd_motor.set_time_source(now_ns)
+
+    # ..........................................................................
+    @property
+    def command_stage(self):
+        return self._stage
+
+    # ..........................................................................
+    def set_coalesce(self, enable):
+        '''
+        If True, the power of both motors is written via the command stage,
+        which must then be flushed once per control tick (see flush()).
+        If False (the default), each motor writes its power immediately.
+        '''
+        if enable:
+            self._stage.reset_stats()
+            self._port_motor.set_command_stage(self._stage)
+            self._stbd_motor.set_command_stage(self._stage)
+        else:
+            self._port_motor.set_command_stage(None)
+            self._stbd_motor.set_command_stage(None)
+            self._stage.flush()
+        self._log.info('coalesced motor commands: {}'.format(enable))
+
+    # ..........................................................................
+    def flush(self):
+        '''
+        Writes the pending port and starboard motor power from the command
+        stage to the ThunderBorg.
+        '''
+        self._stage.flush()
+
+    # ..........................................................................
+    @property
+    def ramp_engine(self):
+        return self._ramp_engine
+
+    # ..........................................................................
+    def accelerate(self, port_speed, stbd_speed, slew_rate):
+        '''
+        Ramps both motors to their speeds (-100 to 100) at the slew rate,
+        both reaching their speed on the same tick. This returns immediately
+        with the port and starboard Ramps, which may be waited upon (or
+        awaited). The ramps are cancelled by interrupt().
+        '''
+        return self._ramp_engine.start_pair(self._port_motor, port_speed, self._stbd_motor, stbd_speed, slew_rate)
+
     # ..........................................................................
     def is_in_motion(self):
         '''
@@ -183,9 +246,9 @@ class Motors():
         Returns the last set power of the specified motor.
         '''
         if orientation is Orientation.PORT:
-            return self._port_motor.get_current_power_level()
+            return self._port_motor.current_power
         else:
-            return self._stbd_motor.get_current_power_level()
+            return self._stbd_motor.current_power
 
     # ..........................................................................
     def interrupt(self):
@@ -198,33 +261,29 @@ class Motors():
     # ..........................................................................
     def halt(self):
         '''
-        Quickly (but not immediately) stops both motors.
+        Quickly (but not immediately) stops both motors. This returns
+        immediately; to wait upon the stop use accelerate(0.0, 0.0,
+        SlewRate.FAST), which returns the Ramps.
         '''
-        self._log.info('halting...')
-        if self.is_stopped():
-            _tp = Thread(name='halt-port', target=self.processStop, args=(Event.HALT, Orientation.PORT))
-            _ts = Thread(name='hapt-stbd', target=self.processStop, args=(Event.HALT, Orientation.STBD))
-            _tp.start()
-            _ts.start()
+        if not self.is_stopped():
+            self._log.info('halting...')
+            self.accelerate(0.0, 0.0, SlewRate.FAST)
         else:
             self._log.debug('already stopped.')
-        self._log.info('halted.')
         return True
 
     # ..........................................................................
     def brake(self):
         '''
-        Slowly coasts both motors to a stop.
+        Slowly coasts both motors to a stop. This returns immediately; to
+        wait upon the stop use accelerate(0.0, 0.0, SlewRate.SLOWER), which
+        returns the Ramps.
         '''
-        self._log.info('braking...')
-        if self.is_stopped():
-            _tp = Thread(name='brake-port', target=self.processStop, args=(Event.BRAKE, Orientation.PORT))
-            _ts = Thread(name='brake-stbd', target=self.processStop, args=(Event.BRAKE, Orientation.STBD))
-            _tp.start()
-            _ts.start()
+        if not self.is_stopped():
+            self._log.info('braking...')
+            self.accelerate(0.0, 0.0, SlewRate.SLOWER)
         else:
             self._log.warning('already stopped.')
-        self._log.info('braked.')
         return True
 
     # ..........................................................................
@@ -277,8 +336,8 @@ class Motors():
         '''
         Returns the last set power values.
         '''
-        _port_power = self._port_motor.get_current_power_level()
-        _stbd_power = self._stbd_motor.get_current_power_level()
+        _port_power = self._port_motor.current_power
+        _stbd_power = self._stbd_motor.current_power
         return [ _port_power, _stbd_power ]
 
     # ..........................................................................
@@ -303,20 +362,27 @@ class Motors():
         if not self._stbd_motor.enabled:
             self._stbd_motor.enable()
         self._ticker.enable()
+        self._ramp_engine.enable()
         self._enabled = True
         self._log.info('enabled.')
 
     # ..........................................................................
     def disable(self):
         '''
-        Disable the motors, halting first if in motion.
+        Disable the motors, halting first if in motion, waiting up to the
+        configured halt_timeout_sec for the halt to complete.
         '''
         if self._enabled:
             self._log.info('disabling...')
             self._enabled = False
-            if self.is_in_motion(): # if we're moving then halt
+            if not self.is_stopped(): # if we're moving then halt
                 self._log.warning('event: motors are in motion (halting).')
-                self.halt()
+                _port_ramp, _stbd_ramp = self.accelerate(0.0, 0.0, SlewRate.FAST)
+                _deadline = time.monotonic() + self._halt_timeout_sec
+                if not ( _port_ramp.wait(self._halt_timeout_sec)
+                        and _stbd_ramp.wait(max(0.0, _deadline - time.monotonic())) ):
+                    self._log.warning('halt incomplete: cutting motor power.')
+            self._ramp_engine.disable()
             self._port_motor.disable()
             self._stbd_motor.disable()
             self._log.info('disabling pigpio...')
@@ -336,6 +402,8 @@ class Motors():
             self._log.info('closing...')
             self._port_motor.close()
             self._stbd_motor.close()
+            self._ramp_engine.close()
+            self._stage.print_stats()
             self._closed = True
             self._log.info('closed.')
         else:
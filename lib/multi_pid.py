@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-28
+# modified: 2021-04-29
+#
+# An N-channel PID controller, computing the outputs of all channels (e.g.,
+# the port and starboard motors) in a single step.
+#
+
+import time, math
+from array import array
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.timing import NS_PER_SEC
+
+# ..............................................................................
+class MultiPID(object):
+    '''
+    An N-channel equivalent of the PID class, whose gains and state are held
+    in flat array buffers, one element per channel, and whose outputs for all
+    channels are computed in a single call. All channels share the same
+    sample time and output limits.
+
+    The algorithm is identical to that of PID (i.e., derivative on measurement,
+    with the integral term clamped to the output limits to avoid windup), such
+    that given the same inputs each channel's output is numerically identical
+    to that of a separate PID. Unlike PID, nothing is logged when called.
+
+    For a small number of channels a plain loop over array buffers is
+    considerably faster than NumPy, whose per-operation overhead dominates
+    for arrays of two elements.
+
+    :param label:       a label for logging
+    :param channels:    the number of channels
+    :param kp:          proportional gain constant, applied to all channels
+    :param ki:          integral gain constant, applied to all channels
+    :param kd:          derivative gain constant, applied to all channels
+    :param min_output:  minimum output limit, None for no limit
+    :param max_output:  maximum output limit, None for no limit
+    :param sample_time: sample time, used as a limit to determine if called too soon
+    :param level:       log level
+    '''
+    def __init__(self,
+                 label,
+                 channels,
+                 kp,
+                 ki,
+                 kd,
+                 min_output,
+                 max_output,
+                 sample_time=0.01,
+                 level=Level.INFO):
+        self._log = Logger('mpid:{}'.format(label), level)
+        if channels < 1:
+            raise ValueError('expected at least one channel.')
+        self._channels     = channels
+        self._range        = range(channels)
+        self._kp           = array('d', [kp] * channels)
+        self._ki           = array('d', [ki] * channels)
+        self._kd           = array('d', [kd] * channels)
+        self._setpoint     = array('d', [0.0] * channels)
+        self._proportional = array('d', [0.0] * channels)
+        self._integral     = array('d', [0.0] * channels)
+        self._derivative   = array('d', [0.0] * channels)
+        self._last_input   = array('d', [0.0] * channels)
+        self._output       = array('d', [0.0] * channels)
+        self._limit        = None
+        self._min_output   = -math.inf if min_output is None else min_output
+        self._max_output   = math.inf  if max_output is None else max_output
+        if sample_time is None:
+            raise Exception('no sample time argument provided')
+        self._sample_time  = sample_time
+        self._current_time = time.monotonic
+        self._log.info('{:d} channels; kp:{:7.4f}; ki:{:7.4f}; kd:{:7.4f};\tmin={}; max={}; sample time: {:7.4f} sec'.format(
+                channels, kp, ki, kd, min_output, max_output, sample_time))
+        self.reset()
+        self._log.info('ready.')
+
+    # ..........................................................................
+    @property
+    def channels(self):
+        return self._channels
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds (see PID).
+        '''
+        self._current_time = lambda: now_ns() / NS_PER_SEC
+        self._last_time    = self._current_time()
+
+    # ..........................................................................
+    def set_constants(self, channel, kp, ki, kd):
+        '''
+        Sets the P-, I- and D- gain constants for the given channel.
+        '''
+        self._kp[channel] = kp
+        self._ki[channel] = ki
+        self._kd[channel] = kd
+
+    # ..........................................................................
+    def constants(self, channel):
+        '''
+        The P-, I- and D- gain constants of the given channel, as a tuple.
+        '''
+        return self._kp[channel], self._ki[channel], self._kd[channel]
+
+    # ..........................................................................
+    def components(self, channel):
+        '''
+        The P-, I- and D-terms of the given channel from the last computation.
+        '''
+        return self._proportional[channel], self._integral[channel], self._derivative[channel]
+
+    # ..........................................................................
+    def get_setpoint(self, channel):
+        return self._setpoint[channel]
+
+    def set_setpoint(self, channel, setpoint):
+        '''
+        Sets the setpoint of the given channel. If a setpoint limit has been
+        set and the argument exceeds the limit, the value is set to the limit.
+        '''
+        if self._limit:
+            if setpoint > self._limit:
+                setpoint = self._limit
+            elif setpoint < -1.0 * self._limit:
+                setpoint = -1.0 * self._limit
+        self._setpoint[channel] = setpoint
+
+    # ..........................................................................
+    def set_limit(self, limit):
+        '''
+        Sets the setpoint limit for all channels. Set to None (the default)
+        to disable this feature.
+        '''
+        self._limit = limit
+
+    # ..........................................................................
+    @property
+    def sample_time(self):
+        return self._sample_time
+
+    # ..........................................................................
+    def __call__(self, targets, dt=None):
+        '''
+        Calculates and returns the control output of all channels, as an
+        array, if sample_time seconds have passed since the last update.
+        If not, the previous outputs are returned.
+
+        The returned array is reused by subsequent calls.
+
+        :param targets: a sequence of the target values, one per channel
+        :param dt:      If set, uses this value for timestep instead of real time.
+        '''
+        _now = self._current_time()
+        if dt is None:
+            dt = _now - self._last_time
+        elif dt <= 0:
+            raise ValueError("dt has nonpositive value {}. Must be positive.".format(dt))
+        if dt < self._sample_time and not math.isclose(dt, self._sample_time):
+            return self._output
+        _min = self._min_output
+        _max = self._max_output
+        for i in self._range:
+            _target = targets[i]
+            _error = self._setpoint[i] - _target
+            _proportional = self._kp[i] * _error
+            _integral = self._integral[i] + self._ki[i] * _error * dt
+            _integral = max(_min, min(_integral, _max)) # avoid integral windup
+            _derivative = -self._kd[i] * ( _target - self._last_input[i] ) / dt
+            self._proportional[i] = _proportional
+            self._integral[i]     = _integral
+            self._derivative[i]   = _derivative
+            self._output[i]       = max(_min, min(_proportional + _integral + _derivative, _max))
+            self._last_input[i]   = _target
+        self._last_time = _now
+        return self._output
+
+    # ..........................................................................
+    def reset(self, channel=None):
+        '''
+        Resets the internal state of the given channel, or all channels if
+        None. The setpoints are not altered.
+        '''
+        for i in ( self._range if channel is None else ( channel, ) ):
+            self._proportional[i] = 0.0
+            self._integral[i]     = 0.0
+            self._derivative[i]   = 0.0
+            self._last_input[i]   = 0.0
+            self._output[i]       = 0.0
+        self._last_time = self._current_time()
+
+#EOF
@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-03-27
-# modified: 2020-03-27
+# modified: 2021-05-15
 #
 #  Beginnings of a possible replacement for the BNO055 as the source of
 #  heading information for the Compass class, instead using the Adafruit
@@ -131,6 +131,7 @@ class NXP9DoF:
         self._log.info('gyroscope ready.')
 
         self._thread  = None
+        self._heartbeat = None
         self._enabled = False
         self._closed  = False
         self._heading = None
@@ -139,6 +140,14 @@ class NXP9DoF:
         self._is_calibrated = False
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the sensor read loop with the Watchdog. The loop reads
+        the sensor every half second.
+        '''
+        self._heartbeat = watchdog.register('nxp9dof', 0.5)
+
     # ..........................................................................
     def get_imu(self):
         return self._imu
@@ -179,6 +188,17 @@ class NXP9DoF:
     def is_calibrated(self):
         return self._is_calibrated
 
+    # ..........................................................................
+    def read_orientation(self):
+        '''
+        Reads the accelerometer and magnetometer once, returning a tuple of
+        the heading (0-360°), pitch and roll (degrees), no quaternion, and
+        whether calibrated, as read by an ImuReader.
+        '''
+        _accel, _mag, _gyro = self._imu.get()
+        _roll, _pitch, _heading = self._imu.getOrientation(_accel, _mag)
+        return ( Convert.to_degrees(_heading) % 360.0, _pitch, _roll, None, self._is_calibrated )
+
     # ..........................................................................
     @staticmethod
     def _in_range(p, q):
@@ -330,6 +350,8 @@ class NXP9DoF:
                 print(Fore.CYAN + "| {:17} | {:20} | {:20} | {:21} |".format("Accels [g's]", " Magnet [uT]", "Gyros [dps]", "Roll, Pitch, Heading") + Style.RESET_ALL)
                 print(Fore.CYAN + ('-'*header) + Style.RESET_ALL)
                 for _ in range(10):
+                    if self._heartbeat:
+                        self._heartbeat.beat()
                     a, m, g = self._imu.get()
                     r, p, h = self._imu.getOrientation(a, m)
                     deg = Convert.to_degrees(h)
@@ -356,9 +378,13 @@ class NXP9DoF:
                 rate.wait()
             else:
                 self._log.info('disabled loop.')
+                if self._heartbeat:
+                    self._heartbeat.release()
                 time.sleep(10)
             count += 1
 
+        if self._heartbeat:
+            self._heartbeat.release()
         self._log.debug('read loop ended.')
 
     # ..........................................................................
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-13
+# modified: 2021-05-13
+#
+# A local occupancy grid centred upon the robot, fusing the range readings of
+# the Lidar, ultrasonic scanner and IFS infrared sensors.
+#
+
+import math
+import numpy
+from threading import Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.timing import now_ns, NS_PER_SEC
+
+# ..............................................................................
+def _logit(p):
+    return math.log(p / ( 1.0 - p ))
+
+# ..............................................................................
+class OccupancyGrid(object):
+    '''
+    A square grid of cells around the robot, each holding the log-odds of
+    its being occupied, updated from range readings with an inverse sensor
+    model: the cells along a ray short of its range become more likely to
+    be free, the cell at its range more likely to be occupied (unless the
+    reading is at the sensor's maximum range). Each batch of readings is
+    integrated with vectorised NumPy operations, each cell being updated
+    at most once per batch.
+
+    The grid is aligned with the odometry frame and kept centred upon the
+    robot by shifting its contents by whole cells as the robot moves, so
+    that turning requires no resampling. On each tick of the clock the pose
+    is taken from the Odometry and the evidence of every cell decays
+    towards unknown with the configured half-life, so that stale readings
+    (e.g., of something that has since moved) are forgotten.
+
+    Bearings are in degrees relative to the robot's heading, as with the
+    Lidar: 0° straight ahead, negative to port, positive to starboard.
+    Ranges are in centimeters.
+
+    Queries of the nearest obstacle by bearing use a polar index of every
+    cell's range and bearing from the centre, precomputed upon creation,
+    from which the nearest occupied range of each sector is computed once
+    after the grid changes; each query is then a table lookup.
+
+    This uses the ros:occupancy: section of the configuration.
+
+    :param config:    the application configuration
+    :param clock:     the optional Ticker or VirtualClock providing the tick
+    :param odometry:  the optional Odometry providing the pose upon each tick
+    :param level:     the log level
+    '''
+    def __init__(self, config, clock=None, odometry=None, level=Level.INFO):
+        self._log = Logger('occupancy', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('occupancy')
+        self._size          = _config.get('size')
+        self._resolution    = _config.get('resolution_cm')
+        self._l_occupied    = _logit(_config.get('p_occupied'))
+        self._l_free        = _logit(_config.get('p_free'))
+        self._l_threshold   = _logit(_config.get('occupied_threshold'))
+        self._l_min         = _config.get('logodds_min')
+        self._l_max         = _config.get('logodds_max')
+        self._half_life_sec = _config.get('half_life_sec')
+        self._sector_deg    = _config.get('sector_deg')
+        self._sectors       = int(round(360.0 / self._sector_deg))
+        self._ifs_bearings  = numpy.array(_config.get('ifs_bearings'), dtype=numpy.float64)
+        self._ifs_max_range = _config.get('ifs_max_range_cm')
+        self._centre        = self._size // 2
+        self._grid          = numpy.zeros(( self._size, self._size ))
+        self._scratch       = numpy.zeros(( self._size, self._size ))
+        # the polar index: the range (cm) and sector of each cell from the centre
+        _offsets = ( numpy.arange(self._size) - self._centre ) * self._resolution
+        _dx, _dy = numpy.meshgrid(_offsets, _offsets) # rows are y, columns x
+        self._cell_range  = numpy.hypot(_dx, _dy).ravel()
+        self._cell_sector = ( numpy.degrees(numpy.arctan2(_dy, _dx)).ravel() % 360.0 // self._sector_deg ).astype(numpy.intp) % self._sectors
+        self._nearest     = numpy.full(self._sectors, numpy.inf)
+        self._dirty       = False
+        # the position of the centre cell and the pose in the odometry frame
+        self._cx = self._cy = 0.0
+        self._x = self._y = self._theta = 0.0
+        self._odometry  = odometry
+        self._now_ns    = now_ns
+        self._last_ns   = None
+        self._lock      = Lock()
+        self._enabled   = False
+        self._closed    = False
+        if clock:
+            clock.add_callback(self.tick)
+        self._log.info('ready: {:d}x{:d} cells of {:3.1f}cm; {:d} sectors of {:3.1f}°; half-life {:3.1f}sec.'.format(
+                self._size, self._size, self._resolution, self._sectors, self._sector_deg, self._half_life_sec))
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds, used
+        to decay the grid upon each tick.
+        '''
+        self._now_ns = now_ns
+
+    # ..........................................................................
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def resolution(self):
+        return self._resolution
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Moves the grid to the latest pose of the Odometry and decays it by
+        the time elapsed since the previous tick.
+        '''
+        if self._enabled:
+            _now_ns = self._now_ns()
+            if self._odometry:
+                _pose = self._odometry.pose
+                self.set_pose(_pose.x, _pose.y, _pose.theta)
+            if self._last_ns is not None:
+                self.decay(( _now_ns - self._last_ns ) / NS_PER_SEC)
+            self._last_ns = _now_ns
+
+    # ..........................................................................
+    def set_pose(self, x, y, theta):
+        '''
+        Sets the pose of the robot in the odometry frame, shifting the grid
+        by whole cells to keep it centred upon the robot.
+        '''
+        with self._lock:
+            self._x, self._y, self._theta = x, y, theta
+            _dc = int(round(( x - self._cx ) / self._resolution))
+            _dr = int(round(( y - self._cy ) / self._resolution))
+            if _dc or _dr:
+                self._shift(_dr, _dc)
+                self._cx += _dc * self._resolution
+                self._cy += _dr * self._resolution
+
+    # ..........................................................................
+    def _shift(self, dr, dc):
+        '''
+        Shifts the contents of the grid by the rows and columns the centre
+        has moved, cells shifted in being unknown.
+        '''
+        _n = self._size
+        self._scratch.fill(0.0)
+        if abs(dr) < _n and abs(dc) < _n:
+            self._scratch[max(-dr, 0):_n - max(dr, 0), max(-dc, 0):_n - max(dc, 0)] = \
+                    self._grid[max(dr, 0):_n - max(-dr, 0), max(dc, 0):_n - max(-dc, 0)]
+        self._grid, self._scratch = self._scratch, self._grid
+        self._dirty = True
+
+    # ..........................................................................
+    def decay(self, elapsed_sec):
+        '''
+        Decays the evidence of every cell towards unknown over the elapsed
+        time.
+        '''
+        if elapsed_sec > 0.0:
+            with self._lock:
+                self._grid *= 0.5 ** ( elapsed_sec / self._half_life_sec )
+                self._dirty = True
+
+    # ..........................................................................
+    def integrate(self, bearings_deg, ranges_cm, max_range_cm, origins_cm=None):
+        '''
+        Integrates a batch of range readings, each a bearing (degrees) and
+        range (cm), which may be scalars or sequences. A range of None or
+        at least max_range_cm is taken to have seen nothing within it. The
+        optional origins are the (x forward, y to port) positions of the
+        sensors relative to the robot (cm).
+        '''
+        _bearings = numpy.atleast_1d(numpy.asarray(bearings_deg, dtype=numpy.float64))
+        _ranges = numpy.atleast_1d(numpy.asarray(ranges_cm, dtype=numpy.float64))
+        _ranges = numpy.where(numpy.isnan(_ranges), max_range_cm, numpy.minimum(_ranges, max_range_cm))
+        _hits = _ranges < max_range_cm
+        _res = self._resolution
+        _n = self._size
+        with self._lock:
+            _angles = self._theta - numpy.radians(_bearings)
+            _cos, _sin = numpy.cos(_angles), numpy.sin(_angles)
+            # the origin of each ray in cells from the centre
+            _ox = numpy.full(len(_bearings), ( self._x - self._cx ) / _res)
+            _oy = numpy.full(len(_bearings), ( self._y - self._cy ) / _res)
+            if origins_cm is not None:
+                _origins = numpy.asarray(origins_cm, dtype=numpy.float64).reshape(-1, 2)
+                _ct, _st = math.cos(self._theta), math.sin(self._theta)
+                _ox += ( _origins[:,0] * _ct - _origins[:,1] * _st ) / _res
+                _oy += ( _origins[:,0] * _st + _origins[:,1] * _ct ) / _res
+            # free: samples every half cell along each ray short of its range
+            _steps = numpy.arange(0.0, max_range_cm / _res, 0.5)
+            _free = _steps[None,:] < ( _ranges / _res - 0.5 )[:,None]
+            _cols = numpy.rint(_ox[:,None] + _steps[None,:] * _cos[:,None]).astype(numpy.intp) + self._centre
+            _rows = numpy.rint(_oy[:,None] + _steps[None,:] * _sin[:,None]).astype(numpy.intp) + self._centre
+            _free &= ( _cols >= 0 ) & ( _cols < _n ) & ( _rows >= 0 ) & ( _rows < _n )
+            _free_cells = numpy.unique(_rows[_free] * _n + _cols[_free])
+            # occupied: the cell at the range of each hit
+            _cols = numpy.rint(_ox + _ranges / _res * _cos).astype(numpy.intp) + self._centre
+            _rows = numpy.rint(_oy + _ranges / _res * _sin).astype(numpy.intp) + self._centre
+            _hits &= ( _cols >= 0 ) & ( _cols < _n ) & ( _rows >= 0 ) & ( _rows < _n )
+            _occupied_cells = numpy.unique(_rows[_hits] * _n + _cols[_hits])
+            _free_cells = numpy.setdiff1d(_free_cells, _occupied_cells, assume_unique=True)
+            _flat = self._grid.reshape(-1)
+            _flat[_free_cells] = numpy.maximum(_flat[_free_cells] + self._l_free, self._l_min)
+            _flat[_occupied_cells] = numpy.minimum(_flat[_occupied_cells] + self._l_occupied, self._l_max)
+            self._dirty = True
+
+    # ..........................................................................
+    def integrate_scan(self, scan, max_range_cm):
+        '''
+        Integrates a sweep of the Lidar, an array of (angle, range mm) rows.
+        '''
+        _scan = numpy.asarray(scan, dtype=numpy.float64).reshape(-1, 2)
+        self.integrate(_scan[:,0], _scan[:,1] / 10.0, max_range_cm)
+
+    # ..........................................................................
+    def integrate_ifs(self, distances_cm):
+        '''
+        Integrates the distances (cm) of the five IFS infrared sensors, in
+        the order port side, port, center, starboard, starboard side, a
+        distance of None being beyond range.
+        '''
+        _ranges = [ numpy.nan if _cm is None else _cm for _cm in distances_cm ]
+        self.integrate(self._ifs_bearings, _ranges, self._ifs_max_range)
+
+    # ..........................................................................
+    def _update_nearest(self):
+        '''
+        Recomputes the range of the nearest occupied cell of each sector,
+        from the polar index.
+        '''
+        _occupied = self._grid.reshape(-1) > self._l_threshold
+        self._nearest.fill(numpy.inf)
+        numpy.minimum.at(self._nearest, self._cell_sector[_occupied], self._cell_range[_occupied])
+        self._dirty = False
+
+    # ..........................................................................
+    def nearest(self, bearing_deg, width_deg=None):
+        '''
+        Returns the range (cm) of the nearest occupied cell within width_deg
+        (by default one sector) centred upon the bearing, or None if there
+        is none.
+        '''
+        with self._lock:
+            if self._dirty:
+                self._update_nearest()
+            _world_deg = math.degrees(self._theta) - bearing_deg
+            if width_deg is None:
+                _range = self._nearest[int(_world_deg % 360.0 // self._sector_deg) % self._sectors]
+            else:
+                _first = int(math.floor(( _world_deg - width_deg / 2.0 ) / self._sector_deg))
+                _last  = int(math.floor(( _world_deg + width_deg / 2.0 ) / self._sector_deg))
+                _range = self._nearest.take(range(_first, _last + 1), mode='wrap').min()
+        return None if math.isinf(_range) else float(_range)
+
+    # ..........................................................................
+    def get_probabilities(self):
+        '''
+        Returns a copy of the grid as the probability of each cell being
+        occupied, rows being y and columns x of the odometry frame.
+        '''
+        with self._lock:
+            return 1.0 - 1.0 / ( 1.0 + numpy.exp(self._grid) )
+
+    # ..........................................................................
+    def is_occupied(self, x_cm, y_cm):
+        '''
+        Returns True if the cell at the position (x forward, y to port)
+        relative to the robot is occupied. Positions off the grid are not.
+        '''
+        with self._lock:
+            _ct, _st = math.cos(self._theta), math.sin(self._theta)
+            _col = self._centre + int(round(( self._x - self._cx + x_cm * _ct - y_cm * _st ) / self._resolution))
+            _row = self._centre + int(round(( self._y - self._cy + x_cm * _st + y_cm * _ct ) / self._resolution))
+            if 0 <= _col < self._size and 0 <= _row < self._size:
+                return bool(self._grid[_row, _col] > self._l_threshold)
+            return False
+
+    # ..........................................................................
+    def clear(self):
+        with self._lock:
+            self._grid.fill(0.0)
+            self._dirty = True
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            self._last_ns = None
+            self._enabled = True
+            self._log.info('enabled.')
+        else:
+            self._log.warning('cannot enable: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            self._log.info('disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if self._enabled:
+            self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
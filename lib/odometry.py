@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-03
+# modified: 2021-05-15
+#
+# Wheel odometry: integrates the encoder steps of both motors into the pose
+# (x, y, θ) of the robot, with an estimate of its covariance.
+#
+
+import math
+import numpy
+from collections import namedtuple, deque
+from threading import Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+from lib.geometry import Geometry
+from lib.timing import now_ns
+
+# ..............................................................................
+class Pose(namedtuple('Pose', 'x y theta covariance distance timestamp')):
+    '''
+    The pose of the robot as of a control tick: its position x, y (cm) and
+    heading theta (radians, counter-clockwise from the x axis, normalised to
+    -π..π) relative to where odometry began, the 3x3 covariance of (x, y,
+    theta) as a tuple of row tuples, the total distance travelled (cm) and
+    the timestamp (ns) of the tick.
+
+    A Pose is immutable, so may be shared freely between threads.
+    '''
+    __slots__ = ()
+
+    @property
+    def heading(self):
+        '''
+        Returns the heading in degrees, 0-360.
+        '''
+        return math.degrees(self.theta) % 360.0
+
+ORIGIN = Pose(0.0, 0.0, 0.0, ( ( 0.0, 0.0, 0.0 ), ( 0.0, 0.0, 0.0 ), ( 0.0, 0.0, 0.0 ) ), 0.0, 0)
+
+# ..............................................................................
+def integrate_steps(port_steps, stbd_steps, steps_per_cm, wheelbase_cm, x=0.0, y=0.0, theta=0.0):
+    '''
+    Re-integrates recorded per-tick step deltas of the port (left) and
+    starboard (right) motors with NumPy, returning arrays of x, y and theta
+    after each tick, using the same exact arc model as Odometry.
+
+    Because the heading is simply the cumulative sum of its increments, the
+    whole log may be integrated without a Python loop, e.g., for offline
+    analysis or to compare alternative calibrations of the geometry.
+    '''
+    _port = numpy.asarray(port_steps, dtype=numpy.float64) / steps_per_cm
+    _stbd = numpy.asarray(stbd_steps, dtype=numpy.float64) / steps_per_cm
+    _distance = ( _port + _stbd ) / 2.0
+    _dtheta = ( _stbd - _port ) / wheelbase_cm
+    _theta = theta + numpy.cumsum(_dtheta)
+    _theta_start = _theta - _dtheta
+    _straight = numpy.abs(_dtheta) < Odometry.STRAIGHT_EPSILON
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        _radius = numpy.where(_straight, 0.0, _distance / _dtheta)
+    _theta_mid = _theta_start + _dtheta / 2.0
+    _dx = numpy.where(_straight, _distance * numpy.cos(_theta_mid), _radius * ( numpy.sin(_theta) - numpy.sin(_theta_start) ))
+    _dy = numpy.where(_straight, _distance * numpy.sin(_theta_mid), -_radius * ( numpy.cos(_theta) - numpy.cos(_theta_start) ))
+    return x + numpy.cumsum(_dx), y + numpy.cumsum(_dy), numpy.arctan2(numpy.sin(_theta), numpy.cos(_theta))
+
+# ..............................................................................
+def load_step_log(filename):
+    '''
+    Returns the timestamps, port and starboard step deltas of a step log
+    saved by Odometry.save_log() as a tuple of arrays.
+    '''
+    _data = numpy.loadtxt(filename, dtype=numpy.int64, ndmin=2)
+    return _data[:,0], _data[:,1], _data[:,2]
+
+# ..............................................................................
+class Odometry(object):
+    '''
+    Wheel odometry for a differential-drive robot.
+
+    On each tick of the clock (a Ticker or VirtualClock) the step count of
+    each motor is read and the deltas since the previous tick integrated
+    into the pose. Over a tick each wheel is assumed to travel at constant
+    velocity, so the robot follows an arc, which is integrated exactly
+    rather than as a straight line. This is a fixed number of arithmetic
+    operations per tick, regardless of speed.
+
+    The covariance is propagated by linearising the arc about its midpoint,
+    with the variance of each wheel's travel proportional to its distance
+    (the wheel_variance configuration).
+
+    After each tick the new Pose is published by replacing the pose property
+    in a single assignment, so that behaviours may read the latest pose at
+    any time without locking or recomputing anything. The most recent step
+    deltas (up to record_limit ticks) may optionally be recorded and saved
+    for offline re-integration with integrate_steps().
+
+    This uses the ros:odometry: section of the configuration.
+
+    :param config:  the application configuration
+    :param clock:   the Ticker or VirtualClock providing the tick
+    :param motors:  the Motors
+    :param level:   the log level
+    '''
+    STRAIGHT_EPSILON = 1e-9 # radians below which an arc is integrated as a line
+
+    def __init__(self, config, clock, motors, level=Level.INFO):
+        self._log = Logger('odometry', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if clock is None:
+            raise ValueError('null clock argument.')
+        if motors is None:
+            raise ValueError('null motors argument.')
+        self._port_motor = motors.get_motor(Orientation.PORT)
+        self._stbd_motor = motors.get_motor(Orientation.STBD)
+        _geometry = Geometry(config, Level.WARN)
+        self._steps_per_cm = _geometry.steps_per_cm
+        self._wheelbase_cm = _geometry.wheelbase / 10.0
+        _config = config['ros'].get('odometry')
+        self._wheel_variance = _config.get('wheel_variance') # cm² per cm travelled
+        self._record = _config.get('record')
+        self._log.info('{:5.2f} steps/cm; wheelbase: {:5.2f}cm; wheel variance: {:6.4f}cm²/cm'.format(
+                self._steps_per_cm, self._wheelbase_cm, self._wheel_variance))
+        self._now_ns     = now_ns
+        self._lock       = Lock()
+        self._log_rows   = deque(maxlen=_config.get('record_limit')) # recorded (timestamp, port, stbd) step deltas
+        self._pose       = ORIGIN
+        self._reset_state()
+        self._enabled    = False
+        self._closed     = False
+        clock.add_callback(self.tick)
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def _reset_state(self):
+        self._x = 0.0
+        self._y = 0.0
+        self._theta = 0.0
+        self._distance = 0.0
+        # covariance, as the upper triangle of the symmetric matrix
+        self._pxx = self._pxy = self._pxt = 0.0
+        self._pyy = self._pyt = self._ptt = 0.0
+        self._port_steps = self._port_motor.steps
+        self._stbd_steps = self._stbd_motor.steps
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds, used
+        to timestamp each pose.
+        '''
+        self._now_ns = now_ns
+
+    # ..........................................................................
+    @property
+    def pose(self):
+        '''
+        Returns the latest Pose.
+        '''
+        return self._pose
+
+    # ..........................................................................
+    def reset(self):
+        '''
+        Resets the pose to the origin.
+        '''
+        with self._lock:
+            self._reset_state()
+            self._pose = ORIGIN
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Integrates the steps of both motors since the previous tick.
+        '''
+        if self._enabled:
+            _port_steps = self._port_motor.steps
+            _stbd_steps = self._stbd_motor.steps
+            with self._lock:
+                _port_delta = _port_steps - self._port_steps
+                _stbd_delta = _stbd_steps - self._stbd_steps
+                self._port_steps = _port_steps
+                self._stbd_steps = _stbd_steps
+                self._pose = self.integrate(_port_delta, _stbd_delta)
+
+    # ..........................................................................
+    def integrate(self, port_delta, stbd_delta):
+        '''
+        Integrates the port (left) and starboard (right) step deltas into
+        the pose, returning the new Pose.
+        '''
+        _timestamp = self._now_ns()
+        if self._record:
+            self._log_rows.append(( _timestamp, port_delta, stbd_delta ))
+        _port = port_delta / self._steps_per_cm
+        _stbd = stbd_delta / self._steps_per_cm
+        _distance = ( _port + _stbd ) / 2.0
+        _dtheta = ( _stbd - _port ) / self._wheelbase_cm
+        _theta = self._theta
+        _mid = _theta + _dtheta / 2.0
+        _cos = math.cos(_mid)
+        _sin = math.sin(_mid)
+        # pose .................................
+        if abs(_dtheta) < Odometry.STRAIGHT_EPSILON:
+            self._x += _distance * _cos
+            self._y += _distance * _sin
+        else:
+            _radius = _distance / _dtheta
+            self._x += _radius * ( math.sin(_theta + _dtheta) - math.sin(_theta) )
+            self._y -= _radius * ( math.cos(_theta + _dtheta) - math.cos(_theta) )
+        self._theta = math.atan2(math.sin(_theta + _dtheta), math.cos(_theta + _dtheta))
+        self._distance += abs(_distance)
+        # covariance: P = F·P·Fᵀ + G·Q·Gᵀ ......
+        # F is the identity but for F[0][2] = a and F[1][2] = b
+        _a = -_distance * _sin
+        _b =  _distance * _cos
+        _pxx = self._pxx + 2.0 * _a * self._pxt + _a * _a * self._ptt
+        _pxy = self._pxy + _a * self._pyt + _b * self._pxt + _a * _b * self._ptt
+        _pxt = self._pxt + _a * self._ptt
+        _pyy = self._pyy + 2.0 * _b * self._pyt + _b * _b * self._ptt
+        _pyt = self._pyt + _b * self._ptt
+        # G is the Jacobian of the pose increment with respect to each wheel's travel
+        _k = _distance / ( 2.0 * self._wheelbase_cm )
+        _gxp, _gxs = 0.5 * _cos + _k * _sin, 0.5 * _cos - _k * _sin
+        _gyp, _gys = 0.5 * _sin - _k * _cos, 0.5 * _sin + _k * _cos
+        _gtp, _gts = -1.0 / self._wheelbase_cm, 1.0 / self._wheelbase_cm
+        _qp = self._wheel_variance * abs(_port)
+        _qs = self._wheel_variance * abs(_stbd)
+        self._pxx = _pxx + _gxp * _gxp * _qp + _gxs * _gxs * _qs
+        self._pxy = _pxy + _gxp * _gyp * _qp + _gxs * _gys * _qs
+        self._pxt = _pxt + _gxp * _gtp * _qp + _gxs * _gts * _qs
+        self._pyy = _pyy + _gyp * _gyp * _qp + _gys * _gys * _qs
+        self._pyt = _pyt + _gyp * _gtp * _qp + _gys * _gts * _qs
+        self._ptt = self._ptt + _gtp * _gtp * _qp + _gts * _gts * _qs
+        return Pose(self._x, self._y, self._theta,
+                ( ( self._pxx, self._pxy, self._pxt ), ( self._pxy, self._pyy, self._pyt ), ( self._pxt, self._pyt, self._ptt ) ),
+                self._distance, _timestamp)
+
+    # ..........................................................................
+    def save_log(self, filename):
+        '''
+        Saves the recorded step deltas, for use with load_step_log() and
+        integrate_steps(). Only the most recent record_limit ticks are kept.
+        '''
+        numpy.savetxt(filename, numpy.array(self._log_rows, dtype=numpy.int64).reshape(-1, 3),
+                fmt='%d', header='timestamp_ns port_steps stbd_steps')
+        self._log.info('saved {:d} ticks of steps to: {}'.format(len(self._log_rows), filename))
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            with self._lock:
+                self._port_steps = self._port_motor.steps
+                self._stbd_steps = self._stbd_motor.steps
+            self._enabled = True
+            self._log.info('enabled.')
+        else:
+            self._log.warning('cannot enable: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            self._log.info('disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if self._enabled:
+            self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-04-20
-# modified: 2020-09-26
+# modified: 2021-04-29
 #
 # This class and the PIDController class were derived from ideas gleaned
 # from libraries by both Martin Lundberg and Brett Beauregard, as well as
@@ -20,6 +20,7 @@ init()
 
 from lib.logger import Logger, Level
 from lib.enums import Orientation
+from lib.timing import NS_PER_SEC
 
 # ..............................................................................
 class PID(object):
@@ -66,6 +67,16 @@ class PID(object):
         self.reset()
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds, e.g.,
+        a VirtualClock's now_ns() when simulating. The default is the
+        monotonic clock.
+        '''
+        self._current_time = lambda: now_ns() / NS_PER_SEC
+        self._last_time    = self._current_time()
+
     # ..........................................................................
     @property
     def kp(self):
@@ -7,14 +7,13 @@
 #
 # author:   Murray Altheim
 # created:  2020-04-20
-# modified: 2020-09-26
+# modified: 2021-05-15
 #
 # This controller uses a threaded loop and uses a pair of PID controllers from
 # the PID class.
 #
 
 import sys, time
-from collections import deque as Deque
 from colorama import init, Fore, Style
 init()
 
@@ -23,6 +22,7 @@ from lib.enums import Orientation
 from lib.message import Message
 from lib.event import Event
 from lib.pid import PID
+from lib.filters import RunningMean
 from lib.slew import SlewRate, SlewLimiter
 
 # ..............................................................................
@@ -80,7 +80,7 @@ class PIDController(object):
 
         # used for hysteresis, if queue too small will zero-out motor power too quickly
         _queue_len = _config.get('hyst_queue_len')
-        self._deque = Deque([], maxlen=_queue_len)
+        self._setpoint_mean = RunningMean(_queue_len)
 
         self._enable_slew = True #_config.get('enable_slew')
         self._slewlimiter = SlewLimiter(config, orientation=self._motor.orientation, level=Level.INFO)
@@ -92,6 +92,10 @@ class PIDController(object):
         else:
             self._log.info('slew limiter disabled.')
 
+        self._executor     = None
+        self._engine       = None
+        self._ticking      = False # tick() has been added to the executor or message bus
+        self._channel      = None
         self._power        = 0.0
         self._last_power   = 0.0
         self._enabled      = False
@@ -113,6 +117,7 @@ class PIDController(object):
     @kp.setter
     def kp(self, kp):
         self._pid.kp = kp
+        self._set_engine_constants()
 
     @property
     def ki(self):
@@ -121,6 +126,7 @@ class PIDController(object):
     @ki.setter
     def ki(self, ki):
         self._pid.ki = ki
+        self._set_engine_constants()
 
     @property
     def kd(self):
@@ -129,6 +135,38 @@ class PIDController(object):
     @kd.setter
     def kd(self, kd):
         self._pid.kd = kd
+        self._set_engine_constants()
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the time source of the PID and slew limiter, e.g., a
+        VirtualClock's now_ns() when simulating.
+        '''
+        self._pid.set_time_source(now_ns)
+        self._slewlimiter.set_time_source(now_ns)
+
+    # ..............................................................................
+    def set_engine(self, engine, channel):
+        '''
+        Sets a MultiPID engine, one channel of which then replaces this
+        controller's own PID. The owner of the engine (e.g., the
+        PIDMotorController) is responsible for calling it once per tick,
+        passing this controller's output to apply(). This must be called
+        prior to enabling.
+        '''
+        if self._enabled:
+            raise Exception('cannot set engine: PID controller already enabled.')
+        self._engine  = engine
+        self._channel = channel
+        self._set_engine_constants()
+        self._engine.set_setpoint(channel, self._pid.setpoint)
+        self._engine.set_limit(self._pid.limit)
+        self._log.info('using channel {:d} of PID engine.'.format(channel))
+
+    def _set_engine_constants(self):
+        if self._engine:
+            self._engine.set_constants(self._channel, self._pid.kp, self._pid.ki, self._pid.kd)
 
     # ..............................................................................
     def enable_slew(self, enable):
@@ -159,6 +197,8 @@ class PIDController(object):
         '''
         Getter for the setpoint (PID set point).
         '''
+        if self._engine:
+            return self._engine.get_setpoint(self._channel)
         return self._pid.setpoint
 
     @setpoint.setter
@@ -168,7 +208,10 @@ class PIDController(object):
         '''
         if self._enable_slew:
             setpoint = self._slewlimiter.slew(self.setpoint, setpoint)
-        self._pid.setpoint = setpoint
+        if self._engine:
+            self._engine.set_setpoint(self._channel, setpoint)
+        else:
+            self._pid.setpoint = setpoint
 
     # ..........................................................................
     def set_limit(self, limit):
@@ -177,6 +220,8 @@ class PIDController(object):
         Set to None (the default) to disable this feature.
         '''
         self._pid.set_limit(limit)
+        if self._engine:
+            self._engine.set_limit(limit)
 
     # ..........................................................................
     @property
@@ -186,28 +231,59 @@ class PIDController(object):
             [kp, ki, kd, cp, ci, cd, last_power, current_motor_power, power, _velocity, setpoint, steps]
         '''
         kp, ki, kd = self._pid.constants
-        cp, ci, cd = self._pid.components
-        return kp, ki, kd, cp, ci, cd, self._last_power, self._motor.get_current_power_level(), self._power, self._motor.velocity, self._pid.setpoint, self._motor.steps
+        cp, ci, cd = self._engine.components(self._channel) if self._engine else self._pid.components
+        return kp, ki, kd, cp, ci, cd, self._last_power, self._motor.current_power, self._power, self._motor.velocity, self.setpoint, self._motor.steps
 
     # ..........................................................................
     @property
     def enabled(self):
         return self._enabled
 
+    # ..........................................................................
+    def set_executor(self, executor):
+        '''
+        Sets a RealTimeExecutor that will call tick() on its dedicated
+        thread, rather than this being driven by clock messages on the
+        message bus. This must be called prior to enabling.
+        '''
+        if self._enabled:
+            raise Exception('cannot set executor: PID controller already enabled.')
+        self._executor = executor
+
     # ..........................................................................
     def handle(self, message):
         '''
-        The PID loop that continues while the enabled flag is True.
+        The message bus handler, which performs a PID step on each clock
+        tick or tock while the enabled flag is True.
+        '''
+        if message.event is Event.CLOCK_TICK or message.event is Event.CLOCK_TOCK:
+            self.tick()
+        return message
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        A single step of the PID loop, performed while the enabled flag is True.
 
         This uses a running average on the setpoint to settle the output
         at zero when it's clear the target velocity is zero. This is a
         perhaps cheap approach to hysteresis.
         '''
-        if self._enabled and ( message.event is Event.CLOCK_TICK or message.event is Event.CLOCK_TOCK ):
+        if self._enabled:
             # calculate velocity from motor encoder's step count
             _velocity = self._motor.velocity
 #           self._log.info(Fore.BLACK + 'handle({}): {:+d} steps; velocity: {:<5.2f}'.format(self._orientation.label, self._motor.steps, _velocity))
-            _pid_output = self._pid(_velocity)
+            self.apply(self._pid(_velocity))
+
+    # ..........................................................................
+    def apply(self, pid_output):
+        '''
+        Applies the output of a PID step to the motor power, while the
+        enabled flag is True. This is called by tick(), or by the owner of
+        the PID engine if one has been set.
+        '''
+        if self._enabled:
+            _pid_output = pid_output
             self._power += _pid_output
             _motor_power = self._power / 100.0
 #           self._log.info(Fore.WHITE + Style.NORMAL + 'handle() _steps: {:d}; _power: {:>5.2f}/_motor_power: {:>5.2f};\t'.format(self._motor.steps, self._power, _motor_power) \
@@ -219,7 +295,6 @@ class PIDController(object):
 #               self._motor.set_motor_power(0.0)
 #           else:
 #               self._motor.set_motor_power(self._power / 100.0)
-        return message
 
     # ..........................................................................
     def _get_mean_setpoint(self, value):
@@ -230,13 +305,7 @@ class PIDController(object):
         '''
         if value == None:
             raise Exception('null argument')
-        self._deque.append(value)
-        _n = 0
-        _mean = 0.0
-        for x in self._deque:
-            _n += 1
-            _mean += ( x - _mean ) / _n
-        return float('nan') if _n < 1 else _mean
+        return self._setpoint_mean.add(value)
 
     # ..........................................................................
     def print_state(self):
@@ -248,6 +317,8 @@ class PIDController(object):
     # ..........................................................................
     def reset(self):
         self._pid.reset()
+        if self._engine:
+            self._engine.reset(self._channel)
         self._motor.stop()
         self._log.info(Fore.GREEN + 'reset.')
 
@@ -257,7 +328,15 @@ class PIDController(object):
             if self._enabled:
                 self._log.warning('PID loop already enabled.')
             else:
-                self._clock.message_bus.add_handler(Message, self.handle)
+                if self._engine:
+                    pass # driven by the owner of the engine
+                elif not self._ticking:
+                    # added only once: tick() does nothing while disabled
+                    self._ticking = True
+                    if self._executor:
+                        self._executor.add_callback(self.tick)
+                    else:
+                        self._clock.message_bus.add_handler(Message, self.handle)
                 self._enabled = True
         else:
             self._log.warning('cannot enable PID loop: already closed.')
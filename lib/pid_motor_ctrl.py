@@ -7,31 +7,63 @@
 #
 # author:   Murray Altheim
 # created:  2020-08-08
-# modified: 2020-10-18
+# modified: 2021-04-29
 #
 
+from array import array
 from colorama import init, Fore, Style
 init()
 
 #from lib.config_loader import ConfigLoader
 from lib.logger import Logger, Level
 from lib.enums import Orientation
+from lib.message import Message
+from lib.event import Event
 from lib.rate import Rate
 from lib.motors import Motors
 from lib.pid_ctrl import PIDController
+from lib.multi_pid import MultiPID
 
 # ..............................................................................
 class PIDMotorController(object):
     '''
     A simple composite pattern consisting of two PIDControllers, one for
     control of the port motor, another for the starboard motor.
+
+    The motors' power is coalesced via their command stage: once both
+    PID controllers have stepped on a clock tick the stage is flushed,
+    so that both motors are written together in (where possible) a
+    single I2C transaction.
+
+    If 'vectorised' is set in the PID controller configuration, both
+    PID controllers use the two channels of a single MultiPID engine,
+    which is stepped once per tick, prior to the flush.
     '''
-    def __init__(self, config, motors, level):
+    def __init__(self, config, clock, motors, level):
         super().__init__()
         self._log = Logger("pmc", level)
+        if clock is None:
+            raise ValueError('null clock argument.')
+        self._clock    = clock
+        if motors is None:
+            raise ValueError('null motors argument.')
         self._motors   = motors
-        self._port_pid = PIDController(config, motors.get_motor(Orientation.PORT), level=level)
-        self._stbd_pid = PIDController(config, motors.get_motor(Orientation.STBD), level=level)
+        self._port_pid = PIDController(config, clock, motors.get_motor(Orientation.PORT), level=level)
+        self._stbd_pid = PIDController(config, clock, motors.get_motor(Orientation.STBD), level=level)
+        self._executor = None
+        self._flushing = False
+        _config = config['ros'].get('motors').get('pid-controller')
+        if _config.get('vectorised'):
+            self._engine = MultiPID('motors', 2, _config.get('kp'), _config.get('ki'), _config.get('kd'),
+                    _config.get('min_output'), _config.get('max_output'),
+                    sample_time=1.0 / _config.get('sample_freq_hz'), level=level)
+            self._port_pid.set_engine(self._engine, 0)
+            self._stbd_pid.set_engine(self._engine, 1)
+            self._port_motor = motors.get_motor(Orientation.PORT)
+            self._stbd_motor = motors.get_motor(Orientation.STBD)
+            self._velocities = array('d', [0.0, 0.0])
+        else:
+            self._engine = None
         self._log.info('ready.')
 
     # ..........................................................................
@@ -47,21 +79,80 @@ class PIDMotorController(object):
         self._port_pid.set_max_velocity(max_velocity)
         self._stbd_pid.set_max_velocity(max_velocity)
 
+    # ..........................................................................
+    def set_executor(self, executor):
+        '''
+        Sets a RealTimeExecutor for both PID controllers (see PIDController.set_executor()).
+        '''
+        self._executor = executor
+        self._port_pid.set_executor(executor)
+        self._stbd_pid.set_executor(executor)
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the time source of the motors' velocity calculation and both PID
+        controllers, e.g., a VirtualClock's now_ns() when simulating.
+        '''
+        self._motors.set_time_source(now_ns)
+        self._port_pid.set_time_source(now_ns)
+        self._stbd_pid.set_time_source(now_ns)
+        if self._engine:
+            self._engine.set_time_source(now_ns)
+
     # ..........................................................................
     @property
     def enabled(self):
         return self._port_pid.enabled or self._stbd_pid.enabled
 
+    # ..........................................................................
+    def handle(self, message):
+        '''
+        The message bus handler, added after those of the PID controllers
+        so that it is called after both have stepped on the same tick.
+        '''
+        if message.event is Event.CLOCK_TICK or message.event is Event.CLOCK_TOCK:
+            self.tick()
+        return message
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Steps the PID engine (if vectorised), then flushes the motor
+        command stage.
+        '''
+        if self._engine:
+            _velocities = self._velocities
+            _velocities[0] = self._port_motor.velocity
+            _velocities[1] = self._stbd_motor.velocity
+            _outputs = self._engine(_velocities)
+            self._port_pid.apply(_outputs[0])
+            self._stbd_pid.apply(_outputs[1])
+        self._motors.flush()
+
+    # ..........................................................................
+    def flush(self):
+        self._motors.flush()
+
     # ..........................................................................
     def enable(self):
+        self._motors.set_coalesce(True)
         self._port_pid.enable()
         self._stbd_pid.enable()
+        if not self._flushing:
+            self._flushing = True
+            if self._executor:
+                self._executor.add_callback(self.tick)
+            else:
+                self._clock.message_bus.add_handler(Message, self.handle)
 
     # ..........................................................................
     def disable(self):
-        self._motors.disable()
+        # the PID controllers must not write motor power during the halt ramp
         self._port_pid.disable()
         self._stbd_pid.disable()
+        self._motors.set_coalesce(False)
+        self._motors.disable()
 
     # ..........................................................................
     def close(self):
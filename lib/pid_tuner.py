@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-30
+# modified: 2021-04-30
+#
+# Automated tuning of the motor PID controllers: open-loop step-response and
+# closed-loop relay-feedback experiments, fitting a first-order-plus-dead-time
+# (FOPDT) model of the motors, and the evaluation of candidate gains against
+# that model in parallel.
+#
+# Note that the PIDController is a velocity-form (incremental) controller:
+# each PID output is added to the motor power. Its configured kp therefore
+# acts as an integral gain on the motor power and kd as a proportional gain
+# on the measured velocity, such that a PI controller with proportional gain
+# Kc and integral time Ti (applied as "I-P", i.e., proportional on
+# measurement) corresponds to:
+#
+#     kp = Kc * dt / Ti;  ki = 0.0;  kd = Kc * dt
+#
+# where dt is the PID sample time.
+#
+
+import math, time, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+from lib.timing import now_ns, NS_PER_SEC
+from lib.multi_pid import MultiPID
+
+# ..............................................................................
+class Trace(object):
+    '''
+    A recorded trace of an experiment, as columns of time (sec), motor power
+    (percent) and the port and starboard velocities (cm/sec).
+    '''
+    def __init__(self):
+        self._rows = []
+
+    # ..........................................................................
+    def add(self, time_sec, power, port_velocity, stbd_velocity):
+        self._rows.append(( time_sec, power, port_velocity, stbd_velocity ))
+
+    # ..........................................................................
+    def __len__(self):
+        return len(self._rows)
+
+    # ..........................................................................
+    @property
+    def times(self):
+        return numpy.array([ row[0] for row in self._rows ])
+
+    @property
+    def powers(self):
+        return numpy.array([ row[1] for row in self._rows ])
+
+    @property
+    def velocities(self):
+        '''
+        Returns the mean of the port and starboard velocities.
+        '''
+        return numpy.array([ ( row[2] + row[3] ) / 2.0 for row in self._rows ])
+
+    # ..........................................................................
+    def save(self, filename):
+        numpy.savetxt(filename, numpy.array(self._rows), fmt='%.6f', header='time power port_velocity stbd_velocity')
+
+    # ..........................................................................
+    @staticmethod
+    def load(filename):
+        _trace = Trace()
+        for _row in numpy.atleast_2d(numpy.loadtxt(filename)):
+            _trace.add(*_row)
+        return _trace
+
+# ..............................................................................
+class FOPDT(object):
+    '''
+    A first-order-plus-dead-time model of the motors:
+
+        gain:           steady state change in velocity per change in power (cm/sec per %)
+        time_constant:  the time constant of the velocity (sec)
+        dead_time:      the delay before the velocity responds (sec)
+    '''
+    def __init__(self, gain, time_constant, dead_time):
+        self.gain          = gain
+        self.time_constant = time_constant
+        self.dead_time     = dead_time
+
+    def __str__(self):
+        return 'K={:7.4f}; tau={:6.3f}s; theta={:6.3f}s'.format(self.gain, self.time_constant, self.dead_time)
+
+# ..............................................................................
+def _crossing_time(times, values, level):
+    '''
+    Returns the time at which the values first reach the level, linearly
+    interpolated between samples, or None if never reached.
+    '''
+    for i in range(1, len(values)):
+        if values[i] >= level:
+            _span = values[i] - values[i-1]
+            _fraction = ( level - values[i-1] ) / _span if _span > 0.0 else 1.0
+            return times[i-1] + _fraction * ( times[i] - times[i-1] )
+    return None
+
+# ..............................................................................
+def fit_fopdt(trace):
+    '''
+    Fits a FOPDT model to a step-response trace using Smith's two-point
+    method: the times at which the response reaches 28.3% and 63.2% of its
+    final change. The final value is taken as the mean of the last fifth
+    of the trace, which should therefore have settled.
+    '''
+    _times  = trace.times
+    _powers = trace.powers
+    _values = trace.velocities
+    _steps = numpy.nonzero(numpy.abs(numpy.diff(_powers)) > 0.0)[0]
+    if len(_steps) == 0:
+        raise ValueError('no step found in trace.')
+    _step = _steps[0] + 1
+    _delta_power = _powers[-1] - _powers[_step - 1]
+    _initial = numpy.mean(_values[:_step])
+    _final   = numpy.mean(_values[-max(1, len(_values) // 5):])
+    _delta_value = _final - _initial
+    if _delta_value == 0.0:
+        raise ValueError('no response to step in trace.')
+    # normalise to a rising response from zero
+    _sign = math.copysign(1.0, _delta_value)
+    _response = _sign * ( _values[_step - 1:] - _initial )
+    _t = _times[_step - 1:] - _times[_step - 1]
+    _t28 = _crossing_time(_t, _response, 0.283 * abs(_delta_value))
+    _t63 = _crossing_time(_t, _response, 0.632 * abs(_delta_value))
+    if _t28 is None or _t63 is None:
+        raise ValueError('response did not settle in trace.')
+    _tau = 1.5 * ( _t63 - _t28 )
+    _theta = max(0.0, _t63 - _tau)
+    return FOPDT(_delta_value / _delta_power, max(_tau, 1e-3), _theta)
+
+# ..............................................................................
+def simc_pi(model, closed_loop_factor=1.0):
+    '''
+    Returns the PI gains (Kc, Ti) of the SIMC tuning rule for the FOPDT
+    model. The desired closed loop time constant is the plant time constant
+    multiplied by the factor, but no less than the dead time (the "tight"
+    setting). Given the coarse resolution of the encoder velocity at 20Hz
+    a factor of about 1.0 is recommended.
+    '''
+    _lambda = max(model.dead_time, closed_loop_factor * model.time_constant)
+    _kc = model.time_constant / ( model.gain * ( _lambda + model.dead_time ))
+    _ti = min(model.time_constant, 4.0 * ( _lambda + model.dead_time ))
+    return _kc, _ti
+
+# ..............................................................................
+def tyreus_luyben_pi(ultimate_gain, ultimate_period):
+    '''
+    Returns the PI gains (Kc, Ti) of the Tyreus-Luyben tuning rule, from the
+    ultimate gain and period found by a relay-feedback experiment.
+    '''
+    return ultimate_gain / 3.2, 2.2 * ultimate_period
+
+# ..............................................................................
+def pi_to_config(kc, ti, dt):
+    '''
+    Converts PI gains to the (kp, ki, kd) of the velocity-form PIDController
+    with sample time dt (see the notes at the top of this module).
+    '''
+    return kc * dt / ti, 0.0, kc * dt
+
+# ..............................................................................
+def evaluate(model, gains, dt, setpoint, duration_sec, min_output, max_output):
+    '''
+    Simulates the step response of the PIDController with the given
+    (kp, ki, kd) gains on the FOPDT model, returning a cost: the integral of
+    absolute error as a fraction of the setpoint, plus twice the fractional
+    overshoot, plus the mean absolute change in power per sample (as a
+    fraction of full power) to penalise chatter. A lower cost is better.
+    '''
+    kp, ki, kd = gains
+    _pid = MultiPID('eval', 1, kp, ki, kd, min_output, max_output, sample_time=dt, level=Level.WARN)
+    _pid.set_setpoint(0, setpoint)
+    _delay = deque([ 0.0 ] * max(0, int(round(model.dead_time / dt))))
+    _alpha = 1.0 - math.exp(-dt / model.time_constant)
+    _velocity = [ 0.0 ]
+    _power = 0.0
+    _iae = 0.0
+    _peak = 0.0
+    _effort = 0.0
+    _samples = int(duration_sec / dt)
+    for i in range(_samples):
+        _last_power = _power
+        _power = max(-100.0, min(_power + _pid(_velocity, dt=dt)[0], 100.0))
+        _effort += abs(_power - _last_power)
+        _delay.append(_power)
+        _velocity[0] += ( model.gain * _delay.popleft() - _velocity[0] ) * _alpha
+        _iae += abs(setpoint - _velocity[0]) * dt
+        _peak = max(_peak, _velocity[0])
+    _overshoot = max(0.0, _peak - setpoint) / setpoint
+    return _iae / ( setpoint * duration_sec ) + 2.0 * _overshoot + _effort / ( 100.0 * _samples )
+
+def _evaluate_all(args):
+    '''
+    Returns the mean cost of the gains over all models. This is a module
+    level function so that it may be executed by a process pool.
+    '''
+    models, gains, dt, setpoint, duration_sec, min_output, max_output = args
+    return sum(evaluate(_model, gains, dt, setpoint, duration_sec, min_output, max_output) for _model in models) / len(models)
+
+# ..............................................................................
+class PIDTuner(object):
+    '''
+    Tunes the PID controllers of a PIDMotorController, either by experiment
+    on its motors (real or simulated) or from previously recorded traces.
+
+    Experiments are driven by a clock providing add_callback(), e.g., the
+    RealTimeExecutor or Ticker, or a VirtualClock (which is then advanced
+    by run()), while the PID controllers are disabled. If tuning only from
+    recorded traces the PIDMotorController and clock may be None.
+
+    This uses the ros:pid_tuner: section of the configuration.
+
+    :param config:   the application configuration
+    :param pmc:      the PIDMotorController
+    :param clock:    the clock used to drive experiments
+    :param level:    the log level
+    '''
+    def __init__(self, config, pmc, clock, level=Level.INFO):
+        self._log = Logger('pid-tuner', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        self._pmc   = pmc
+        self._clock = clock
+        _config = config['ros'].get('pid_tuner')
+        self._step_bias       = _config.get('step_bias')
+        self._step_power      = _config.get('step_power')
+        self._settle_sec      = _config.get('settle_sec')
+        self._step_sec        = _config.get('step_sec')
+        self._relay_bias      = _config.get('relay_bias')
+        self._relay_amplitude = _config.get('relay_amplitude')
+        self._relay_sec       = _config.get('relay_sec')
+        self._setpoint        = _config.get('setpoint')
+        self._eval_sec        = _config.get('eval_sec')
+        self._workers         = _config.get('workers')
+        self._closed_loop_factor = _config.get('closed_loop_factor')
+        _pid_config = config['ros'].get('motors').get('pid-controller')
+        self._dt              = 1.0 / _pid_config.get('sample_freq_hz')
+        self._min_output      = _pid_config.get('min_output')
+        self._max_output      = _pid_config.get('max_output')
+        if pmc:
+            _motors = pmc.get_motors()
+            self._port_motor = _motors.get_motor(Orientation.PORT)
+            self._stbd_motor = _motors.get_motor(Orientation.STBD)
+        self._now_ns  = now_ns
+        self._trace   = None
+        self._power   = 0.0
+        self._relay   = False
+        self._start_ns = None
+        if clock:
+            clock.add_callback(self._tick)
+        self._log.info('step: {:4.1f}% to {:4.1f}% for {:4.1f}s; relay: {:4.1f}±{:4.1f}% for {:4.1f}s about {:4.1f}cm/s'.format(
+                self._step_bias, self._step_bias + self._step_power, self._step_sec, self._relay_bias, self._relay_amplitude, self._relay_sec, self._setpoint))
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the time source used to timestamp traces, e.g., a VirtualClock's
+        now_ns() when simulating.
+        '''
+        self._now_ns = now_ns
+
+    # ..........................................................................
+    @property
+    def sample_time(self):
+        return self._dt
+
+    # ..........................................................................
+    def _tick(self):
+        '''
+        The clock callback: records the trace and, for a relay experiment,
+        switches the motor power about the setpoint.
+        '''
+        if self._trace is None:
+            return
+        _port_velocity = self._port_motor.velocity
+        _stbd_velocity = self._stbd_motor.velocity
+        if self._relay:
+            _velocity = ( _port_velocity + _stbd_velocity ) / 2.0
+            if _velocity < self._setpoint:
+                self._set_power(self._relay_bias + self._relay_amplitude)
+            else:
+                self._set_power(self._relay_bias - self._relay_amplitude)
+        self._trace.add(( self._now_ns() - self._start_ns ) / NS_PER_SEC, self._power, _port_velocity, _stbd_velocity)
+
+    # ..........................................................................
+    def _set_power(self, power):
+        self._power = power
+        self._port_motor.set_motor_power(power / 100.0)
+        self._stbd_motor.set_motor_power(power / 100.0)
+
+    # ..........................................................................
+    def _wait(self, seconds):
+        if hasattr(self._clock, 'run'):
+            self._clock.run(seconds)
+        else:
+            time.sleep(seconds)
+
+    # ..........................................................................
+    def _run(self, bias, power, relay, seconds):
+        '''
+        Settles the motors at the bias power, then begins recording the
+        trace, stepping to the power (or starting the relay) after a
+        further settling time.
+        '''
+        if self._pmc is None or self._clock is None:
+            raise Exception('cannot run experiment: no PID motor controller or clock.')
+        elif self._pmc.enabled:
+            raise Exception('cannot run experiment: PID motor controller is enabled.')
+        self._set_power(bias)
+        self._wait(self._settle_sec)
+        self._start_ns = self._now_ns()
+        self._trace    = Trace()
+        self._wait(self._settle_sec)
+        self._set_power(power)
+        self._relay    = relay
+        self._wait(seconds)
+        _trace = self._trace
+        self._trace = None
+        self._relay = False
+        self._set_power(0.0)
+        self._wait(1.0)
+        return _trace
+
+    # ..........................................................................
+    def step_experiment(self):
+        '''
+        Runs an open-loop step-response experiment, returning its Trace.
+        '''
+        self._log.info('running step response experiment...')
+        return self._run(self._step_bias, self._step_bias + self._step_power, False, self._step_sec)
+
+    # ..........................................................................
+    def relay_experiment(self):
+        '''
+        Runs a relay-feedback experiment, returning its Trace.
+        '''
+        self._log.info('running relay feedback experiment...')
+        return self._run(self._relay_bias, self._relay_bias, True, self._relay_sec)
+
+    # ..........................................................................
+    def analyse_relay(self, trace):
+        '''
+        Returns the ultimate gain and period from a relay-feedback trace,
+        ignoring the first half of the trace while the oscillation settles.
+        '''
+        _times  = trace.times
+        _values = trace.velocities
+        _powers = trace.powers
+        _half = len(_times) // 2
+        # rising switches of the relay
+        _switches = [ _times[i] for i in range(_half, len(_powers)) if _powers[i] > _powers[i-1] ]
+        if len(_switches) < 3:
+            raise ValueError('too few relay oscillations in trace.')
+        _period = ( _switches[-1] - _switches[0] ) / ( len(_switches) - 1 )
+        _amplitude = ( numpy.max(_values[_half:]) - numpy.min(_values[_half:]) ) / 2.0
+        _ultimate_gain = 4.0 * self._relay_amplitude / ( math.pi * _amplitude )
+        self._log.info('relay: amplitude {:5.2f}cm/s; ultimate gain: {:6.4f}; period: {:5.3f}s'.format(_amplitude, _ultimate_gain, _period))
+        return _ultimate_gain, _period
+
+    # ..........................................................................
+    def candidates(self, kc, ti, scales=( 0.5, 0.7, 1.0, 1.4, 2.0 )):
+        '''
+        Returns a grid of candidate (kp, ki, kd) gains about the PI gains.
+        '''
+        return [ pi_to_config(kc * _kc_scale, ti * _ti_scale, self._dt) for _kc_scale, _ti_scale in itertools.product(scales, scales) ]
+
+    # ..........................................................................
+    def evaluate(self, models, candidates):
+        '''
+        Evaluates the candidate gains against the models in parallel, returning
+        a list of (cost, gains), best first.
+        '''
+        _args = [ ( models, _gains, self._dt, self._setpoint, self._eval_sec, self._min_output, self._max_output ) for _gains in candidates ]
+        _start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self._workers) as _executor:
+            _costs = list(_executor.map(_evaluate_all, _args))
+        self._log.info('evaluated {:d} candidates on {:d} models in {:5.3f}s.'.format(len(candidates), len(models), time.perf_counter() - _start))
+        return sorted(zip(_costs, candidates), key=lambda x: x[0])
+
+    # ..........................................................................
+    def tune(self, traces):
+        '''
+        Fits a model to each step-response trace, then returns the best
+        candidate (kp, ki, kd) gains about the SIMC tuning of the mean model,
+        and its cost.
+        '''
+        _models = [ fit_fopdt(_trace) for _trace in traces ]
+        for _model in _models:
+            self._log.info('fitted model: ' + Fore.GREEN + '{}'.format(_model))
+        _mean = FOPDT(numpy.mean([ m.gain for m in _models ]),
+                numpy.mean([ m.time_constant for m in _models ]), numpy.mean([ m.dead_time for m in _models ]))
+        _kc, _ti = simc_pi(_mean, self._closed_loop_factor)
+        self._log.info('SIMC: Kc={:6.4f}; Ti={:5.3f}s'.format(_kc, _ti))
+        _cost, _gains = self.evaluate(_models, self.candidates(_kc, _ti))[0]
+        self._log.info('best: kp={:7.5f}; ki={:7.5f}; kd={:7.5f}; cost: {:6.4f}'.format(*_gains, _cost))
+        return _gains, _cost
+
+# ..............................................................................
+def to_config_fragment(gains, comment=None):
+    '''
+    Returns the gains as a config.yaml fragment.
+    '''
+    kp, ki, kd = gains
+    _lines = []
+    if comment:
+        _lines.append('# {}'.format(comment))
+    _lines.extend([
+        'ros:',
+        '    motors:',
+        '        pid-controller:',
+        '            kp:           {:>12.5f}          # proportional gain'.format(kp),
+        '            ki:           {:>12.5f}          # integral gain'.format(ki),
+        '            kd:           {:>12.5f}          # derivative gain'.format(kd) ])
+    return '\n'.join(_lines) + '\n'
+
+#EOF
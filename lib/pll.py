@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-21
+# modified: 2021-05-07
+#
+# A phase-locked loop used to discipline the software Clock to an external
+# (Arduino microsecond_clock.ino) or hardware (PWM) reference clock.
+#
+
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.filters import IntervalEstimator
+
+# ..............................................................................
+class PhaseLockedLoop(object):
+    '''
+    A software phase-locked loop that disciplines the period of a local
+    (software) clock to an external reference.
+
+    The reference edges are fed in via reference_edge() and are used in two
+    ways: an O(1) IntervalEstimator tracks the reference period (frequency),
+    and the most recent edge provides the phase. Each time the local clock
+    ticks it calls tick(), which returns the period to be used for its next
+    wait. That period is the estimated reference period less a proportional
+    plus integral correction on the phase error, so the local clock is both
+    frequency- and phase-locked to the reference.
+
+    Because the loop retains its frequency estimate, the reference need only
+    be sampled occasionally once locked, and if the reference drops out the
+    local clock continues in "holdover" at the last estimated period.
+
+    All times are in integer nanoseconds from a monotonic counter.
+
+    :param nominal_period_ns:  the nominal period of the reference in nanoseconds
+    :param kp:                 proportional gain on phase error
+    :param ki:                 integral gain on phase error
+    :param window:             size of the reference interval window
+    :param lock_threshold_ns:  phase error below which the loop is considered locked
+    :param lock_count:         number of consecutive in-threshold ticks required for lock
+    :param holdover_ns:        time after the last reference edge before entering holdover
+    :param level:              the log level
+    '''
+    def __init__(self, nominal_period_ns, kp=0.25, ki=0.02, window=50,
+                 lock_threshold_ns=100000, lock_count=20, holdover_ns=None, level=Level.INFO):
+        self._log = Logger('pll', level)
+        if nominal_period_ns <= 0:
+            raise ValueError('nominal period must be positive.')
+        self._nominal_ns  = int(nominal_period_ns)
+        self._kp          = kp
+        self._ki          = ki
+        self._lock_threshold_ns = lock_threshold_ns
+        self._lock_count  = lock_count
+        # by default, enter holdover after missing ten reference periods
+        self._holdover_ns = holdover_ns if holdover_ns is not None else 10 * self._nominal_ns
+        # limit any single correction to 10% of the nominal period
+        self._max_correction_ns = self._nominal_ns // 10
+        self._estimator   = IntervalEstimator(window)
+        self._log.info('nominal period: {:d}ns; kp: {:5.3f}; ki: {:5.3f}; window: {:d}'.format(self._nominal_ns, kp, ki, window))
+        self.reset()
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def reset(self):
+        '''
+        Resets the loop state, returning it to the nominal period.
+        '''
+        self._estimator.reset()
+        self._last_ref_ns   = None
+        self._period_ns     = self._nominal_ns
+        self._integral_ns   = 0.0
+        self._phase_err_ns  = 0
+        self._in_threshold  = 0
+        self._locked        = False
+        self._edge_count    = 0
+
+    # ..........................................................................
+    def reference_edge(self, timestamp_ns):
+        '''
+        Called upon each received reference edge with its monotonic
+        timestamp in nanoseconds. Intervals that are not within half a
+        nominal period of a multiple of the nominal period are rejected
+        as glitches; a gap of several periods (e.g., when sampling the
+        reference only occasionally) is divided down to a single period.
+        '''
+        self._edge_count += 1
+        if self._last_ref_ns is not None:
+            _interval_ns = timestamp_ns - self._last_ref_ns
+            _periods = ( _interval_ns + ( self._nominal_ns // 2 ) ) // self._nominal_ns
+            if _periods >= 1:
+                _interval_ns //= _periods
+                if abs(_interval_ns - self._nominal_ns) < self._max_correction_ns:
+                    self._period_ns = int(self._estimator.add(_interval_ns))
+                else:
+                    self._log.debug('rejected reference interval: {:d}ns'.format(_interval_ns))
+            else:
+                # a bounce or glitch: ignore the edge entirely
+                return
+        self._last_ref_ns = timestamp_ns
+
+    # ..........................................................................
+    def tick(self, timestamp_ns):
+        '''
+        Called on each local clock tick with its monotonic timestamp in
+        nanoseconds. Returns the period (in nanoseconds) the local clock
+        should use until its next tick.
+        '''
+        if self._last_ref_ns is None or ( timestamp_ns - self._last_ref_ns ) > self._holdover_ns:
+            # no reference or reference lost: free-run at the last estimated period
+            if self._locked:
+                self._log.warning('reference lost: entering holdover at {:d}ns.'.format(self._period_ns))
+                self._locked = False
+            self._in_threshold = 0
+            return self._period_ns
+        # phase error, wrapped to (-period/2, period/2]
+        _half = self._period_ns // 2
+        _err = ( ( timestamp_ns - self._last_ref_ns + _half ) % self._period_ns ) - _half
+        self._phase_err_ns = _err
+        self._integral_ns += self._ki * _err
+        self._integral_ns = max(-self._max_correction_ns, min(self._integral_ns, self._max_correction_ns))
+        _correction = self._kp * _err + self._integral_ns
+        _correction = max(-self._max_correction_ns, min(_correction, self._max_correction_ns))
+        # lock detection
+        if abs(_err) < self._lock_threshold_ns:
+            self._in_threshold += 1
+            if not self._locked and self._in_threshold >= self._lock_count:
+                self._locked = True
+                self._log.info(Fore.GREEN + 'locked to reference at {:d}ns.'.format(self._period_ns))
+        else:
+            self._in_threshold = 0
+            self._locked = False
+        return int(self._period_ns - _correction)
+
+    # ..........................................................................
+    @property
+    def locked(self):
+        '''
+        Returns True if the loop is currently phase-locked to the reference.
+        '''
+        return self._locked
+
+    # ..........................................................................
+    @property
+    def period_ns(self):
+        '''
+        Returns the current estimated reference period in nanoseconds.
+        '''
+        return self._period_ns
+
+    # ..........................................................................
+    @property
+    def phase_error_ns(self):
+        '''
+        Returns the phase error measured on the last tick in nanoseconds.
+        '''
+        return self._phase_err_ns
+
+    # ..........................................................................
+    @property
+    def jitter_ns(self):
+        '''
+        Returns the standard deviation of the reference interval in nanoseconds.
+        '''
+        return self._estimator.variance ** 0.5
+
+    # ..........................................................................
+    @property
+    def edge_count(self):
+        return self._edge_count
+
+#EOF
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-10
+# modified: 2021-05-11
+#
+# Schedules which groups of the Integrated Front Sensor's sensors are read upon
+# each sampling cycle, weighted by the robot's motion and proximity to obstacles.
+#
+
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.filters import RunningMean
+from lib.ioe import IoExpander
+
+# ..............................................................................
+class PollScheduler(object):
+    '''
+    Chooses the groups of sensors (bumpers, center infrared, oblique
+    infrareds and side infrareds) read upon each cycle of the IFS sampler,
+    so that the sensors facing the direction of travel are read more often
+    than the others, rather than each group in turn.
+
+    Each group has a weight of 1.0, increased:
+
+      * for the bumpers, center and oblique infrareds, by speed_gain times
+        the forward velocity as a proportion of max_velocity;
+      * for the oblique and side infrareds, by turn_gain times the turning
+        velocity (the difference between the motors) as a proportion of
+        max_velocity;
+      * for each group, by proximity_gain times its latest (maximum) raw
+        infrared value as a proportion of near_raw (or fully, if a bumper
+        is pressed).
+
+    The groups are chosen by smooth weighted round robin: upon each cycle
+    every group's credit is increased by its weight, and the groups_per_cycle
+    groups with the greatest credit are chosen, each giving up an equal share
+    of the total weight. This interleaves the groups in proportion to their
+    weights with no long runs of any one group; credits are bounded so that
+    the schedule follows changes in the weights promptly. Regardless of its
+    weight, a group is always read if it has not been read for the number
+    of cycles corresponding to min_rate_hz.
+
+    Groups read by other means (e.g., interrupt-driven bumpers) may be
+    excluded, and are never chosen. The effective rate of each other group
+    (and sensor) over the last two seconds is available from rates and
+    sensor_rates.
+
+    This uses the ros:integrated_front_sensor:poll_scheduler: section of the
+    configuration.
+
+    :param config:   the application configuration
+    :param level:    the log level
+    :param exclude:  a mask of the groups (GROUP_BUMPERS, etc.) never read
+    '''
+    GROUPS = ( IoExpander.GROUP_BUMPERS, IoExpander.GROUP_CNTR, IoExpander.GROUP_OBLQ, IoExpander.GROUP_SIDE )
+    GROUP_LABELS = ( 'bmp', 'cntr', 'oblq', 'side' )
+    # the sensors of each group, by label
+    GROUP_SENSORS = ( ( 'bmp-port', 'bmp-cntr', 'bmp-stbd' ), ( 'ir-cntr', ), ( 'ir-port', 'ir-stbd' ), ( 'ir-psid', 'ir-ssid' ) )
+    # the snapshot indices of the infrareds of each group
+    GROUP_INDICES = ( (), ( IoExpander.CNTR_IR, ), ( IoExpander.PORT_IR, IoExpander.STBD_IR ), ( IoExpander.PORT_SIDE_IR, IoExpander.STBD_SIDE_IR ) )
+    RATE_WINDOW_SEC = 2.0
+
+    def __init__(self, config, level=Level.INFO, exclude=0):
+        self._log = Logger('poll-sched', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _ifs_config = config['ros'].get('integrated_front_sensor')
+        _config = _ifs_config.get('poll_scheduler')
+        self._sample_freq_hz   = _ifs_config.get('sample_freq_hz')
+        # the indices of the groups that may be chosen
+        self._active = [ i for i, _group in enumerate(PollScheduler.GROUPS) if not exclude & _group ]
+        if not self._active:
+            raise ValueError('every group is excluded.')
+        self._groups_per_cycle = min(_config.get('groups_per_cycle'), len(self._active))
+        self._min_rate_hz      = _config.get('min_rate_hz')
+        self._max_velocity     = _config.get('max_velocity')
+        self._speed_gain       = _config.get('speed_gain')
+        self._turn_gain        = _config.get('turn_gain')
+        self._proximity_gain   = _config.get('proximity_gain')
+        self._near_raw         = _config.get('near_raw')
+        # a group not read for this many cycles is read regardless of its weight
+        self._max_gap = max(1, int(self._sample_freq_hz / self._min_rate_hz))
+        _count = len(PollScheduler.GROUPS)
+        self._forward   = 0.0 # proportion of max_velocity ahead
+        self._turn      = 0.0 # proportion of max_velocity turning
+        self._proximity = [ 0.0 ] * _count
+        self._weights   = [ 1.0 ] * _count
+        self._credits   = [ 0.0 ] * _count
+        self._gaps      = [ 0 ] * _count
+        _window = max(2, int(self._sample_freq_hz * PollScheduler.RATE_WINDOW_SEC))
+        self._polled    = [ RunningMean(_window) for i in range(_count) ]
+        self._log.info('ready: {:d} group(s) per cycle at {:5.2f}Hz; minimum rate {:5.2f}Hz (every {:d} cycles).'.format(
+                self._groups_per_cycle, self._sample_freq_hz, self._min_rate_hz, self._max_gap))
+
+    # ..........................................................................
+    def set_motion(self, forward, turn):
+        '''
+        Sets the current forward and turning velocities (cm/sec), e.g., the
+        mean of and half the difference between the motors' velocities.
+        Only forward (positive) velocity increases the weights.
+        '''
+        self._forward = min(max(forward, 0.0) / self._max_velocity, 1.0)
+        self._turn    = min(abs(turn) / self._max_velocity, 1.0)
+
+    # ..........................................................................
+    def _update_weights(self):
+        _proximity_gain = self._proximity_gain
+        _speed = self._speed_gain * self._forward
+        _turn  = self._turn_gain * self._turn
+        _proximity = self._proximity
+        _weights = self._weights
+        _weights[0] = 1.0 + _speed + _proximity_gain * _proximity[0]
+        _weights[1] = 1.0 + _speed + _proximity_gain * _proximity[1]
+        _weights[2] = 1.0 + _speed + _turn + _proximity_gain * _proximity[2]
+        _weights[3] = 1.0 + _turn + _proximity_gain * _proximity[3]
+
+    # ..........................................................................
+    def next_groups(self):
+        '''
+        Returns the mask of the groups (GROUP_BUMPERS, etc.) to be read upon
+        the next cycle.
+        '''
+        self._update_weights()
+        _weights = self._weights
+        _credits = self._credits
+        _gaps    = self._gaps
+        _active  = self._active
+        for i in _active:
+            _credits[i] += _weights[i]
+        _chosen = [ i for i in _active if _gaps[i] + 1 >= self._max_gap ]
+        if len(_chosen) < self._groups_per_cycle:
+            for i in sorted(_active, key=_credits.__getitem__, reverse=True):
+                if i not in _chosen:
+                    _chosen.append(i)
+                    if len(_chosen) == self._groups_per_cycle:
+                        break
+        _share = sum(_weights[i] for i in _active) / self._groups_per_cycle
+        _groups = 0
+        for i in _active:
+            if i in _chosen:
+                # bounded, so that a group forced by the minimum rate doesn't
+                # accumulate a debt (nor the others a surplus) to be repaid later
+                _credits[i] = max(_credits[i] - _share, -_share)
+                _gaps[i] = 0
+                self._polled[i].add(1)
+                _groups |= PollScheduler.GROUPS[i]
+            else:
+                _credits[i] = min(_credits[i], _share)
+                _gaps[i] += 1
+                self._polled[i].add(0)
+        return _groups
+
+    # ..........................................................................
+    def record(self, snapshot):
+        '''
+        Updates the proximity of each group read in the snapshot from its
+        values.
+        '''
+        _groups = snapshot[IoExpander.GROUPS]
+        if _groups & IoExpander.GROUP_BUMPERS:
+            self._proximity[0] = 1.0 if snapshot[IoExpander.BUMPERS] else 0.0
+        for i in range(1, len(PollScheduler.GROUPS)):
+            if _groups & PollScheduler.GROUPS[i]:
+                _raw = max(snapshot[_index] for _index in PollScheduler.GROUP_INDICES[i])
+                self._proximity[i] = min(_raw / self._near_raw, 1.0)
+
+    # ..........................................................................
+    @property
+    def weights(self):
+        '''
+        Returns a dict of the current weight of each group not excluded,
+        by label.
+        '''
+        return { PollScheduler.GROUP_LABELS[i]: self._weights[i] for i in self._active }
+
+    # ..........................................................................
+    @property
+    def rates(self):
+        '''
+        Returns a dict of the effective rate (Hz) of each group not excluded,
+        by label.
+        '''
+        return { PollScheduler.GROUP_LABELS[i]: self._polled[i].mean * self._sample_freq_hz if self._polled[i].count else 0.0
+                for i in self._active }
+
+    # ..........................................................................
+    @property
+    def sensor_rates(self):
+        '''
+        Returns a dict of the effective sample rate (Hz) of each sensor,
+        by label (e.g., 'ir-cntr').
+        '''
+        _rates = {}
+        for _label, _rate in self.rates.items():
+            for _sensor in PollScheduler.GROUP_SENSORS[PollScheduler.GROUP_LABELS.index(_label)]:
+                _rates[_sensor] = _rate
+        return _rates
+
+#EOF
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-04
+# modified: 2021-05-15
+#
+# A non-blocking engine for ramping (slewing) motor power, advanced on each
+# control tick rather than by a sleeping thread per motor.
+#
+
+import asyncio
+from threading import Event, Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+
+# ..............................................................................
+class Ramp(object):
+    '''
+    A ramp of a single motor's power level from its current level to a
+    target, by a fixed increment per tick.
+
+    A Ramp is returned by RampEngine.start() and may be used to wait for
+    its completion, either by blocking in wait() or, in asyncio code (e.g.,
+    within the message bus), by awaiting the Ramp itself. Both return True
+    if the ramp completed, False if it was cancelled.
+
+    If steps is greater than zero the ramp only completes once the motor
+    has also run that number of (encoder) steps since the ramp began,
+    holding the target power level until then.
+
+    :param motor:      the Motor
+    :param target:     the target power level (-1.0 to 1.0)
+    :param increment:  the change in power level per tick
+    :param steps:      the optional number of steps to run
+    '''
+    def __init__(self, motor, target, increment, steps=0):
+        self._motor     = motor
+        self._target    = target
+        self._increment = increment
+        self._steps     = steps
+        self._start     = motor.steps if steps > 0 else 0
+        self._level     = motor.current_power / motor.get_max_power_ratio()
+        self._cancelled = False
+        self._event     = Event()
+        self._lock      = Lock()
+        self._futures   = [] # (loop, future) of any awaiting coroutines
+
+    # ..........................................................................
+    @property
+    def motor(self):
+        return self._motor
+
+    # ..........................................................................
+    @property
+    def target(self):
+        return self._target
+
+    # ..........................................................................
+    @property
+    def level(self):
+        '''
+        Returns the power level most recently set by the ramp.
+        '''
+        return self._level
+
+    # ..........................................................................
+    @property
+    def done(self):
+        return self._event.is_set()
+
+    # ..........................................................................
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    # ..........................................................................
+    def step(self):
+        '''
+        Advances the ramp by one tick, returning True if the target was
+        reached (and any steps have been run).
+        '''
+        if self._level != self._target or self._steps <= 0:
+            _remaining = self._target - self._level
+            if abs(_remaining) <= self._increment:
+                self._level = self._target
+            else:
+                self._level += self._increment if _remaining > 0.0 else -self._increment
+            self._motor.set_motor_power(self._level)
+        return self._level == self._target \
+                and ( self._steps <= 0 or abs(self._motor.steps - self._start) >= self._steps )
+
+    # ..........................................................................
+    def complete(self, cancelled=False):
+        '''
+        Marks the ramp as complete (or cancelled), releasing any waiters.
+        '''
+        with self._lock:
+            self._cancelled = cancelled
+            self._event.set()
+            _futures = self._futures
+            self._futures = []
+        for _loop, _future in _futures:
+            _loop.call_soon_threadsafe(Ramp._resolve, _future, not cancelled)
+
+    # ..........................................................................
+    @staticmethod
+    def _resolve(future, result):
+        if not future.done():
+            future.set_result(result)
+
+    # ..........................................................................
+    def wait(self, timeout=None):
+        '''
+        Blocks until the ramp is done or the timeout (sec) expires, returning
+        True if the ramp completed, False if cancelled or timed out.
+        '''
+        return self._event.wait(timeout) and not self._cancelled
+
+    # ..........................................................................
+    def __await__(self):
+        _loop = asyncio.get_event_loop()
+        _future = _loop.create_future()
+        with self._lock:
+            if self._event.is_set():
+                _future.set_result(not self._cancelled)
+            else:
+                self._futures.append(( _loop, _future ))
+        return _future.__await__()
+
+# ..............................................................................
+class RampEngine(object):
+    '''
+    Advances the power ramps of all motors, replacing the blocking loop of
+    Motor.accelerate(), which slept between each increment and so required
+    a thread per motor.
+
+    On each tick all active ramps are advanced together, then the command
+    stage (if any) is flushed, so that ramps on both sides change power on
+    the same tick. start_pair() additionally scales the two ramps so that
+    both motors reach their target on the same tick.
+
+    A ramp is cancelled if its motor's interrupt() flag is set, if the
+    motor is disabled, or if a new ramp is started on the same motor.
+
+    The engine may be driven by a Ticker or VirtualClock (as the clock
+    argument), or within an asyncio event loop (such as the message bus)
+    by creating a task of run(), in which case clock should be None.
+
+    :param config:  the application configuration
+    :param clock:   the Ticker or VirtualClock, or None if using run()
+    :param flush:   an optional function called after each tick's increments
+    :param level:   the log level
+    '''
+    def __init__(self, config, clock, flush=None, level=Level.INFO):
+        self._log = Logger('ramp', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('motors')
+        self._freq_hz = clock.freq_hz if clock else _config.get('ramp_freq_hz')
+        # slew rate ratios are per increment of the original acceleration loop
+        self._ratio_per_tick = 1.0 / ( _config.get('accel_loop_delay_sec') * self._freq_hz )
+        self._flush   = flush
+        self._lock    = Lock()
+        self._ramps   = { Orientation.PORT: None, Orientation.STBD: None }
+        if clock:
+            clock.add_callback(self.tick)
+        self._enabled = False
+        self._closed  = False
+        self._log.info('ready at {:d}Hz{}.'.format(self._freq_hz, '' if clock else ' (asyncio)'))
+
+    # ..........................................................................
+    def start(self, motor, speed, slew_rate, steps=0):
+        '''
+        Starts ramping the motor to the speed (-100 to 100) at the slew rate,
+        returning the Ramp. Any existing ramp on the motor is cancelled. If
+        steps is greater than zero the Ramp completes once the motor has
+        also run that number of steps.
+        '''
+        return self._start(( ( motor, speed ), ), slew_rate, steps)[0]
+
+    # ..........................................................................
+    def start_pair(self, port_motor, port_speed, stbd_motor, stbd_speed, slew_rate):
+        '''
+        Starts ramping both motors, each to its speed (-100 to 100), at the
+        slew rate, such that both reach their speed on the same tick. Returns
+        the port and starboard Ramps.
+        '''
+        return self._start(( ( port_motor, port_speed ), ( stbd_motor, stbd_speed ) ), slew_rate)
+
+    # ..........................................................................
+    def _start(self, motors_speeds, slew_rate, steps=0):
+        _increment = slew_rate.ratio * self._ratio_per_tick
+        _changes = [ abs(_speed / 100.0 - _motor.current_power / _motor.get_max_power_ratio()) for _motor, _speed in motors_speeds ]
+        _largest = max(_changes)
+        _ramps = []
+        with self._lock:
+            for ( _motor, _speed ), _change in zip(motors_speeds, _changes):
+                _motor.reset_interrupt()
+                # the largest change proceeds at the slew rate, others proportionally
+                _ratio = _change / _largest if _largest > 0.0 else 1.0
+                _ramp = Ramp(_motor, _speed / 100.0, max(_increment * _ratio, 1e-6), steps)
+                _existing = self._ramps[_motor.orientation]
+                if _existing:
+                    _existing.complete(cancelled=True)
+                self._ramps[_motor.orientation] = _ramp
+                _ramps.append(_ramp)
+                self._log.debug('{} ramp from {:>5.2f} to {:>5.2f}.'.format(_motor.orientation.label, _ramp.level, _ramp.target))
+        return _ramps
+
+    # ..........................................................................
+    @property
+    def active(self):
+        '''
+        Returns True if any ramp is in progress.
+        '''
+        return any(self._ramps.values())
+
+    # ..........................................................................
+    def cancel(self):
+        '''
+        Cancels all ramps, leaving the motors at their current power.
+        '''
+        with self._lock:
+            for _orientation, _ramp in self._ramps.items():
+                if _ramp:
+                    _ramp.complete(cancelled=True)
+                    self._ramps[_orientation] = None
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Advances all active ramps by one increment.
+        '''
+        if not self._enabled:
+            return
+        _stepped = False
+        with self._lock:
+            for _orientation, _ramp in self._ramps.items():
+                if _ramp is None:
+                    continue
+                _motor = _ramp.motor
+                if _motor.interrupted or not _motor.enabled:
+                    self._log.info('{} ramp cancelled at {:>5.2f}.'.format(_orientation.label, _ramp.level))
+                    _ramp.complete(cancelled=True)
+                    self._ramps[_orientation] = None
+                    continue
+                _stepped = True
+                if _ramp.step():
+                    _ramp.complete()
+                    self._ramps[_orientation] = None
+        if _stepped and self._flush:
+            self._flush()
+
+    # ..........................................................................
+    async def run(self):
+        '''
+        Advances the ramps at the configured frequency while enabled, for use
+        as an asyncio task, e.g., within the message bus' event loop.
+        '''
+        _period_sec = 1.0 / self._freq_hz
+        _loop = asyncio.get_event_loop()
+        _next = _loop.time()
+        while self._enabled:
+            self.tick()
+            _next += _period_sec
+            await asyncio.sleep(max(0.0, _next - _loop.time()))
+        self._log.info('exited ramp loop.')
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            self._enabled = True
+            self._log.info('enabled.')
+        else:
+            self._log.warning('cannot enable: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            self.cancel()
+            self._log.info('disabled.')
+        else:
+            self._log.debug('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-14
+# modified: 2021-05-15
+#
+# The latest range reading of each bearing bin of a scanning sensor, with
+# its timestamp, for querying while the sensor continues to scan.
+#
+
+import numpy
+from threading import Lock
+
+from lib.timing import now_ns, NS_PER_SEC
+
+# ..............................................................................
+class RangeBins(object):
+    '''
+    Holds the latest range (mm) and its timestamp (ns) for each bin of
+    bearings from min_angle to max_angle in steps of degree_step, in
+    preallocated arrays written by the scanning thread and read by any
+    other without waiting for a scan.
+
+    Only actual readings are put: a bearing with nothing in range is not
+    recorded (see UltrasonicScanner), so its bin keeps its previous reading,
+    which ages. A bin that has never been written has a timestamp of zero
+    and a range of NaN.
+
+    :param min_angle:    the bearing of the first bin (degrees)
+    :param max_angle:    the bearing of the last bin (degrees)
+    :param degree_step:  the width of each bin (degrees)
+    '''
+    def __init__(self, min_angle, max_angle, degree_step):
+        if degree_step <= 0.0:
+            raise ValueError('degree step must be greater than zero.')
+        self._min_angle   = min_angle
+        self._degree_step = degree_step
+        self._bearings    = numpy.arange(min_angle, max_angle + 0.01, degree_step)
+        self._ranges      = numpy.full(len(self._bearings), numpy.nan)
+        self._stamps      = numpy.zeros(len(self._bearings), dtype=numpy.int64)
+        self._now_ns      = now_ns
+        self._lock        = Lock()
+
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        self._now_ns = now_ns
+
+    # ..........................................................................
+    @property
+    def bearings(self):
+        return self._bearings
+
+    # ..........................................................................
+    def _bin(self, bearing):
+        return min(max(int(round(( bearing - self._min_angle ) / self._degree_step)), 0), len(self._bearings) - 1)
+
+    # ..........................................................................
+    def put(self, bearing, range_mm, timestamp_ns=None):
+        '''
+        Records the range at the bearing, by default as of now.
+        '''
+        _index = self._bin(bearing)
+        with self._lock:
+            self._ranges[_index] = range_mm
+            self._stamps[_index] = self._now_ns() if timestamp_ns is None else timestamp_ns
+
+    # ..........................................................................
+    def get(self, bearing):
+        '''
+        Returns the latest range (mm) of the bin of the bearing and its age
+        (sec) as a tuple, or None if the bin has never been written.
+        '''
+        _index = self._bin(bearing)
+        with self._lock:
+            _range, _stamp = self._ranges[_index], self._stamps[_index]
+        if _stamp == 0:
+            return None
+        return float(_range), ( self._now_ns() - _stamp ) / NS_PER_SEC
+
+    # ..........................................................................
+    def minimum(self, min_bearing, max_bearing, max_age_sec=None):
+        '''
+        Returns the bearing and range (mm) of the nearest reading of the
+        bins from min_bearing to max_bearing as a tuple, ignoring readings
+        older than max_age_sec if provided, or None if there is none. Bins
+        never written, and any non-finite range put, are not readings.
+        '''
+        _first, _last = self._bin(min(min_bearing, max_bearing)), self._bin(max(min_bearing, max_bearing))
+        with self._lock:
+            _ranges = self._ranges[_first:_last + 1].copy()
+            _stamps = self._stamps[_first:_last + 1].copy()
+        _valid = ( _stamps != 0 ) & numpy.isfinite(_ranges)
+        if max_age_sec is not None:
+            _valid &= _stamps >= self._now_ns() - int(max_age_sec * NS_PER_SEC)
+        if not _valid.any():
+            return None
+        _index = numpy.flatnonzero(_valid)[numpy.argmin(_ranges[_valid])]
+        return float(self._bearings[_first + _index]), float(_ranges[_index])
+
+    # ..........................................................................
+    def get_ages(self):
+        '''
+        Returns the age (sec) of the reading of each bin as an array, inf
+        for bins never written.
+        '''
+        _now_ns = self._now_ns()
+        with self._lock:
+            _stamps = self._stamps.copy()
+        return numpy.where(_stamps == 0, numpy.inf, ( _now_ns - _stamps ) / NS_PER_SEC)
+
+    # ..........................................................................
+    def get_ranges(self):
+        '''
+        Returns a copy of the latest range (mm) of each bin.
+        '''
+        with self._lock:
+            return self._ranges.copy()
+
+    # ..........................................................................
+    def clear(self):
+        with self._lock:
+            self._ranges.fill(numpy.nan)
+            self._stamps.fill(0)
+
+#EOF
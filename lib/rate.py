@@ -15,6 +15,7 @@ from colorama import init, Fore, Style
 init()
 
 from lib.logger import Level, Logger
+from lib.timing import now_ns, NS_PER_SEC
 
 # ..............................................................................
 class Rate():
@@ -27,8 +28,7 @@ class Rate():
     '''
     def __init__(self, hertz, level=Level.INFO, use_ns=False):
         self._log = Logger('rate', level)
-        self._last_ns   = time.perf_counter_ns()
-        self._last_time = time.time()
+        self._last_ns   = now_ns()
         self._dt_s = 1/hertz
         self._dt_ms = self._dt_s * 1000
         self._dt_ns = self._dt_ms * 1000000
@@ -75,6 +75,17 @@ class Rate():
         else:
             self._log.warning('trim argument {:8.5f}s larger than dt ({:8.5f}s): ignored.'.format(trim_s, self._dt_s))
 
+    # ..........................................................................
+    def set_period_ns(self, period_ns):
+        '''
+        Sets the loop period in nanoseconds. This is used by a disciplining
+        PhaseLockedLoop to adjust the period each loop; as such it doesn't
+        log anything.
+        '''
+        self._dt_ns = period_ns
+        self._dt_ms = period_ns / 1000000
+        self._dt_s  = period_ns / 1000000000
+
     # ..........................................................................
     @property
     def dt_ms(self):
@@ -97,7 +108,7 @@ class Rate():
         '''
         Return True if still waiting for the current loop to complete.
         '''
-        return self._dt_s < ( time.time() - self._last_time )
+        return self._dt_ns < ( now_ns() - self._last_ns )
 
     # ..........................................................................
     def wait(self):
@@ -116,15 +127,15 @@ class Rate():
                 rate.wait()
         '''
         if self._use_ns:
-            _ns_diff = time.perf_counter_ns() - self._last_ns
+            _ns_diff = now_ns() - self._last_ns
             _delay_sec = ( self._dt_ns - _ns_diff ) / ( 1000 * 1000000 )
             if self._dt_ns > _ns_diff:
 #               print('...')
                 time.sleep(_delay_sec)
 #           self._log.info(Fore.BLACK + Style.BRIGHT + 'dt_ns: {:7.4f}; diff: {:7.4f}ns; delay: {:7.4f}s'.format(self._dt_ns, _ns_diff, _delay_sec))
-            self._last_ns = time.perf_counter_ns()
+            self._last_ns = now_ns()
         else:
-            _diff = time.time() - self._last_time
+            _diff = ( now_ns() - self._last_ns ) / NS_PER_SEC
 #           _delay_sec = self._dt_s - _diff
             _delay_sec = self._dt_s - _diff
             # adjust for error
@@ -143,7 +154,7 @@ class Rate():
 #           else:
 #               self._log.debug(Fore.CYAN + Style.NORMAL + '= dt: {:7.4f}ms;'.format(self._dt_s * 1000.0) + Fore.WHITE \
 #                       + ' delay: {:7.4f}s; diff: {:7.4f}ms; trim: {:5.2f}'.format(_delay_sec * 1000.0, _diff * 1000.0, self._trim))
-            self._last_time = time.time()
+            self._last_ns = now_ns()
 
 #       self._log.info(Fore.BLACK + Style.BRIGHT + 'elapsed: {:>6.3f}ms'.format(_elapsed))
 
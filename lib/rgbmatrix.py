@@ -93,6 +93,7 @@ class RgbMatrix(Feature):
         self._log.info('rgbmatrix width,height: {},{}'.format(self._width, self._height))
         self._thread_PORT = None
         self._thread_STBD = None
+        self._heartbeats = {}
         self._color = Color.RED # used by _solid
         enabled = False
         self._closing = False
@@ -110,6 +111,23 @@ class RgbMatrix(Feature):
     def name(self):
         return 'RgbMatrix'
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the display thread of each RGB matrix with the Watchdog.
+        Each display loop beats once per iteration; the longest of these
+        (blinky and scan) take a bit over two seconds.
+        '''
+        if self._rgbmatrix5x5_PORT:
+            self._heartbeats[self._rgbmatrix5x5_PORT] = watchdog.register('rgb-port', 2.5)
+        self._heartbeats[self._rgbmatrix5x5_STBD] = watchdog.register('rgb-stbd', 2.5)
+
+    # ..........................................................................
+    def _beat(self, rgbmatrix5x5):
+        _heartbeat = self._heartbeats.get(rgbmatrix5x5)
+        if _heartbeat:
+            _heartbeat.beat()
+
     # ..........................................................................
     def _get_target(self):
         if self._display_type is DisplayType.BLINKY:
@@ -176,6 +194,8 @@ class RgbMatrix(Feature):
             self._thread_STBD.join(timeout=1.0)
             self._log.debug('starboard rgbmatrix thread joined.')
             self._thread_STBD = None
+        for _heartbeat in self._heartbeats.values():
+            _heartbeat.release()
         self._log.debug('disabled.')
 
     # ..........................................................................
@@ -189,6 +209,7 @@ class RgbMatrix(Feature):
         i = 0
         cpu_values = [0] * self._width
         while enabled:
+            self._beat(rgbmatrix5x5)
             try:
                 cpu_values.pop(0)
                 cpu_values.append(psutil.cpu_percent())
@@ -276,6 +297,7 @@ class RgbMatrix(Feature):
         _spacing = 360.0 / 5.0
         _hue = 0
         while enabled:
+            self._beat(rgbmatrix5x5)
             for x in range(self._width):
                 for y in range(self._height):
                     _hue = int(time.time() * 100) % 360
@@ -440,6 +462,7 @@ class RgbMatrix(Feature):
         self._set_color(self._rgbmatrix5x5_STBD, self._color)
         self._log.info('starting solid color to {}...'.format(str.lower(self._color.name)))
         while enabled:
+            self._beat(rgbmatrix5x5)
             time.sleep(0.2)
 
     # ..........................................................................
@@ -451,6 +474,7 @@ class RgbMatrix(Feature):
         self._log.info('starting dark...')
         self.set_color(Color.BLACK)
         while enabled:
+            self._beat(rgbmatrix5x5)
             time.sleep(0.2)
 
     # ..........................................................................
@@ -476,6 +500,7 @@ class RgbMatrix(Feature):
             _delta = 2
 
         while enabled:
+            self._beat(rgbmatrix5x5)
             for i in range(3):
                 for z in list(range(1, 10)[::-1]) + list(range(1, 10)):
                     fwhm = 5.0/z
@@ -524,6 +549,7 @@ class RgbMatrix(Feature):
         _delay = 0.25
 
         while enabled:
+            self._beat(rgbmatrix5x5)
 #           for i in range(count):
             for y in range(0,self._height):
                 rgbmatrix5x5.clear()
@@ -549,6 +575,7 @@ class RgbMatrix(Feature):
         self._log.info('starting random...')
         count = 0
         while enabled:
+            self._beat(rgbmatrix5x5)
             rand_hue = numpy.random.uniform(0.1, 0.9)
             rand_mat = numpy.random.rand(self._width,self._height)
             for y in range(self._height):
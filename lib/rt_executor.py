@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-23
+# modified: 2021-05-07
+#
+# A dedicated, optionally real-time thread for executing the critical control
+# callbacks (motor PID, encoder velocity) at a fixed rate.
+#
+
+import os, time, itertools
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.filters import IntervalEstimator
+from lib.timing import now_ns, NS_PER_US, NS_PER_SEC
+
+# ..............................................................................
+class RealTimeExecutor(object):
+    '''
+    Executes a list of callbacks on a dedicated thread at a fixed rate,
+    scheduled on absolute deadlines so that callback execution time does
+    not accumulate as drift.
+
+    This is a drop-in for the Ticker (i.e., it provides add_callback() and
+    freq_hz), so it can be passed to a Velocity in place of a Ticker, and
+    a PIDController can be attached via its set_executor() method.
+
+    If the 'realtime' configuration property is True the thread will, where
+    permitted, set itself to the SCHED_FIFO scheduling policy at the
+    configured priority and pin itself to the configured CPU core, ideally
+    one isolated from the kernel scheduler via 'isolcpus=3' on the kernel
+    command line. This requires root or the CAP_SYS_NICE capability; if not
+    permitted the executor logs a warning and continues as an ordinary
+    thread.
+
+    The lateness of each wakeup relative to its deadline is recorded, and
+    is available as the jitter statistics.
+
+    :param config:   the application configuration
+    :param level:    the log level
+    '''
+    def __init__(self, config, level=Level.INFO):
+        self._log = Logger("rt-exec", level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config = config['ros'].get('rt_executor')
+        self._loop_freq_hz = _config.get('loop_freq_hz')
+        self._period_ns    = round(NS_PER_SEC / self._loop_freq_hz)
+        self._realtime     = _config.get('realtime')
+        self._priority     = _config.get('priority')
+        self._cpu          = _config.get('cpu')
+        self._log.info('loop frequency: {:d}Hz; real-time: {}; priority: {:d}; cpu: {:d}'.format(
+                self._loop_freq_hz, self._realtime, self._priority, self._cpu))
+        self._callbacks    = []
+        self._lateness     = IntervalEstimator(_config.get('jitter_window'))
+        self._max_late_ns  = 0
+        self._overruns     = 0
+        self._is_realtime  = False
+        self._counter      = itertools.count()
+        self._thread       = None
+        self._enabled      = False
+        self._closed       = False
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def name(self):
+        return 'rt-executor'
+
+    # ..........................................................................
+    def add_callback(self, callback):
+        '''
+        Adds a no-argument callback, to be executed once per loop in the
+        order added.
+        '''
+        self._callbacks.append(callback)
+
+    # ..........................................................................
+    @property
+    def freq_hz(self):
+        return self._loop_freq_hz
+
+    # ..........................................................................
+    @property
+    def is_realtime(self):
+        '''
+        Returns True if the executor thread succeeded in obtaining the
+        SCHED_FIFO scheduling policy.
+        '''
+        return self._is_realtime
+
+    # ..........................................................................
+    @property
+    def jitter_stats(self):
+        '''
+        Returns a tuple of wakeup lateness statistics, in microseconds:
+        (mean, standard deviation, maximum), followed by the overrun count.
+        '''
+        if self._lateness.count == 0:
+            return 0.0, 0.0, 0.0, self._overruns
+        return self._lateness.mean / NS_PER_US, ( self._lateness.variance ** 0.5 ) / NS_PER_US, \
+                self._max_late_ns / NS_PER_US, self._overruns
+
+    # ..........................................................................
+    def print_jitter_stats(self):
+        _mean, _stdev, _max, _overruns = self.jitter_stats
+        self._log.info('jitter: mean {:8.2f}µs; stdev: {:8.2f}µs; max: {:8.2f}µs; overruns: {:d}; real-time: {}'.format(
+                _mean, _stdev, _max, _overruns, self._is_realtime))
+
+    # ..........................................................................
+    def _configure_thread(self):
+        '''
+        Called from within the executor thread: on Linux a pid of zero
+        refers to the calling thread, so this affects only this thread.
+        '''
+        if not self._realtime:
+            return
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(self._priority))
+            self._is_realtime = True
+            self._log.info(Fore.GREEN + 'set SCHED_FIFO priority {:d}.'.format(self._priority))
+        except (AttributeError, PermissionError, OSError) as e:
+            self._log.warning('unable to set SCHED_FIFO scheduling, continuing as ordinary thread: {}'.format(e))
+        if self._cpu >= 0:
+            try:
+                os.sched_setaffinity(0, { self._cpu })
+                self._log.info(Fore.GREEN + 'pinned to cpu {:d}.'.format(self._cpu))
+            except (AttributeError, PermissionError, OSError) as e:
+                self._log.warning('unable to pin thread to cpu {:d}: {}'.format(self._cpu, e))
+
+    # ..........................................................................
+    def _loop(self, f_is_enabled):
+        '''
+        The executor loop, which executes while the f_is_enabled flag is True.
+        '''
+        self._configure_thread()
+        _deadline = now_ns() + self._period_ns
+        while f_is_enabled():
+            for callback in self._callbacks:
+                callback()
+            _now = now_ns()
+            if _deadline > _now:
+                time.sleep(( _deadline - _now ) / NS_PER_SEC)
+            _woke = now_ns()
+            _late = _woke - _deadline
+            self._lateness.add(_late)
+            if _late > self._max_late_ns:
+                self._max_late_ns = _late
+            _deadline += self._period_ns
+            if _woke > _deadline:
+                # overran a whole period: skip missed deadlines rather than bursting to catch up
+                self._overruns += 1
+                _deadline = _woke + self._period_ns
+            next(self._counter)
+        self._log.info('exited executor loop.')
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            if self._enabled:
+                self._log.warning('executor already enabled.')
+            else:
+                # if we haven't started the thread yet, do so now...
+                if self._thread is None:
+                    self._enabled = True
+                    self._thread = Thread(name='rt-executor', target=RealTimeExecutor._loop, args=[self, lambda: self.enabled], daemon=True)
+                    self._thread.start()
+                    self._log.info('executor enabled.')
+                else:
+                    self._log.warning('cannot enable executor: thread already exists.')
+        else:
+            self._log.warning('cannot enable executor: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread is not None:
+                self._thread.join(timeout=1.0)
+            self._thread = None
+            self._log.info('executor disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if not self._closed:
+            if self._enabled:
+                self.disable()
+            self._closed = True
+            self.print_jitter_stats()
+            self._log.info('closed.')
+        else:
+            self._log.warning('already closed.')
+
+#EOF
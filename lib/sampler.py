@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-09
+# modified: 2021-05-10
+#
+# A sampler thread that acquires sensor readings into a double-buffered
+# snapshot, decoupling slow (e.g., I²C) acquisition from the clock tick.
+#
+
+import time
+from array import array
+from threading import Thread, Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.filters import RunningMean
+from lib.timing import now_ns
+
+# ..............................................................................
+class Sampler(object):
+    '''
+    Calls an acquisition function on its own thread at a fixed frequency,
+    which fills an array of unsigned shorts with raw sensor values.
+
+    There are two arrays: the acquisition fills the back array while the
+    front array holds the latest completed snapshot, and upon completion
+    the two are swapped, along with the snapshot's sequence number and
+    timestamp. The lock is held only for the swap and for read(), which
+    copies the front array, so a reader never waits on acquisition, nor
+    sees a partially filled snapshot.
+
+    Before each acquisition the back array is refreshed from the front, so
+    that an acquisition need only fill the values it has read (e.g., a scan
+    of some of the sensors), the others retaining their latest values.
+
+    sample() performs a single acquisition on the calling thread, e.g.,
+    for testing, or to provide a first snapshot before enabling.
+
+    :param name:     the name of the sampler (and its thread)
+    :param acquire:  the function filling the array passed to it
+    :param size:     the length of the snapshot array
+    :param freq_hz:  the sampling frequency
+    :param level:    the log level
+    '''
+    def __init__(self, name, acquire, size, freq_hz, level=Level.INFO):
+        self._log = Logger(name, level)
+        if acquire is None:
+            raise ValueError('null acquire argument.')
+        self._name         = name
+        self._acquire      = acquire
+        self._size         = size
+        self._period_sec   = 1.0 / freq_hz
+        self._buffers      = [ array('H', bytes(2 * size)), array('H', bytes(2 * size)) ]
+        self._front        = 0
+        self._sequence     = 0
+        self._timestamp_ns = 0
+        self._errors       = 0
+        self._acquire_us   = RunningMean(50)
+        self._lock         = Lock()
+        self._thread       = None
+        self._enabled      = False
+        self._closed       = False
+        self._log.info('ready at {:5.2f}Hz.'.format(freq_hz))
+
+    # ..........................................................................
+    def snapshot(self):
+        '''
+        Returns a new array for use with read().
+        '''
+        return array('H', bytes(2 * self._size))
+
+    # ..........................................................................
+    def sample(self):
+        '''
+        Acquires a snapshot into the back array, then swaps it to the front.
+        '''
+        _back = 1 - self._front # only the sampling thread changes the front
+        _start_ns = now_ns()
+        self._buffers[_back][:] = self._buffers[self._front]
+        self._acquire(self._buffers[_back])
+        _timestamp_ns = now_ns()
+        with self._lock:
+            self._front = _back
+            self._sequence += 1
+            self._timestamp_ns = _timestamp_ns
+        self._acquire_us.add(( _timestamp_ns - _start_ns ) // 1000)
+
+    # ..........................................................................
+    def read(self, snapshot):
+        '''
+        Copies the latest completed snapshot into the array, returning its
+        sequence number (zero if there has been none) and timestamp (ns).
+        '''
+        with self._lock:
+            snapshot[:] = self._buffers[self._front]
+            return self._sequence, self._timestamp_ns
+
+    # ..........................................................................
+    @property
+    def sequence(self):
+        return self._sequence
+
+    # ..........................................................................
+    @property
+    def errors(self):
+        '''
+        Returns the number of acquisitions that have raised an exception.
+        '''
+        return self._errors
+
+    # ..........................................................................
+    @property
+    def acquire_us(self):
+        '''
+        Returns the mean duration of recent acquisitions in microseconds.
+        '''
+        return self._acquire_us.mean
+
+    # ..........................................................................
+    def _sample_loop(self):
+        _next = time.monotonic()
+        while self._enabled:
+            try:
+                self.sample()
+            except Exception as e:
+                self._errors += 1
+                self._log.error('error acquiring sample: {}'.format(e))
+            _next += self._period_sec
+            _delay = _next - time.monotonic()
+            if _delay > 0.0:
+                time.sleep(_delay)
+            else: # overrun: start afresh rather than trying to catch up
+                _next = time.monotonic()
+        self._log.info('exited sampling loop.')
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if self._closed:
+            self._log.warning('cannot enable: already closed.')
+        elif not self._enabled:
+            self._enabled = True
+            self._thread = Thread(name=self._name, target=self._sample_loop, daemon=True)
+            self._thread.start()
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread:
+                self._thread.join(timeout=max(1.0, 4.0 * self._period_sec))
+                self._thread = None
+            self._log.info('disabled.')
+        else:
+            self._log.debug('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
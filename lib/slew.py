@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-04-27
-# modified: 2020-05-21
+# modified: 2021-05-05
 #
 # A general purpose slew limiter that limits the rate of change of a value.
 #
@@ -25,6 +25,7 @@ except ImportError:
 
 from lib.logger import Level, Logger
 from lib.enums import Orientation
+from lib.timing import NS_PER_MS
 
 # ..............................................................................
 class SlewLimiter():
@@ -57,6 +58,15 @@ class SlewLimiter():
         self._enabled           = False
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds, e.g.,
+        a VirtualClock's now_ns() when simulating.
+        '''
+        self._millis = lambda: now_ns() // NS_PER_MS
+        self._start_time = self._millis()
+
     # ..........................................................................
     def set_rate_limit(self, slew_rate):
         '''
@@ -109,16 +119,9 @@ class SlewLimiter():
         if target_value == current_value:
             _value = current_value
 #           self._log.debug(Fore.BLACK + 'already there; returning target: {:+06.2f})'.format(_value))
-        elif target_value > current_value: # increasing ..........
-            _min = current_value - ( self._rate_limit * _elapsed )
-            _max = current_value + ( self._rate_limit * _elapsed )
-            _value = numpy.clip(target_value, _min, _max)
-#           self._log.debug(Fore.GREEN + '-value: {:+06.2f} = numpy.clip(target_value: {:+06.2f}), _min: {:+06.2f}), _max: {:+06.2f}); elapsed: {:+06.2f}'.format(_value, target_value, _min, _max, _elapsed))
-        else: # decreasing .......................................
-            _min = current_value - ( self._rate_limit * _elapsed )
-            _max = current_value + ( self._rate_limit * _elapsed )
-            _value = numpy.clip(target_value, _min, _max)
-#           self._log.debug(Fore.RED + '-value: {:+06.2f} = numpy.clip(target_value: {:+06.2f}), _min: {:+06.2f}), _max: {:+06.2f}); elapsed: {:+06.2f}'.format(_value, target_value, _min, _max, _elapsed))
+        else: # limit the change (using min/max, as numpy.clip is slow on scalars)
+            _change = self._rate_limit * _elapsed
+            _value = max(current_value - _change, min(current_value + _change, target_value))
 
         # clip the output between min and max set in config (if negative we fix it before and after)
         if _value < 0:
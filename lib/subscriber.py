@@ -13,12 +13,12 @@
 import asyncio
 import random
 from typing import final
-from datetime import datetime as dt
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Logger, Level
 from lib.event import Event
+from lib.timing import elapsed_ms
 
 LOG_INDENT = ( ' ' * 60 ) + Fore.CYAN + ': ' + Fore.CYAN
 
@@ -194,7 +194,7 @@ class Subscriber(object):
                 raise Exception('cannot process: message has been garbage collected.')
             message.process(self)
             if self._message_bus.verbose:
-                _elapsed_ms = (dt.now() - message.timestamp).total_seconds() * 1000.0
+                _elapsed_ms = elapsed_ms(message.timestamp)
                 self.print_message_info('processing message:', message, _elapsed_ms)
             # want to sleep for less than the deadline amount
             await asyncio.sleep(2)
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-12
+# modified: 2021-05-15
+#
+# A pipelined sweep engine for a ranging sensor on a servo (e.g., the Lidar),
+# with a calibrated model of the servo's settle time.
+#
+
+import math, time
+import numpy
+from threading import Thread, Lock
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+
+# ..............................................................................
+class SettleModel(object):
+    '''
+    The time a servo takes to settle after being commanded to move by a
+    number of degrees, modelled as
+
+        settle = dead time + |degrees| / slew rate + margin
+
+    so that a sweep need not poll the servo's position (which for the
+    UltraBorg is in any case its commanded rather than actual position).
+
+    :param dead_time_sec:  the delay before the servo begins to move
+    :param rate_dps:       the slew rate in degrees per second
+    :param margin_sec:     an added margin for ringing and readout
+    '''
+    def __init__(self, dead_time_sec, rate_dps, margin_sec=0.0):
+        if rate_dps <= 0.0:
+            raise ValueError('slew rate must be greater than zero.')
+        self._dead_time_sec = dead_time_sec
+        self._rate_dps      = rate_dps
+        self._margin_sec    = margin_sec
+
+    # ..........................................................................
+    @staticmethod
+    def fit(samples, margin_sec=0.0):
+        '''
+        Fits a SettleModel to a sequence of measured (degrees moved, settle
+        time sec) samples by linear least squares.
+        '''
+        _samples = numpy.asarray(samples, dtype=numpy.float64).reshape(-1, 2)
+        if len(_samples) < 2:
+            raise ValueError('at least two samples are required to fit a settle model.')
+        _slope, _intercept = numpy.polyfit(numpy.abs(_samples[:,0]), _samples[:,1], 1)
+        if _slope <= 0.0:
+            raise ValueError('samples do not describe a settle time increasing with distance.')
+        return SettleModel(max(_intercept, 0.0), 1.0 / _slope, margin_sec)
+
+    # ..........................................................................
+    @property
+    def dead_time_sec(self):
+        return self._dead_time_sec
+
+    @property
+    def rate_dps(self):
+        return self._rate_dps
+
+    @property
+    def margin_sec(self):
+        return self._margin_sec
+
+    # ..........................................................................
+    def settle_sec(self, degrees):
+        '''
+        Returns the time to settle after a move of the number of degrees.
+        '''
+        return self._dead_time_sec + abs(degrees) / self._rate_dps + self._margin_sec
+
+# ..............................................................................
+class SweepEngine(object):
+    '''
+    Sweeps a servo through a range of angles, taking a reading from a
+    ranging sensor at each, returning the scan as a NumPy array of (angle,
+    range mm) rows.
+
+    The ranging sensor (e.g., a VL53L1X) is expected to range continuously,
+    each measurement integrating over the timing budget, with read_distance()
+    blocking until the next measurement is complete. A pipelined sweep
+    commands the next angle as soon as each measurement of the current angle
+    has been returned, so that the servo moves during the gap before the
+    sensor's next measurement rather than in sequence with it. The gap is
+    the inter-measurement period less the budget, so the sensor should be
+    set to inter_measurement_ms, which allows for the settle time of one
+    step as given by the SettleModel. Should a measurement nevertheless
+    have begun before the servo settled it is discarded and another read.
+
+    The sequential sweep is that previously used by the Lidar: it polls
+    the servo's position until it matches, reads the sensor, then lingers
+    for step_delay_sec at each angle.
+
+    sweep_continuously() sweeps back and forth, writing each reading as a
+    (time, angle, range mm) row into a ring buffer of ring_capacity rows,
+    and keeping the latest complete sweep; enable() does so on its own
+    thread until disabled.
+
+    This uses the ros:lidar: section of the configuration.
+
+    :param config:  the application configuration
+    :param servo:   the servo, with set_position(degrees) and get_position(default)
+    :param ranger:  the ranging sensor, with read_distance()
+    :param level:   the log level
+    '''
+    def __init__(self, config, servo, ranger, level=Level.INFO):
+        self._log = Logger('sweep', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if servo is None:
+            raise ValueError('null servo argument.')
+        if ranger is None:
+            raise ValueError('null ranger argument.')
+        self._servo  = servo
+        self._ranger = ranger
+        _lidar_config = config['ros'].get('lidar')
+        _config = _lidar_config.get('sweep')
+        self._min_angle      = _lidar_config.get('min_angle')
+        self._max_angle      = _lidar_config.get('max_angle')
+        self._degree_step    = _lidar_config.get('degree_step')
+        self._step_delay_sec = _lidar_config.get('step_delay_sec')
+        self._error_range    = 0.067
+        self._pipelined      = _config.get('pipelined')
+        self._budget_sec     = _config.get('budget_ms') / 1000.0
+        self._settle_model   = SettleModel(_config.get('settle_dead_ms') / 1000.0, _config.get('settle_rate_dps'),
+                _config.get('settle_margin_ms') / 1000.0)
+        self._angles = numpy.arange(self._min_angle, self._max_angle + 0.01, self._degree_step)
+        self._position   = 0.0 # the last commanded angle
+        self._moving_from = 0.0 # the angle from which set_position() last moved
+        self._settles_at = None # when that move is expected to have settled
+        self._discarded  = 0
+        self._sweep_sec  = 0.0
+        # continuous sweeping
+        self._ring       = numpy.zeros(( _config.get('ring_capacity'), 3 ))
+        self._ring_count = 0
+        self._latest     = None
+        self._lock       = Lock()
+        self._thread     = None
+        self._now        = time.monotonic
+        self._sleep      = time.sleep
+        self._enabled    = False
+        self._closed     = False
+        self._log.info('ready: {:d} angles from {:>4.1f}° to {:>4.1f}°; {} sweep; inter-measurement period {:d}ms.'.format(
+                len(self._angles), self._min_angle, self._max_angle, 'pipelined' if self._pipelined else 'sequential',
+                self.inter_measurement_ms))
+
+    # ..........................................................................
+    def set_time_source(self, now, sleep):
+        '''
+        Sets the functions returning the time (sec) and sleeping, e.g., of
+        a simulation.
+        '''
+        self._now   = now
+        self._sleep = sleep
+
+    # ..........................................................................
+    @property
+    def settle_model(self):
+        return self._settle_model
+
+    def set_settle_model(self, settle_model):
+        self._settle_model = settle_model
+        self._log.info('settle model: dead time {:4.1f}ms; rate {:5.1f}°/sec; margin {:4.1f}ms; inter-measurement period {:d}ms.'.format(
+                settle_model.dead_time_sec * 1000.0, settle_model.rate_dps, settle_model.margin_sec * 1000.0, self.inter_measurement_ms))
+
+    # ..........................................................................
+    @property
+    def inter_measurement_ms(self):
+        '''
+        Returns the inter-measurement period (ms) the ranging sensor should
+        be set to for a pipelined sweep: the budget plus the settle time of
+        one step.
+        '''
+        return int(math.ceil(( self._budget_sec + self._settle_model.settle_sec(self._degree_step) ) * 1000.0))
+
+    # ..........................................................................
+    @property
+    def angles(self):
+        return self._angles
+
+    @property
+    def discarded(self):
+        '''
+        Returns the number of readings discarded as having begun before
+        the servo had settled.
+        '''
+        return self._discarded
+
+    @property
+    def sweep_sec(self):
+        '''
+        Returns the duration of the most recent sweep (sec).
+        '''
+        return self._sweep_sec
+
+    # ..........................................................................
+    def set_position(self, degrees):
+        '''
+        Moves the servo to the angle without waiting, recording it as the
+        position from which the settle time of the next sweep's first move
+        is modelled. The servo should only be moved otherwise than by a
+        sweep by this method.
+        '''
+        self._servo.set_position(degrees)
+        self._moving_from = self._position
+        self._settles_at  = self._now() + self._settle_model.settle_sec(degrees - self._position)
+        self._position    = degrees
+
+    # ..........................................................................
+    def _first_settle_sec(self, degrees):
+        '''
+        Returns the time for the servo to settle upon the angle from its
+        position. If it may still be moving from a previous set_position()
+        it could be anywhere between where it began and its target, so the
+        farther of the two is assumed.
+        '''
+        _distance = abs(degrees - self._position)
+        if self._settles_at is not None and self._now() < self._settles_at:
+            _distance = max(_distance, abs(degrees - self._moving_from))
+        return self._settle_model.settle_sec(_distance)
+
+    # ..........................................................................
+    def sweep(self, reverse=False):
+        '''
+        Sweeps from the minimum to the maximum angle (or the reverse),
+        returning an array of (angle, range mm) rows.
+        '''
+        if self._pipelined:
+            return self.sweep_pipelined(reverse)
+        else:
+            return self.sweep_sequential(reverse)
+
+    # ..........................................................................
+    def sweep_pipelined(self, reverse=False):
+        _angles = self._angles[::-1] if reverse else self._angles
+        _scan   = numpy.empty(( len(_angles), 2 ))
+        _scan[:,0] = _angles
+        _servo, _ranger, _now = self._servo, self._ranger, self._now
+        _budget_sec, _model = self._budget_sec, self._settle_model
+        _start = _now()
+        # the first angle may be far from the current position: wait for the
+        # servo, any measurement begun before it arrived then being discarded
+        _servo.set_position(_angles[0])
+        self._sleep(self._first_settle_sec(_angles[0]))
+        _settled_at = _now()
+        for i in range(len(_angles)):
+            while True:
+                _mm = _ranger.read_distance()
+                # the measurement integrated over the budget before it returned
+                if _now() - _budget_sec >= _settled_at:
+                    break
+                self._discarded += 1
+            if i + 1 < len(_angles):
+                _servo.set_position(_angles[i + 1])
+                _settled_at = _now() + _model.settle_sec(_angles[i + 1] - _angles[i])
+            _scan[i,1] = _mm
+        self._position = _angles[-1]
+        self._sweep_sec = _now() - _start
+        self._log.info('pipelined sweep of {:d} angles complete: {:5.3f}sec elapsed.'.format(len(_angles), self._sweep_sec))
+        return _scan
+
+    # ..........................................................................
+    def sweep_sequential(self, reverse=False):
+        _angles = self._angles[::-1] if reverse else self._angles
+        _scan   = numpy.empty(( len(_angles), 2 ))
+        _scan[:,0] = _angles
+        _start = self._now()
+        self._servo.set_position(_angles[0])
+        self._sleep(0.3)
+        for i, _degrees in enumerate(_angles):
+            self._servo.set_position(_degrees)
+            _wait_count = 0
+            while abs(self._servo.get_position(_degrees) - _degrees) > self._error_range and _wait_count < 10:
+                self._sleep(0.0025)
+                _wait_count += 1
+            _scan[i,1] = self._ranger.read_distance()
+            self._sleep(self._step_delay_sec)
+        self._position = _angles[-1]
+        self._sweep_sec = self._now() - _start
+        self._log.info('sequential sweep of {:d} angles complete: {:5.3f}sec elapsed.'.format(len(_angles), self._sweep_sec))
+        return _scan
+
+    # ..........................................................................
+    def calibrate(self, steps=( 5.0, 10.0, 20.0, 40.0 ), tolerance=0.5, timeout_sec=1.0):
+        '''
+        Measures the settle time of the servo for moves of each number of
+        degrees, polling its position every millisecond until within the
+        tolerance, then fits and sets a SettleModel, which is returned.
+        This requires a servo reporting its actual position.
+        '''
+        _samples = []
+        _origin = self._min_angle
+        self._move_to(_origin, tolerance, timeout_sec)
+        self._sleep(0.1)
+        for _step in steps:
+            for _target in ( _origin + _step, _origin ):
+                _samples.append(( _step, self._move_to(_target, tolerance, timeout_sec) ))
+        self._position = _origin
+        _model = SettleModel.fit(_samples, self._settle_model.margin_sec)
+        self.set_settle_model(_model)
+        return _model
+
+    # ..........................................................................
+    def _move_to(self, target, tolerance, timeout_sec):
+        '''
+        Moves the servo to the target angle, returning the time taken to
+        come within the tolerance of it.
+        '''
+        _start = self._now()
+        self._servo.set_position(target)
+        while abs(self._servo.get_position(target) - target) > tolerance:
+            if self._now() - _start > timeout_sec:
+                raise RuntimeError('servo did not reach {:>5.2f}° within {:4.2f}sec.'.format(target, timeout_sec))
+            self._sleep(0.001)
+        return self._now() - _start
+
+    # ..........................................................................
+    def sweep_continuously(self, count=None):
+        '''
+        Sweeps back and forth into the ring buffer until disabled, or for
+        count sweeps if provided. Returns the number of sweeps.
+        '''
+        _sweeps = 0
+        _reverse = False
+        while count is None and self._enabled or count is not None and _sweeps < count:
+            _scan = self.sweep(_reverse)
+            _now = self._now()
+            with self._lock:
+                _n = len(_scan)
+                _capacity = len(self._ring)
+                _index = self._ring_count % _capacity
+                for i in range(_n):
+                    _row = self._ring[( _index + i ) % _capacity]
+                    _row[0] = _now
+                    _row[1:] = _scan[i]
+                self._ring_count += _n
+                self._latest = _scan
+            _reverse = not _reverse
+            _sweeps += 1
+        return _sweeps
+
+    # ..........................................................................
+    def get_latest(self):
+        '''
+        Returns the latest complete sweep as an array of (angle, range mm)
+        rows, or None if there has been none.
+        '''
+        with self._lock:
+            return None if self._latest is None else self._latest.copy()
+
+    # ..........................................................................
+    def get_ring(self):
+        '''
+        Returns the readings held in the ring buffer, oldest first, as an
+        array of (time, angle, range mm) rows.
+        '''
+        with self._lock:
+            _capacity = len(self._ring)
+            if self._ring_count < _capacity:
+                return self._ring[:self._ring_count].copy()
+            _index = self._ring_count % _capacity
+            return numpy.concatenate(( self._ring[_index:], self._ring[:_index] ))
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        '''
+        Starts sweeping continuously on a separate thread.
+        '''
+        if self._closed:
+            self._log.warning('cannot enable: already closed.')
+        elif not self._enabled:
+            self._enabled = True
+            self._thread = Thread(name='sweep', target=self.sweep_continuously, daemon=True)
+            self._thread.start()
+            self._log.info('enabled.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread:
+                self._thread.join(timeout=10.0)
+                self._thread = None
+            self._log.info('disabled.')
+        else:
+            self._log.debug('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
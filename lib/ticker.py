@@ -37,6 +37,7 @@ class Ticker(object):
         self._rate         = Rate(self._loop_freq_hz)
         self._log.info('tick frequency: {:d}Hz'.format(self._loop_freq_hz))
         self._callbacks    = []
+        self._heartbeat    = None
         self._thread       = None
         self._enabled      = False
         self._closed       = False
@@ -46,6 +47,13 @@ class Ticker(object):
     def add_callback(self, callback):
         self._callbacks.append(callback)
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog, name='ticker'):
+        '''
+        Registers this ticker as a control loop with the Watchdog.
+        '''
+        self._heartbeat = watchdog.register(name, 1.0 / self._loop_freq_hz, control=True)
+
     # ..........................................................................
     def name(self):
         return 'clock'
@@ -61,10 +69,14 @@ class Ticker(object):
         The clock loop, which executes while the f_is_enabled flag is True.
         '''
         while f_is_enabled():
+            if self._heartbeat:
+                self._heartbeat.beat()
             for callback in self._callbacks:
                 self._log.debug('executing callback...')
                 callback()
             self._rate.wait()
+        if self._heartbeat:
+            self._heartbeat.release()
         self._log.info('exited clock loop.')
 
     # ..........................................................................
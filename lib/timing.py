@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-22
+# modified: 2021-04-22
+#
+# Integer nanosecond monotonic timestamps and cheap elapsed-time helpers.
+#
+# All hot paths (the Clock, Rate, Message, Velocity, Motor, the Arbitrator,
+# Controller and IntegratedFrontSensor) use these rather than datetime.now()
+# or time.time(). Datetime arithmetic is comparatively slow (an object is
+# created for each timestamp and each difference), and wall clock time
+# jumps when NTP syncs on the Pi, whereas the monotonic clock never goes
+# backwards and an integer subtraction is about as cheap as it gets.
+#
+# Wall clock time should only be used for display or for naming files.
+#
+
+import time
+
+NS_PER_US  = 1000
+NS_PER_MS  = 1000000
+NS_PER_SEC = 1000000000
+
+# the monotonic nanosecond counter, as a module-level alias
+now_ns = time.monotonic_ns
+
+# ..............................................................................
+def elapsed_ns(start_ns):
+    '''
+    Returns the elapsed time since the provided start timestamp, as
+    integer nanoseconds.
+    '''
+    return time.monotonic_ns() - start_ns
+
+# ..............................................................................
+def elapsed_ms(start_ns):
+    '''
+    Returns the elapsed time since the provided start timestamp, as
+    (float) milliseconds.
+    '''
+    return ( time.monotonic_ns() - start_ns ) / NS_PER_MS
+
+# ..............................................................................
+def elapsed_sec(start_ns):
+    '''
+    Returns the elapsed time since the provided start timestamp, as
+    (float) seconds.
+    '''
+    return ( time.monotonic_ns() - start_ns ) / NS_PER_SEC
+
+# ..............................................................................
+def ns_to_ms(ns):
+    '''
+    Converts a nanosecond duration to (float) milliseconds.
+    '''
+    return ns / NS_PER_MS
+
+# ..............................................................................
+def ns_to_sec(ns):
+    '''
+    Converts a nanosecond duration to (float) seconds.
+    '''
+    return ns / NS_PER_SEC
+
+#EOF
@@ -7,7 +7,7 @@
 #
 # author:   altheim
 # created:  2020-03-31
-# modified: 2020-03-31
+# modified: 2021-05-12
 #
 
 import sys
@@ -72,6 +72,22 @@ class TimeOfFlight():
             self._tof.set_timing(UPDATE_TIME_MICROS, INTER_MEASUREMENT_PERIOD_MILLIS)
         self._log.info('ready.')
 
+    # ..........................................................................
+    def set_timing(self, budget_us, inter_measurement_ms):
+        '''
+        Sets the timing budget (µs) over which each measurement integrates
+        and the inter-measurement period (ms), from the start of one
+        measurement to the start of the next, which must exceed the budget.
+        This applies only to the PERFORMANCE range.
+        '''
+        if inter_measurement_ms * 1000 <= budget_us:
+            raise ValueError('inter-measurement period of {:d}ms must exceed the timing budget of {:d}µs.'.format(inter_measurement_ms, budget_us))
+        if self._range is Range.PERFORMANCE:
+            self._tof.set_timing(budget_us, inter_measurement_ms)
+            self._log.info('timing budget {:d}µs; inter-measurement period {:d}ms.'.format(budget_us, inter_measurement_ms))
+        else:
+            self._log.warning('timing unchanged for {} range.'.format(self._range.name))
+
     # ..........................................................................
     def read_distance(self):
         '''
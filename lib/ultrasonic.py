@@ -7,10 +7,11 @@
 #
 # author:   altheim
 # created:  2020-03-31
-# modified: 2020-03-31
+# modified: 2021-05-15
 #
 
 import time
+from threading import Thread, Lock
 from colorama import init, Fore, Style
 init()
 
@@ -20,12 +21,32 @@ except ImportError:
     exit("This script requires the numpy module\nInstall with: pip3 install --user numpy")
 
 from lib.servo import Servo
+from lib.range_bins import RangeBins
 from lib.logger import Logger, Level
 
 # ..............................................................................
 class UltrasonicScanner():
+    '''
+    An ultrasonic sensor on a servo, driven by an UltraBorg.
 
-    def __init__(self, config, level):
+    scan() performs a single blocking sweep. Alternatively, start_scanning()
+    sweeps back and forth continuously on a separate thread, recording the
+    latest range of each bearing in a RangeBins, which may be queried at any
+    time with get_range(), get_minimum() and get_ages() without waiting.
+    Only one of these may drive the servo at a time: scan() refuses while
+    scanning continuously, and vice versa.
+
+    The sensor reads zero both when nothing is in range and when it fails
+    to read a very close obstacle, so a zero is retried (as in scan()) and,
+    if it persists, the bearing is skipped rather than recorded. A bearing
+    with nothing in range therefore keeps its previous reading, which ages;
+    queries may ignore old readings with max_age_sec.
+
+    :param config:  the application configuration
+    :param level:   the log level
+    :param servo:   the optional Servo (or a mock)
+    '''
+    def __init__(self, config, level, servo=None):
         self._log = Logger('ultrasonic', Level.INFO)
         self._config = config
         if self._config:
@@ -36,6 +57,7 @@ class UltrasonicScanner():
             self._degree_step = _config.get('degree_step')
             self._use_raw_distance = _config.get('use_raw_distance')
             self._read_delay_sec = _config.get('read_delay_sec')
+            self._zero_retries = _config.get('zero_retries')
             self._log.info('read delay: {:>4.1f} sec'.format(self._read_delay_sec))
             _servo_number = _config.get('servo_number')
         else:
@@ -45,13 +67,20 @@ class UltrasonicScanner():
             self._degree_step = 3.0
             self._use_raw_distance = False
             self._read_delay_sec = 0.1
+            self._zero_retries = 3
             _servo_number = 2
 
         self._log.info('scan from {:>5.2f} to {:>5.2f} with step of {:>4.1f}°'.format(self._min_angle, self._max_angle, self._degree_step))
-        self._servo = Servo(self._config, _servo_number, level)
+        self._servo = servo if servo else Servo(self._config, _servo_number, level)
         self._ub = self._servo.get_ultraborg()
 #       self._tof = TimeOfFlight(_range, Level.WARN)
         self._error_range = 0.067
+        self._max_retries = 10
+        self._bins = RangeBins(self._min_angle, self._max_angle, self._degree_step)
+        self._servo_lock = Lock() # held by scan() or while scanning continuously
+        self._thread = None
+        self._scanning = False
+        self._sweeps = 0
         self._enabled = False
         self._closed = False
         self._log.info('ready.')
@@ -65,7 +94,16 @@ class UltrasonicScanner():
         if not self._enabled:
             self._log.warning('cannot scan: disabled.')
             return
+        if not self._servo_lock.acquire(blocking=False):
+            self._log.warning('cannot scan: already scanning.')
+            return
+        try:
+            return self._scan()
+        finally:
+            self._servo_lock.release()
 
+    # ..........................................................................
+    def _scan(self):
         start = time.time()
         _min_mm = 9999.0
         _angle_at_min = 0.0
@@ -130,6 +168,118 @@ class UltrasonicScanner():
         self._servo.set_position(0.0)
         return [ _angle_at_min, _min_mm, _angle_at_max, _max_mm ]
 
+    # ..........................................................................
+    def _read(self):
+        '''
+        Returns the distance (mm) at the current position, retrying a zero
+        reading up to zero_retries times, or None upon failure or if the
+        reading remains zero.
+        '''
+        for i in range(self._zero_retries + 1):
+            _mm = self._servo.get_distance(self._max_retries, self._use_raw_distance)
+            if _mm is None:
+                return None
+            elif _mm > 0.01:
+                return _mm
+            time.sleep(self._read_delay_sec)
+        return None
+
+    # ..........................................................................
+    def _scan_continuously(self):
+        '''
+        Sweeps back and forth until stopped, recording each reading. Each
+        sweep begins next to where the last ended, so there is neither a
+        return to the minimum angle nor a second reading at the turn. The
+        servo lock acquired by start_scanning() is released upon return.
+        '''
+        _bearings = self._bins.bearings
+        _reverse = False
+        _start = 0
+        try:
+            while self._scanning:
+                for _degrees in ( _bearings[::-1] if _reverse else _bearings )[_start:]:
+                    if not self._scanning:
+                        break
+                    self._servo.set_position(_degrees)
+                    time.sleep(self._read_delay_sec)
+                    _mm = self._read()
+                    if _mm is None:
+                        self._log.debug('no distance read at {:>5.2f}°.'.format(_degrees))
+                    else:
+                        self._bins.put(_degrees, _mm)
+                else:
+                    self._sweeps += 1
+                _reverse = not _reverse
+                _start = 1
+        finally:
+            self._servo_lock.release()
+
+    # ..........................................................................
+    def start_scanning(self):
+        '''
+        Starts sweeping continuously on a separate thread.
+        '''
+        if not self._enabled:
+            self._log.warning('cannot scan: disabled.')
+        elif not self._scanning:
+            if not self._servo_lock.acquire(blocking=False):
+                self._log.warning('cannot start scanning: scan in progress.')
+                return
+            self._scanning = True
+            self._thread = Thread(name='uscanner', target=self._scan_continuously, daemon=True)
+            self._thread.start()
+            self._log.info('started scanning from {:>5.2f} to {:>5.2f}°.'.format(self._min_angle, self._max_angle))
+
+    # ..........................................................................
+    def stop_scanning(self):
+        if self._scanning:
+            self._scanning = False
+            if self._thread:
+                self._thread.join(timeout=2.0)
+                self._thread = None
+            self._log.info('stopped scanning after {:d} sweeps.'.format(self._sweeps))
+
+    # ..........................................................................
+    @property
+    def scanning(self):
+        return self._scanning
+
+    @property
+    def sweeps(self):
+        '''
+        Returns the number of complete sweeps while scanning continuously.
+        '''
+        return self._sweeps
+
+    # ..........................................................................
+    def get_range(self, bearing):
+        '''
+        Returns the latest range (mm) at the bearing and its age (sec) as a
+        tuple, or None if none has been read.
+        '''
+        return self._bins.get(bearing)
+
+    # ..........................................................................
+    def get_minimum(self, min_bearing, max_bearing, max_age_sec=None):
+        '''
+        Returns the bearing and range (mm) of the nearest reading between
+        the bearings as a tuple, ignoring readings older than max_age_sec
+        if provided, or None if there is none.
+        '''
+        return self._bins.minimum(min_bearing, max_bearing, max_age_sec)
+
+    # ..........................................................................
+    def get_ages(self):
+        '''
+        Returns the age (sec) of the reading at each bearing as an array,
+        in the order of get_bearings().
+        '''
+        return self._bins.get_ages()
+
+    # ..........................................................................
+    def get_bearings(self):
+        return self._bins.bearings
+
     # ..........................................................................
     def enable(self):
         if self._closed:
@@ -140,6 +290,7 @@ class UltrasonicScanner():
 
     # ..........................................................................
     def disable(self):
+        self.stop_scanning()
         self._enabled = False
         self._servo.disable()
 #       self._tof.disable()
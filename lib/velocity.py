@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2020-09-13
-# modified: 2020-09-13
+# modified: 2021-05-02
 #
 # Unlike other enums this one requires configuration as it involves the
 # specifics of the motor encoders and physical geometry of the robot.
@@ -22,6 +22,8 @@ from lib.enums import Orientation
 from lib.message import Message
 from lib.event import Event
 from lib.logger import Level, Logger
+from lib.timing import now_ns, NS_PER_MS
+from lib.edge_velocity import EdgeVelocity
 
 # ..............................................................................
 class Velocity(object):
@@ -90,6 +92,12 @@ class Velocity(object):
     and multiply that constant times the number of milliseconds passed since the
     last function call.
 
+    At low speed counting steps is too coarse, so if configured with the
+    'edge' velocity_estimator and the motor provides timestamped steps
+    (i.e., uses an EdgeDecoder) the velocity is instead estimated from
+    the step timestamps by an EdgeVelocity. Either way a confidence value
+    (0.0-1.0) is provided along with the velocity.
+
     TODO:
       a. measure unloaded wheel speed at maximum power (in steps per second,
          from encoders) to obtain maximum velocity as upper limit
@@ -127,15 +135,33 @@ class Velocity(object):
         _test_velocity = self.steps_to_cm(self._steps_per_rotation)
         self._log.info(Fore.GREEN + 'example conversion:\t{:7.4f}cm/rotation'.format(_test_velocity))
         assert _test_velocity == self._wheel_circumference
+        # velocity estimator: 'count' or 'edge'
+        _motors_config = config['ros'].get('motors')
+        self._confidence_steps = _motors_config.get('edge_velocity').get('confidence_steps')
+        if _motors_config.get('velocity_estimator') == 'edge':
+            self._edge_velocity = EdgeVelocity(config, level)
+        else:
+            self._edge_velocity = None
         # ..............................
+        self._now_ns       = now_ns
         self._stepcount_timestamp = None
         self._steps_begin  = 0      # step count at beginning of velocity measurement
         self._velocity     = 0.0    # current velocity
+        self._confidence   = 0.0    # confidence in current velocity
         self._max_velocity = 0.0    # capture maximum velocity attained
         self._enabled      = False
         self._closed       = False
         self._log.info('ready.')
 
+    # ..............................................................................
+    def set_time_source(self, now_ns):
+        '''
+        Sets the function returning the current time in nanoseconds, e.g.,
+        a VirtualClock's now_ns() when simulating.
+        '''
+        self._now_ns = now_ns
+        self._stepcount_timestamp = now_ns()
+
     # ..............................................................................
     def steps_to_cm(self, steps):
         return steps / self._steps_per_cm
@@ -153,12 +179,17 @@ class Velocity(object):
         velocity based on the tick/step count of the motor encoder.
         '''
         if self._enabled:
-            if self._motor.enabled: # then calculate velocity from motor encoder's step count
+            if self._motor.enabled and self._edge_velocity and self._motor.edge_ring is not None:
+                # calculate velocity from the timestamps of the motor encoder's steps
+                self._steps_begin = self._motor.steps # folds any new steps into the ring
+                _steps_per_sec, self._confidence = self._edge_velocity.estimate(self._motor.edge_ring, self._motor.get_current_tick())
+                self._velocity = self.steps_to_cm(self._motor.pulse_sign * _steps_per_sec)
+                self._max_velocity = max(self._velocity, self._max_velocity)
+            elif self._motor.enabled: # then calculate velocity from motor encoder's step count
                 _time_diff_ms = 0.0
                 _steps = self._motor.steps
                 if self._steps_begin != 0:
-                    _time_diff_sec = time.time() - self._stepcount_timestamp
-                    _time_diff_ms = _time_diff_sec * 1000.0
+                    _time_diff_ms = ( self._now_ns() - self._stepcount_timestamp ) / NS_PER_MS
                     _time_error_ms = self._period_ms - _time_diff_ms
                     # we multiply our step count by the percentage error to obtain
                     # what would be the step count for our 50.0ms period
@@ -169,17 +200,20 @@ class Velocity(object):
                     _steps_per_sec = _corrected_diff_steps * self._freq_hz
                     _cm_per_sec = self.steps_to_cm(_steps_per_sec)
                     self._velocity = _cm_per_sec
+                    self._confidence = min(1.0, abs(_diff_steps) / self._confidence_steps)
                     self._max_velocity = max(self._velocity, self._max_velocity)
                     self._log.info(Fore.BLUE + '{:+d} steps, {:+d}/{:5.2f} diff/corrected; time diff: {:>5.2f}ms; error: {:>5.2f}%;\t'.format(\
                             self._motor.steps, _diff_steps, _corrected_diff_steps, _time_diff_ms, _time_error_percent * 100.0) \
                             + Fore.YELLOW + 'velocity: {:>5.2f} steps/sec; {:<5.2f}cm/sec'.format(_steps_per_sec, self._velocity))
-                self._stepcount_timestamp = time.time()
+                self._stepcount_timestamp = self._now_ns()
                 self._steps_begin = _steps
             else:
                 self._log.warning('handle() failed: motor disabled.')
                 self._velocity = 0.0
+                self._confidence = 0.0
         else:
             self._velocity = 0.0 # or None?
+            self._confidence = 0.0
 #       return self._velocity
 #       return message
 
@@ -192,6 +226,16 @@ class Velocity(object):
 #       self._log.info(Fore.BLUE + '__call__() {:+d} steps; RETURN velocity: {:<5.2f}'.format(self._motor.steps, self._velocity))
         return self._velocity
 
+    # ..............................................................................
+    @property
+    def confidence(self):
+        '''
+        Returns the confidence (0.0-1.0) in the current velocity, from the
+        number of steps it was calculated from and, for the 'edge' estimator,
+        the time since the newest step.
+        '''
+        return self._confidence
+
     # ..............................................................................
     @property
     def max_velocity(self):
@@ -89,6 +89,7 @@ class Video():
         self._filename = None
         self._thread   = None
         self._killer   = None
+        self._heartbeat = None
 
         # scan I2c bus for devices
         _i2c_scanner = I2CScanner(Level.DEBUG)
@@ -121,6 +122,13 @@ class Video():
         else:
             self._log.info('ready: save to file only, no streaming.')
 
+    # ..........................................................................
+    def set_watchdog(self, watchdog):
+        '''
+        Registers the once-per-second annotation loop with the Watchdog.
+        '''
+        self._heartbeat = watchdog.register('video', 1.0)
+
     # ..........................................................................
     def set_compass(self, compass):
         global g_compass
@@ -223,11 +231,15 @@ class Video():
         self._camera = camera
         _count = 0
         while f_is_enabled():
+            if self._heartbeat:
+                self._heartbeat.beat()
 #           _count = next(self._counter)
             self._camera.annotate_text = Video.get_annotation()
 #           if ( _count % 5 ) == 0: # every five seconds
             self.set_night_mode(camera, self.is_night_mode())
             time.sleep(1.0)
+        if self._heartbeat:
+            self._heartbeat.release()
 
     # ..........................................................................
     def set_night_mode(self, camera, enabled):
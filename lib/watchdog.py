@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-25
+# modified: 2021-04-25
+#
+# A watchdog that monitors the heartbeats of the various ROS thread loops,
+# reporting loop overruns and stalls.
+#
+
+import sys, time, traceback, threading
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.timing import now_ns, NS_PER_MS, NS_PER_SEC
+
+# ..............................................................................
+class Heartbeat(object):
+    '''
+    The heartbeat of a single registered loop, obtained from the Watchdog's
+    register() method. The loop calls beat() once per iteration, which
+    simply records the timestamp and the calling thread's identity, and
+    counts an overrun if the interval since the previous beat exceeded the
+    overrun threshold. This is intended to be cheap enough for any loop.
+
+    A loop that exits normally should call release(), so that it is no
+    longer monitored until its next beat.
+
+    :param name:        the name of the loop
+    :param period_ns:   the expected loop period in nanoseconds, or None if
+                        the loop is event-driven (aperiodic)
+    :param stall_ns:    the interval without a beat considered a stall
+    :param overrun_ns:  the interval between beats considered an overrun
+    :param control:     True if this is a control loop
+    '''
+    def __init__(self, name, period_ns, stall_ns, overrun_ns, control):
+        self._name       = name
+        self._period_ns  = period_ns
+        self._stall_ns   = stall_ns
+        self._overrun_ns = overrun_ns
+        self._control    = control
+        self._ident      = None
+        self._last_ns    = None
+        self._max_ns     = 0
+        self._beats      = 0
+        self._overruns   = 0
+        self._stalled_ns = None
+
+    # ..........................................................................
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def period_ns(self):
+        return self._period_ns
+
+    @property
+    def stall_ns(self):
+        return self._stall_ns
+
+    @property
+    def control(self):
+        return self._control
+
+    @property
+    def ident(self):
+        '''
+        Returns the identity of the thread that last beat.
+        '''
+        return self._ident
+
+    @property
+    def last_ns(self):
+        '''
+        Returns the timestamp of the last beat, None if released.
+        '''
+        return self._last_ns
+
+    # ..........................................................................
+    @property
+    def stalled(self):
+        return self._stalled_ns is not None
+
+    def set_stalled(self, stalled):
+        '''
+        Called by the Watchdog to mark (or clear) the stall at the
+        timestamp of the last beat, so that a subsequent beat indicates
+        the loop has recovered.
+        '''
+        self._stalled_ns = self._last_ns if stalled else None
+
+    @property
+    def recovered(self):
+        '''
+        Returns True if stalled but the loop has since beat again.
+        '''
+        return self._stalled_ns is not None and self._last_ns is not None \
+                and self._last_ns != self._stalled_ns
+
+    # ..........................................................................
+    @property
+    def stats(self):
+        '''
+        Returns a tuple of: beat count, overrun count and the maximum
+        interval between beats in milliseconds.
+        '''
+        return self._beats, self._overruns, self._max_ns / NS_PER_MS
+
+    # ..........................................................................
+    def beat(self):
+        _now = now_ns()
+        if self._last_ns is not None:
+            _interval = _now - self._last_ns
+            if _interval > self._max_ns:
+                self._max_ns = _interval
+            if self._overrun_ns and _interval > self._overrun_ns:
+                self._overruns += 1
+        self._last_ns = _now
+        self._ident   = threading.get_ident()
+        self._beats  += 1
+
+    # ..........................................................................
+    def release(self):
+        self._last_ns    = None
+        self._stalled_ns = None
+
+# ..............................................................................
+class Watchdog(object):
+    '''
+    Monitors the heartbeats of registered thread loops. Each loop registers
+    its expected period up front (e.g., via the set_watchdog() method of the
+    Clock, Ticker, Arbitrator, etc.) and calls beat() on the returned
+    Heartbeat once per iteration.
+
+    The watchdog runs its own low frequency thread, which checks the age of
+    each heartbeat. A loop that has not beat for 'stall_factor' times its
+    expected period is considered stalled, and its thread's current stack
+    is logged (obtained via sys._current_frames()), so that it's possible
+    to see where it's stuck. A loop whose thread has died without releasing
+    its heartbeat is similarly reported. Event-driven loops registered with
+    a period of None are only monitored for the latter.
+
+    If a stalled loop was registered as a control loop the configured
+    'control_event' (e.g., STOP) is published on the message bus. When a
+    stalled loop resumes beating this is logged as recovered.
+
+    Overruns (an interval between beats greater than 'overrun_factor'
+    times the period) are counted by the Heartbeat itself and reported
+    upon close.
+
+    :param config:           the application configuration
+    :param message_bus:      the message bus
+    :param message_factory:  the factory for messages
+    :param level:            the log level
+    '''
+    def __init__(self, config, message_bus, message_factory, level=Level.INFO):
+        self._log = Logger("watchdog", level)
+        if message_bus is None:
+            raise ValueError('null message bus argument.')
+        self._message_bus = message_bus
+        if message_factory is None:
+            raise ValueError('null message factory argument.')
+        self._message_factory = message_factory
+        if config is None:
+            raise ValueError('null configuration argument.')
+        _config               = config['ros'].get('watchdog')
+        self._loop_freq_hz    = _config.get('loop_freq_hz')
+        self._stall_factor    = _config.get('stall_factor')
+        self._overrun_factor  = _config.get('overrun_factor')
+        self._control_event   = Event.from_str(_config.get('control_event'))
+        self._log.info('check frequency: {:d}Hz; stall factor: {:4.1f}; overrun factor: {:4.1f}; control event: {}'.format(
+                self._loop_freq_hz, self._stall_factor, self._overrun_factor, self._control_event.name))
+        self._heartbeats      = {}
+        self._stall_count     = 0
+        self._thread          = None
+        self._enabled         = False
+        self._closed          = False
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def name(self):
+        return 'watchdog'
+
+    # ..........................................................................
+    def register(self, name, period_sec, control=False):
+        '''
+        Registers a loop with the watchdog, returning its Heartbeat.
+        Registering an existing name replaces its Heartbeat.
+
+        :param name:        the unique name of the loop
+        :param period_sec:  the expected loop period in seconds, None if aperiodic
+        :param control:     True if this is a control loop, whose stall will
+                            publish the configured control event
+        '''
+        if period_sec is None:
+            _period_ns  = None
+            _stall_ns   = None
+            _overrun_ns = None
+        else:
+            _period_ns  = round(period_sec * NS_PER_SEC)
+            _stall_ns   = round(_period_ns * self._stall_factor)
+            _overrun_ns = round(_period_ns * self._overrun_factor)
+        _heartbeat = Heartbeat(name, _period_ns, _stall_ns, _overrun_ns, control)
+        self._heartbeats[name] = _heartbeat
+        if period_sec is None:
+            self._log.info('registered aperiodic {}loop \'{}\'.'.format('control ' if control else '', name))
+        else:
+            self._log.info('registered {}loop \'{}\' with period {:5.3f}s.'.format('control ' if control else '', name, period_sec))
+        return _heartbeat
+
+    # ..........................................................................
+    def unregister(self, name):
+        if self._heartbeats.pop(name, None):
+            self._log.info('unregistered loop \'{}\'.'.format(name))
+
+    # ..........................................................................
+    @property
+    def stall_count(self):
+        return self._stall_count
+
+    # ..........................................................................
+    def _get_stack(self, frames, ident):
+        '''
+        Returns the formatted current stack of the thread with the provided
+        identity, or None if the thread is not alive.
+        '''
+        _frame = frames.get(ident)
+        if _frame is None:
+            return None
+        return ''.join(traceback.format_stack(_frame))
+
+    # ..........................................................................
+    def _stalled(self, heartbeat, age_ns, stack):
+        heartbeat.set_stalled(True)
+        self._stall_count += 1
+        if stack is None:
+            self._log.error(Style.BRIGHT + 'loop \'{}\' thread has died.'.format(heartbeat.name))
+        else:
+            self._log.error(Style.BRIGHT + 'loop \'{}\' stalled: no heartbeat for {:d}ms (period {:d}ms); stack:\n'.format(
+                    heartbeat.name, age_ns // NS_PER_MS, heartbeat.period_ns // NS_PER_MS) + Fore.RED + Style.NORMAL + stack)
+        if heartbeat.control:
+            self._log.warning('control loop \'{}\' stalled: publishing {} event.'.format(heartbeat.name, self._control_event.name))
+            _message = self._message_factory.get_message(self._control_event, heartbeat.name)
+            self._message_bus.handle(_message)
+
+    # ..........................................................................
+    def check(self):
+        '''
+        Checks all registered heartbeats once. This is called by the watchdog
+        loop but may also be called directly.
+        '''
+        _now = now_ns()
+        _frames = sys._current_frames()
+        for _heartbeat in list(self._heartbeats.values()):
+            _last_ns = _heartbeat.last_ns
+            if _last_ns is None:
+                continue
+            _age_ns = _now - _last_ns
+            if _heartbeat.stalled:
+                if _heartbeat.recovered:
+                    _heartbeat.set_stalled(False)
+                    self._log.info(Fore.GREEN + 'loop \'{}\' recovered.'.format(_heartbeat.name))
+            elif _heartbeat.stall_ns and _age_ns > _heartbeat.stall_ns:
+                self._stalled(_heartbeat, _age_ns, self._get_stack(_frames, _heartbeat.ident))
+            elif _heartbeat.ident not in _frames:
+                self._stalled(_heartbeat, _age_ns, None)
+
+    # ..........................................................................
+    def _loop(self, f_is_enabled):
+        '''
+        The watchdog loop, which executes while the f_is_enabled flag is True.
+        '''
+        _period_sec = 1.0 / self._loop_freq_hz
+        while f_is_enabled():
+            self.check()
+            time.sleep(_period_sec)
+        self._log.info('exited watchdog loop.')
+
+    # ..........................................................................
+    def print_stats(self):
+        for _heartbeat in self._heartbeats.values():
+            _beats, _overruns, _max_ms = _heartbeat.stats
+            _fore = Fore.YELLOW if _overruns > 0 else Fore.GREEN
+            self._log.info(_fore + '{:<14} beats: {:>8d}; overruns: {:>5d}; max interval: {:9.3f}ms'.format(
+                    _heartbeat.name, _beats, _overruns, _max_ms))
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            if self._enabled:
+                self._log.warning('watchdog already enabled.')
+            else:
+                # if we haven't started the thread yet, do so now...
+                if self._thread is None:
+                    self._enabled = True
+                    self._thread = Thread(name='watchdog', target=Watchdog._loop, args=[self, lambda: self.enabled], daemon=True)
+                    self._thread.start()
+                    self._log.info('watchdog enabled.')
+                else:
+                    self._log.warning('cannot enable watchdog: thread already exists.')
+        else:
+            self._log.warning('cannot enable watchdog: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread is not None:
+                self._thread.join(timeout=1.0)
+            self._thread = None
+            self._log.info('watchdog disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if not self._closed:
+            if self._enabled:
+                self.disable()
+            self._closed = True
+            self.print_stats()
+            self._log.info('closed.')
+        else:
+            self._log.warning('already closed.')
+
+#EOF
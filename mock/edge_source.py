@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-01
+# modified: 2021-05-02
+#
+# A mock source of pigpio notification reports for a quadrature encoder.
+#
+
+import numpy
+
+from lib.edge_decoder import REPORT_DTYPE
+
+# ..............................................................................
+class MockEdgeSource(object):
+    '''
+    Generates the pigpio notification reports of a quadrature encoder on
+    the A and B GPIOs, in place of a NotificationPipe, for use with the
+    EdgeDecoder. Each step is four edges: for a forward step B rises, then
+    A rises (the step), B falls and A falls; the reverse for a backward step.
+
+    Steps may alternatively be placed at given times with add_step_at(),
+    e.g., by a simulated plant, in which case advance_to() keeps the
+    current tick in step with the simulation.
+
+    The generated edges are also recorded as (gpio, level, tick) tuples, so
+    that they may be replayed through the callback Decoder for comparison.
+
+    :param gpio_a:  pin number for A
+    :param gpio_b:  pin number for B
+    :param tick:    the initial tick (µs), by default near the 32 bit wrap
+    '''
+    def __init__(self, gpio_a, gpio_b, tick=0xFFFF0000):
+        self._gpio_a = gpio_a
+        self._gpio_b = gpio_b
+        self._origin = tick
+        self._tick   = tick
+        self._level  = 0
+        self._seqno  = 0
+        self._pending = []
+        self.edges    = []
+
+    # ..........................................................................
+    def get_current_tick(self):
+        return self._tick & 0xFFFFFFFF
+
+    # ..........................................................................
+    def advance(self, microseconds):
+        '''
+        Advances the tick without generating any edges.
+        '''
+        self._tick += microseconds
+
+    # ..........................................................................
+    def advance_to(self, microseconds):
+        '''
+        Sets the tick to the given time since the initial tick.
+        '''
+        self._tick = self._origin + int(microseconds)
+
+    # ..........................................................................
+    def _edge(self, gpio, level, interval_us):
+        self._tick += interval_us
+        self._edge_at(gpio, level, self._tick)
+
+    # ..........................................................................
+    def _edge_at(self, gpio, level, tick):
+        if level:
+            self._level |= 1 << gpio
+        else:
+            self._level &= ~( 1 << gpio )
+        _tick = tick & 0xFFFFFFFF
+        self._pending.append(( self._seqno & 0xFFFF, 0, _tick, self._level ))
+        self._seqno += 1
+        self.edges.append(( gpio, level, _tick ))
+
+    # ..........................................................................
+    def add_steps(self, steps, period_us):
+        '''
+        Generates the edges of the given number of steps (negative for
+        backward), each of the period in microseconds.
+        '''
+        _quarter = max(1, int(round(period_us / 4.0)))
+        if steps >= 0:
+            _first, _second = self._gpio_b, self._gpio_a
+        else:
+            _first, _second = self._gpio_a, self._gpio_b
+        for i in range(abs(steps)):
+            self._edge(_first,  1, _quarter)
+            self._edge(_second, 1, _quarter)
+            self._edge(_first,  0, _quarter)
+            self._edge(_second, 0, _quarter)
+
+    # ..........................................................................
+    def add_step_at(self, microseconds, direction, quarter_us=10):
+        '''
+        Generates the edges of a single step (direction +1 or -1) whose
+        counted edge occurs at the given time since the initial tick, the
+        other edges quarter_us apart. This does not change the current tick.
+        '''
+        _tick = self._origin + int(microseconds)
+        if direction >= 0:
+            _first, _second = self._gpio_b, self._gpio_a
+        else:
+            _first, _second = self._gpio_a, self._gpio_b
+        self._edge_at(_first,  1, _tick - quarter_us)
+        self._edge_at(_second, 1, _tick)
+        self._edge_at(_first,  0, _tick + quarter_us)
+        self._edge_at(_second, 0, _tick + 2 * quarter_us)
+
+    # ..........................................................................
+    def add_report(self, flags):
+        '''
+        Adds a non-edge report, e.g., a keep-alive.
+        '''
+        self._pending.append(( self._seqno & 0xFFFF, flags, self._tick & 0xFFFFFFFF, self._level ))
+        self._seqno += 1
+
+    # ..........................................................................
+    def read(self):
+        _reports = numpy.array([ ( s, f, t, l ) for s, f, t, l in self._pending ], dtype=REPORT_DTYPE)
+        self._pending.clear()
+        return _reports.tobytes()
+
+    # ..........................................................................
+    def close(self):
+        pass
+
+#EOF
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-11
+# modified: 2021-05-11
+#
+# A mock of the GPIO inputs of a pigpio pi, delivering edges (e.g., of a bouncing
+# switch) to its callbacks on a separate thread, as does pigpio.
+#
+
+import time
+from queue import Queue
+from threading import Thread
+
+from lib.timing import now_ns
+
+# as pigpio
+RISING_EDGE  = 0
+FALLING_EDGE = 1
+EITHER_EDGE  = 2
+
+# ..............................................................................
+class _Callback(object):
+    def __init__(self, source, gpio, edge, func):
+        self._source = source
+        self.gpio = gpio
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        self._source._cancel(self)
+
+# ..............................................................................
+class MockGpioEdgeSource(object):
+    '''
+    The subset of a pigpio pi used for GPIO inputs. Each GPIO is high (as
+    with a pull-up) until changed by an edge. Edges are scheduled by edge(),
+    or as the hit and release of a bouncing switch by press() and release(),
+    and delivered at their time by a dispatch thread to the callbacks
+    registered by callback(), with their level and tick (µs), as by pigpio's
+    callback thread.
+
+    press() returns the time (as lib.timing.now_ns()) of the first edge of
+    the hit, so that the latency from a hit to its event may be measured.
+
+    :param bounces:    the number of bounces of each press and release
+    :param bounce_us:  the interval between the edges of a bounce
+    '''
+    def __init__(self, bounces=3, bounce_us=200):
+        self._bounces   = bounces
+        self._bounce_us = bounce_us
+        self._levels    = {}
+        self._callbacks = []
+        self._next_ns   = 0 # edges are scheduled no earlier than this
+        self._queue     = Queue()
+        self.edges      = 0
+        self._thread    = Thread(name='mock-gpio', target=self._dispatch, daemon=True)
+        self._thread.start()
+
+    # ..........................................................................
+    def set_mode(self, gpio, mode):
+        pass
+
+    # ..........................................................................
+    def set_pull_up_down(self, gpio, pud):
+        pass
+
+    # ..........................................................................
+    def read(self, gpio):
+        return self._levels.get(gpio, 1)
+
+    # ..........................................................................
+    def get_current_tick(self):
+        return ( now_ns() // 1000 ) & 0xFFFFFFFF
+
+    # ..........................................................................
+    def callback(self, gpio, edge, func):
+        _callback = _Callback(self, gpio, edge, func)
+        self._callbacks.append(_callback)
+        return _callback
+
+    # ..........................................................................
+    def _cancel(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    # ..........................................................................
+    def edge(self, gpio, level, delay_us=0):
+        '''
+        Schedules an edge of the GPIO to the level, delay_us after the
+        current time or the previously scheduled edge, whichever is later.
+        Returns the time of the edge (ns).
+        '''
+        _edge_ns = max(now_ns(), self._next_ns) + delay_us * 1000
+        self._next_ns = _edge_ns
+        self._queue.put(( _edge_ns, gpio, level ))
+        return _edge_ns
+
+    # ..........................................................................
+    def press(self, gpio):
+        '''
+        Schedules the edges of a switch on the GPIO closing (to low) with
+        bounce. Returns the time of the first edge (ns).
+        '''
+        _edge_ns = self.edge(gpio, 0)
+        for i in range(self._bounces):
+            self.edge(gpio, 1, self._bounce_us)
+            self.edge(gpio, 0, self._bounce_us)
+        return _edge_ns
+
+    # ..........................................................................
+    def release(self, gpio):
+        '''
+        Schedules the edges of a switch on the GPIO opening (to high) with
+        bounce.
+        '''
+        self.edge(gpio, 1)
+        for i in range(self._bounces):
+            self.edge(gpio, 0, self._bounce_us)
+            self.edge(gpio, 1, self._bounce_us)
+
+    # ..........................................................................
+    def wait(self):
+        '''
+        Blocks until every scheduled edge has been delivered.
+        '''
+        self._queue.join()
+
+    # ..........................................................................
+    def _dispatch(self):
+        while True:
+            _edge_ns, _gpio, _level = self._queue.get()
+            try:
+                if _gpio is None:
+                    return
+                _delay_ns = _edge_ns - now_ns()
+                if _delay_ns > 0:
+                    time.sleep(_delay_ns / 1e9)
+                if self._levels.get(_gpio, 1) == _level:
+                    continue # not an edge
+                self._levels[_gpio] = _level
+                self.edges += 1
+                _tick = ( _edge_ns // 1000 ) & 0xFFFFFFFF
+                for _callback in list(self._callbacks):
+                    if _callback.gpio == _gpio and ( _callback.edge == EITHER_EDGE
+                            or _callback.edge == ( FALLING_EDGE if _level == 0 else RISING_EDGE )):
+                        _callback.func(_gpio, _level, _tick)
+            finally:
+                self._queue.task_done()
+
+    # ..........................................................................
+    def stop(self):
+        self._queue.put(( 0, None, None ))
+        self._thread.join()
+
+#EOF
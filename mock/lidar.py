@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-12
+# modified: 2021-05-12
+#
+# A simulated servo and continuously-ranging ToF sensor, sharing a simulated
+# time, so that the sweeps of the Lidar may be timed and checked off-robot.
+#
+
+# ..............................................................................
+class SimTime(object):
+    '''
+    A time (sec) that only advances upon sleep(), to be given to the
+    SweepEngine's set_time_source() as now() and sleep().
+    '''
+    def __init__(self):
+        self._time = 0.0
+
+    def now(self):
+        return self._time
+
+    def sleep(self, sec):
+        self._time += max(sec, 0.0)
+
+# ..............................................................................
+class MockServo(object):
+    '''
+    A servo that after a dead time slews at a constant rate to each commanded
+    position. Unlike the UltraBorg, get_position() returns its actual position.
+
+    :param time:           the SimTime
+    :param dead_time_sec:  the delay before the servo begins to move
+    :param rate_dps:       the slew rate in degrees per second
+    '''
+    def __init__(self, time, dead_time_sec=0.008, rate_dps=500.0):
+        self._time          = time
+        self._dead_time_sec = dead_time_sec
+        self._rate_dps      = rate_dps
+        self._start_time    = 0.0
+        self._start         = 0.0
+        self._target        = 0.0
+        self.commands       = 0
+
+    def position_at(self, t):
+        _moved = max(t - self._start_time - self._dead_time_sec, 0.0) * self._rate_dps
+        _distance = self._target - self._start
+        if _moved >= abs(_distance):
+            return self._target
+        return self._start + ( _moved if _distance > 0.0 else -_moved )
+
+    def set_position(self, degrees):
+        _now = self._time.now()
+        self._start      = self.position_at(_now)
+        self._start_time = _now
+        self._target     = degrees
+        self.commands += 1
+
+    def get_position(self, default):
+        return self.position_at(self._time.now())
+
+# ..............................................................................
+class MockRanger(object):
+    '''
+    A ToF sensor ranging continuously, as a VL53L1X: a measurement begins
+    every inter-measurement period and integrates over the timing budget.
+    read_distance() returns the latest measurement completed since the last
+    read, if any, otherwise waits for the next to complete.
+
+    The range is that of the scene (a function of angle returning mm) at
+    the servo's mean position over the measurement, which is blurred if the
+    servo moved more than tolerance degrees during it.
+
+    :param time:               the SimTime
+    :param servo:              the MockServo
+    :param scene:              the function of angle returning the range in mm
+    :param budget_sec:         the timing budget
+    :param inter_measurement_sec: the inter-measurement period
+    :param tolerance:          the movement (degrees) beyond which a measurement is blurred
+    '''
+    def __init__(self, time, servo, scene, budget_sec=0.066, inter_measurement_sec=0.070, tolerance=0.1):
+        if inter_measurement_sec <= budget_sec:
+            raise ValueError('inter-measurement period must exceed the timing budget.')
+        self._time      = time
+        self._servo     = servo
+        self._scene     = scene
+        self._budget    = budget_sec
+        self._period    = inter_measurement_sec
+        self._tolerance = tolerance
+        self._last      = -1 # the index of the last measurement read
+        self.blurred    = 0
+
+    def set_timing(self, budget_sec, inter_measurement_sec):
+        self._budget = budget_sec
+        self._period = inter_measurement_sec
+
+    def read_distance(self):
+        _now = self._time.now()
+        # the index of the latest measurement complete by now
+        _latest = int(( _now - self._budget ) // self._period)
+        if _latest <= self._last:
+            _latest = self._last + 1
+            self._time.sleep(_latest * self._period + self._budget - _now)
+        self._last = _latest
+        _start = _latest * self._period
+        _positions = [ self._servo.position_at(_start + self._budget * i / 10.0) for i in range(11) ]
+        if max(_positions) - min(_positions) > self._tolerance:
+            self.blurred += 1
+        return int(round(self._scene(sum(_positions) / len(_positions))))
+
+#EOF
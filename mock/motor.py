@@ -21,6 +21,7 @@ except ImportError:
     sys.exit(1)
 
 from lib.logger import Level, Logger
+from lib.timing import now_ns
 from lib.enums import Orientation
 from lib.slew import SlewRate
 from lib.decoder import Decoder
@@ -103,10 +104,10 @@ class Motor(object):
         self._max_power = 0.0                # capture maximum power applied
         self._max_driving_power = 0.0        # capture maximum adjusted power applied
         self._interrupt = False              # used to interrupt loops
-        self._stepcount_timestamp = time.time()  # timestamp at beginning of velocity measurement
+        self._stepcount_timestamp = now_ns()     # timestamp at beginning of velocity measurement
         self._enabled = False                # was by default enabled
         self._killed  = False                # if killed we never re-enable
-        self._start_timestamp = time.time()  # timestamp at beginning of velocity measurement
+        self._start_timestamp = now_ns()     # timestamp at beginning of velocity measurement
 
         # configure encoder ................................
         self._log.info('configuring rotary encoders...')
@@ -346,6 +347,15 @@ class Motor(object):
         else:
             return value
 
+    # ..........................................................................
+    @property
+    def current_power(self):
+        '''
+        Returns the last commanded driving power. The mock ThunderBorg
+        returns this directly.
+        '''
+        return self.get_current_power_level()
+
     # ..........................................................................
     @staticmethod
     def velocity_to_power(velocity):
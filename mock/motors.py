@@ -12,13 +12,13 @@
 
 import asyncio
 import random
-from datetime import datetime as dt
 from colorama import init, Fore, Style
 init()
 
 from lib.logger import Logger, Level
 from lib.enums import Orientation
 from lib.event import Event
+from lib.timing import elapsed_ms
 from lib.subscriber import Subscriber
 from mock.motor import Motor
 
@@ -165,7 +165,7 @@ class Motors(Subscriber):
             message.process(self)
             print('motors.process_message() 2. ---------------------------------- ')
             if self._message_bus.verbose:
-                _elapsed_ms = (dt.now() - message.timestamp).total_seconds() * 1000.0
+                _elapsed_ms = elapsed_ms(message.timestamp)
                 self.print_message_info('processing message:', message, _elapsed_ms)
             # switch on event type...
             _event = message.event
@@ -197,7 +197,7 @@ class Motors(Subscriber):
             await asyncio.sleep(2)
 
             if self._message_bus.verbose:
-                _elapsed_ms = (dt.now() - message.timestamp).total_seconds() * 1000.0
+                _elapsed_ms = elapsed_ms(message.timestamp)
                 self.print_message_info('processing complete:', message, _elapsed_ms)
 
     # ................................................................
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-08
+# modified: 2021-05-11
+#
+# A register-level mock of the MS51 microcontroller of a Pimoroni IO Expander,
+# counting I²C transactions, and a mock of the ioexpander library's IOE using
+# it, so that bulk acquisition may be compared with per-pin reads off-robot.
+#
+
+import time
+
+from lib.ioe_scan import ( IOE_PINS, PORT_REGISTERS, REG_ADCRL, REG_ADCRH, REG_ADCCON0,
+        REG_ADCCON1, REG_AINDIDS, ADCCON0_ADCF, ADCCON0_ADCS, ADCCON1_ADCEN )
+
+ADC = 0b01010   # as ioexpander.ADC
+IN_PU = 0b10000 # as ioexpander.IN_PU
+
+# ..............................................................................
+class MockMS51(object):
+    '''
+    The registers of an MS51, as accessed over I²C with the same read() and
+    write() as the Ms51Bus. Each read or write counts as one transaction; a
+    read of more than one byte reads consecutive registers.
+
+    The port registers reflect the levels set by set_level() (pins are high
+    by default, as with their pull-ups), and setting ADCS in ADCCON0 completes
+    a conversion of the selected channel immediately, from the voltage set by
+    set_voltage(). As with the MS51, writes to the port registers are bit
+    addressed: 0b1000 | bit sets the bit, otherwise it is cleared.
+
+    A delay per transaction may be given to approximate the time taken on
+    the bus.
+
+    :param vref:            the ADC reference voltage
+    :param transaction_us:  the delay per transaction in microseconds
+    '''
+    def __init__(self, vref=3.3, transaction_us=0):
+        self._vref = vref
+        self._delay_sec = transaction_us / 1000000.0
+        self._registers = bytearray(256)
+        for _reg in PORT_REGISTERS:
+            self._registers[_reg] = 0xFF
+        self._voltages = [ 0.0 ] * 8
+        self.transactions = 0
+
+    # ..........................................................................
+    def set_voltage(self, channel, volts):
+        self._voltages[channel] = volts
+
+    # ..........................................................................
+    def set_level(self, port, bit, level):
+        if level:
+            self._registers[PORT_REGISTERS[port]] |= 1 << bit
+        else:
+            self._registers[PORT_REGISTERS[port]] &= ~( 1 << bit ) & 0xFF
+
+    # ..........................................................................
+    def read(self, reg, length=1):
+        self.transactions += 1
+        if self._delay_sec:
+            time.sleep(self._delay_sec)
+        return list(self._registers[reg:reg + length])
+
+    # ..........................................................................
+    def write(self, reg, value):
+        self.transactions += 1
+        if self._delay_sec:
+            time.sleep(self._delay_sec)
+        if reg in PORT_REGISTERS:
+            _bit = value & 0b111
+            self.set_level(PORT_REGISTERS.index(reg), _bit, value & 0b1000)
+            return
+        self._registers[reg] = value & 0xFF
+        if reg == REG_ADCCON0 and value & ADCCON0_ADCS:
+            _channel = value & 0x0f
+            _count = int(round(min(max(self._voltages[_channel], 0.0), self._vref) / self._vref * 4095.0))
+            self._registers[REG_ADCRH] = _count >> 4
+            self._registers[REG_ADCRL] = _count & 0x0f
+            self._registers[REG_ADCCON0] = ( value & ~ADCCON0_ADCS & 0xFF ) | ADCCON0_ADCF
+
+# ..............................................................................
+class MockIOE(object):
+    '''
+    A mock of the ioexpander library's IOE, performing the same sequence of
+    register reads and writes upon a MockMS51 for input() as the library,
+    less its sleeps. Only the ADC and input modes are supported.
+
+    If given a GPIO source (e.g., a MockGpioEdgeSource) and pin, the
+    board's interrupt output is connected to that pin: when enabled, a
+    change of an input pin by set_input() with its interrupt enabled drives
+    the pin low until the interrupt is cleared.
+
+    :param ms51:           the MockMS51
+    :param gpio:           the optional GPIO source receiving the interrupt output
+    :param interrupt_pin:  the GPIO pin of the interrupt output
+    '''
+    def __init__(self, ms51, gpio=None, interrupt_pin=None):
+        self._ms51  = ms51
+        self._modes = [ None ] * len(IOE_PINS)
+        self._vref  = 3.3
+        self._gpio  = gpio
+        self._interrupt_pin = interrupt_pin
+        self._interrupt_pins = set()
+        self._interrupt_out = False
+        self._interrupt = False
+
+    # ..........................................................................
+    def set_adc_vref(self, vref):
+        self._vref = vref
+
+    # ..........................................................................
+    def set_mode(self, pin, mode):
+        self._modes[pin - 1] = mode
+
+    # ..........................................................................
+    def _set_bits(self, reg, bits):
+        self._ms51.write(reg, self._ms51.read(reg)[0] | bits)
+
+    def _clr_bits(self, reg, bits):
+        self._ms51.write(reg, self._ms51.read(reg)[0] & ~bits & 0xFF)
+
+    # ..........................................................................
+    def set_pin_interrupt(self, pin, enabled):
+        if enabled:
+            self._interrupt_pins.add(pin)
+        else:
+            self._interrupt_pins.discard(pin)
+
+    # ..........................................................................
+    def enable_interrupt_out(self, pin_swap=False):
+        self._interrupt_out = True
+
+    # ..........................................................................
+    def disable_interrupt_out(self):
+        self._interrupt_out = False
+
+    # ..........................................................................
+    def get_interrupt(self):
+        return self._interrupt
+
+    # ..........................................................................
+    def clear_interrupt(self):
+        self._ms51.transactions += 2 # as the library's read-modify-write
+        if self._interrupt:
+            self._interrupt = False
+            if self._gpio and self._interrupt_out:
+                self._gpio.edge(self._interrupt_pin, 1)
+
+    # ..........................................................................
+    def set_input(self, pin, level):
+        '''
+        Sets the level of an input pin, raising its interrupt if enabled.
+        '''
+        _port, _bit, _channel = IOE_PINS[pin - 1]
+        self._ms51.set_level(_port, _bit, level)
+        if pin in self._interrupt_pins and not self._interrupt:
+            self._interrupt = True
+            if self._gpio and self._interrupt_out:
+                self._gpio.edge(self._interrupt_pin, 0)
+
+    # ..........................................................................
+    def input(self, pin):
+        _port, _bit, _channel = IOE_PINS[pin - 1]
+        if self._modes[pin - 1] == ADC:
+            self._clr_bits(REG_ADCCON0, 0x0f)
+            self._set_bits(REG_ADCCON0, _channel)
+            self._ms51.write(REG_AINDIDS, 0)
+            self._set_bits(REG_AINDIDS, 1 << _channel)
+            self._set_bits(REG_ADCCON1, ADCCON1_ADCEN)
+            self._clr_bits(REG_ADCCON0, ADCCON0_ADCF)
+            self._set_bits(REG_ADCCON0, ADCCON0_ADCS)
+            while not self._ms51.read(REG_ADCCON0)[0] & ADCCON0_ADCF:
+                pass
+            _hi = self._ms51.read(REG_ADCRH)[0]
+            _lo = self._ms51.read(REG_ADCRL)[0]
+            return (( _hi << 4 ) | _lo ) / 4095.0 * self._vref
+        else:
+            return 1 if self._ms51.read(PORT_REGISTERS[_port])[0] & ( 1 << _bit ) else 0
+
+#EOF
@@ -16,6 +16,10 @@ class _callbackThread(object):
     def __init__(self):
         self.name = '_callback'
 
+class _Callback(object):
+    def cancel(self):
+        pass
+
 class MockPi(object):
     def __init__(self):
         self._notify = _callbackThread()
@@ -33,7 +37,7 @@ class MockPi(object):
         pass
 
     def callback(self, pin, edge, func):
-        pass
+        return _Callback()
 
 # GPIO edges
 
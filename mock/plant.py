@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-29
+# modified: 2021-05-15
+#
+# A simulated differential-drive plant: the dynamics of the two motors and
+# wheels, driven by the power set on the ThunderBorg, generating encoder
+# steps for the motors.
+#
+
+import math, random
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.enums import Orientation
+from lib.rate import Rate
+from lib.timing import now_ns, NS_PER_SEC
+from lib.edge_decoder import EdgeDecoder
+from lib.motors import Motors
+from mock.edge_source import MockEdgeSource
+from mock.pigpio import MockPi
+from mock.thunderborg import QuietThunderBorg
+from mock.virtual_clock import VirtualClock
+
+# ..............................................................................
+class MotorPlant(object):
+    '''
+    The simulated dynamics of a single motor and wheel.
+
+    The motor power (-1.0 to 1.0) less a static friction deadband is scaled
+    by the supply voltage ratio to a free-running wheel speed, which the
+    actual wheel speed approaches as a first order lag whose time constant
+    represents the inertia of the robot. Noise is applied to each increment
+    of wheel rotation. Each whole encoder step is passed to the callback as
+    a single pulse, as would be done by the Decoder, or if a MockEdgeSource
+    is provided is added to that at the (interpolated) time it occurred.
+
+    :param orientation:         the motor orientation
+    :param steps_per_rotation:  encoder steps per wheel rotation
+    :param max_rps:             wheel rotations per second at full power and supply
+    :param inertia_sec:         the time constant of the wheel speed, in seconds
+    :param friction:            the power lost to static friction (0.0-1.0)
+    :param noise:               the standard deviation of the fractional speed noise
+    :param callback:            the encoder step callback
+    :param pulse:               the pulse (+1 or -1) for a forward step
+    :param rng:                 the random number generator used for noise
+    :param source:              an optional MockEdgeSource in place of the callback
+    '''
+    def __init__(self, orientation, steps_per_rotation, max_rps, inertia_sec, friction, noise, callback, pulse, rng, source=None):
+        self._orientation        = orientation
+        self._steps_per_rotation = steps_per_rotation
+        self._max_rps            = max_rps
+        self._inertia_sec        = inertia_sec
+        self._friction           = friction
+        self._noise              = noise
+        self._callback           = callback
+        self._pulse              = pulse
+        self._rng                = rng
+        self._source             = source
+        self._time_us            = 0.0 # elapsed time
+        self._rps                = 0.0 # wheel rotations per second
+        self._position           = 0.0 # fractional encoder steps
+        self._steps              = 0   # whole encoder steps generated
+
+    # ..........................................................................
+    @property
+    def rps(self):
+        return self._rps
+
+    # ..........................................................................
+    @property
+    def steps(self):
+        return self._steps
+
+    # ..........................................................................
+    def step(self, power, supply_ratio, dt):
+        '''
+        Advances the wheel by dt seconds at the given motor power and
+        supply voltage ratio.
+        '''
+        _magnitude = abs(power) - self._friction
+        if _magnitude > 0.0:
+            _drive_rps = math.copysign(_magnitude / ( 1.0 - self._friction ), power) * supply_ratio * self._max_rps
+        else:
+            _drive_rps = 0.0
+        # exact for a constant drive over dt, so stable for any step size
+        self._rps += ( _drive_rps - self._rps ) * ( 1.0 - math.exp(-dt / self._inertia_sec) )
+        _rps = self._rps
+        if self._noise:
+            _rps *= 1.0 + self._rng.gauss(0.0, self._noise)
+        _start_position = self._position
+        self._position += _rps * self._steps_per_rotation * dt
+        _target = math.floor(self._position)
+        if self._source:
+            # add each step at the time its position was crossed
+            _us_per_step = dt * 1e6 / ( self._position - _start_position ) if self._steps != _target else 0.0
+            while self._steps < _target:
+                self._steps += 1
+                self._source.add_step_at(self._time_us + ( self._steps - _start_position ) * _us_per_step, self._pulse)
+            while self._steps > _target:
+                self._source.add_step_at(self._time_us + ( self._steps - _start_position ) * _us_per_step, -self._pulse)
+                self._steps -= 1
+            self._time_us += dt * 1e6
+            self._source.advance_to(self._time_us)
+        else:
+            while self._steps < _target:
+                self._steps += 1
+                self._callback(self._pulse)
+            while self._steps > _target:
+                self._steps -= 1
+                self._callback(-self._pulse)
+
+    # ..........................................................................
+    def reset(self):
+        self._rps      = 0.0
+        self._position = 0.0
+        self._steps    = 0
+
+# ..............................................................................
+def simulate(config, freq_hz=20, seed=None, edge_sources=False, history=False, level=Level.WARN):
+    '''
+    Returns a simulation of the robot's motors as a tuple of a QuietThunderBorg
+    (recording the history of each motor's power if history is True), a
+    VirtualClock of the frequency, the Motors timed by the clock, and the
+    DifferentialDrivePlant driving them (see its seed and edge_sources).
+    '''
+    _tb = QuietThunderBorg(level, history=history)
+    _clock = VirtualClock(freq_hz, level=level)
+    _motors = Motors(config, _clock, _tb, level, pi=MockPi())
+    _motors.set_time_source(_clock.now_ns)
+    _plant = DifferentialDrivePlant(config, _tb, _motors.get_motor(Orientation.PORT), _motors.get_motor(Orientation.STBD),
+            clock=_clock, seed=seed, edge_sources=edge_sources, level=level)
+    return _tb, _clock, _motors, _plant
+
+# ..............................................................................
+class DifferentialDrivePlant(object):
+    '''
+    A simulated differential-drive robot for closed-loop testing of motor
+    control off-robot. The power of each motor is read from the (mock)
+    ThunderBorg and the resulting encoder steps are passed to each Motor's
+    step count callback, in place of its Decoder.
+
+    The supply voltage sags in proportion to the total power drawn by the
+    two motors, so that, e.g., a turn slows the outer wheel.
+
+    If edge_sources is True each Motor is instead given an EdgeDecoder
+    whose MockEdgeSource receives the timestamped steps, as if using the
+    'notify' encoder backend.
+
+    If a VirtualClock is provided the plant is advanced on each of its
+    ticks and may be run faster than real time; otherwise enable() starts
+    a thread advancing the plant in real time.
+
+    This uses the ros:plant: section of the configuration.
+
+    :param config:       the application configuration
+    :param tb:           the (mock) ThunderBorg
+    :param port_motor:   the port Motor
+    :param stbd_motor:   the starboard Motor
+    :param clock:        an optional VirtualClock
+    :param seed:         an optional seed for the noise generator
+    :param edge_sources: if True provide the motors with timestamped steps
+    :param level:        the log level
+    '''
+    def __init__(self, config, tb, port_motor, stbd_motor, clock=None, seed=None, edge_sources=False, level=Level.INFO):
+        self._log = Logger('plant', level)
+        if config is None:
+            raise ValueError('null configuration argument.')
+        if tb is None:
+            raise ValueError('null thunderborg argument.')
+        self._tb = tb
+        if port_motor is None or stbd_motor is None:
+            raise ValueError('null motor argument.')
+        _config = config['ros'].get('plant')
+        self._physics_freq_hz = _config.get('physics_freq_hz')
+        _max_rps      = _config.get('max_rps')
+        _inertia_sec  = _config.get('inertia_sec')
+        _friction     = _config.get('friction')
+        _noise        = _config.get('noise')
+        self._battery_sag = _config.get('battery_sag')
+        self._log.info('max: {:4.2f} rps; inertia: {:4.2f} sec; friction: {:4.2f}; battery sag: {:4.2f}; noise: {:5.3f}'.format(
+                _max_rps, _inertia_sec, _friction, self._battery_sag, _noise))
+        _steps_per_rotation = config['ros'].get('geometry').get('steps_per_rotation')
+        self._wheel_circumference = config['ros'].get('geometry').get('wheel_diameter') * math.pi / 10.0 # cm
+        # the pulse that increments each Motor's step count when driving forward
+        _reverse = config['ros'].get('motors').get('reverse_encoder_orientation')
+        _port_pulse = -1 if _reverse else 1
+        self._rng = random.Random(seed)
+        _port_source = self._create_edge_source(config, port_motor, 'port', level) if edge_sources else None
+        _stbd_source = self._create_edge_source(config, stbd_motor, 'stbd', level) if edge_sources else None
+        self._port = MotorPlant(Orientation.PORT, _steps_per_rotation, _max_rps, _inertia_sec, _friction, _noise,
+                port_motor._callback_step_count, _port_pulse, self._rng, _port_source)
+        self._stbd = MotorPlant(Orientation.STBD, _steps_per_rotation, _max_rps, _inertia_sec, _friction, _noise,
+                stbd_motor._callback_step_count, -1 * _port_pulse, self._rng, _stbd_source)
+        self._supply_ratio = 1.0
+        self._clock   = clock
+        if self._clock:
+            self._clock.add_integrator(self.step)
+            self._log.info('using virtual clock.')
+        self._thread  = None
+        self._enabled = False
+        self._closed  = False
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def _create_edge_source(self, config, motor, suffix, level):
+        '''
+        Returns a MockEdgeSource for the motor, setting an EdgeDecoder
+        reading from it on the motor.
+        '''
+        _config = config['ros'].get('motors')
+        _gpio_a = _config.get('motor_encoder_a{:d}_{}'.format(1 if suffix == 'port' else 2, suffix))
+        _gpio_b = _config.get('motor_encoder_b{:d}_{}'.format(1 if suffix == 'port' else 2, suffix))
+        _source = MockEdgeSource(_gpio_a, _gpio_b)
+        motor.set_edge_decoder(EdgeDecoder(config, _source, _gpio_a, _gpio_b, motor.orientation, level))
+        return _source
+
+    # ..........................................................................
+    @property
+    def supply_ratio(self):
+        return self._supply_ratio
+
+    # ..........................................................................
+    def get_velocity(self, orientation):
+        '''
+        Returns the actual (noiseless) velocity of the wheel of the given
+        orientation, in cm/sec, for comparison with the measured velocity.
+        '''
+        _plant = self._port if orientation is Orientation.PORT else self._stbd
+        return _plant.rps * self._wheel_circumference
+
+    # ..........................................................................
+    def step(self, dt):
+        '''
+        Advances the plant by dt seconds at the current motor power.
+        '''
+        _port_power = self._tb.GetMotor1()
+        _stbd_power = self._tb.GetMotor2()
+        self._supply_ratio = 1.0 - self._battery_sag * ( abs(_port_power) + abs(_stbd_power) ) / 2.0
+        self._port.step(_port_power, self._supply_ratio, dt)
+        self._stbd.step(_stbd_power, self._supply_ratio, dt)
+
+    # ..........................................................................
+    def reset(self):
+        self._port.reset()
+        self._stbd.reset()
+
+    # ..........................................................................
+    def _loop(self, f_is_enabled):
+        '''
+        Advances the plant in real time while the f_is_enabled flag is True.
+        '''
+        _rate = Rate(self._physics_freq_hz)
+        _last_ns = now_ns()
+        while f_is_enabled():
+            _now_ns = now_ns()
+            self.step(( _now_ns - _last_ns ) / NS_PER_SEC)
+            _last_ns = _now_ns
+            _rate.wait()
+        self._log.info('exited plant loop.')
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        if not self._closed:
+            if self._enabled:
+                self._log.warning('already enabled.')
+            else:
+                self._enabled = True
+                if not self._clock:
+                    self._thread = Thread(name='plant', target=DifferentialDrivePlant._loop, args=[self, lambda: self._enabled], daemon=True)
+                    self._thread.start()
+                self._log.info('enabled.')
+        else:
+            self._log.warning('cannot enable: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        if self._enabled:
+            self._enabled = False
+            if self._thread:
+                self._thread.join(timeout=1.0)
+                self._thread = None
+            self._log.info('disabled.')
+        else:
+            self._log.warning('already disabled.')
+
+    # ..........................................................................
+    def close(self):
+        if self._enabled:
+            self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
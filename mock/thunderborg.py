@@ -827,3 +827,26 @@ Displays the names and descriptions of the various functions and settings provid
         for func in funcListSorted:
             print('=== {} === {}'.format(func.func_name, func.func_doc))
 
+
+
+class QuietThunderBorg(ThunderBorg):
+    """
+A mock ThunderBorg that doesn't print each motor power setting, for use in
+tests and simulation. If history is True each power setting of each motor
+is appended to motor1_history or motor2_history.
+    """
+
+    def __init__(self, level, history=False):
+        super().__init__(level)
+        self.motor1_history = [] if history else None
+        self.motor2_history = [] if history else None
+
+    def SetMotor1(self, power):
+        self._motor1_power = power
+        if self.motor1_history is not None:
+            self.motor1_history.append(power)
+
+    def SetMotor2(self, power):
+        self._motor2_power = power
+        if self.motor2_history is not None:
+            self.motor2_history.append(power)
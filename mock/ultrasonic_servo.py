@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-14
+# modified: 2021-05-14
+#
+# A mock of the Servo of the UltrasonicScanner, with its ultrasonic sensor
+# ranging a scene that may be changed while scanning.
+#
+
+import time
+
+# ..............................................................................
+class MockUltrasonicServo(object):
+    '''
+    The subset of the Servo used by the UltrasonicScanner. get_distance()
+    returns the range (mm) of the scene (a function of angle returning mm,
+    or 0 if nothing is in range) at the current position, after read_sec.
+
+    :param scene:     the function of angle returning the range in mm
+    :param read_sec:  the time taken by each reading
+    '''
+    def __init__(self, scene, read_sec=0.002):
+        self.scene     = scene
+        self._read_sec = read_sec
+        self._position = 0.0
+        self.readings  = 0
+
+    def get_ultraborg(self):
+        return None
+
+    def is_in_range(self, degrees):
+        return -90.1 <= degrees <= 90.1
+
+    def set_position(self, degrees):
+        self._position = degrees
+
+    def get_position(self, default):
+        return self._position
+
+    def get_distance(self, retry_count, use_raw_distance):
+        time.sleep(self._read_sec)
+        self.readings += 1
+        return self.scene(self._position)
+
+    def disable(self):
+        pass
+
+    def close(self):
+        pass
+
+#EOF
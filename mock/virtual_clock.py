@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-29
+# modified: 2021-04-29
+#
+# A clock whose time only advances when it is stepped, for running
+# simulations faster than real time.
+#
+
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.timing import NS_PER_SEC
+
+# ..............................................................................
+class VirtualClock(object):
+    '''
+    A virtual clock that may be used in place of the Ticker (to drive the
+    motors' velocity calculation) or a RealTimeExecutor (to drive the PID
+    controllers), but whose time only advances when tick() or run() is
+    called, which may be as fast as the host allows.
+
+    Each tick first advances any added integrators (e.g., a simulated
+    plant) over the tick period in the configured number of substeps, then
+    executes the callbacks in the order they were added.
+
+    Components that measure elapsed time should be given now_ns() as
+    their time source.
+
+    :param loop_freq_hz:   the loop frequency in Hertz
+    :param substeps:       the number of integrator substeps per tick
+    :param level:          the optional log level
+    '''
+    def __init__(self, loop_freq_hz, substeps=10, level=Level.INFO):
+        super().__init__()
+        self._log = Logger("vclock", level)
+        self._loop_freq_hz = loop_freq_hz
+        self._period_ns    = int(NS_PER_SEC / loop_freq_hz)
+        if substeps < 1:
+            raise ValueError('expected at least one substep.')
+        self._substep_ns   = self._period_ns // substeps
+        self._substeps     = substeps
+        self._substep_sec  = self._substep_ns / NS_PER_SEC
+        self._time_ns      = 0
+        self._ticks        = 0
+        self._integrators  = []
+        self._callbacks    = []
+        self._enabled      = False
+        self._closed       = False
+        self._log.info('tick frequency: {:d}Hz; {:d} substeps per tick.'.format(self._loop_freq_hz, substeps))
+        self._log.info('ready.')
+
+    # ..........................................................................
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    # ..........................................................................
+    def add_integrator(self, integrator):
+        '''
+        Adds an integrator function, called with the substep duration in
+        seconds, prior to the callbacks on each tick.
+        '''
+        self._integrators.append(integrator)
+
+    # ..........................................................................
+    def name(self):
+        return 'vclock'
+
+    # ..........................................................................
+    @property
+    def freq_hz(self):
+        return self._loop_freq_hz
+
+    # ..........................................................................
+    def now_ns(self):
+        '''
+        Returns the virtual time as integer nanoseconds, beginning at zero.
+        '''
+        return self._time_ns
+
+    # ..........................................................................
+    @property
+    def ticks(self):
+        return self._ticks
+
+    # ..........................................................................
+    def tick(self):
+        '''
+        Advances the virtual time by one tick.
+        '''
+        for i in range(self._substeps):
+            for integrator in self._integrators:
+                integrator(self._substep_sec)
+            self._time_ns += self._substep_ns
+        self._ticks += 1
+        for callback in self._callbacks:
+            callback()
+
+    # ..........................................................................
+    def run(self, seconds):
+        '''
+        Advances the virtual time by the given number of (virtual) seconds.
+        '''
+        for i in range(int(round(seconds * self._loop_freq_hz))):
+            self.tick()
+
+    # ..........................................................................
+    @property
+    def enabled(self):
+        return self._enabled
+
+    # ..........................................................................
+    def enable(self):
+        '''
+        Provided for compatibility with the Ticker: the clock is only
+        advanced by calls to tick() or run().
+        '''
+        if not self._closed:
+            self._enabled = True
+            self._log.info('enabled.')
+        else:
+            self._log.warning('cannot enable: already closed.')
+
+    # ..........................................................................
+    def disable(self):
+        self._enabled = False
+        self._log.info('disabled.')
+
+    # ..........................................................................
+    def close(self):
+        self.disable()
+        self._closed = True
+        self._log.info('closed.')
+
+#EOF
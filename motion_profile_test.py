@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-05
+# modified: 2021-05-15
+#
+# Tests the jerk-limited motion profiles against their limits, and the
+# TrajectoryGenerator driving the PID controllers on the simulated plant.
+#
+
+import pytest
+import sys, timeit
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.pid_motor_ctrl import PIDMotorController
+from lib.slew import SlewLimiter, SlewRate
+from lib.motion_profile import MotionProfile, TrajectoryGenerator
+from mock.plant import simulate
+
+DT = 0.05
+MAX_VELOCITY = 50.0
+MAX_ACCEL    = 40.0
+MAX_JERK     = 200.0
+
+# ..............................................................................
+def _check_limits(velocities, start):
+    '''
+    Asserts the acceleration and jerk of the sampled velocities are within
+    their limits (allowing for sampling).
+    '''
+    _velocities = numpy.concatenate(( [ start, start ], velocities ))
+    _accel = numpy.diff(_velocities) / DT
+    _jerk = numpy.diff(_accel) / DT
+    assert numpy.max(numpy.abs(_accel)) <= MAX_ACCEL + 1e-6
+    assert numpy.max(numpy.abs(_jerk)) <= MAX_JERK * 1.5
+
+# ..............................................................................
+@pytest.mark.unit
+def test_motion_profile():
+    _log = Logger('profile-test', Level.INFO)
+
+    # velocity change of both wheels ..........
+    _profile = MotionProfile.to_velocity(0.0, 10.0, 40.0, 20.0, MAX_ACCEL, MAX_JERK, DT)
+    _port, _stbd = numpy.array(_profile[:]).T
+    assert _profile.final == ( 40.0, 20.0 )
+    assert numpy.all(numpy.diff(_port) >= 0.0)
+    # 40cm/sec at 40cm/sec² plus the 0.2 sec jerk phases takes 1.2 sec
+    assert len(_profile) == 24
+    _check_limits(_port, 0.0)
+    # the other wheel is in proportion throughout
+    assert numpy.allclose(_stbd, 10.0 + _port / 4.0)
+    # a small change never reaches the maximum acceleration
+    _profile = MotionProfile.to_velocity(30.0, 30.0, 28.0, 28.0, MAX_ACCEL, MAX_JERK, DT)
+    _check_limits(numpy.array(_profile[:])[:,0], 30.0)
+    assert _profile.final == ( 28.0, 28.0 )
+
+    # over a distance .........................
+    for _distance in [ 200.0, 10.0, -30.0 ]:
+        _profile = MotionProfile.over_distance(_distance, _distance / 2.0, MAX_VELOCITY, MAX_ACCEL, MAX_JERK, DT)
+        _port, _stbd = numpy.array(_profile[:]).T
+        assert numpy.sum(_port) * DT == pytest.approx(_distance, rel=0.02)
+        assert numpy.sum(_stbd) * DT == pytest.approx(_distance / 2.0, rel=0.02)
+        assert _profile.final == ( 0.0, 0.0 )
+        assert numpy.max(numpy.abs(_port)) <= MAX_VELOCITY
+        _check_limits(_port, 0.0)
+    # a short move peaks below the maximum velocity
+    assert numpy.max(numpy.abs(_port)) < MAX_VELOCITY
+    # indexing holds the final setpoints once done
+    _profile = MotionProfile.to_velocity(0.0, 0.0, 1.0, 1.0, MAX_ACCEL, MAX_JERK, DT)
+    while not _profile.done:
+        _profile.next()
+    assert _profile.next() == ( 1.0, 1.0 )
+
+    # per tick cost vs slew limiting ..........
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _limiter = SlewLimiter(_config, None, Level.WARN)
+    _limiter.set_rate_limit(SlewRate.NORMAL)
+    _limiter.enable()
+    _profile = MotionProfile.over_distance(1e6, 1e6, MAX_VELOCITY, MAX_ACCEL, MAX_JERK, DT)
+    _n = 10000
+    _profile_sec = timeit.timeit(_profile.next, number=_n) / _n
+    _slew_sec = timeit.timeit(lambda: ( _limiter.slew(10.0, 40.0), _limiter.slew(10.0, 40.0) ), number=_n) / _n
+    _log.info('per tick: profile: {:5.3f}µs; slew limiting both setpoints: {:5.3f}µs.'.format(_profile_sec * 1e6, _slew_sec * 1e6))
+
+    # driving the PID controllers .............
+    _tb, _clock, _motors, _plant = simulate(_config, seed=3)
+    _port_motor = _motors.get_motor(Orientation.PORT)
+    _stbd_motor = _motors.get_motor(Orientation.STBD)
+    _pmc = PIDMotorController(_config, _clock, _motors, Level.WARN)
+    _pmc.set_executor(_clock)
+    _pmc.set_time_source(_clock.now_ns)
+    _trajectory = TrajectoryGenerator(_config, _clock, _pmc, Level.WARN)
+    _motors.enable()
+    _pmc.enable()
+    _trajectory.enable()
+    _trajectory.set_velocity(30.0, 30.0)
+    _clock.run(6.0)
+    assert not _trajectory.active
+    assert _trajectory.setpoints == ( 30.0, 30.0 )
+    for _orientation in ( Orientation.PORT, Orientation.STBD ):
+        assert _plant.get_velocity(_orientation) == pytest.approx(30.0, abs=2.0)
+    _trajectory.stop()
+    _clock.run(6.0)
+    for _orientation in ( Orientation.PORT, Orientation.STBD ):
+        assert _plant.get_velocity(_orientation) == pytest.approx(0.0, abs=2.0)
+    # the PID controllers' slew limiters are off while enabled, then restored
+    _port_pid, _stbd_pid = _pmc.get_pid_controllers()
+    assert _port_pid.enable_slew(False) is False and _stbd_pid.enable_slew(False) is False
+    _trajectory.disable()
+    assert _port_pid.enable_slew(True) is True and _stbd_pid.enable_slew(True) is True
+    _pmc.disable()
+    _pmc.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_motion_profile()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-27
+# modified: 2021-04-27
+#
+# Tests the MotorCommandStage, comparing the number of ThunderBorg I2C
+# transactions for the same sequence of port and starboard motor commands
+# written directly and via the command stage.
+#
+
+import pytest
+import sys, time
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.ticker import Ticker
+from lib.motor import Motor, TB_LOCK
+from lib.motor_command import MotorCommandStage
+from mock.pigpio import MockPi
+from mock.thunderborg import ThunderBorg
+
+TICKS = 200
+
+# ..............................................................................
+class CountingThunderBorg(ThunderBorg):
+    '''
+    A mock ThunderBorg that counts I2C transactions.
+    '''
+    def __init__(self, level):
+        super().__init__(level)
+        self.transactions = 0
+
+    def SetMotor1(self, power):
+        self.transactions += 1
+        self._motor1_power = power
+
+    def SetMotor2(self, power):
+        self.transactions += 1
+        self._motor2_power = power
+
+    def SetMotors(self, power):
+        self.transactions += 1
+        self._motor1_power = power
+        self._motor2_power = power
+
+# ..............................................................................
+def _get_powers(tick):
+    '''
+    Returns a sequence of port and starboard powers per tick: accelerating
+    straight ahead, cruising, turning, then cruising again.
+    '''
+    if tick < 50:
+        return tick / 100.0, tick / 100.0
+    elif tick < 100:
+        return 0.5, 0.5
+    elif tick < 150:
+        return 0.5 - ( tick - 100 ) / 200.0, 0.5
+    else:
+        return 0.25, 0.25
+
+def _run(config, coalesce):
+    _tb = CountingThunderBorg(Level.WARN)
+    _ticker = Ticker(20, lambda: None, Level.WARN)
+    _port_motor = Motor(config, _ticker, _tb, MockPi(), Orientation.PORT, Level.WARN)
+    _stbd_motor = Motor(config, _ticker, _tb, MockPi(), Orientation.STBD, Level.WARN)
+    _stage = MotorCommandStage(config, _tb, TB_LOCK, Level.INFO)
+    for _motor in ( _port_motor, _stbd_motor ):
+        _motor.set_max_power_ratio(1.0)
+        _motor.enable()
+        if coalesce:
+            _motor.set_command_stage(_stage)
+    for _tick in range(TICKS):
+        _port_power, _stbd_power = _get_powers(_tick)
+        _port_motor.set_motor_power(_port_power)
+        _stbd_motor.set_motor_power(_stbd_power)
+        if coalesce:
+            _stage.flush()
+        assert _tb.GetMotor1() == pytest.approx(_port_power, abs=0.002)
+        assert _tb.GetMotor2() == pytest.approx(_stbd_power, abs=0.002)
+    # stopping is written immediately
+    _port_motor.stop()
+    assert _tb.GetMotor1() == 0.0
+    for _motor in ( _port_motor, _stbd_motor ):
+        _motor.disable()
+    return _tb.transactions
+
+# ..............................................................................
+@pytest.mark.unit
+def test_motor_command():
+    _log = Logger('cmd-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _direct    = _run(_config, False)
+    _coalesced = _run(_config, True)
+    # at a 20Hz control loop
+    _seconds = TICKS / 20.0
+    _log.info('I2C transactions: direct: {:d} ({:5.1f}/sec); '.format(_direct, _direct / _seconds) \
+            + Fore.GREEN + 'coalesced: {:d} ({:5.1f}/sec).'.format(_coalesced, _coalesced / _seconds))
+    assert _direct == 2 * TICKS + 3 # plus a stop and a pair on disable
+    assert _coalesced < _direct / 3
+
+# main .........................................................................
+def main():
+    try:
+        test_motor_command()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
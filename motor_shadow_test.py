@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-26
+# modified: 2021-05-15
+#
+# Tests the Motor's shadow copy of its power: setting the motor power must
+# not read from the ThunderBorg, and reconciliation must detect (and adopt)
+# a disagreement between the shadow copy and the ThunderBorg, with only one
+# reconcile thread however quickly the motor is re-enabled.
+#
+
+import pytest
+import sys, time, threading
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.ticker import Ticker
+from lib.motor import Motor
+from mock.pigpio import MockPi
+from mock.thunderborg import QuietThunderBorg
+
+# ..............................................................................
+class CountingThunderBorg(QuietThunderBorg):
+    '''
+    A mock ThunderBorg that counts the reads of motor power.
+    '''
+    def __init__(self, level):
+        super().__init__(level)
+        self.reads = 0
+
+    def GetMotor1(self):
+        self.reads += 1
+        return self._motor1_power
+
+    def GetMotor2(self):
+        self.reads += 1
+        return self._motor2_power
+
+# ..............................................................................
+@pytest.mark.unit
+def test_motor_shadow():
+    _log = Logger('shadow-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros'].get('motors')['reconcile_interval_sec'] = 0.05
+    _tb = CountingThunderBorg(Level.WARN)
+    _ticker = Ticker(20, lambda: None, Level.WARN)
+    _motor = Motor(_config, _ticker, _tb, MockPi(), Orientation.PORT, Level.WARN)
+    _motor.set_max_power_ratio(0.5)
+    _motor.enable()
+
+    # the hot path performs no reads ..........
+    _reads = _tb.reads
+    for i in range(100):
+        _motor.set_motor_power(i / 200.0)
+    assert _tb.reads - _reads < 5 # only any concurrent reconciliation
+    assert _motor.current_power == pytest.approx(99 / 200.0 * 0.5)
+    # sign jumps are still refused using the shadow copy
+    _motor.set_motor_power(-0.5)
+    assert _motor.current_power > 0.0
+
+    # reconciliation ..........................
+    assert _motor.reconcile()
+    assert _motor.shadow_mismatch_count == 0
+    Motor.cancel() # bypasses the motor's shadow copy
+    time.sleep(0.2)
+    assert _motor.shadow_mismatch_count == 1
+    assert _motor.current_power == 0.0
+    _log.info('{:d} reads; {:d} shadow mismatches.'.format(_tb.reads, _motor.shadow_mismatch_count))
+    _motor.disable()
+    _motor.close()
+
+    # re-enabling within the interval ...........
+    _config['ros'].get('motors')['reconcile_interval_sec'] = 1.0
+    _motor = Motor(_config, _ticker, _tb, MockPi(), Orientation.STBD, Level.WARN)
+    _threads = lambda: [ _thread for _thread in threading.enumerate() if _thread.name == 'reconcile:stbd' ]
+    for i in range(3):
+        _motor.enable()
+        _motor.disable()
+    assert not _threads()
+    _motor.enable()
+    assert len(_threads()) == 1
+    _motor.disable()
+    _motor.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_motor_shadow()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
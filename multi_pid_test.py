@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-28
+# modified: 2021-04-28
+#
+# Tests that the outputs of the two-channel MultiPID are identical to those
+# of two scalar PIDs, and compares the time taken per control step.
+#
+
+import pytest
+import sys, math, timeit
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.pid import PID
+from lib.multi_pid import MultiPID
+
+KP, KI, KD  = 0.095, 0.02, 0.004
+MIN_OUTPUT  = -10.0
+MAX_OUTPUT  =  10.0
+DT          = 0.05
+STEPS       = 400
+
+# ..............................................................................
+def _get_velocities(step):
+    '''
+    Returns a port and starboard velocity per step, the port motor turning
+    slightly faster, with a large disturbance to exercise the output clamp.
+    '''
+    _port = 40.0 * math.sin(step / 30.0) + ( 80.0 if 100 <= step < 120 else 0.0 )
+    _stbd = 35.0 * math.sin(step / 30.0 + 0.2)
+    return _port, _stbd
+
+# ..............................................................................
+@pytest.mark.unit
+def test_multi_pid():
+    _log = Logger('mpid-test', Level.INFO)
+    _port_pid = PID('port', KP, KI, KD, MIN_OUTPUT, MAX_OUTPUT, sample_time=DT, level=Level.WARN)
+    _stbd_pid = PID('stbd', KP, KI, KD, MIN_OUTPUT, MAX_OUTPUT, sample_time=DT, level=Level.WARN)
+    _engine = MultiPID('test', 2, KP, KI, KD, MIN_OUTPUT, MAX_OUTPUT, sample_time=DT, level=Level.WARN)
+    _engine.set_constants(1, KP * 1.1, KI, KD) # channels may have different gains
+    _stbd_pid.kp = KP * 1.1
+
+    # numerically identical outputs ...........
+    for _step in range(STEPS):
+        if _step % 100 == 0:
+            _setpoint = 30.0 if _step < 200 else -20.0
+            _port_pid.setpoint = _setpoint
+            _stbd_pid.setpoint = _setpoint
+            _engine.set_setpoint(0, _setpoint)
+            _engine.set_setpoint(1, _setpoint)
+        _port_velocity, _stbd_velocity = _get_velocities(_step)
+        _outputs = _engine(( _port_velocity, _stbd_velocity ), dt=DT)
+        assert _outputs[0] == _port_pid(_port_velocity, dt=DT)
+        assert _outputs[1] == _stbd_pid(_stbd_velocity, dt=DT)
+        assert _engine.components(0) == _port_pid.components
+        assert _engine.components(1) == _stbd_pid.components
+    # the integral term is clamped to the output limits
+    assert MIN_OUTPUT <= _engine.components(0)[1] <= MAX_OUTPUT
+
+    _engine.reset(0)
+    assert _engine.components(0) == ( 0.0, 0.0, 0.0 )
+    assert _engine.components(1) != ( 0.0, 0.0, 0.0 )
+
+    # per-step microbenchmark .................
+    _velocities = [ 12.0, 11.5 ]
+    _number = 20000
+    _scalar_us = min(timeit.repeat(lambda: ( _port_pid(_velocities[0], dt=DT), _stbd_pid(_velocities[1], dt=DT) ),
+            number=_number, repeat=3)) / _number * 1e6
+    _vector_us = min(timeit.repeat(lambda: _engine(_velocities, dt=DT),
+            number=_number, repeat=3)) / _number * 1e6
+    _log.info('per step: two PIDs: {:6.2f}µs; '.format(_scalar_us) + Fore.GREEN + 'MultiPID: {:6.2f}µs.'.format(_vector_us))
+
+# main .........................................................................
+def main():
+    try:
+        test_multi_pid()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-13
+# modified: 2021-05-13
+#
+# Tests the local occupancy grid: integrating Lidar sweeps and IFS distances,
+# following the pose of the robot, decay, and nearest obstacle queries.
+#
+
+import pytest, math, timeit
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.odometry import Pose, ORIGIN
+from lib.occupancy import OccupancyGrid
+from mock.virtual_clock import VirtualClock
+
+WALL_CM = 100.0
+
+# ..............................................................................
+class MockOdometry(object):
+    def __init__(self):
+        self.pose = ORIGIN
+
+# ..............................................................................
+def _wall_scan(distance_cm):
+    '''
+    Returns a Lidar sweep of a wall ahead at the distance.
+    '''
+    _angles = numpy.arange(-40.0, 40.01, 5.0)
+    return numpy.column_stack(( _angles, distance_cm * 10.0 / numpy.cos(numpy.radians(_angles)) ))
+
+# ..............................................................................
+@pytest.mark.unit
+def test_occupancy():
+    _log = Logger('occupancy-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _clock = VirtualClock(20, level=Level.WARN)
+    _odometry = MockOdometry()
+    _grid = OccupancyGrid(_config, _clock, _odometry, Level.WARN)
+    _grid.set_time_source(_clock.now_ns)
+    _res = _grid.resolution
+    _max_range_cm = 400.0
+
+    # a wall ahead ............................
+    assert _grid.nearest(0.0) is None
+    for i in range(3):
+        _grid.integrate_scan(_wall_scan(WALL_CM), _max_range_cm)
+    assert _grid.nearest(0.0) == pytest.approx(WALL_CM, abs=_res)
+    assert _grid.nearest(30.0, width_deg=10.0) == pytest.approx(WALL_CM / math.cos(math.radians(30.0)), abs=2 * _res)
+    assert _grid.nearest(90.0) is None
+    assert _grid.nearest(-90.0, width_deg=180.0) == pytest.approx(WALL_CM, abs=_res)
+    assert _grid.is_occupied(WALL_CM, 0.0)
+    assert not _grid.is_occupied(WALL_CM / 2.0, 0.0)
+    _probabilities = _grid.get_probabilities()
+    _centre = _grid.size // 2
+    assert numpy.all(_probabilities[_centre, _centre:_centre + int(WALL_CM / _res) - 1] < 0.5)
+
+    # following the pose: forward, then turning to port
+    _clock.enable()
+    _grid.enable()
+    _odometry.pose = Pose(30.0, 0.0, 0.0, ORIGIN.covariance, 30.0, 0)
+    _clock.tick()
+    assert _grid.nearest(0.0) == pytest.approx(WALL_CM - 30.0, abs=_res)
+    assert _grid.is_occupied(WALL_CM - 30.0, 0.0)
+    _odometry.pose = Pose(30.0, 0.0, math.pi / 2.0, ORIGIN.covariance, 30.0, 0)
+    _clock.tick()
+    assert _grid.nearest(0.0) is None
+    assert _grid.nearest(90.0) == pytest.approx(WALL_CM - 30.0, abs=_res)
+    assert _grid.is_occupied(0.0, -( WALL_CM - 30.0 ))
+    # a move of less than half a cell shifts nothing, but is not lost
+    for i in range(10):
+        _odometry.pose = Pose(30.0, 0.0 + ( i + 1 ) * 0.4 * _res, math.pi / 2.0, ORIGIN.covariance, 30.0, 0)
+        _clock.tick()
+    assert _grid.nearest(90.0) == pytest.approx(WALL_CM - 30.0, abs=_res)
+    assert _grid.is_occupied(0.0, -( WALL_CM - 30.0 ))
+
+    # stale evidence decays ...................
+    _half_life_sec = _config['ros'].get('occupancy').get('half_life_sec')
+    _clock.run(_half_life_sec)
+    assert _grid.nearest(90.0) is not None
+    _clock.run(2.0 * _half_life_sec)
+    assert _grid.nearest(90.0) is None
+    _grid.disable()
+
+    # the IFS infrareds .......................
+    _grid = OccupancyGrid(_config, level=Level.WARN)
+    for i in range(3):
+        _grid.integrate_ifs([ None, None, 40.0, None, 25.0 ])
+    assert _grid.nearest(0.0) == pytest.approx(40.0, abs=_res)
+    assert _grid.nearest(90.0) == pytest.approx(25.0, abs=_res)
+    assert _grid.nearest(-90.0) is None
+    assert _grid.nearest(-45.0) is None
+    _grid.clear()
+    assert _grid.nearest(0.0) is None
+
+    # cost of an update and a query ...........
+    _scan = _wall_scan(WALL_CM)
+    _update_us = timeit.timeit(lambda: _grid.integrate_scan(_scan, _max_range_cm), number=200) / 200 * 1e6
+    _query_us = timeit.timeit(lambda: _grid.nearest(0.0), number=2000) / 2000 * 1e6
+    _log.info('integrating a sweep of {:d} readings: {:5.1f}µs; nearest obstacle query: {:4.1f}µs.'.format(len(_scan), _update_us, _query_us))
+
+# main .........................................................................
+def main():
+    try:
+        test_occupancy()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
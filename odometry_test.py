@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-03
+# modified: 2021-05-15
+#
+# Tests the wheel odometry: that a constant arc closes into a circle, that
+# the batch re-integration of a recorded step log matches the per-tick pose
+# on the simulated plant, and the growth of the covariance.
+#
+
+import pytest
+import sys, math, os, tempfile, timeit
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.odometry import Odometry, integrate_steps, load_step_log
+from mock.plant import simulate
+
+# ..............................................................................
+@pytest.mark.unit
+def test_odometry():
+    _log = Logger('odometry-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros'].get('odometry')['record'] = True
+    _config['ros'].get('odometry')['record_limit'] = 1000
+    _tb, _clock, _motors, _plant = simulate(_config, seed=7)
+    _odometry = Odometry(_config, _clock, _motors, Level.WARN)
+    _odometry.set_time_source(_clock.now_ns)
+    _steps_per_cm = _odometry._steps_per_cm
+    _wheelbase_cm = _odometry._wheelbase_cm
+
+    # a constant arc closes into a circle .....
+    _ticks = 400
+    _port, _stbd = 10, 30 # steps per tick
+    _dtheta = ( _stbd - _port ) / _steps_per_cm / _wheelbase_cm
+    _scale = 2.0 * math.pi / ( _dtheta * _ticks ) # scale so the circle closes in _ticks
+    for i in range(_ticks):
+        _pose = _odometry.integrate(_port * _scale, _stbd * _scale)
+    assert _pose.x == pytest.approx(0.0, abs=1e-9)
+    assert _pose.y == pytest.approx(0.0, abs=1e-9)
+    assert _pose.theta == pytest.approx(0.0, abs=1e-9)
+    # covariance grows, symmetric and positive semi-definite
+    _covariance = numpy.array(_pose.covariance)
+    assert numpy.allclose(_covariance, _covariance.T)
+    assert numpy.all(numpy.linalg.eigvalsh(_covariance) >= -1e-12)
+    assert _covariance[2][2] > 0.0
+    # a straight line
+    _odometry.reset()
+    _pose = _odometry.integrate(100, 100)
+    assert ( _pose.x, _pose.y, _pose.theta ) == pytest.approx(( 100 / _steps_per_cm, 0.0, 0.0 ))
+    assert 0.0 < _pose.covariance[1][1] < _pose.covariance[0][0] # less lateral than longitudinal uncertainty
+
+    # driven on the simulated plant ...........
+    _odometry.reset()
+    _odometry._log_rows.clear()
+    _motors.enable()
+    _odometry.enable()
+    _port_motor = _motors.get_motor(Orientation.PORT)
+    _stbd_motor = _motors.get_motor(Orientation.STBD)
+    _port_motor.set_motor_power(0.5)
+    _stbd_motor.set_motor_power(0.7)
+    _clock.run(4.0)
+    _port_motor.set_motor_power(0.7)
+    _stbd_motor.set_motor_power(0.4)
+    _clock.run(4.0)
+    _pose = _odometry.pose
+    _log.info('pose: x={:6.2f}cm; y={:6.2f}cm; heading={:5.1f}°; distance: {:6.2f}cm; σx={:5.3f}cm'.format(
+            _pose.x, _pose.y, _pose.heading, _pose.distance, math.sqrt(_pose.covariance[0][0])))
+    assert _pose.distance > 50.0
+    assert _pose.timestamp == _clock.now_ns()
+    _total_cm = ( _port_motor.steps + _stbd_motor.steps ) / 2.0 / _steps_per_cm
+    assert _pose.distance == pytest.approx(_total_cm)
+
+    # batch re-integration of the recorded log
+    _filename = os.path.join(tempfile.mkdtemp(), 'steps.dat')
+    _odometry.save_log(_filename)
+    _timestamps, _port_steps, _stbd_steps = load_step_log(_filename)
+    assert len(_timestamps) == 160 # 8 sec at 20Hz
+    _x, _y, _theta = integrate_steps(_port_steps, _stbd_steps, _steps_per_cm, _wheelbase_cm)
+    assert ( _x[-1], _y[-1], _theta[-1] ) == pytest.approx(( _pose.x, _pose.y, _pose.theta ), abs=1e-9)
+
+    # cost per tick ...........................
+    _n = 10000
+    _tick_sec = timeit.timeit(lambda: _odometry.integrate(25, 27), number=_n) / _n
+    _batch_sec = timeit.timeit(lambda: integrate_steps(_port_steps, _stbd_steps, _steps_per_cm, _wheelbase_cm), number=100) / 100
+    _log.info('integration: {:5.2f}µs per tick; batch: {:5.2f}µs per tick over {:d} ticks.'.format(
+            _tick_sec * 1e6, _batch_sec * 1e6 / len(_port_steps), len(_port_steps)))
+    # only the most recent ticks are recorded
+    assert len(_odometry._log_rows) == 1000
+    assert _odometry._log_rows[-1][1:] == ( 25, 27 )
+    _odometry.close()
+    _motors.disable()
+
+# main .........................................................................
+def main():
+    try:
+        test_odometry()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
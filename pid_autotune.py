@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-30
+# modified: 2021-05-15
+#
+# Automatically tunes the motor PID controllers, writing the resulting gains
+# as a config.yaml fragment. Experiments may be run on the motors, on the
+# simulated plant (--sim), or skipped in favour of previously recorded
+# step-response traces (--trace).
+#
+# Examples:
+#
+#   % ./pid_autotune.py --sim --record step.dat
+#   % ./pid_autotune.py --trace step.dat step2.dat --output pid.yaml
+#   % ./pid_autotune.py --experiment relay
+#
+
+import sys, argparse, traceback
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.motors import Motors
+from lib.pid_motor_ctrl import PIDMotorController
+from lib.pid_tuner import PIDTuner, Trace, fit_fopdt, tyreus_luyben_pi, pi_to_config, to_config_fragment
+
+# ..............................................................................
+def parse_args():
+    formatter = lambda prog: argparse.HelpFormatter(prog,max_help_position=60)
+    parser = argparse.ArgumentParser(formatter_class=formatter,
+            description='Automatically tunes the motor PID controllers, printing a config.yaml fragment.')
+    parser.add_argument('--sim',            '-s', action='store_true', help='run experiments on the simulated plant')
+    parser.add_argument('--experiment',     '-e', default='step', help='experiment: \'step\' (default) or \'relay\'')
+    parser.add_argument('--trace',          '-t', nargs='+', help='fit to recorded step-response trace file(s) rather than experiment')
+    parser.add_argument('--record',         '-r', help='record the experiment trace to a file')
+    parser.add_argument('--output',         '-o', help='write the config.yaml fragment to a file')
+    parser.add_argument('--config-file',    '-f', default='config.yaml', help='use alternative configuration file')
+    parser.add_argument('--level',          '-l', help='specify logging level \'DEBUG\'|\'INFO\'|\'WARN\'|\'ERROR\' (default: \'INFO\')')
+    return parser.parse_args()
+
+# ..............................................................................
+def _create_tuner(config, sim, level):
+    '''
+    Returns the PIDTuner and a function to close its resources, driving the
+    simulated plant on a virtual clock, or the motors in real time. Either
+    drives the motors (their velocity and ramps), the PID controllers and
+    the tuner, so that all are stepped on the same thread.
+    '''
+    if sim:
+        from mock.plant import simulate
+        _tb, _clock, _motors, _plant = simulate(config, freq_hz=config['ros'].get('rt_executor').get('loop_freq_hz'))
+        _executor = _clock
+    else:
+        from lib.rt_executor import RealTimeExecutor
+        _executor = RealTimeExecutor(config, level)
+        _motors = Motors(config, _executor, None, level)
+    _pmc = PIDMotorController(config, _executor, _motors, level)
+    _pmc.set_executor(_executor)
+    _tuner = PIDTuner(config, _pmc, _executor, level)
+    if sim:
+        _pmc.set_time_source(_clock.now_ns)
+        _tuner.set_time_source(_clock.now_ns)
+    _motors.enable() # also enables the executor
+    def _close():
+        # the motors halt on the executor, so are closed first
+        _pmc.close()
+        _executor.close()
+    return _tuner, _close
+
+# main .........................................................................
+def main():
+    _args = parse_args()
+    _level = Level.from_str(_args.level) if _args.level != None else Level.INFO
+    _log = Logger('autotune', _level)
+    _config = ConfigLoader(Level.WARN).configure(_args.config_file)
+    _close = None
+    try:
+        if _args.trace:
+            _tuner = PIDTuner(_config, None, None, _level)
+            _traces = [ Trace.load(_filename) for _filename in _args.trace ]
+            _gains, _cost = _tuner.tune(_traces)
+            _comment = 'fitted to {}; cost: {:6.4f}'.format(', '.join(_args.trace), _cost)
+        else:
+            _tuner, _close = _create_tuner(_config, _args.sim, _level)
+            if _args.experiment == 'relay':
+                _trace = _tuner.relay_experiment()
+                _kc, _ti = tyreus_luyben_pi(*_tuner.analyse_relay(_trace))
+                _gains = pi_to_config(_kc, _ti, _tuner.sample_time)
+                _comment = 'relay feedback (Tyreus-Luyben): Kc={:6.4f}; Ti={:5.3f}s'.format(_kc, _ti)
+            elif _args.experiment == 'step':
+                _trace = _tuner.step_experiment()
+                _gains, _cost = _tuner.tune([ _trace ])
+                _comment = 'step response ({}); cost: {:6.4f}; model: {}'.format(
+                        'simulated' if _args.sim else 'motors', _cost, fit_fopdt(_trace))
+            else:
+                raise ValueError('unrecognised experiment: {}'.format(_args.experiment))
+            if _args.record:
+                _trace.save(_args.record)
+                _log.info('trace written to: {}'.format(_args.record))
+        _fragment = to_config_fragment(_gains, _comment)
+        print(Fore.GREEN + '\n' + _fragment + Style.RESET_ALL)
+        if _args.output:
+            with open(_args.output, 'w') as _file:
+                _file.write(_fragment)
+            _log.info('configuration written to: {}'.format(_args.output))
+    except KeyboardInterrupt:
+        _log.info('Ctrl-C caught; exiting...')
+    except Exception as e:
+        _log.error('error tuning PID controllers: {}\n{}'.format(e, traceback.format_exc()))
+    finally:
+        if _close:
+            _close()
+
+if __name__== "__main__":
+    main()
+
+#EOF
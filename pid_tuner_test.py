@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-30
+# modified: 2021-04-30
+#
+# Tests the PID tuner's FOPDT fit against a trace generated from a known
+# model, and the parallel evaluation of candidate gains.
+#
+
+import pytest
+import sys, math, yaml
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.pid_tuner import PIDTuner, Trace, FOPDT, fit_fopdt, simc_pi, pi_to_config, evaluate, to_config_fragment
+
+DT = 0.05
+
+# ..............................................................................
+def _generate_trace(model, bias, step, seconds):
+    '''
+    Returns the trace of a step from the bias power on the FOPDT model.
+    '''
+    _trace = Trace()
+    _velocity = model.gain * bias
+    _delay_samples = int(round(model.dead_time / DT))
+    _powers = []
+    for i in range(int(seconds / DT)):
+        _power = bias if i < 20 else bias + step
+        _powers.append(_power)
+        _delayed = _powers[max(0, i - _delay_samples)]
+        _velocity += ( model.gain * _delayed - _velocity ) * ( 1.0 - math.exp(-DT / model.time_constant) )
+        _trace.add(i * DT, _power, _velocity, _velocity)
+    return _trace
+
+# ..............................................................................
+@pytest.mark.unit
+def test_pid_tuner():
+    _log = Logger('tuner-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros'].get('pid_tuner')['workers'] = 2
+
+    # model fit ...............................
+    _model = FOPDT(0.55, 0.30, 0.10)
+    _trace = _generate_trace(_model, 50.0, 20.0, 6.0)
+    _fitted = fit_fopdt(_trace)
+    _log.info('actual: {}; fitted: {}'.format(_model, _fitted))
+    assert _fitted.gain == pytest.approx(_model.gain, rel=0.02)
+    assert _fitted.time_constant == pytest.approx(_model.time_constant, rel=0.2)
+    assert _fitted.dead_time == pytest.approx(_model.dead_time, abs=DT)
+
+    # tuning rules ............................
+    _kc, _ti = simc_pi(_fitted, 1.0)
+    kp, ki, kd = pi_to_config(_kc, _ti, DT)
+    assert kp == pytest.approx(_kc * DT / _ti)
+    assert ki == 0.0
+    assert kd == pytest.approx(_kc * DT)
+
+    # parallel evaluation .....................
+    _tuner = PIDTuner(_config, None, None, Level.INFO)
+    _results = _tuner.evaluate([ _model ], _tuner.candidates(_kc, _ti) + [ ( 0.0001, 0.0, 0.0 ) ])
+    _costs = [ _cost for _cost, _gains in _results ]
+    assert _costs == sorted(_costs)
+    # a barely-responding controller is the worst candidate
+    assert _results[-1][1] == ( 0.0001, 0.0, 0.0 )
+    assert _results[0][0] == pytest.approx(evaluate(_model, _results[0][1], DT, 30.0, 5.0, -10.0, 10.0))
+
+    # tune from traces, to a configuration fragment
+    _gains, _cost = _tuner.tune([ _trace ])
+    _fragment = yaml.safe_load(to_config_fragment(_gains, 'test'))
+    _pid_config = _fragment['ros']['motors']['pid-controller']
+    assert ( _pid_config['kp'], _pid_config['ki'], _pid_config['kd'] ) == pytest.approx(_gains, abs=1e-5)
+
+# main .........................................................................
+def main():
+    try:
+        test_pid_tuner()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
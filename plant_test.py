@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-29
+# modified: 2021-05-15
+#
+# Closed-loop test of the PIDMotorController against the simulated plant,
+# running on a virtual clock faster than real time.
+#
+
+import pytest
+import sys, time
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.pid_motor_ctrl import PIDMotorController
+from mock.plant import simulate
+
+SETPOINT = 30.0 # cm/sec
+
+# ..............................................................................
+@pytest.mark.unit
+def test_plant():
+    _log = Logger('plant-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _tb, _clock, _motors, _plant = simulate(_config, seed=42)
+    _port_motor = _motors.get_motor(Orientation.PORT)
+    _stbd_motor = _motors.get_motor(Orientation.STBD)
+    _pmc = PIDMotorController(_config, _clock, _motors, Level.WARN)
+    _pmc.set_executor(_clock)
+    _pmc.set_time_source(_clock.now_ns)
+    _port_pid, _stbd_pid = _pmc.get_pid_controllers()
+
+    # the setpoint is slewed, so is set on every tick as by a caller
+    _setpoints = [ 0.0 ]
+    def _set_setpoints():
+        _port_pid.setpoint = _setpoints[0]
+        _stbd_pid.setpoint = _setpoints[0]
+    _clock.add_callback(_set_setpoints)
+
+    _motors.enable()
+    _pmc.enable()
+    _start = time.perf_counter()
+    _setpoints[0] = SETPOINT
+    _clock.run(15.0)
+    _elapsed_sec = time.perf_counter() - _start
+    _log.info('15 sec simulated in {:5.3f} sec; velocity: port {:5.2f}, stbd {:5.2f}cm/sec; supply ratio: {:5.3f}'.format(
+            _elapsed_sec, _port_motor.velocity, _stbd_motor.velocity, _plant.supply_ratio))
+    assert _elapsed_sec < 15.0
+    assert _port_motor.steps > 0 and _stbd_motor.steps > 0
+    for _orientation in ( Orientation.PORT, Orientation.STBD ):
+        assert _plant.get_velocity(_orientation) == pytest.approx(SETPOINT, abs=2.0)
+    assert _plant.supply_ratio < 1.0
+
+    # come to a stop
+    _setpoints[0] = 0.0
+    _clock.run(10.0)
+    for _orientation in ( Orientation.PORT, Orientation.STBD ):
+        assert _plant.get_velocity(_orientation) == pytest.approx(0.0, abs=2.0)
+
+    # re-enabling doesn't add the PID controllers' callbacks again
+    for i in range(3):
+        _port_pid.disable()
+        _port_pid.enable()
+    assert _clock._callbacks.count(_port_pid.tick) == 1
+    assert _clock._callbacks.count(_stbd_pid.tick) == 1
+
+    # disabling while driving halts without the PID controllers intervening
+    _setpoints[0] = SETPOINT
+    _clock.run(10.0)
+    _powers = []
+    _stop = [ False ]
+    def _tick():
+        while not _stop[0]:
+            _clock.tick()
+            _powers.append(_tb.GetMotor1())
+            time.sleep(0.001)
+    _ticker = Thread(target=_tick, daemon=True)
+    _ticker.start()
+    _pmc.disable()
+    _stop[0] = True
+    _ticker.join()
+    assert _tb.GetMotor1() == 0.0 and _tb.GetMotor2() == 0.0
+    assert all([ _next <= _power for _power, _next in zip(_powers, _powers[1:]) ])
+    _pmc.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_plant()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
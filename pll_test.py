@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-21
+# modified: 2021-04-21
+#
+# Tests the IntervalEstimator and PhaseLockedLoop against a simulated
+# reference clock, i.e., without requiring any hardware.
+#
+
+import pytest
+import sys, random, statistics
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.pll import IntervalEstimator, PhaseLockedLoop
+
+NOMINAL_NS = 50000000 # 20Hz
+
+# ..............................................................................
+def _simulate(pll, ref_period_ns, ref_offset_ns, duration_ns, ref_until_ns=None, jitter_ns=0):
+    '''
+    Runs a simulated local clock whose period is set by the PLL each tick,
+    against a reference clock with the given period and offset. Returns the
+    time of the last tick.
+    '''
+    _ref_t   = ref_offset_ns
+    _local_t = 0
+    _period  = NOMINAL_NS
+    while _local_t < duration_ns:
+        while _ref_t <= _local_t:
+            if ref_until_ns is None or _ref_t < ref_until_ns:
+                pll.reference_edge(_ref_t + random.randint(-jitter_ns, jitter_ns))
+            _ref_t += ref_period_ns
+        _period = pll.tick(_local_t)
+        _local_t += _period
+    return _local_t
+
+# ..............................................................................
+@pytest.mark.unit
+def test_interval_estimator():
+    _log = Logger('pll-test', Level.INFO)
+    _estimator = IntervalEstimator(10)
+    _values = [ random.randint(49000000, 51000000) for i in range(37) ]
+    for _value in _values:
+        _estimator.add(_value)
+    _window = _values[-10:]
+    assert _estimator.full
+    assert _estimator.mean == pytest.approx(statistics.mean(_window))
+    assert _estimator.variance == pytest.approx(statistics.variance(_window))
+    _log.info('interval estimator: mean {:8.1f}; variance: {:8.1f}'.format(_estimator.mean, _estimator.variance))
+
+# ..............................................................................
+@pytest.mark.unit
+def test_pll_lock_and_holdover():
+    _log = Logger('pll-test', Level.INFO)
+    random.seed(42)
+    _ref_period_ns = 50250000 # reference runs 0.5% slow
+    _pll = PhaseLockedLoop(NOMINAL_NS, level=Level.WARN)
+    _simulate(_pll, _ref_period_ns, 17000000, 30 * 1000000000, jitter_ns=20000)
+    _log.info('locked: {}; period: {:d}ns; phase error: {:d}ns; jitter: {:5.1f}ns'.format(
+            _pll.locked, _pll.period_ns, _pll.phase_error_ns, _pll.jitter_ns))
+    assert _pll.locked
+    assert abs(_pll.period_ns - _ref_period_ns) < 10000
+    assert abs(_pll.phase_error_ns) < 100000
+
+    # reference drops out after 5s: loop continues in holdover at the estimated period
+    _pll.reset()
+    _simulate(_pll, _ref_period_ns, 17000000, 10 * 1000000000, ref_until_ns=5 * 1000000000)
+    assert not _pll.locked
+    assert abs(_pll.period_ns - _ref_period_ns) < 10000
+    _log.info(Fore.GREEN + 'holdover period: {:d}ns'.format(_pll.period_ns))
+
+# ..............................................................................
+@pytest.mark.unit
+def test_pll_sparse_sampling():
+    '''
+    The reference need only be sampled occasionally once locked: a gap in
+    the edges is divided down to a single period.
+    '''
+    _pll = PhaseLockedLoop(NOMINAL_NS, level=Level.WARN)
+    _pll.reference_edge(0)
+    _pll.reference_edge(10 * 50100000)
+    assert _pll.period_ns == 50100000
+    # a bounce is ignored
+    _pll.reference_edge(10 * 50100000 + 1000)
+    assert _pll.period_ns == 50100000
+
+# main .........................................................................
+def main():
+    try:
+        test_interval_estimator()
+        test_pll_lock_and_holdover()
+        test_pll_sparse_sampling()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
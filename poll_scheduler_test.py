@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-10
+# modified: 2021-05-15
+#
+# Tests the adaptive poll scheduler of the Integrated Front Sensor, partial
+# scans of the IO Expander on a register-level mock of its MS51, and that the
+# IFS only thresholds the groups of sensors read since its previous tick.
+#
+
+import pytest
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.config_loader import ConfigLoader
+from lib.ioe import IoExpander
+from lib.ioe_scan import IOE_PINS
+from lib.poll_scheduler import PollScheduler
+from mock.ms51 import MockMS51, MockIOE, ADC, IN_PU
+
+CYCLES = 400 # 20 seconds at 20Hz
+
+# the group of the IR sensor of each event
+IR_GROUPS = { Event.INFRARED_CNTR: IoExpander.GROUP_CNTR, Event.INFRARED_PORT: IoExpander.GROUP_OBLQ,
+        Event.INFRARED_STBD: IoExpander.GROUP_OBLQ, Event.INFRARED_PORT_SIDE: IoExpander.GROUP_SIDE,
+        Event.INFRARED_STBD_SIDE: IoExpander.GROUP_SIDE }
+
+# ..............................................................................
+class MockClock(object):
+    '''
+    Stands in for the Clock, recording the events of the messages sent on
+    its message bus.
+    '''
+    def __init__(self):
+        self.events = []
+        self.message_bus = self
+        self.message_factory = self
+
+    def get_message(self, event, value):
+        return event
+
+    def handle(self, message):
+        self.events.append(message)
+
+# ..............................................................................
+def _run(scheduler, snapshot, cycles=CYCLES):
+    '''
+    Runs the scheduler for a number of cycles, returning the number of
+    cycles each group was chosen and the longest gap between them.
+    '''
+    _counts = [ 0 ] * len(PollScheduler.GROUPS)
+    _gaps   = [ 0 ] * len(PollScheduler.GROUPS)
+    _last   = [ -1 ] * len(PollScheduler.GROUPS)
+    for _cycle in range(cycles):
+        _groups = scheduler.next_groups()
+        assert _groups
+        snapshot[IoExpander.GROUPS] = _groups
+        scheduler.record(snapshot)
+        for i, _group in enumerate(PollScheduler.GROUPS):
+            if _groups & _group:
+                _counts[i] += 1
+                _gaps[i] = max(_gaps[i], _cycle - _last[i])
+                _last[i] = _cycle
+    return _counts, _gaps
+
+# ..............................................................................
+@pytest.mark.unit
+def test_poll_scheduler():
+    _log = Logger('poll-sched-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _ifs_config = _config['ros'].get('integrated_front_sensor')
+    _config_ps = _ifs_config.get('poll_scheduler')
+    _config_ps['groups_per_cycle'] = 1
+    _sample_freq_hz = _ifs_config.get('sample_freq_hz')
+    _max_gap = int(_sample_freq_hz / _config_ps.get('min_rate_hz'))
+    _snapshot = [ 0 ] * IoExpander.SNAPSHOT_SIZE
+
+    # parked: each group in turn ...............
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    _log.info('parked:  {}'.format(_counts))
+    assert max(_counts) - min(_counts) <= 1
+    assert max(_gaps) == 4
+    for _label, _rate in _scheduler.rates.items():
+        assert _rate == pytest.approx(_sample_freq_hz / 4.0, abs=0.5)
+    _rates = _scheduler.sensor_rates
+    assert len(_rates) == 8
+    assert _rates['ir-port'] == _rates['ir-stbd'] == _scheduler.rates['oblq']
+
+    # full speed ahead: forward groups favoured, minimum rate honoured
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _scheduler.set_motion(_config_ps.get('max_velocity'), 0.0)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    _log.info('ahead:   {}; rates: {}'.format(_counts, _scheduler.rates))
+    _bmp, _cntr, _oblq, _side = _counts
+    assert _cntr > 2 * _side and _oblq > 2 * _side and _bmp > 2 * _side
+    assert _gaps[3] <= _max_gap
+    assert _scheduler.rates['side'] >= _config_ps.get('min_rate_hz')
+    assert _scheduler.rates['cntr'] > _sample_freq_hz / 4.0
+
+    # astern: soon no different from parked ..
+    _scheduler.set_motion(-_config_ps.get('max_velocity'), 0.0)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    assert max(_counts) - min(_counts) <= 4
+    assert max(_gaps) <= _max_gap
+
+    # turning in place: oblique and side favoured
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _scheduler.set_motion(0.0, -_config_ps.get('max_velocity'))
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    _log.info('turning: {}'.format(_counts))
+    _bmp, _cntr, _oblq, _side = _counts
+    assert _oblq > 2 * _cntr and _side > 2 * _cntr
+
+    # an obstacle near the port side .........
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _snapshot[IoExpander.PORT_SIDE_IR] = _config_ps.get('near_raw')
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    _log.info('obstacle to port side: {}'.format(_counts))
+    _snapshot[IoExpander.PORT_SIDE_IR] = 0
+    _bmp, _cntr, _oblq, _side = _counts
+    assert _side > 2 * _cntr
+    assert max(_gaps) <= _max_gap
+
+    # a minimum rate beyond the share of a group is still honoured
+    _config_ps['min_rate_hz'] = 5.0
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _scheduler.set_motion(_config_ps.get('max_velocity'), 0.0)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    assert max(_gaps) <= 4
+
+    # more than one group per cycle ...........
+    _config_ps['groups_per_cycle'] = 2
+    _config_ps['min_rate_hz'] = 2.0
+    _scheduler = PollScheduler(_config, Level.WARN)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    assert sum(_counts) == 2 * CYCLES
+    assert max(_counts) - min(_counts) <= 2
+
+    # interrupt-driven bumpers are excluded ...
+    _config_ps['groups_per_cycle'] = 1
+    _scheduler = PollScheduler(_config, Level.WARN, exclude=IoExpander.GROUP_BUMPERS)
+    _counts, _gaps = _run(_scheduler, _snapshot)
+    assert _counts[0] == 0
+    assert max(_counts[1:]) - min(_counts[1:]) <= 1
+    assert 'bmp' not in _scheduler.rates and 'bmp-port' not in _scheduler.sensor_rates
+
+# ..............................................................................
+@pytest.mark.unit
+def test_partial_scan():
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _ioe_config = _config['ros'].get('io_expander')
+    _ms51 = MockMS51()
+    _ioe = MockIOE(_ms51)
+    _adc_pins = [ _ioe_config.get(_key) for _key in ( 'port_side_ir_pin', 'port_ir_pin', 'center_ir_pin',
+            'stbd_ir_pin', 'stbd_side_ir_pin', 'port_moth_pin', 'stbd_moth_pin' ) ]
+    _bmp_pins = [ _ioe_config.get(_key) for _key in ( 'port_bmp_pin', 'center_bmp_pin', 'stbd_bmp_pin' ) ]
+    for _pin in _adc_pins:
+        _ioe.set_mode(_pin, ADC)
+    for _pin in _bmp_pins:
+        _ioe.set_mode(_pin, IN_PU)
+    for i, _pin in enumerate(_adc_pins):
+        _ms51.set_voltage(IOE_PINS[_pin - 1][2], 0.3 + i * 0.4)
+    _port, _bit, _channel = IOE_PINS[_bmp_pins[1] - 1]
+    _ms51.set_level(_port, _bit, 0)
+    for _bulk in ( False, True ):
+        _config['ros']['io_expander']['bulk_read'] = _bulk
+        _expander = IoExpander(_config, Level.WARN, ioe=_ioe, bus=_ms51)
+        _full = _expander.scan()
+        _ms51.transactions = 0
+        _expander.scan(groups=IoExpander.GROUP_ALL)
+        _full_transactions = _ms51.transactions
+        # only the oblique infrareds are read; the rest are untouched
+        _snapshot = _expander.scan(groups=IoExpander.GROUP_OBLQ)
+        assert _snapshot[IoExpander.GROUPS] == IoExpander.GROUP_OBLQ
+        for i in range(IoExpander.BUMPERS + 1):
+            if i in ( IoExpander.PORT_IR, IoExpander.STBD_IR ):
+                assert _snapshot[i] == _full[i]
+            else:
+                assert _snapshot[i] == 0
+        # a partial scan fills the rest of a previous snapshot
+        _ms51.transactions = 0
+        _expander.scan(_snapshot, IoExpander.GROUP_ALL & ~IoExpander.GROUP_OBLQ)
+        assert _ms51.transactions < _full_transactions
+        assert _snapshot[:IoExpander.GROUPS] == _full[:IoExpander.GROUPS]
+        _ms51.transactions = 0
+        _expander.scan(_snapshot, IoExpander.GROUP_BUMPERS)
+        assert _ms51.transactions == ( 2 if _bulk else 3 )
+        assert _snapshot[IoExpander.BUMPERS] == IoExpander.BUMPER_CNTR
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ifs_missed_snapshots():
+    pytest.importorskip('pymessagebus')
+    pytest.importorskip('ioexpander')
+    from lib.ifs import IntegratedFrontSensor
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _ifs_config = _config['ros'].get('integrated_front_sensor')
+    _ifs_config['poll_scheduler']['adaptive'] = True
+    _ifs_config['poll_scheduler']['groups_per_cycle'] = 1
+    _ioe_config = _config['ros'].get('io_expander')
+    _ms51 = MockMS51()
+    _ioe = MockIOE(_ms51)
+    for _key in ( 'port_side_ir_pin', 'port_ir_pin', 'center_ir_pin', 'stbd_ir_pin', 'stbd_side_ir_pin', 'port_moth_pin', 'stbd_moth_pin' ):
+        _pin = _ioe_config.get(_key)
+        _ioe.set_mode(_pin, ADC)
+        _ms51.set_voltage(IOE_PINS[_pin - 1][2], 0.9) # every infrared triggers
+    for _key in ( 'port_bmp_pin', 'center_bmp_pin', 'stbd_bmp_pin' ):
+        _ioe.set_mode(_ioe_config.get(_key), IN_PU)
+    _clock = MockClock()
+    _ifs = IntegratedFrontSensor(_config, _clock, Level.WARN, ioe=IoExpander(_config, Level.WARN, ioe=_ioe, bus=_ms51))
+    _sampler = _ifs.sampler
+    _snapshot = _sampler.snapshot()
+    _ir_groups = IoExpander.GROUP_CNTR | IoExpander.GROUP_OBLQ | IoExpander.GROUP_SIDE
+    _tested = 0
+    for _tick in range(40):
+        # between ticks the sampler completes one or (missing one) two snapshots
+        _read = 0
+        for _sample in range(1 + _tick % 2):
+            _sampler.sample()
+            _sampler.read(_snapshot)
+            _read |= _snapshot[IoExpander.GROUPS]
+        _clock.events.clear()
+        _ifs.handle(None)
+        _handled = 0
+        for _event in _clock.events:
+            _handled |= IR_GROUPS[_event]
+        # the infrareds of exactly the groups read since the last tick
+        assert _handled == _read & _ir_groups
+        if _read & _ir_groups != _ir_groups:
+            _tested += 1
+        # without a new snapshot nothing is thresholded again
+        _clock.events.clear()
+        _ifs.handle(None)
+        assert not _clock.events
+    assert _tested
+    _ifs.close()
+    # if not adaptive every handled group is read, but never the unused moth sensors
+    _ifs_config['poll_scheduler']['adaptive'] = False
+    _ifs = IntegratedFrontSensor(_config, _clock, Level.WARN, ioe=IoExpander(_config, Level.WARN, ioe=_ioe, bus=_ms51))
+    _ifs.sampler.sample()
+    _ifs.sampler.read(_snapshot)
+    assert _snapshot[IoExpander.GROUPS] == IoExpander.GROUP_ALL & ~IoExpander.GROUP_MOTH
+    _ifs.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_poll_scheduler()
+        test_partial_scan()
+        test_ifs_missed_snapshots()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
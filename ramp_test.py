@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-04
+# modified: 2021-05-15
+#
+# Tests the RampEngine: synchronised ramps of both motors advanced on the
+# clock tick, cancellation by interrupt(), step targets, and ramps driven
+# and awaited within an asyncio event loop.
+#
+
+import pytest
+import sys, time, asyncio
+from threading import Thread
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.enums import Orientation
+from lib.slew import SlewRate
+from lib.motors import Motors
+from lib.ramp import RampEngine
+from mock.pigpio import MockPi
+from mock.thunderborg import QuietThunderBorg
+from mock.virtual_clock import VirtualClock
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ramp():
+    _log = Logger('ramp-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _tb = QuietThunderBorg(Level.WARN, history=True)
+    _clock = VirtualClock(20, level=Level.WARN)
+    _motors = Motors(_config, _clock, _tb, Level.WARN, pi=MockPi())
+    _port_motor = _motors.get_motor(Orientation.PORT)
+    _stbd_motor = _motors.get_motor(Orientation.STBD)
+    _ratio = _port_motor.get_max_power_ratio()
+    _motors.enable()
+
+    # synchronised ramps of both motors .......
+    _port_ramp, _stbd_ramp = _motors.accelerate(60.0, 30.0, SlewRate.NORMAL)
+    assert not _port_ramp.done # returned immediately
+    _ticks = 0
+    while _motors.ramp_engine.active:
+        _clock.tick()
+        _ticks += 1
+        assert _port_ramp.done == _stbd_ramp.done # both complete on the same tick
+    # NORMAL slews 0.08 per 100ms, i.e., 0.04 per 50ms tick
+    assert _ticks == 15
+    assert _port_ramp.wait(0.0) and _stbd_ramp.wait(0.0)
+    assert _tb.GetMotor1() == pytest.approx(0.6 * _ratio)
+    assert _tb.GetMotor2() == pytest.approx(0.3 * _ratio)
+
+    # cancellation by interrupt ...............
+    _ramps = _motors.accelerate(0.0, 0.0, SlewRate.SLOWER)
+    _clock.run(0.25)
+    _motors.interrupt()
+    _clock.tick()
+    assert not _motors.ramp_engine.active
+    assert all([ _ramp.cancelled for _ramp in _ramps ])
+    assert not _ramps[0].wait(0.0)
+    _port_power = _tb.GetMotor1()
+    assert 0.0 < _port_power < 0.6 * _ratio
+    _clock.run(0.5)
+    assert _tb.GetMotor1() == _port_power # left where it was
+    # a new ramp on a motor supersedes the existing one
+    _ramp = _port_motor.accelerate(0.0, SlewRate.NORMAL, -1)
+    _clock.tick()
+    _new_ramp = _port_motor.halt()
+    assert _ramp.cancelled
+    _clock.run(1.0)
+    assert _new_ramp.done and not _new_ramp.cancelled
+    assert _tb.GetMotor1() == 0.0
+    # a step target holds the speed until the steps have been run
+    _ramp = _port_motor.accelerate(40.0, SlewRate.FAST, 100)
+    _clock.run(1.0)
+    assert not _ramp.done
+    assert _tb.GetMotor1() == pytest.approx(0.4 * _ratio)
+    _port_motor._callback_step_count(99)
+    _clock.tick()
+    assert not _ramp.done
+    _port_motor._callback_step_count(1)
+    _clock.tick()
+    assert _ramp.done and not _ramp.cancelled
+    assert _tb.GetMotor1() == pytest.approx(0.4 * _ratio)
+    _port_motor.halt()
+    _clock.run(1.0)
+    assert _tb.GetMotor1() == 0.0
+
+    # driven and awaited in asyncio ...........
+    _engine = RampEngine(_config, None, None, Level.WARN)
+    _stbd_motor.set_ramp_engine(_engine)
+    async def _ramp_down():
+        _engine.enable()
+        _task = asyncio.get_event_loop().create_task(_engine.run())
+        _completed = await _stbd_motor.accelerate(0.0, SlewRate.FAST, -1)
+        _engine.disable()
+        await _task
+        return _completed
+    assert asyncio.run(_ramp_down())
+    assert _tb.GetMotor2() == 0.0
+
+    # disabling while in motion halts first ...
+    _port_motor.set_ramp_engine(_motors.ramp_engine)
+    _stbd_motor.set_ramp_engine(_motors.ramp_engine)
+    _motors.accelerate(50.0, 50.0, SlewRate.FAST)
+    _clock.run(1.0)
+    assert _tb.GetMotor1() == pytest.approx(0.5 * _ratio)
+    assert _motors.halt() is True
+    _motors.accelerate(50.0, 50.0, SlewRate.FAST)
+    _clock.run(1.0)
+    _stop = [ False ]
+    def _tick():
+        while not _stop[0]:
+            _clock.tick()
+            time.sleep(0.001)
+    _ticker = Thread(target=_tick, daemon=True)
+    _tb.motor1_history.clear()
+    _ticker.start()
+    _motors.disable()
+    _stop[0] = True
+    _ticker.join()
+    assert _tb.GetMotor1() == 0.0 and _tb.GetMotor2() == 0.0
+    # ramped down rather than cut
+    assert len([ _power for _power in _tb.motor1_history if 0.0 < _power < 0.5 * _ratio ]) >= 2
+    _log.info('ramps complete.')
+    _motors.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_ramp()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -7,7 +7,7 @@
 #
 # author:   Murray Altheim
 # created:  2019-12-23
-# modified: 2020-03-12
+# modified: 2021-05-15
 #
 # The NZPRG Robot Operating System (ROS), including its command line interface (CLI).
 #
@@ -39,6 +39,7 @@ from lib.clock import Clock
 from lib.queue import MessageQueue
 from lib.arbitrator import Arbitrator
 from lib.controller import Controller
+from lib.watchdog import Watchdog
 
 #from lib.indicator import Indicator
 #from lib.gamepad import Gamepad, GamepadConnectException
@@ -101,6 +102,7 @@ class ROS(AbstractTask):
         self._gamepad      = None
         self._motors       = None
         self._ifs          = None
+        self._watchdog     = None
         self._features     = []
         self._log.info('initialised.')
 
@@ -281,6 +283,11 @@ class ROS(AbstractTask):
         self._controller = Controller(self._config, self._ifs, self._motors, self._callback_shutdown, self._log.level)
         self._log.info('configuring arbitrator...')
         self._arbitrator = Arbitrator(self._config, self._queue, self._controller, self._log.level)
+        if self._config['ros'].get('watchdog').get('enabled'):
+            self._log.info('configuring watchdog...')
+            self._watchdog = Watchdog(self._config, self._message_bus, self._message_factory, self._log.level)
+            self._clock.set_watchdog(self._watchdog)
+            self._arbitrator.set_watchdog(self._watchdog)
         self._log.info('configured.')
 
     # ..........................................................................
@@ -517,6 +524,9 @@ class ROS(AbstractTask):
         for feature in self._features:
             self._log.info('enabling feature {}...'.format(feature.name()))
             feature.enable()
+        if self._watchdog:
+            self._log.info('enabling watchdog...')
+            self._watchdog.enable()
 
         self._log.notice('Press Ctrl-C to exit.')
         self._log.info('begin main os loop.\r')
@@ -573,6 +583,9 @@ class ROS(AbstractTask):
             self._active = False
             self._closing = True
             self._log.info(Style.BRIGHT + 'closing...')
+            if self._watchdog:
+                # first, so that loops stopping during shutdown aren't reported as stalled
+                self._watchdog.close()
             if self._gamepad:
                 self._gamepad.close() 
             if self._motors:
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-23
+# modified: 2021-04-23
+#
+# Tests the RealTimeExecutor, reporting loop jitter with the real-time
+# features disabled and enabled whilst under a CPU stress load. Run as root
+# (e.g., via sudo) for SCHED_FIFO to be permitted; otherwise the executor
+# falls back to an ordinary thread and both results will be similar.
+#
+
+import pytest
+import sys, time, multiprocessing
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.rt_executor import RealTimeExecutor
+
+LOOP_FREQ_HZ = 100
+DURATION_SEC = 2.0
+
+# ..............................................................................
+def _stress(stop_event):
+    _x = 0
+    while not stop_event.is_set():
+        _x = ( _x * 31 + 7 ) % 1000003
+
+def _get_config(realtime):
+    return { 'ros': { 'rt_executor': {
+        'realtime': realtime,
+        'loop_freq_hz': LOOP_FREQ_HZ,
+        'priority': 50,
+        'cpu': -1,
+        'jitter_window': 1000 } } }
+
+def _run(log, realtime, stress):
+    _stop = multiprocessing.Event()
+    _workers = []
+    if stress:
+        for i in range(multiprocessing.cpu_count() * 2):
+            _worker = multiprocessing.Process(target=_stress, args=(_stop,), daemon=True)
+            _worker.start()
+            _workers.append(_worker)
+    _ticks = []
+    _executor = RealTimeExecutor(_get_config(realtime), Level.WARN)
+    _executor.add_callback(lambda: _ticks.append(1))
+    try:
+        _executor.enable()
+        time.sleep(DURATION_SEC)
+        _executor.disable()
+    finally:
+        _stop.set()
+        for _worker in _workers:
+            _worker.join()
+    _mean, _stdev, _max, _overruns = _executor.jitter_stats
+    log.info('real-time: {} ({}); stress: {}; ticks: {:d}; '.format(realtime, _executor.is_realtime, stress, len(_ticks)) \
+            + Fore.YELLOW + 'jitter mean: {:8.2f}µs; stdev: {:8.2f}µs; max: {:8.2f}µs; overruns: {:d}'.format(_mean, _stdev, _max, _overruns))
+    return _executor, len(_ticks)
+
+# ..............................................................................
+@pytest.mark.unit
+def test_rt_executor():
+    _log = Logger('rt-exec-test', Level.INFO)
+    _expected = LOOP_FREQ_HZ * DURATION_SEC
+    for _realtime in ( False, True ):
+        _executor, _count = _run(_log, _realtime, stress=True)
+        # tolerate a loose margin: this is a sanity check, not a benchmark
+        assert _count > _expected * 0.8
+        assert _count < _expected * 1.1
+        assert not _executor.enabled
+
+# main .........................................................................
+def main():
+    try:
+        test_rt_executor()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-09
+# modified: 2021-05-09
+#
+# Tests the double-buffered Sampler, and compares the time spent in the clock
+# tick reading the IO Expander directly with reading the sampler's snapshot.
+#
+
+import pytest
+import time
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.ioe import IoExpander
+from lib.ioe_scan import IOE_PINS
+from lib.sampler import Sampler
+from lib.timing import now_ns
+from mock.ms51 import MockMS51, MockIOE, ADC, IN_PU
+
+# ..............................................................................
+class SlowCounter(object):
+    '''
+    An acquisition that fills each snapshot with a single incrementing
+    value, slowly, so that a partially filled snapshot would be detected.
+    '''
+    def __init__(self):
+        self._value = 0
+
+    def acquire(self, snapshot):
+        self._value += 1
+        for i in range(len(snapshot)):
+            snapshot[i] = self._value
+            time.sleep(0.0002)
+
+# ..............................................................................
+def _create_expander(config, ms51):
+    _ioe = MockIOE(ms51)
+    _ioe_config = config['ros'].get('io_expander')
+    for _key in ( 'port_side_ir_pin', 'port_ir_pin', 'center_ir_pin', 'stbd_ir_pin', 'stbd_side_ir_pin', 'port_moth_pin', 'stbd_moth_pin' ):
+        _pin = _ioe_config.get(_key)
+        _ioe.set_mode(_pin, ADC)
+        ms51.set_voltage(IOE_PINS[_pin - 1][2], 0.9)
+    for _key in ( 'port_bmp_pin', 'center_bmp_pin', 'stbd_bmp_pin' ):
+        _ioe.set_mode(_ioe_config.get(_key), IN_PU)
+    return IoExpander(config, Level.WARN, ioe=_ioe, bus=ms51)
+
+# ..............................................................................
+@pytest.mark.unit
+def test_sampler():
+    _log = Logger('sampler-test', Level.INFO)
+
+    # consistency of snapshots ................
+    _counter = SlowCounter()
+    _sampler = Sampler('test-sampler', _counter.acquire, 8, 200, Level.WARN)
+    _snapshot = _sampler.snapshot()
+    assert _sampler.read(_snapshot) == ( 0, 0 )
+    _sampler.enable()
+    _last_sequence = 0
+    _reads = 0
+    _end = time.monotonic() + 0.5
+    while time.monotonic() < _end:
+        _sequence, _timestamp_ns = _sampler.read(_snapshot)
+        assert _sequence >= _last_sequence
+        # never a partial snapshot: all from the same acquisition
+        assert len(set(_snapshot)) == 1
+        if _sequence:
+            assert _snapshot[0] == _sequence
+        _last_sequence = _sequence
+        _reads += 1
+        time.sleep(0.0001)
+    _sampler.close()
+    assert not _sampler.enabled
+    assert _last_sequence > 20
+    assert _sampler.errors == 0
+    _log.info('{:d} snapshots in 0.5 sec; {:d} reads.'.format(_last_sequence, _reads))
+
+    # tick handler time .......................
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros']['io_expander']['bulk_read'] = False
+    _ms51 = MockMS51(transaction_us=100) # ~ a 2 byte transaction at 100kHz
+    _expander = _create_expander(_config, _ms51)
+    _snapshot = _expander.scan()
+    _sampler = Sampler('ifs-sampler', _expander.scan, IoExpander.SNAPSHOT_SIZE, 20, Level.WARN)
+    _sampler.sample()
+    _direct_ns = 0
+    _sampled_ns = 0
+    for i in range(5):
+        _start_ns = now_ns()
+        _expander.scan(_snapshot)
+        _direct_ns += now_ns() - _start_ns
+        _start_ns = now_ns()
+        _sampler.read(_snapshot)
+        _sampled_ns += now_ns() - _start_ns
+    assert _snapshot[IoExpander.CNTR_IR] == 90
+    _log.info('per tick: reading the IO Expander: {:7.1f}µs; reading the snapshot: {:5.1f}µs; sampler acquisition: {:7.1f}µs.'.format(
+            _direct_ns / 5000.0, _sampled_ns / 5000.0, _sampler.acquire_us))
+    assert _sampled_ns * 100 < _direct_ns
+
+# main .........................................................................
+def main():
+    try:
+        test_sampler()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-12
+# modified: 2021-05-15
+#
+# Tests the sweep engine of the Lidar upon a simulated servo and ToF sensor,
+# comparing the time and accuracy of sequential and pipelined sweeps.
+#
+
+import pytest, time, math
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.sweep import SettleModel, SweepEngine
+from mock.lidar import SimTime, MockServo, MockRanger
+
+# ..............................................................................
+def _scene(angle):
+    '''
+    A wall nearer to starboard, with a post just to port of center.
+    '''
+    _mm = 1200.0 - 8.0 * angle
+    if -12.5 < angle < -7.5:
+        _mm -= 600.0
+    return _mm
+
+# ..............................................................................
+def _create(config, budget_sec=0.066, inter_measurement_sec=0.070):
+    _time   = SimTime()
+    _servo  = MockServo(_time, dead_time_sec=0.008, rate_dps=500.0)
+    _ranger = MockRanger(_time, _servo, _scene, budget_sec, inter_measurement_sec)
+    _engine = SweepEngine(config, _servo, _ranger, Level.WARN)
+    _engine.set_time_source(_time.now, _time.sleep)
+    return _engine, _servo, _ranger, _time
+
+# ..............................................................................
+def _errors(scan):
+    return sum(1 for _angle, _mm in scan if _mm != int(round(_scene(_angle))))
+
+# ..............................................................................
+@pytest.mark.unit
+def test_settle_model():
+    _model = SettleModel(0.008, 500.0, 0.004)
+    assert _model.settle_sec(5.0) == pytest.approx(0.022)
+    assert _model.settle_sec(-5.0) == _model.settle_sec(5.0)
+    _fitted = SettleModel.fit([ ( _step, 0.010 + _step / 400.0 ) for _step in ( 5.0, 10.0, 20.0, 40.0 ) ])
+    assert _fitted.dead_time_sec == pytest.approx(0.010)
+    assert _fitted.rate_dps == pytest.approx(400.0)
+    with pytest.raises(ValueError):
+        SettleModel.fit([ ( 5.0, 0.02 ) ])
+
+# ..............................................................................
+@pytest.mark.unit
+def test_sweep():
+    _log = Logger('sweep-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _lidar_config = _config['ros'].get('lidar')
+    _count = len(numpy.arange(_lidar_config.get('min_angle'), _lidar_config.get('max_angle') + 0.01, _lidar_config.get('degree_step')))
+
+    # before: polling the servo's position, lingering at each step ...........
+    _engine, _servo, _ranger, _time = _create(_config)
+    _scan = _engine.sweep_sequential()
+    _sequential_sec = _engine.sweep_sec
+    _sequential_errors = _errors(_scan)
+    _log.info('sequential sweep: {:5.3f}sec; {:d} of {:d} ranges in error.'.format(_sequential_sec, _sequential_errors, _count))
+
+    # after: the ToF's inter-measurement period allows for the servo to settle
+    _engine, _servo, _ranger, _time = _create(_config)
+    _ranger.set_timing(0.066, _engine.inter_measurement_ms / 1000.0)
+    _scan = _engine.sweep()
+    _pipelined_sec = _engine.sweep_sec
+    _log.info('pipelined sweep:  {:5.3f}sec; {:d} of {:d} ranges in error; inter-measurement period {:d}ms.'.format(
+            _pipelined_sec, _errors(_scan), _count, _engine.inter_measurement_ms))
+    assert _scan.shape == ( _count, 2 )
+    assert numpy.array_equal(_scan[:,0], _engine.angles)
+    assert _errors(_scan) == 0
+    # only measurements begun before arriving at the first angle are discarded
+    assert _engine.discarded <= 2
+    assert _scan[numpy.argmin(_scan[:,1]),0] == -10.0
+    assert _pipelined_sec < 0.8 * _sequential_sec
+    assert _sequential_errors > _count // 2 # the stale reading of the previous step
+    # the measurement per step: no longer than the inter-measurement period
+    assert _pipelined_sec < ( _count + 2 ) * _engine.inter_measurement_ms / 1000.0
+    _discarded = _engine.discarded
+    _scan = _engine.sweep(reverse=True)
+    assert _engine.discarded - _discarded <= 2
+    assert numpy.array_equal(_scan[:,0], _engine.angles[::-1])
+    assert _errors(_scan) == 0
+    # parked between sweeps (as after a Lidar scan) via the engine, so the
+    # first move of the next sweep is modelled from where the servo is ...
+    _engine.set_position(0.0)
+    _time.sleep(1.01)
+    _scan = _engine.sweep()
+    assert _errors(_scan) == 0
+    # ... or may be, if it is still moving there
+    _engine.set_position(0.0)
+    _scan = _engine.sweep(reverse=True)
+    assert _errors(_scan) == 0
+
+    # a period too short for the servo: measurements begun early are discarded
+    _engine, _servo, _ranger, _time = _create(_config)
+    _scan = _engine.sweep()
+    assert _engine.discarded >= _count - 1
+    assert _errors(_scan) == 0
+
+    # calibration of the settle model from the servo's position ...........
+    _engine, _servo, _ranger, _time = _create(_config)
+    _model = _engine.calibrate()
+    _log.info('calibrated: dead time {:4.1f}ms; rate {:5.1f}°/sec.'.format(_model.dead_time_sec * 1000.0, _model.rate_dps))
+    assert _model.dead_time_sec == pytest.approx(0.008, abs=0.002)
+    assert _model.rate_dps == pytest.approx(500.0, rel=0.1)
+
+# ..............................................................................
+@pytest.mark.unit
+def test_continuous_sweep():
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _config['ros']['lidar']['sweep']['ring_capacity'] = 40
+    _engine, _servo, _ranger, _time = _create(_config)
+    _ranger.set_timing(0.066, _engine.inter_measurement_ms / 1000.0)
+    _count = len(_engine.angles)
+    assert _engine.get_latest() is None
+    assert len(_engine.get_ring()) == 0
+    assert _engine.sweep_continuously(count=1) == 1
+    assert len(_engine.get_ring()) == _count
+    # back and forth: the latest sweep is the return
+    assert _engine.sweep_continuously(count=3) == 3
+    _latest = _engine.get_latest()
+    assert numpy.array_equal(_latest[:,0], _engine.angles)
+    _ring = _engine.get_ring()
+    assert _ring.shape == ( 40, 3 )
+    assert numpy.all(numpy.diff(_ring[:,0]) >= 0.0)
+    assert numpy.array_equal(_ring[-_count:,1], _engine.angles)
+    assert numpy.array_equal(_ring[-2 * _count:-_count,1], _engine.angles[::-1])
+    assert _errors(_ring[:,1:]) == 0
+    # on its own thread
+    _engine, _servo, _ranger, _time = _create(_config)
+    _engine.enable()
+    time.sleep(0.05)
+    _engine.close()
+    assert not _engine.enabled
+    assert _engine.get_latest() is not None
+
+# main .........................................................................
+def main():
+    try:
+        test_settle_model()
+        test_sweep()
+        test_continuous_sweep()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-05-14
+# modified: 2021-05-15
+#
+# Tests background scanning of the UltrasonicScanner upon a mock servo: that
+# its range buffer may be queried without waiting while it sweeps, and that
+# a change in the scene is seen within a sweep.
+#
+
+import pytest, time, timeit
+import numpy
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.config_loader import ConfigLoader
+from lib.range_bins import RangeBins
+from lib.timing import NS_PER_SEC
+from lib.ultrasonic import UltrasonicScanner
+from mock.ultrasonic_servo import MockUltrasonicServo
+
+# ..............................................................................
+def _wall(angle):
+    '''
+    A wall ahead, out of range beyond 60° either side.
+    '''
+    return 0 if abs(angle) > 60.0 else int(800.0 + 4.0 * abs(angle))
+
+# ..............................................................................
+def _wait_for(condition, timeout_sec=5.0):
+    _start = time.monotonic()
+    while not condition():
+        assert time.monotonic() - _start < timeout_sec
+        time.sleep(0.01)
+
+# ..............................................................................
+@pytest.mark.unit
+def test_range_bins():
+    _time_ns = [ 10 * NS_PER_SEC ]
+    _bins = RangeBins(-10.0, 10.0, 5.0)
+    _bins.set_time_source(lambda: _time_ns[0])
+    assert len(_bins.bearings) == 5
+    assert _bins.get(0.0) is None
+    assert _bins.minimum(-10.0, 10.0) is None
+    _bins.put(-10.0, 500.0)
+    _bins.put(1.0, 300.0)  # the 0° bin
+    _bins.put(10.0, numpy.inf)
+    _time_ns[0] += NS_PER_SEC // 2
+    _bins.put(5.0, 400.0)
+    assert _bins.get(0.0) == ( 300.0, 0.5 )
+    assert _bins.get(-40.0) == ( 500.0, 0.5 ) # clamped to the first bin
+    assert _bins.minimum(-10.0, 10.0) == ( 0.0, 300.0 )
+    assert _bins.minimum(10.0, 5.0) == ( 5.0, 400.0 )
+    assert _bins.minimum(-10.0, 10.0, max_age_sec=0.25) == ( 5.0, 400.0 )
+    assert numpy.array_equal(_bins.get_ages(), [ 0.5, numpy.inf, 0.5, 0.0, 0.5 ])
+    _bins.clear()
+    assert _bins.get(0.0) is None
+
+# ..............................................................................
+@pytest.mark.unit
+def test_ultrasonic_scan():
+    _log = Logger('uscan-test', Level.INFO)
+    _config = ConfigLoader(Level.WARN).configure('config.yaml')
+    _servo = MockUltrasonicServo(_wall)
+    _scanner = UltrasonicScanner(_config, Level.WARN, servo=_servo)
+    _bearings = _scanner.get_bearings()
+    _scanner.start_scanning()
+    assert not _scanner.scanning # disabled
+    _scanner.enable()
+    try:
+        _start = time.monotonic()
+        _scanner.start_scanning()
+        # queries return at once, before the first sweep is complete
+        assert _scanner.get_range(_bearings[-1]) is None
+        assert time.monotonic() - _start < 0.1
+        _in_range = numpy.abs(_bearings) <= 60.0
+        _wait_for(lambda: numpy.all(numpy.isfinite(_scanner.get_ages()[_in_range])))
+        _sweep_sec = time.monotonic() - _start
+        _log.info('first sweep of {:d} bearings: {:4.2f}sec.'.format(len(_bearings), _sweep_sec))
+        for _bearing in _bearings:
+            if abs(_bearing) > 60.0:
+                assert _scanner.get_range(_bearing) is None # nothing in range: never recorded
+            else:
+                _range, _age = _scanner.get_range(_bearing)
+                assert _range == _wall(_bearing)
+                assert _age < _sweep_sec + 0.1
+        assert _scanner.get_minimum(-30.0, 30.0) == ( 0.0, 800.0 )
+        assert _scanner.get_minimum(65.0, 90.0) is None # nothing in range
+        # the servo is driven by one scan at a time
+        assert _scanner.scan() is None
+        # sweeping back and forth: the middle is read upon each pass
+        _wait_for(lambda: _scanner.sweeps >= 2)
+        assert _scanner.get_ages()[len(_bearings) // 2] < _sweep_sec
+        # an obstacle appears to starboard ...
+        _servo.scene = lambda angle: 300 if 25.0 <= angle <= 35.0 else _wall(angle)
+        _wait_for(lambda: _scanner.get_range(30.0)[0] == 300.0)
+        _bearing, _range = _scanner.get_minimum(-90.0, 90.0, max_age_sec=0.1)
+        assert 25.0 <= _bearing <= 35.0 and _range == 300.0
+        # a very close obstacle to port, which often reads zero, is retried
+        _reads = [ 0 ]
+        def _close(angle):
+            if -35.0 <= angle <= -25.0:
+                _reads[0] += 1
+                return 0 if _reads[0] % 2 else 60
+            return _wall(angle)
+        _servo.scene = _close
+        _wait_for(lambda: _scanner.get_range(-30.0)[0] == 60.0)
+        _bearing, _range = _scanner.get_minimum(-90.0, 90.0)
+        assert -35.0 <= _bearing <= -25.0 and _range == 60.0
+        _query_us = timeit.timeit(lambda: _scanner.get_minimum(-45.0, 45.0), number=1000) / 1000 * 1e6
+        _log.info('minimum in a sector: {:5.1f}µs while scanning.'.format(_query_us))
+        _scanner.stop_scanning()
+        assert not _scanner.scanning
+        _readings = _servo.readings
+        time.sleep(0.05)
+        assert _servo.readings == _readings
+    finally:
+        _scanner.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_range_bins()
+        test_ultrasonic_scan()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF
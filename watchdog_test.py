@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright 2020-2021 by Murray Altheim. All rights reserved. This file is part
+# of the Robot Operating System project, released under the MIT License. Please
+# see the LICENSE file included as part of this package.
+#
+# author:   Murray Altheim
+# created:  2021-04-25
+# modified: 2021-04-25
+#
+# Tests the Watchdog with a pair of loops: a control loop that stalls and
+# then recovers, and a loop whose thread dies without releasing its heartbeat.
+#
+
+import pytest
+import sys, time, threading
+from colorama import init, Fore, Style
+init()
+
+from lib.logger import Logger, Level
+from lib.event import Event
+from lib.message_factory import MessageFactory
+from lib.ticker import Ticker
+from lib.watchdog import Watchdog
+
+_CONFIG = { 'ros': { 'watchdog': {
+        'loop_freq_hz': 50,
+        'stall_factor': 5.0,
+        'overrun_factor': 1.5,
+        'control_event': 'STOP' } } }
+
+# ..............................................................................
+class MessageSink(object):
+    '''
+    Collects any messages published by the watchdog.
+    '''
+    def __init__(self):
+        self.messages = []
+
+    def handle(self, message):
+        self.messages.append(message)
+
+# ..............................................................................
+def _stuck_in_here(release_event):
+    release_event.wait()
+
+def _control_loop(heartbeat, stall_event, release_event, stop_event):
+    while not stop_event.is_set():
+        heartbeat.beat()
+        if stall_event.is_set():
+            stall_event.clear()
+            _stuck_in_here(release_event)
+        time.sleep(0.01)
+    heartbeat.release()
+
+def _doomed_loop(heartbeat):
+    for i in range(5):
+        heartbeat.beat()
+        time.sleep(0.01)
+    # exits without releasing its heartbeat
+
+# ..............................................................................
+@pytest.mark.unit
+def test_watchdog():
+    _log = Logger('watchdog-test', Level.INFO)
+    _sink = MessageSink()
+    _message_factory = MessageFactory(None, Level.WARN)
+    _watchdog = Watchdog(_CONFIG, _sink, _message_factory, Level.INFO)
+
+    _control = _watchdog.register('control', 0.01, control=True)
+    _doomed  = _watchdog.register('doomed', 0.01)
+    _stall   = threading.Event()
+    _release = threading.Event()
+    _stop    = threading.Event()
+    _control_thread = threading.Thread(target=_control_loop, args=[_control, _stall, _release, _stop], daemon=True)
+    _doomed_thread  = threading.Thread(target=_doomed_loop, args=[_doomed], daemon=True)
+
+    # a ticker registers via set_watchdog() and releases its heartbeat when disabled
+    _ticks = []
+    _ticker = Ticker(50, lambda: _ticks.append(1), Level.WARN)
+    _ticker.set_watchdog(_watchdog)
+
+    _watchdog.enable()
+    _ticker.enable()
+    _control_thread.start()
+    _doomed_thread.start()
+    time.sleep(0.3)
+    assert _watchdog.stall_count == 1 # the doomed loop
+    assert _doomed.stalled
+    assert len(_sink.messages) == 0   # not a control loop
+    assert not _control.stalled
+
+    # stall the control loop .................
+    _stall.set()
+    time.sleep(0.3)
+    assert _control.stalled
+    assert _watchdog.stall_count == 2
+    assert len(_sink.messages) == 1
+    assert _sink.messages[0].event is Event.STOP
+    assert _sink.messages[0].value == 'control'
+    _stack = _watchdog._get_stack(sys._current_frames(), _control.ident)
+    assert '_stuck_in_here' in _stack
+
+    # ...and let it recover ...................
+    _release.set()
+    time.sleep(0.2)
+    assert not _control.stalled
+    _beats, _overruns, _max_ms = _control.stats
+    _log.info('control loop: {:d} beats; {:d} overruns; max interval {:5.1f}ms'.format(_beats, _overruns, _max_ms))
+    assert _overruns >= 1
+    assert _max_ms > 200.0
+
+    # loops that exit normally are not reported ...
+    _ticker.disable()
+    _stop.set()
+    _control_thread.join()
+    time.sleep(0.3)
+    assert _watchdog.stall_count == 2
+    assert len(_sink.messages) == 1
+    _watchdog.close()
+
+# main .........................................................................
+def main():
+    try:
+        test_watchdog()
+    except KeyboardInterrupt:
+        print(Fore.RED + 'Ctrl-C caught; exiting...' + Style.RESET_ALL)
+
+if __name__== "__main__":
+    main()
+
+#EOF